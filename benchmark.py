@@ -0,0 +1,218 @@
+"""
+Замеры производительности генератора G-кодов.
+
+Запуск:
+    python benchmark.py
+
+Конфигурация берётся из data/data.json и data/heads.json (как в GUI),
+количество слоёв можно переопределить аргументом --layers.
+
+Содержит:
+- load_bench_config — конфигурация для замеров
+- bench_write_throughput — скорость записи файла разными способами
+- bench_engines — время генерации и записи файла каждым способом генерации
+- bench_command_memory — память под команды слоёв (общие команды и копии)
+"""
+
+import argparse
+import copy
+import gc
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from core import (
+    AtomicOutputWriter,
+    CommandGenerator,
+    GCodeFormatter,
+    DURABILITY_NONE,
+    DURABILITY_FILE,
+    DURABILITY_FULL,
+    ENGINES_BY_SPEED,
+    ENGINE_MEMORY,
+    ENGINE_TEMPLATE,
+)
+
+
+def load_bench_config(layers: int = 0) -> Dict[str, Any]:
+    """
+    Загружает конфигурацию из data/data.json и data/heads.json.
+
+    Args:
+        layers: Количество слоёв (0 — как в data.json)
+
+    Returns:
+        Словарь параметров генерации
+    """
+    with open(os.path.join('data', 'data.json'), encoding='utf-8-sig') as f:
+        config = json.load(f)
+    with open(os.path.join('data', 'heads.json'), encoding='utf-8-sig') as f:
+        config.update(json.load(f))
+    if layers:
+        config['Количество слоёв'] = layers
+    return config
+
+
+def _timed(func: Callable[[], Any]) -> float:
+    """Возвращает время выполнения func в секундах."""
+    gc.collect()
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def bench_write_throughput(config: Dict[str, Any]) -> List[str]:
+    """
+    Сравнивает скорость записи одних и тех же слоёв в файл.
+
+    Слои генерируются один раз, затем записываются через open(..., 'w')
+    (как раньше) и через AtomicOutputWriter с разными политиками fsync.
+
+    Args:
+        config: Параметры генерации
+
+    Returns:
+        Строки отчёта
+    """
+    generator = CommandGenerator(config)
+    layers = generator.generate_layers()
+
+    def write_layers(file_handle):
+        formatter = GCodeFormatter(file_handle, generator.amount_layers)
+        formatter.write_prehead(generator.get_prehead_params())
+        for layer in layers:
+            formatter.write_layer(layer)
+
+    report = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.tap')
+
+        def text_mode():
+            with open(path, 'w', encoding='utf-8') as f:
+                write_layers(f)
+
+        variants = [('open(w), буфер по умолчанию', text_mode)]
+        for durability in (DURABILITY_NONE, DURABILITY_FILE, DURABILITY_FULL):
+            def atomic(durability=durability):
+                with AtomicOutputWriter(path, durability=durability) as f:
+                    write_layers(f)
+            variants.append((f'AtomicOutputWriter, fsync={durability}', atomic))
+
+        for name, func in variants:
+            seconds = _timed(func)
+            size_mb = os.path.getsize(path) / (1 << 20)
+            report.append(f'{name:45} {seconds:7.3f} с  {size_mb / seconds:8.1f} МБ/с')
+
+    return report
+
+
+def bench_engines(config: Dict[str, Any], repeat: int = 3) -> List[str]:
+    """
+    Сравнивает время генерации и записи файла способами генерации (см. core.engine).
+
+    Слои генерируются и записываются так же, как в generate_G_codes_file:
+    memory — все слои до записи, streaming — по одному, template — по одному
+    с переиспользованием XY перемещений ударов. Запись без fsync, чтобы
+    время диска не заслоняло разницу способов. Берётся лучшее время
+    из repeat запусков.
+
+    Args:
+        config: Параметры генерации
+        repeat: Количество запусков каждого способа
+
+    Returns:
+        Строки отчёта
+    """
+    generator = CommandGenerator(config)
+    offset_list = generator.pattern_offsets()
+
+    report = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.tap')
+        for engine in ENGINES_BY_SPEED:
+            def generate_and_write(engine=engine):
+                if engine == ENGINE_MEMORY:
+                    layers = generator.generate_layers(offset_list)
+                else:
+                    layers = generator.iter_layers(offset_list,
+                                                   reuse_hits=engine == ENGINE_TEMPLATE)
+                with AtomicOutputWriter(path, durability=DURABILITY_NONE) as f:
+                    formatter = GCodeFormatter(f, generator.amount_layers)
+                    formatter.write_prehead(generator.get_prehead_params())
+                    for layer in layers:
+                        formatter.write_layer(layer)
+
+            seconds = min(_timed(generate_and_write) for _ in range(repeat))
+            report.append(f'{engine:45} {seconds:7.3f} с')
+
+    return report
+
+
+def _traced(func: Callable[[], Any]):
+    """Возвращает результат func и объём памяти, удерживаемой результатом (байт)."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, size
+
+
+def bench_command_memory(config: Dict[str, Any]) -> List[str]:
+    """
+    Сравнивает память под команды слоёв с общими командами и без них.
+
+    Вариант без общих команд воспроизводится копированием каждой команды
+    в отдельный объект — так генератор создавал команды раньше.
+
+    Args:
+        config: Параметры генерации
+        repeat: Количество запусков каждого способа
+
+    Returns:
+        Строки отчёта
+    """
+    generator = CommandGenerator(config)
+    offset_list = generator.pattern_offsets()
+    layers, shared_size = _traced(lambda: generator.generate_layers(offset_list))
+    commands = [cmd for layer in layers for cmd in layer.commands]
+    _, copied_size = _traced(lambda: [[copy.copy(cmd) for cmd in layer.commands]
+                                      for layer in layers])
+
+    objects = len({id(cmd) for cmd in commands})
+    return [
+        f'{"Команд":45} {len(commands):>12,}'.replace(',', ' '),
+        f'{"Объектов команд (общие команды)":45} {objects:>12,}'.replace(',', ' '),
+        f'{"Память, общие команды":45} {shared_size / (1 << 20):9.1f} МБ',
+        f'{"Память, отдельный объект на команду":45} {copied_size / (1 << 20):9.1f} МБ',
+    ]
+
+
+def main():
+    """Запускает все замеры и печатает отчёт."""
+    parser = argparse.ArgumentParser(description='Замеры производительности генератора')
+    parser.add_argument('--layers', type=int, default=200, help='количество слоёв')
+    args = parser.parse_args()
+
+    config = load_bench_config(args.layers)
+
+    print('Запись файла:')
+    for line in bench_write_throughput(config):
+        print('  ' + line)
+
+    print('Способы генерации:')
+    for line in bench_engines(config):
+        print('  ' + line)
+
+    print('Память под команды:')
+    for line in bench_command_memory(config):
+        print('  ' + line)
+
+
+if __name__ == '__main__':
+    main()
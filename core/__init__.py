@@ -2,12 +2,26 @@
 Core модуль генератора G-кодов.
 
 Публичный API:
-- Команды: MoveCommand, PauseCommand, SetSpeedCommand, RawCommand, Layer
+- Команды: MoveCommand, PauseCommand, SetSpeedCommand, RawCommand, Layer, format_move
 - Форматирование: GCodeFormatter, PreheadParams
-- Время: TimeEstimator, TimeEstimate
+- Время: TimeEstimator, TimeEstimate, RunningEstimate
 - Геометрия: generate_offset_list, get_result_offset_list, get_nx_ny, и др.
+- Параметры задания: JobSpec, as_job_spec
 - Валидация: check_dict_keys
 - Файлы: get_filename, get_filename_path_and_create_directory_if_need, get_message
+- Запись: AtomicOutputWriter, write_single_pass, write_layers_as_subprograms, write_split_output
+- Способ генерации: select_engine, estimate_engine_memory, EngineChoice
+- Прогноз: predict_job, JobPrediction
+- Журнал генераций: read_records, build_report, TelemetryReport
+- Пределы осей: check_envelope, program_extents, EnvelopeReport, EnvelopeError
+- Сравнение: compare_gcode_files_streaming, GCodeDiffResult, layer_digests,
+  generated_layer_digests
+- Сервис: GenerationJobService, JobServiceClient, run_job_service
+- Пакетная генерация: generate_batch, BatchResult
+- Отправка на контроллер: send_job, GCodeSender, program_lines, ControllerSimulator
+
+Сервис, пакетная генерация и отправка (asyncio, http, пулы процессов, сокеты) загружаются
+при первом обращении к своим именам, а не при импорте core.
 """
 
 from .commands import (
@@ -17,6 +31,7 @@ from .commands import (
     RawCommand,
     SetSpeedCommand,
     Layer,
+    format_move,
 )
 
 from .formatter import (
@@ -27,7 +42,14 @@ from .formatter import (
 from .time_estimator import (
     TimeEstimator,
     TimeEstimate,
+    RunningEstimate,
     ACCEL_LINEAR_DEFAULT,
+    LAYER_MEMO_SIZE_DEFAULT,
+)
+
+from .motion_planner import (
+    JUNCTION_DEVIATION_DEFAULT,
+    LOOKAHEAD_DEFAULT,
 )
 
 from .geometry import (
@@ -42,6 +64,18 @@ from .geometry import (
 )
 
 from .validator import check_dict_keys
+from .job_spec import JobSpec, as_job_spec
+
+from .output_writer import (
+    AtomicOutputWriter,
+    BUFFER_SIZE_DEFAULT,
+    QUEUE_CHUNKS_DEFAULT,
+    DURABILITY_NONE,
+    DURABILITY_FILE,
+    DURABILITY_FULL,
+)
+from .subprograms import write_layers_as_subprograms
+from .split_output import OutputPart, plan_parts, write_split_output
 
 from .file_utils import (
     get_filename,
@@ -49,8 +83,81 @@ from .file_utils import (
     get_message,
 )
 
+from .gcode_diff import (
+    GCodeDifference,
+    GCodeDiffResult,
+    decode_command,
+    iter_gcode_commands,
+    layer_digests,
+    generated_layer_digests,
+    compare_gcode_files_streaming,
+)
+
 from .command_generator import CommandGenerator
-from .generator import generate_G_codes_file
+from .generator import generate_G_codes_file, make_time_estimator, write_single_pass
+from .engine import (
+    ENGINE_MEMORY,
+    ENGINE_STREAMING,
+    ENGINE_TEMPLATE,
+    ENGINES_BY_SPEED,
+    EngineChoice,
+    estimate_engine_memory,
+    select_engine,
+)
+from .predictor import JobPrediction, predict_job
+from .telemetry import (
+    StageTimer,
+    TelemetryReport,
+    UsageRow,
+    append_record,
+    build_report,
+    make_record,
+    parameter_hash,
+    read_records,
+    telemetry_path,
+)
+from .version import VERSION
+from .preflight import (
+    AxisExtent,
+    EnvelopeError,
+    EnvelopeReport,
+    EnvelopeViolation,
+    axis_limits,
+    check_envelope,
+    program_extents,
+)
+
+# Имена, загружаемые из подмодулей при первом обращении. Сборщик exe
+# (PyInstaller) не видит эти импорты: код приложения импортирует такие
+# подмодули напрямую (from core.job_service import ...), а не из core.
+_LAZY_ATTRIBUTES = {
+    'BatchItem': '.batch',
+    'BatchResult': '.batch',
+    'generate_batch': '.batch',
+    'GenerationJob': '.job_service',
+    'GenerationJobService': '.job_service',
+    'JobServiceClient': '.job_service',
+    'run_job_service': '.job_service',
+    'DWELL_MILLISECONDS': '.sender',
+    'DWELL_SECONDS': '.sender',
+    'GCodeSender': '.sender',
+    'SendResult': '.sender',
+    'SenderError': '.sender',
+    'program_lines': '.sender',
+    'send_job': '.sender',
+    'ControllerSimulator': '.controller_simulator',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        import importlib
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     # Commands
@@ -60,13 +167,18 @@ __all__ = [
     'RawCommand',
     'SetSpeedCommand',
     'Layer',
+    'format_move',
     # Formatter
     'GCodeFormatter',
     'PreheadParams',
     # Time
     'TimeEstimator',
     'TimeEstimate',
+    'RunningEstimate',
     'ACCEL_LINEAR_DEFAULT',
+    'LAYER_MEMO_SIZE_DEFAULT',
+    'JUNCTION_DEVIATION_DEFAULT',
+    'LOOKAHEAD_DEFAULT',
     # Geometry
     'generate_offset_list',
     'get_result_offset_list',
@@ -78,11 +190,83 @@ __all__ = [
     'calculate_steps_from_frame',
     # Validator
     'check_dict_keys',
+    # Job spec
+    'JobSpec',
+    'as_job_spec',
+    # Output
+    'AtomicOutputWriter',
+    'BUFFER_SIZE_DEFAULT',
+    'QUEUE_CHUNKS_DEFAULT',
+    'DURABILITY_NONE',
+    'DURABILITY_FILE',
+    'DURABILITY_FULL',
+    'write_layers_as_subprograms',
+    'OutputPart',
+    'plan_parts',
+    'write_split_output',
     # Files
     'get_filename',
     'get_filename_path_and_create_directory_if_need',
     'get_message',
+    # Diff
+    'GCodeDifference',
+    'GCodeDiffResult',
+    'decode_command',
+    'iter_gcode_commands',
+    'layer_digests',
+    'generated_layer_digests',
+    'compare_gcode_files_streaming',
     # Generator
     'CommandGenerator',
     'generate_G_codes_file',
+    'make_time_estimator',
+    'write_single_pass',
+    # Engine
+    'ENGINE_MEMORY',
+    'ENGINE_STREAMING',
+    'ENGINE_TEMPLATE',
+    'ENGINES_BY_SPEED',
+    'EngineChoice',
+    'estimate_engine_memory',
+    'select_engine',
+    # Prediction
+    'JobPrediction',
+    'predict_job',
+    # Telemetry
+    'StageTimer',
+    'TelemetryReport',
+    'UsageRow',
+    'append_record',
+    'build_report',
+    'make_record',
+    'parameter_hash',
+    'read_records',
+    'telemetry_path',
+    'VERSION',
+    # Preflight
+    'AxisExtent',
+    'EnvelopeError',
+    'EnvelopeReport',
+    'EnvelopeViolation',
+    'axis_limits',
+    'check_envelope',
+    'program_extents',
+    # Batch
+    'BatchItem',
+    'BatchResult',
+    'generate_batch',
+    # Service
+    'GenerationJob',
+    'GenerationJobService',
+    'JobServiceClient',
+    'run_job_service',
+    # Sender
+    'DWELL_MILLISECONDS',
+    'DWELL_SECONDS',
+    'GCodeSender',
+    'SendResult',
+    'SenderError',
+    'program_lines',
+    'send_job',
+    'ControllerSimulator',
 ]
@@ -0,0 +1,174 @@
+"""
+Пакетная генерация одного рецепта каркаса для нескольких игольниц.
+
+Паттерн пробивки (nx, ny и offset_list вместе с перемешиванием) зависит
+только от количества ударов, шага игл и зерна, поэтому головы с одинаковым
+шагом игл группируются и паттерн строится один раз на группу. Сами файлы
+генерируются параллельно в пуле процессов.
+
+Содержит:
+- BatchItem — результат генерации для одной головы
+- BatchResult — результаты пакета и сводная таблица
+- generate_batch — пакетная генерация
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from .command_generator import CommandGenerator, new_seed
+from .file_utils import get_filename, get_filename_path_and_create_directory_if_need
+from .generator import generate_G_codes_file
+from .geometry import get_nx_ny
+from .job_spec import JobSpec
+
+
+@dataclass
+class BatchItem:
+    """
+    Результат генерации файла для одной головы.
+
+    Attributes:
+        head_name: Имя игольницы
+        path: Путь к файлу
+        result: Результат generate_G_codes_file (None при ошибке)
+        error: Текст ошибки (пусто, если файл сгенерирован)
+    """
+    head_name: str
+    path: str
+    result: Optional[Dict[str, Any]] = None
+    error: str = ''
+
+
+@dataclass
+class BatchResult:
+    """
+    Результаты пакетной генерации.
+
+    Attributes:
+        items: Результаты по головам в порядке запроса
+        seed: Общее зерно случайности пакета
+        pattern_groups: Сколько разных паттернов пришлось построить
+    """
+    items: List[BatchItem] = field(default_factory=list)
+    seed: int = 0
+    pattern_groups: int = 0
+
+    @property
+    def failed(self) -> List[BatchItem]:
+        """Головы, для которых генерация не удалась."""
+        return [item for item in self.items if item.error]
+
+    def format_summary_table(self) -> str:
+        """Формирует сводную таблицу по всем головам."""
+        header = ('Голова', 'Время слоя', 'Время всех слоёв', 'Плотность', 'Файл')
+        rows = []
+        for item in self.items:
+            if item.error:
+                rows.append((item.head_name, '-', '-', '-', f'ОШИБКА: {item.error}'))
+            else:
+                rows.append((item.head_name,
+                             item.result['layer_time_str'],
+                             item.result['work_time_str'],
+                             f"{item.result['density']:.2f}",
+                             os.path.basename(item.path)))
+
+        widths = [max(len(str(row[i])) for row in [header] + rows) for i in range(len(header))]
+        lines = [' | '.join(f'{value:{widths[i]}}' for i, value in enumerate(row)).rstrip()
+                 for row in [header] + rows]
+        lines.insert(1, '-+-'.join('-' * w for w in widths))
+        return '\n'.join(lines)
+
+
+def _generate_head(spec: JobSpec, path: str, offset_list: List) -> Dict[str, Any]:
+    """Генерирует файл одной головы с готовым паттерном (в процессе пула)."""
+    return generate_G_codes_file(spec, lambda x: None,
+                                 output_path=path, offset_list=offset_list)
+
+
+def generate_batch(data_dict: Dict[str, Any],
+                   head_names: Optional[List[str]] = None,
+                   output_dir: Optional[str] = None,
+                   max_workers: Optional[int] = None,
+                   display_percent_progress_func: Optional[Callable[[float], None]] = None
+                   ) -> BatchResult:
+    """
+    Генерирует файлы одного рецепта для нескольких игольниц.
+
+    nx, ny и зерно случайности определяются один раз для всего пакета,
+    offset_list — один раз на группу голов с одинаковым шагом игл.
+    Ошибка генерации одной головы не прерывает остальные.
+
+    Args:
+        data_dict: Параметры генерации (рецепт и 'Игольницы (ИП головы)')
+        head_names: Имена голов (по умолчанию — все игольницы из data_dict)
+        output_dir: Папка для файлов (внутри — папки голов); по умолчанию
+            файлы сохраняются как при обычной генерации
+        max_workers: Количество процессов (1 — генерация в текущем процессе,
+            None — по числу ядер)
+        display_percent_progress_func: Функция отображения прогресса (0-100),
+            вызывается после готовности каждой головы
+
+    Returns:
+        BatchResult с результатами по головам
+    """
+    heads = data_dict['Игольницы (ИП головы)']
+    if head_names is None:
+        head_names = list(heads)
+
+    # Общие для всех голов зерно и форма паттерна
+    seed = data_dict.get('Зерно случайности') or new_seed()
+    pattern = dict(data_dict['Параметры паттерна'])
+    if pattern.get('Автоматическое определение формы паттерна'):
+        pattern['nx'], pattern['ny'] = get_nx_ny(pattern['Кол-во ударов'])
+        pattern['Автоматическое определение формы паттерна'] = False
+
+    jobs = []
+    patterns = {}
+    for head_name in head_names:
+        head_dict = {**data_dict,
+                     'Выбранная игольница (ИП игольница)': head_name,
+                     'Зерно случайности': seed,
+                     'Параметры паттерна': pattern}
+
+        item = BatchItem(head_name=head_name, path='')
+        spec = None
+        try:
+            # Параметры головы разбираются один раз: для генератора, имени файла и пула
+            spec = JobSpec.from_dict(head_dict)
+            generator = CommandGenerator(spec)
+            key = generator.pattern_key()
+            if key not in patterns:
+                patterns[key] = generator.pattern_offsets()
+
+            if output_dir is None:
+                item.path = get_filename_path_and_create_directory_if_need(spec)
+            else:
+                item.path = os.path.join(output_dir, head_name, get_filename(spec))
+        except Exception as e:
+            item.error = f'{type(e).__name__}: {e}'
+        jobs.append((item, spec, patterns[key] if not item.error else None))
+
+    pending = [job for job in jobs if not job[0].error]
+
+    def finish(item, call):
+        try:
+            item.result = call()
+        except Exception as e:
+            item.error = f'{type(e).__name__}: {e}'
+        if display_percent_progress_func is not None:
+            done = sum(1 for job in jobs if job[0].result is not None or job[0].error)
+            display_percent_progress_func(done / len(jobs) * 100)
+
+    if max_workers == 1:
+        for item, spec, offset_list in pending:
+            finish(item, lambda: _generate_head(spec, item.path, offset_list))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(_generate_head, spec, item.path, offset_list): item
+                       for item, spec, offset_list in pending}
+            for future in as_completed(futures):
+                finish(futures[future], future.result)
+
+    return BatchResult(items=[job[0] for job in jobs], seed=seed, pattern_groups=len(patterns))
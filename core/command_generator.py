@@ -6,15 +6,26 @@
 """
 
 import logging
-import random
+import secrets
 from math import ceil as round_to_greater
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
 
-from .commands import MoveCommand, PauseCommand, RawCommand, Layer
+import numpy as np
+
+from .commands import MoveCommand, PauseCommand, RawCommand, Layer, format_move
 
 logger = logging.getLogger(__name__)
 from .formatter import PreheadParams
-from .geometry import generate_offset_list, get_nx_ny, get_ordered_list_of_rows
+from .geometry import generate_offset_list, get_ordered_list_of_rows
+from .job_spec import JobSpec, as_job_spec
+
+
+# Верхняя граница автоматически выбираемого зерна случайности
+SEED_MAX = 2**31 - 1
+
+# Номера независимых потоков случайных чисел, порождаемых из зерна задания
+_SHUFFLE_STREAM = 0
+_JITTER_STREAM = 1
 
 
 def r(x):
@@ -22,6 +33,17 @@ def r(x):
     return round(x, 1)
 
 
+def _coordinate(value: float) -> Tuple[float, str]:
+    """Округлённая координата и её запись в файле (как в MoveCommand.to_string)."""
+    value = r(value)
+    return value, f'{value}'
+
+
+def new_seed() -> int:
+    """Возвращает новое случайное зерно для задания."""
+    return secrets.randbelow(SEED_MAX) + 1
+
+
 class CommandGenerator:
     """
     Генерирует G-code команды, группируя их послойно.
@@ -32,164 +54,207 @@ class CommandGenerator:
     - Управление порядком обхода (rows, steps, offsets)
     """
 
-    def __init__(self, data_dict: Dict[str, Any]):
+    def __init__(self, data_dict: Union[Dict[str, Any], JobSpec]):
         """
         Инициализирует генератор параметрами из data_dict.
 
         Args:
-            data_dict: Словарь с параметрами генерации
+            data_dict: Словарь с параметрами генерации или разобранный JobSpec
         """
-        self._data = data_dict
+        self.spec = as_job_spec(data_dict)
+        # Общие (flyweight) команды, повторяющиеся в слоях, см. _move_cmd
+        self._shared_moves: Dict[Tuple, MoveCommand] = {}
         self._parse_parameters()
 
     def _parse_parameters(self) -> None:
-        """Извлекает и вычисляет все необходимые параметры."""
-        d = self._data
+        """Переносит параметры задания из JobSpec в атрибуты генератора."""
+        spec = self.spec
 
-        # Базовые параметры - читаем spacing из выбранной игольницы
-        head_name = d['Выбранная игольница (ИП игольница)']
-        head_data = d['Игольницы (ИП головы)'][head_name]
-
-        # Поддержка старого формата (fallback для обратной совместимости)
-        if 'needle_spacing_x' in head_data:
-            self.cell_size_x = head_data['needle_spacing_x']
-            self.cell_size_y = head_data['needle_spacing_y']
-        else:
-            # Fallback для старых конфигураций (если миграция не сработала)
-            self.cell_size_x = d.get('Расстояние между иглами (мм)', {}).get('X', 8.0)
-            self.cell_size_y = d.get('Расстояние между иглами (мм)', {}).get('Y', 8.0)
-
-        self.num_pitch = d['Параметры паттерна']['Кол-во ударов']
-        self.generate_nx_ny = d['Параметры паттерна']['Автоматическое определение формы паттерна']
-        self.nx = d['Параметры паттерна']['nx']
-        self.ny = d['Параметры паттерна']['ny']
-        self.num_step_x = d['Количество шагов головы']['X']
-        self.num_row_y = d['Количество шагов головы']['Y']
-        self.frame_length_x = d['Габариты каркаса']['X']
-        self.frame_length_y = d['Габариты каркаса']['Y']
-
-        # Поддержка старого (str) и нового (dict) форматов для задания размеров каркаса
-        frame_size_value = d['Задание размеров каркаса']
-        if isinstance(frame_size_value, dict):
-            self.selected_type_frame_size = frame_size_value["value"]
-        else:
-            self.selected_type_frame_size = frame_size_value
+        # Голова
+        self.head_name = spec.head_name
+        self.needles_x = spec.needles_x
+        self.needles_y = spec.needles_y
+        self.cell_size_x = spec.cell_size_x
+        self.cell_size_y = spec.cell_size_y
+
+        # Паттерн и каркас
+        self.num_pitch = spec.num_pitch
+        self.generate_nx_ny = spec.generate_nx_ny
+        self.nx, self.ny = spec.nx_ny
+        self.frame_length_x = spec.frame_length_x
+        self.frame_length_y = spec.frame_length_y
+        self.selected_type_frame_size = spec.selected_type_frame_size
 
         # Параметры пробивки
-        self.is_progressive_depth = d['Пробивка']['Пробивка с нарастанием глубины']
-        self.initial_depth = d['Пробивка']['Начальная глубина удара (мм)']
-        self.max_depth = d['Пробивка']['Глубина удара (мм)']
+        self.is_progressive_depth = spec.is_progressive_depth
+        self.initial_depth = spec.initial_depth
+        self.max_depth = spec.max_depth
 
         # Слои
-        self.amount_layers = d['Количество слоёв']
-        self.amount_virtual_layers = d['Количество пустых слоёв']
-        self.layer_thickness = d['Толщина слоя (мм)']
-        self.dist_to_material = d['Расстояние от каркаса до головы перед ударом (мм)']
-
-        # Голова
-        self.head_name = d['Выбранная игольница (ИП игольница)']
-        self.needles_x = d['Игольницы (ИП головы)'][self.head_name]['X']
-        self.needles_y = d['Игольницы (ИП головы)'][self.head_name]['Y']
+        self.amount_layers = spec.amount_layers
+        self.amount_virtual_layers = spec.amount_virtual_layers
+        self.layer_thickness = spec.layer_thickness
+        self.dist_to_material = spec.dist_to_material
 
         # Позиция укладки
-        self.layer_laying_position_x = d['Позиция при ручной укладки слоя']['X']
-        self.layer_laying_position_y = d['Позиция при ручной укладки слоя']['Y']
-        self.layer_laying_position_z = d['Позиция при ручной укладки слоя']['Z']
-        self.pause = d['Позиция при ручной укладки слоя']['Пауза в конце слоя (сек)']
-        self.sound_signal_duration = d['Позиция при ручной укладки слоя']['Звуковой сигнал (сек)']
-        mode_value = d['Позиция при ручной укладки слоя']['Режим звукового сигнала']
-        # Поддержка старого (list/str) и нового (dict) форматов
-        if isinstance(mode_value, dict):
-            self.sound_signal_mode = mode_value["value"]
-        elif isinstance(mode_value, list):
-            self.sound_signal_mode = mode_value[0]
-        else:
-            self.sound_signal_mode = mode_value
-        self.is_growing_z = d['Позиция при ручной укладки слоя']['Рост Z с каждым слоем']
+        self.layer_laying_position_x = spec.layer_laying_position_x
+        self.layer_laying_position_y = spec.layer_laying_position_y
+        self.layer_laying_position_z = spec.layer_laying_position_z
+        self.pause = spec.pause
+        self.sound_signal_duration = spec.sound_signal_duration
+        self.sound_signal_mode = spec.sound_signal_mode
+        self.is_growing_z = spec.is_growing_z
 
         # Опции
-        self.is_random_order = d['Случайный порядок ударов']
-        self.is_random_offsets = d['Случайные смещения']
-        self.is_rotation_direction = d['Чередование направлений прохода слоя']
-        self.is_swap_xy = d['Смена осей X↔Y']
-        self.coefficient_random_offsets = d['Коэффициент случайных смещений']
-        self.speed_xy = d['Скорость (мм/мин)']['Движение осей X и Y']
-        self.speed_z_insert = d['Скорость (мм/мин)']['Внедрение игл по Z']
-        self.speed_z_extract = d['Скорость (мм/мин)']['Извлечение игл по Z']
+        self.is_random_order = spec.is_random_order
+        self.is_random_offsets = spec.is_random_offsets
+        self.is_rotation_direction = spec.is_rotation_direction
+        self.is_swap_xy = spec.is_swap_xy
+        self.coefficient_random_offsets = spec.coefficient_random_offsets
+        self.order = spec.order
+        # Зерно случайности: 0 — новое зерно для каждого задания
+        self.seed = spec.seed or new_seed()
+        self.speed_xy = spec.speed_xy
+        self.speed_z_insert = spec.speed_z_insert
+        self.speed_z_extract = spec.speed_z_extract
         self.speed = self.speed_xy  # для совместимости с TimeEstimator
-        self.acceleration = d['Ускорение осей станка (мм/с²)']
-
-        # Поддержка старого (str) и нового (dict) форматов для порядка прохождения рядов
-        order_value = d["Порядок прохождения рядов"]
-        if isinstance(order_value, dict):
-            self.order = order_value["value"]
-        else:
-            self.order = order_value
-
-        # Вычисляем параметры паттерна, если необходимо
-        if self.generate_nx_ny:
-            self.nx, self.ny = get_nx_ny(self.num_pitch)
+        self.acceleration = spec.acceleration
+        self.axis_max_speed = dict(spec.axis_max_speed)
+        self.axis_acceleration = dict(spec.axis_acceleration)
 
         # Вспомогательные параметры
-        self.head_width_x = self.cell_size_x * self.needles_x
-        self.head_width_y = self.cell_size_y * self.needles_y
-        self.frame_height = int(self.amount_layers * self.layer_thickness)
-
-        # Определяем количество шагов головы, если каркас задан габаритами
-        if self.selected_type_frame_size == 'По габаритам':
-            self.num_step_x = round_to_greater(self.frame_length_x / self.head_width_x)
-            self.num_row_y = round_to_greater(self.frame_length_y / self.head_width_y)
+        self.head_width_x = spec.head_width_x
+        self.head_width_y = spec.head_width_y
+        self.frame_height = spec.frame_height
+        self.num_step_x = spec.num_step_x
+        self.num_row_y = spec.num_row_y
 
-    def _move_cmd(self, x=None, y=None, z=None, f=None) -> MoveCommand:
+    def _move_cmd(self, x=None, y=None, z=None, f=None, shared=False) -> MoveCommand:
         """
         Создаёт команду перемещения с учётом флага смены осей.
 
+        Команды неизменяемы, поэтому повторяющиеся (Z удара и извлечения,
+        позиция укладки) создаются один раз и переиспользуются: shared=True
+        возвращает общий экземпляр для тех же значений, строка команды
+        которого записана в нём заранее.
+
         Args:
             x: Координата X (или Y, если is_swap_xy=True)
             y: Координата Y (или X, если is_swap_xy=True)
             z: Координата Z
             f: Скорость подачи (мм/мин)
+            shared: Вернуть общий экземпляр команды
 
         Returns:
             MoveCommand с учётом смены осей
         """
         if self.is_swap_xy:
-            return MoveCommand(x=y, y=x, z=z, f=f)
-        return MoveCommand(x=x, y=y, z=z, f=f)
-
-    def generate_layers(self) -> List[Layer]:
+            x, y = y, x
+        if not shared:
+            return MoveCommand(x=x, y=y, z=z, f=f)
+
+        # repr различает 1 и 1.0, 0.0 и -0.0 — они по-разному пишутся в файл
+        key = (repr(x), repr(y), repr(z), repr(f))
+        command = self._shared_moves.get(key)
+        if command is None:
+            command = self._shared_moves[key] = MoveCommand(x=x, y=y, z=z, f=f,
+                                                            text=format_move(x, y, z, f))
+        return command
+
+    def pattern_key(self) -> Tuple:
         """
-        Генерирует все слои с командами.
+        Возвращает ключ паттерна: генераторы с одинаковым ключом строят
+        одинаковый offset_list (см. pattern_offsets).
 
         Returns:
-            Список Layer объектов с командами
+            Кортеж (nx, ny, шаг игл по X, шаг игл по Y, зерно или None)
         """
-        layers = []
+        return (self.nx, self.ny, self.cell_size_x, self.cell_size_y,
+                self.seed if self.is_random_order else None)
 
-        # Формируем паттерн пробивки
+    def pattern_offsets(self) -> List:
+        """
+        Формирует паттерн пробивки в порядке ударов.
+
+        Returns:
+            Список смещений [x, y] внутри элементарной ячейки
+        """
         offset_list = generate_offset_list(
             self.nx, self.ny, self.cell_size_x, self.cell_size_y
         )
 
         # Если выбран чекбокс "случайный порядок ударов", то перемешиваем
         if self.is_random_order:
-            random.shuffle(offset_list)
+            order = self._rng(_SHUFFLE_STREAM).permutation(len(offset_list))
+            offset_list = [offset_list[i] for i in order]
+
+        return offset_list
+
+    def generate_layers(self, offset_list: Optional[List] = None,
+                        start_layer: int = 1) -> List[Layer]:
+        """
+        Генерирует слои с командами.
+
+        Args:
+            offset_list: Готовый паттерн (результат pattern_offsets генератора
+                с тем же pattern_key); по умолчанию вычисляется заново
+            start_layer: Номер первого генерируемого слоя (с 1). Окно паттерна
+                первого слоя вычисляется сразу (см. hit_window), а случайные
+                смещения зависят только от зерна и номера слоя, поэтому
+                предыдущие слои не генерируются
+
+        Returns:
+            Список Layer объектов с командами (слои start_layer..последний)
+
+        Raises:
+            ValueError: start_layer вне диапазона слоёв задания
+        """
+        return list(self.iter_layers(offset_list, start_layer))
+
+    def iter_layers(self, offset_list: Optional[List] = None,
+                    start_layer: int = 1, reuse_hits: bool = False) -> Iterator[Layer]:
+        """
+        Генерирует слои по одному (как generate_layers, но без списка всех слоёв).
+
+        Args:
+            offset_list: Готовый паттерн (см. generate_layers)
+            start_layer: Номер первого генерируемого слоя (с 1)
+            reuse_hits: Строить XY перемещения ударов один раз на окно паттерна
+                и направление прохода и переиспользовать их в следующих слоях
+                (быстрее, но кэш занимает память; без случайных смещений)
+
+        Returns:
+            Итератор Layer
+
+        Raises:
+            ValueError: start_layer вне диапазона слоёв задания (сразу при вызове)
+        """
+        total_layers = self.amount_layers + self.amount_virtual_layers
+        if not 1 <= start_layer <= max(total_layers, 1):
+            raise ValueError(f'Номер первого слоя должен быть от 1 до {total_layers}, '
+                             f'получено {start_layer}')
 
+        # Формируем паттерн пробивки
+        if offset_list is None:
+            offset_list = self.pattern_offsets()
+        return self._iter_layers(offset_list, start_layer, total_layers,
+                                 {} if reuse_hits else None)
+
+    def _iter_layers(self, offset_list: List, start_layer: int, total_layers: int,
+                     hit_cache: Optional[Dict[Tuple, List[MoveCommand]]]) -> Iterator[Layer]:
+        """Цикл генерации слоёв start_layer..total_layers."""
         # Формируем список с номерами рядов в порядке их прохождения
         rows = get_ordered_list_of_rows(self.num_row_y, self.order)
 
         # Генерируем слои
-        start_hit = 0
-        finish_hit = self.num_pitch
-        total_layers = self.amount_layers + self.amount_virtual_layers
+        start_hit, finish_hit = self.hit_window(start_layer - 1, len(offset_list))
 
-        for layer_idx in range(total_layers):
+        for layer_idx in range(start_layer - 1, total_layers):
             is_virtual = layer_idx >= self.amount_layers
-            layer = self._generate_single_layer(
+            yield self._generate_single_layer(
                 layer_idx, is_virtual, offset_list, rows,
-                start_hit, finish_hit
+                start_hit, finish_hit, hit_cache
             )
-            layers.append(layer)
 
             # Смещение координат ударов на новом слое
             if finish_hit < len(offset_list):
@@ -199,11 +264,88 @@ class CommandGenerator:
                 start_hit = 0
                 finish_hit = self.num_pitch
 
-        return layers
+    def reentry_commands(self, start_layer: int) -> List:
+        """
+        Возвращает команды безопасного входа в задание перед слоем start_layer.
+
+        После сбоя положение станка неизвестно: иглы могут быть в материале.
+        Поэтому сначала только подъём по Z на высоту укладки слоя, затем
+        переезд к позиции укладки и остановка программы (M0) — оператор
+        проверяет каркас и продолжает выполнение.
+
+        Args:
+            start_layer: Номер слоя, с которого продолжается задание (с 1)
+
+        Returns:
+            Список GCodeCommand
+        """
+        _, _, z_layer_position = self.layer_heights(start_layer - 1)
+        return [
+            self._move_cmd(z=r(z_layer_position), f=self.speed_z_extract),
+            self._move_cmd(x=r(self.layer_laying_position_x),
+                           y=r(self.layer_laying_position_y),
+                           f=self.speed_xy),
+            RawCommand(code="M0"),
+        ]
+
+    def generate_layer(self, layer_idx: int, offset_list: Optional[List] = None) -> Layer:
+        """
+        Генерирует один слой без генерации предыдущих.
+
+        Args:
+            layer_idx: Индекс слоя (0-based)
+            offset_list: Готовый паттерн (см. generate_layers)
+
+        Returns:
+            Layer с командами, совпадающий с layers[layer_idx] из generate_layers
+        """
+        if offset_list is None:
+            offset_list = self.pattern_offsets()
+        rows = get_ordered_list_of_rows(self.num_row_y, self.order)
+        start_hit, finish_hit = self.hit_window(layer_idx, len(offset_list))
+        return self._generate_single_layer(
+            layer_idx, layer_idx >= self.amount_layers, offset_list, rows,
+            start_hit, finish_hit
+        )
+
+    def _rng(self, *stream) -> np.random.Generator:
+        """
+        Создаёт генератор случайных чисел для потока stream задания.
+
+        Потоки выводятся из зерна задания через SeedSequence, поэтому
+        перемешивание и смещения любого слоя воспроизводятся независимо.
+
+        Args:
+            stream: Номер потока (и, например, индекс слоя)
+
+        Returns:
+            numpy.random.Generator
+        """
+        return np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=stream))
+
+    def layer_jitter(self, layer_idx: int, hits: int) -> List[List[float]]:
+        """
+        Вычисляет случайные смещения всех ударов слоя одним вызовом.
+
+        Смещения зависят только от (зерна, номера слоя), поэтому любой слой
+        можно сгенерировать повторно без генерации предыдущих.
+
+        Args:
+            layer_idx: Индекс слоя (0-based)
+            hits: Количество ударов в слое
+
+        Returns:
+            Список [dx, dy] смещений в порядке ударов, каждое в пределах
+            ±coefficient_random_offsets
+        """
+        rng = self._rng(_JITTER_STREAM, layer_idx)
+        jitter = rng.uniform(-1.0, 1.0, size=(hits, 2)) * self.coefficient_random_offsets
+        return jitter.tolist()
 
     def _generate_single_layer(self, layer_idx: int, is_virtual: bool,
                                offset_list: List, rows: List[int],
-                               start_hit: int, finish_hit: int) -> Layer:
+                               start_hit: int, finish_hit: int,
+                               hit_cache: Optional[Dict[Tuple, List[MoveCommand]]] = None) -> Layer:
         """
         Генерирует команды для одного слоя.
 
@@ -214,72 +356,189 @@ class CommandGenerator:
             rows: Порядок прохождения рядов
             start_hit: Начальный индекс в offset_list
             finish_hit: Конечный индекс в offset_list
+            hit_cache: Кэш XY перемещений ударов по окну и направлению прохода
+                (без случайных смещений они одинаковы у слоёв с тем же окном)
 
         Returns:
             Layer с командами
         """
         commands = []
 
-        # Вычисляем смещение по высоте
-        z_offset = self.layer_thickness * layer_idx
+        # Высоты слоя
+        z_offset, needle_depth, z_layer_position = self.layer_heights(layer_idx)
 
-        # Вычисляем глубину удара
-        if self.is_progressive_depth:
-            growing_depth = self.initial_depth + self.layer_thickness * layer_idx
-            needle_depth = min(growing_depth, self.max_depth)
+        # Команды, общие для всех ударов слоя
+        laying_z = self._move_cmd(z=r(z_layer_position), f=self.speed_z_extract, shared=True)
+        laying_xy = self._move_cmd(x=r(self.layer_laying_position_x),
+                                   y=r(self.layer_laying_position_y),
+                                   f=self.speed_xy, shared=True)
+        insert_z = self._move_cmd(z=r(z_offset - needle_depth), f=self.speed_z_insert,
+                                  shared=True)
+        extract_z = self._move_cmd(z=r(self.dist_to_material + z_offset),
+                                   f=self.speed_z_extract, shared=True)
+
+        # Выезд на позицию для укладки слоя
+        commands.append(laying_z)
+        commands.append(laying_xy)
+
+        # Направление прохода слоя
+        is_reversed = bool(self.is_rotation_direction and (layer_idx + 1) % 2)
+
+        # XY перемещения ударов
+        if hit_cache is not None and not self.is_random_offsets:
+            key = (start_hit, finish_hit, is_reversed)
+            hit_moves = hit_cache.get(key)
+            if hit_moves is None:
+                hit_moves = hit_cache[key] = self._hit_moves(
+                    layer_idx, offset_list, rows, start_hit, finish_hit, is_reversed)
         else:
-            needle_depth = self.max_depth
+            hit_moves = self._hit_moves(layer_idx, offset_list, rows,
+                                        start_hit, finish_hit, is_reversed)
 
-        # Вычисляем позицию Z для укладки слоя
-        z_layer_position = (self.layer_laying_position_z + z_offset
-                          if self.is_growing_z else self.layer_laying_position_z)
+        # Удар: XY, внедрение, извлечение
+        hits = len(hit_moves)
+        body = [None] * (3 * hits)
+        body[0::3] = hit_moves
+        body[1::3] = [insert_z] * hits
+        body[2::3] = [extract_z] * hits
+        commands.extend(body)
 
         # Выезд на позицию для укладки слоя
-        commands.append(self._move_cmd(z=r(z_layer_position), f=self.speed_z_extract))
-        commands.append(self._move_cmd(x=r(self.layer_laying_position_x),
-                                       y=r(self.layer_laying_position_y),
-                                       f=self.speed_xy))
+        commands.append(laying_z)
+        commands.append(laying_xy)
+
+        # Звуковой сигнал и пауза
+        commands.extend(self.layer_tail())
+
+        return Layer(
+            layer_number=layer_idx + 1,
+            is_virtual=is_virtual,
+            commands=commands,
+            signature=self._layer_signature(start_hit, is_reversed, z_layer_position,
+                                            z_offset - needle_depth,
+                                            self.dist_to_material + z_offset)
+        )
+
+    def _hit_moves(self, layer_idx: int, offset_list: List, rows: List[int],
+                   start_hit: int, finish_hit: int, is_reversed: bool) -> List[MoveCommand]:
+        """
+        Генерирует XY перемещения ударов слоя в порядке прохода.
 
-        # Цикл рядов по Y
+        Args:
+            layer_idx: Индекс слоя (0-based, для случайных смещений)
+            offset_list: Список смещений паттерна
+            rows: Порядок прохождения рядов
+            start_hit: Начальный индекс в offset_list
+            finish_hit: Конечный индекс в offset_list
+            is_reversed: True если слой проходится в обратном направлении
+
+        Returns:
+            Список MoveCommand
+        """
+        moves = []
+        speed = self.speed_xy
+        speed_text = '' if speed is None else f' F{r(speed)}'
+        swap = self.is_swap_xy
+
+        step_range = range(self.num_step_x)
+        offset_range = offset_list[start_hit:finish_hit]
+        if is_reversed:
+            step_range = step_range[::-1]
+            offset_range = offset_range[::-1]
+
+        if self.is_random_offsets:
+            # Случайные смещения сразу для всех ударов слоя
+            jitter = iter(self.layer_jitter(layer_idx, len(rows) * self.num_step_x
+                                            * len(offset_range)))
+            for row in rows:
+                y = self.head_width_y * row
+                for step in step_range:
+                    x = self.head_width_x * step
+                    for offs_x, offs_y in offset_range:
+                        jitter_x, jitter_y = next(jitter)
+                        current_x = r(x + offs_x + jitter_x)
+                        current_y = r(y + offs_y + jitter_y)
+                        if swap:
+                            moves.append(MoveCommand(
+                                x=current_y, y=current_x, f=speed,
+                                text=f'G1 X{current_y} Y{current_x}{speed_text}'))
+                        else:
+                            moves.append(MoveCommand(
+                                x=current_x, y=current_y, f=speed,
+                                text=f'G1 X{current_x} Y{current_y}{speed_text}'))
+            return moves
+
+        # Таблицы координат: X — по шагам головы и точкам окна, Y — по точкам
+        # окна для ряда. Округление и запись числа выполняются один раз на
+        # значение, строка удара собирается из готовых записей
+        x_table = [[_coordinate(self.head_width_x * step + offs_x) for offs_x, _ in offset_range]
+                   for step in step_range]
         for row in rows:
             y = self.head_width_y * row
+            y_row = [_coordinate(y + offs_y) for _, offs_y in offset_range]
+            for x_row in x_table:
+                for (current_x, x_text), (current_y, y_text) in zip(x_row, y_row):
+                    if swap:
+                        moves.append(MoveCommand(x=current_y, y=current_x, f=speed,
+                                                 text=f'G1 X{y_text} Y{x_text}{speed_text}'))
+                    else:
+                        moves.append(MoveCommand(x=current_x, y=current_y, f=speed,
+                                                 text=f'G1 X{x_text} Y{y_text}{speed_text}'))
+        return moves
+
+    def hit_window(self, layer_idx: int, pattern_len: int) -> Tuple[int, int]:
+        """
+        Возвращает окно паттерна (start_hit, finish_hit) для слоя.
 
-            # Цикл шагов по Х
-            step_range = list(range(self.num_step_x))
-            if self.is_rotation_direction and (layer_idx + 1) % 2:
-                step_range = list(reversed(step_range))
+        Окно сдвигается на num_pitch с каждым слоем и возвращается к началу,
+        когда паттерн пройден, поэтому окна повторяются с периодом
+        ceil(pattern_len / num_pitch) слоёв.
 
-            for step in step_range:
-                x = self.head_width_x * step
+        Args:
+            layer_idx: Индекс слоя (0-based)
+            pattern_len: Длина offset_list
 
-                # Цикл микрошагов внутри ячейки между иглами
-                offset_range = offset_list[start_hit:finish_hit]
-                if self.is_rotation_direction and (layer_idx + 1) % 2:
-                    offset_range = list(reversed(offset_range))
+        Returns:
+            Кортеж (start_hit, finish_hit)
+        """
+        period = max(round_to_greater(pattern_len / self.num_pitch), 1)
+        start_hit = (layer_idx % period) * self.num_pitch
+        return start_hit, start_hit + self.num_pitch
 
-                for offs_x, offs_y in offset_range:
-                    current_x = x + offs_x
-                    current_y = y + offs_y
+    def layer_heights(self, layer_idx: int) -> Tuple[float, float, float]:
+        """
+        Вычисляет высоты слоя.
 
-                    # Если выбран чекбокс "случайные смещения"
-                    if self.is_random_offsets:
-                        current_x += self.coefficient_random_offsets * (random.random() - 0.5) * 2
-                        current_y += self.coefficient_random_offsets * (random.random() - 0.5) * 2
+        Args:
+            layer_idx: Индекс слоя (0-based)
 
-                    commands.append(self._move_cmd(x=r(current_x), y=r(current_y),
-                                                   f=self.speed_xy))
-                    commands.append(self._move_cmd(z=r(z_offset - needle_depth),
-                                                   f=self.speed_z_insert))
-                    commands.append(self._move_cmd(z=r(self.dist_to_material + z_offset),
-                                                   f=self.speed_z_extract))
+        Returns:
+            Кортеж (смещение слоя по Z, глубина удара, Z позиции укладки)
+        """
+        # Вычисляем смещение по высоте
+        z_offset = self.layer_thickness * layer_idx
 
-        # Выезд на позицию для укладки слоя
-        commands.append(self._move_cmd(z=r(z_layer_position), f=self.speed_z_extract))
-        commands.append(self._move_cmd(x=r(self.layer_laying_position_x),
-                                       y=r(self.layer_laying_position_y),
-                                       f=self.speed_xy))
+        # Вычисляем глубину удара
+        if self.is_progressive_depth:
+            growing_depth = self.initial_depth + self.layer_thickness * layer_idx
+            needle_depth = min(growing_depth, self.max_depth)
+        else:
+            needle_depth = self.max_depth
 
-        # Звуковой сигнал и пауза
+        # Вычисляем позицию Z для укладки слоя
+        z_layer_position = (self.layer_laying_position_z + z_offset
+                          if self.is_growing_z else self.layer_laying_position_z)
+
+        return z_offset, needle_depth, z_layer_position
+
+    def layer_tail(self) -> List:
+        """
+        Возвращает команды конца слоя: звуковой сигнал и пауза.
+
+        Returns:
+            Список GCodeCommand (одинаков для всех слоёв)
+        """
+        commands = []
         pause_sec = self.pause
         signal_sec = self.sound_signal_duration
 
@@ -299,11 +558,33 @@ class CommandGenerator:
         else:
             commands.append(PauseCommand(milliseconds=pause_sec * 1000))
 
-        return Layer(
-            layer_number=layer_idx + 1,
-            is_virtual=is_virtual,
-            commands=commands
-        )
+        return commands
+
+    def _layer_signature(self, start_hit: int, is_reversed: bool, z_layer_position: float,
+                         z_insert: float, z_extract: float):
+        """
+        Вычисляет сигнатуру слоя для повторного использования оценок времени.
+
+        Слои с одинаковыми окном паттерна, направлением прохода, глубиной удара
+        и положением позиции укладки относительно слоя отличаются только
+        сдвигом по Z. Высоты берутся уже округлёнными, как в командах, поэтому
+        совпадение сигнатур означает точное совпадение перемещений.
+
+        Args:
+            start_hit: Начальный индекс окна в offset_list
+            is_reversed: True если слой проходится в обратном направлении
+            z_layer_position: Z позиции укладки слоя
+            z_insert: Z нижней точки удара
+            z_extract: Z после извлечения игл
+
+        Returns:
+            Кортеж-сигнатура или None, если слой неповторим (случайные смещения)
+        """
+        if self.is_random_offsets:
+            return None
+        z_base = r(z_layer_position)
+        return (start_hit, is_reversed,
+                r(r(z_insert) - z_base), r(r(z_extract) - z_base))
 
     def _generate_sound_signal(self, signal_sec: float) -> list:
         """
@@ -345,13 +626,15 @@ class CommandGenerator:
 
         return commands
 
-    def get_prehead_params(self, work_time: str = "", layer_time: str = "") -> PreheadParams:
+    def get_prehead_params(self, work_time: str = "", layer_time: str = "",
+                           start_layer: int = 1) -> PreheadParams:
         """
         Возвращает параметры для записи заголовка файла.
 
         Args:
             work_time: Строка с временем работы файла на станке
             layer_time: Строка с временем работы над одним слоем
+            start_layer: Номер слоя, с которого начинается файл (с 1)
 
         Returns:
             PreheadParams с параметрами
@@ -375,6 +658,8 @@ class CommandGenerator:
             is_random_offsets=self.is_random_offsets,
             coefficient_random_offsets=self.coefficient_random_offsets,
             is_frame_by_dimensions=(self.selected_type_frame_size == 'По габаритам'),
+            seed=self.seed if (self.is_random_order or self.is_random_offsets) else None,
             work_time=work_time,
-            layer_time=layer_time
+            layer_time=layer_time,
+            start_layer=start_layer
         )
@@ -2,6 +2,7 @@
 Классы G-code команд для генератора.
 
 Содержит типизированные команды:
+- format_move — запись перемещения G1 по координатам
 - MoveCommand (G1) — линейное перемещение
 - PauseCommand (G4) — пауза
 - SetSpeedCommand (F) — установка скорости
@@ -10,7 +11,7 @@
 """
 
 from dataclasses import dataclass, field
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
 
 @dataclass(frozen=True)
@@ -22,6 +23,33 @@ class GCodeCommand:
         raise NotImplementedError
 
 
+def format_move(x: Optional[float] = None, y: Optional[float] = None,
+                z: Optional[float] = None, f: Optional[float] = None) -> str:
+    """
+    Возвращает строку 'G1 X... Y... Z... F...' для перемещения.
+
+    Значения округляются до 0.1 и пишутся как есть: целое 0 — 'X0',
+    дробное 486.0 — 'X486.0' (так записаны все ранее выпущенные программы).
+
+    Args:
+        x, y, z: Координаты (мм), None если не меняются
+        f: Скорость подачи (мм/мин), None если не меняется
+
+    Returns:
+        Строка команды
+    """
+    parts = ["G1"]
+    if x is not None:
+        parts.append(f"X{round(x, 1)}")
+    if y is not None:
+        parts.append(f"Y{round(y, 1)}")
+    if z is not None:
+        parts.append(f"Z{round(z, 1)}")
+    if f is not None:
+        parts.append(f"F{round(f, 1)}")
+    return " ".join(parts)
+
+
 @dataclass(frozen=True)
 class MoveCommand(GCodeCommand):
     """
@@ -31,24 +59,22 @@ class MoveCommand(GCodeCommand):
         x: Координата X (мм), None если не меняется
         y: Координата Y (мм), None если не меняется
         z: Координата Z (мм), None если не меняется
+        f: Скорость подачи (мм/мин), None если не меняется
+        text: Готовая строка команды (равна format_move(x, y, z, f)) или None.
+            Генератор заполняет её из таблиц записей координат, чтобы не
+            округлять и не форматировать числа при записи каждой команды
     """
     x: Optional[float] = None
     y: Optional[float] = None
     z: Optional[float] = None
     f: Optional[float] = None
+    text: Optional[str] = field(default=None, compare=False, repr=False)
 
     def to_string(self) -> str:
         """Преобразует команду в строку 'G1 X... Y... Z... F...'."""
-        parts = ["G1"]
-        if self.x is not None:
-            parts.append(f"X{round(self.x, 1)}")
-        if self.y is not None:
-            parts.append(f"Y{round(self.y, 1)}")
-        if self.z is not None:
-            parts.append(f"Z{round(self.z, 1)}")
-        if self.f is not None:
-            parts.append(f"F{round(self.f, 1)}")
-        return " ".join(parts)
+        if self.text is not None:
+            return self.text
+        return format_move(self.x, self.y, self.z, self.f)
 
     def distance_to(self, other: 'MoveCommand') -> float:
         """
@@ -119,10 +145,14 @@ class Layer:
         layer_number: Номер слоя (начиная с 1)
         is_virtual: True если это виртуальный (холостой) слой
         commands: Список команд слоя
+        signature: Сигнатура слоя или None. Слои с одинаковой сигнатурой
+            отличаются только сдвигом всех Z на одну величину, поэтому время
+            их выполнения одинаково (см. TimeEstimator.estimate_from_layers)
     """
     layer_number: int
     is_virtual: bool = False
     commands: List[GCodeCommand] = field(default_factory=list)
+    signature: Optional[Tuple] = None
 
     @property
     def layer_type(self) -> str:
@@ -0,0 +1,290 @@
+"""
+Локальный имитатор контроллера для проверки отправки программы.
+
+Принимает одно TCP подключение и ведёт себя как контроллер с
+потоковой загрузкой (по образцу Grbl):
+- принятые байты попадают в приёмный буфер ограниченного размера
+  (переполнение отмечается — отправитель не должен его допускать);
+- строка разбирается, когда в буфере планировщика есть место,
+  и в этот момент контроллеру отвечает 'ok' (или 'error:N');
+- планировщик выполняет перемещения по очереди за время длина / подача
+  (с учётом коррекции подачи), паузы G4 P — за указанное время
+  (P в секундах, как в Grbl; dwell_units=DWELL_MILLISECONDS — как в Mach3);
+- команды реального времени (пауза '!', продолжение '~', коррекция
+  подачи 0x90-0x94) выполняются сразу при приёме, вне очереди.
+
+time_scale ускоряет время выполнения (0.001 — в тысячу раз).
+
+Содержит:
+- ControllerSimulator — имитатор контроллера
+"""
+
+import math
+import re
+import socket
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from .sender import (CYCLE_START, DWELL_MILLISECONDS, DWELL_SECONDS, FEED_HOLD,
+                     FEED_OVERRIDE_MAX, FEED_OVERRIDE_MIN, FEED_OVERRIDE_MINUS_1,
+                     FEED_OVERRIDE_MINUS_10, FEED_OVERRIDE_PLUS_1, FEED_OVERRIDE_PLUS_10,
+                     FEED_OVERRIDE_RESET, RX_BUFFER_SIZE_DEFAULT)
+
+# Размер буфера планировщика (строк, как у Grbl)
+PLANNER_SIZE_DEFAULT = 15
+
+# Шаг ожидания исполнителя при паузе и выполнении (с)
+_TICK = 0.001
+
+_WORD = re.compile(r'([A-Z])\s*(-?\d+(?:\.\d*)?)')
+
+# Коды ошибок (как в Grbl)
+ERROR_BAD_WORD = 'error:1'
+ERROR_UNSUPPORTED = 'error:20'
+
+_OVERRIDE_STEPS = {
+    FEED_OVERRIDE_PLUS_10[0]: 10,
+    FEED_OVERRIDE_MINUS_10[0]: -10,
+    FEED_OVERRIDE_PLUS_1[0]: 1,
+    FEED_OVERRIDE_MINUS_1[0]: -1,
+}
+
+
+def _parse(line: str) -> Optional[Dict[str, float]]:
+    """Разбирает строку на слова {буква: число}; None — строка некорректна."""
+    words = {}
+    position = 0
+    for match in _WORD.finditer(line):
+        if line[position:match.start()].strip():
+            return None
+        words[match.group(1)] = float(match.group(2))
+        position = match.end()
+    if line[position:].strip() or not words:
+        return None
+    return words
+
+
+class ControllerSimulator:
+    """
+    Имитатор контроллера на локальном TCP порту.
+
+    Пример:
+        with ControllerSimulator(time_scale=0.01) as sim:
+            send_job(data_dict, *sim.address)
+            sim.wait_idle()
+            print(sim.executed)
+    """
+
+    def __init__(self, rx_buffer_size: int = RX_BUFFER_SIZE_DEFAULT,
+                 planner_size: int = PLANNER_SIZE_DEFAULT,
+                 time_scale: float = 1.0, host: str = '127.0.0.1', port: int = 0,
+                 dwell_units: str = DWELL_SECONDS):
+        """
+        Args:
+            rx_buffer_size: Размер приёмного буфера (байт)
+            planner_size: Размер буфера планировщика (строк)
+            time_scale: Множитель времени выполнения команд
+            host: Адрес для подключения
+            port: Порт (0 — свободный порт, см. address)
+            dwell_units: Единицы P в паузах G4 (DWELL_SECONDS или DWELL_MILLISECONDS)
+
+        Raises:
+            ValueError: Неизвестные единицы паузы
+        """
+        if dwell_units not in (DWELL_SECONDS, DWELL_MILLISECONDS):
+            raise ValueError(f'Неизвестные единицы паузы: {dwell_units}')
+        self.rx_buffer_size = rx_buffer_size
+        self.planner_size = planner_size
+        self.time_scale = time_scale
+        self.dwell_units = dwell_units
+
+        # Состояние, видимое тестам
+        self.received: List[str] = []        # принятые строки в порядке приёма
+        self.executed: List[str] = []        # выполненные строки
+        self.errors: List[Tuple[str, str]] = []
+        self.overflow = False                # отправитель переполнил приёмный буфер
+        self.max_rx_bytes = 0
+        self.feed_override = 100
+        self.paused = False
+        self.realtime: List[bytes] = []      # принятые команды реального времени
+        self.position = {'X': 0.0, 'Y': 0.0, 'Z': 0.0}
+        self.machine_seconds = 0.0           # время выполнения без учёта time_scale
+
+        self._server = socket.create_server((host, port))
+        self.address: Tuple[str, int] = self._server.getsockname()[:2]
+        self._connection: Optional[socket.socket] = None
+        self._state = threading.Condition()
+        self._rx = deque()                   # полные строки в приёмном буфере
+        self._rx_bytes = 0
+        self._planner = deque()
+        self._feed = 0.0
+        self._running = True
+        self._busy = False
+        self._threads = [threading.Thread(target=target, daemon=True)
+                         for target in (self._receive, self._parse_lines, self._execute)]
+
+    def __enter__(self) -> 'ControllerSimulator':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.stop()
+        return False
+
+    def start(self) -> None:
+        """Запускает приём подключения и выполнение."""
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        """Останавливает имитатор и закрывает соединение."""
+        with self._state:
+            self._running = False
+            self._state.notify_all()
+        for sock in (self._connection, self._server):
+            if sock is not None:
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+        for thread in self._threads:
+            thread.join(timeout=1)
+
+    def wait_idle(self, timeout: float = 10.0) -> bool:
+        """
+        Ждёт, пока все принятые строки не будут выполнены.
+
+        Returns:
+            True если имитатор простаивает
+        """
+        deadline = time.monotonic() + timeout
+        with self._state:
+            while self._rx or self._planner or self._busy:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._state.wait(remaining)
+        return True
+
+    # --- потоки имитатора ---
+
+    def _receive(self):
+        """Приём байт: команды реального времени сразу, остальное — в приёмный буфер."""
+        try:
+            self._connection, _ = self._server.accept()
+        except OSError:
+            return
+        partial = bytearray()
+        while self._running:
+            try:
+                data = self._connection.recv(4096)
+            except OSError:
+                break
+            if not data:
+                break
+            with self._state:
+                for byte in data:
+                    if self._apply_realtime(byte):
+                        continue
+                    partial.append(byte)
+                    self._rx_bytes += 1
+                    if byte == ord('\n'):
+                        self._rx.append(partial.decode('ascii', 'replace').strip())
+                        partial = bytearray()
+                self.max_rx_bytes = max(self.max_rx_bytes, self._rx_bytes)
+                if self._rx_bytes > self.rx_buffer_size:
+                    self.overflow = True
+                self._state.notify_all()
+
+    def _apply_realtime(self, byte: int) -> bool:
+        """Выполняет команду реального времени; False — обычный байт."""
+        if byte == FEED_HOLD[0]:
+            self.paused = True
+        elif byte == CYCLE_START[0]:
+            self.paused = False
+        elif byte == FEED_OVERRIDE_RESET[0]:
+            self.feed_override = 100
+        elif byte in _OVERRIDE_STEPS:
+            self.feed_override = max(FEED_OVERRIDE_MIN, min(FEED_OVERRIDE_MAX,
+                                     self.feed_override + _OVERRIDE_STEPS[byte]))
+        else:
+            return False
+        self.realtime.append(bytes([byte]))
+        return True
+
+    def _parse_lines(self):
+        """Разбор строк: из приёмного буфера в планировщик, ответ 'ok' на каждую."""
+        while True:
+            with self._state:
+                while self._running and not (self._rx and len(self._planner) < self.planner_size):
+                    self._state.wait()
+                if not self._running:
+                    return
+                line = self._rx.popleft()
+                self._rx_bytes -= len(line) + 1
+                self.received.append(line)
+                response = self._check(line)
+                if response == 'ok':
+                    self._planner.append(line)
+                else:
+                    self.errors.append((line, response))
+                self._state.notify_all()
+            try:
+                self._connection.sendall((response + '\n').encode('ascii'))
+            except OSError:
+                return
+
+    @staticmethod
+    def _check(line: str) -> str:
+        """Ответ на строку: 'ok' или код ошибки."""
+        words = _parse(line)
+        if words is None:
+            return ERROR_BAD_WORD
+        if 'G' in words and words['G'] not in (0, 1, 4):
+            return ERROR_UNSUPPORTED
+        return 'ok'
+
+    def _execute(self):
+        """Выполнение команд планировщика с временем по подаче."""
+        while True:
+            with self._state:
+                while self._running and not self._planner:
+                    self._state.wait()
+                if not self._running:
+                    return
+                line = self._planner[0]
+                self._busy = True
+            seconds = self._duration(_parse(line))
+            self.machine_seconds += seconds
+            self._wait(seconds)
+            with self._state:
+                self._planner.popleft()
+                self.executed.append(line)
+                self._busy = False
+                self._state.notify_all()
+
+    def _duration(self, words: Dict[str, float]) -> float:
+        """Время выполнения команды (с) и обновление положения."""
+        if 'F' in words:
+            self._feed = words['F']
+        if words.get('G') == 4:
+            dwell = words.get('P', 0.0)
+            return dwell / 1000 if self.dwell_units == DWELL_MILLISECONDS else dwell
+        if words.get('G') not in (0, 1):
+            return 0.0
+        target = {axis: words.get(axis, value) for axis, value in self.position.items()}
+        distance = math.dist(target.values(), self.position.values())
+        self.position = target
+        if not distance or not self._feed:
+            return 0.0
+        return distance / (self._feed / 60) * 100 / self.feed_override
+
+    def _wait(self, seconds: float) -> None:
+        """Ждёт seconds × time_scale, не продвигаясь во время паузы подачи."""
+        remaining = seconds * self.time_scale
+        while self._running and (remaining > 0 or self.paused):
+            time.sleep(_TICK)
+            if not self.paused:
+                remaining -= _TICK
@@ -0,0 +1,131 @@
+"""
+Выбор способа генерации по бюджету памяти.
+
+Объём памяти задания определяется количеством ударов: шаги × ряды ×
+удары в ячейку × слои. Способы генерации (все дают одинаковый файл):
+- template — слои генерируются по одному, XY перемещения ударов строятся
+  один раз на окно паттерна и направление прохода и переиспользуются;
+- streaming — слои генерируются и записываются по одному;
+- memory — все слои строятся до записи (нужно для записи подпрограммами,
+  которой нужен весь список слоёв; разбиение на части проходит слои
+  дважды и работает с любым способом).
+
+Способы перечислены в порядке предпочтения (замер bench_engines
+в benchmark.py): template заметно быстрее остальных, streaming и memory
+по времени близки, но streaming держит в памяти один слой, а не все.
+Выбирается первый из тех, чья оценка памяти укладывается в бюджет.
+
+Содержит:
+- EngineChoice — выбранный способ и оценки памяти
+- estimate_engine_memory — оценка памяти каждого способа
+- select_engine — выбор способа по бюджету
+"""
+
+from dataclasses import dataclass, field
+from math import ceil
+from typing import Dict
+
+from .command_generator import CommandGenerator
+from .output_writer import BUFFER_SIZE_DEFAULT
+
+ENGINE_TEMPLATE = 'template'
+ENGINE_STREAMING = 'streaming'
+ENGINE_MEMORY = 'memory'
+
+# В порядке предпочтения: от быстрого к медленному, при равной скорости — от экономного
+ENGINES_BY_SPEED = (ENGINE_TEMPLATE, ENGINE_STREAMING, ENGINE_MEMORY)
+
+# Оценки занимаемой памяти (байт), замерены через tracemalloc (CPython 3.11, 64 бит)
+HIT_BYTES = 250            # XY команда удара с готовой строкой и три ссылки в списке команд слоя
+CACHED_MOVE_BYTES = 215    # XY команда с готовой строкой в кэше шаблонов (template)
+LAYER_BYTES = 1500         # общие команды слоя (Z, позиция укладки) и объект Layer
+BASE_BYTES = BUFFER_SIZE_DEFAULT + (1 << 20)  # буфер записи, паттерн и прочее
+
+
+@dataclass
+class EngineChoice:
+    """
+    Выбранный способ генерации.
+
+    Attributes:
+        engine: Способ ('template', 'streaming' или 'memory')
+        memory_budget: Бюджет памяти в байтах (0 — без ограничения)
+        estimates: Оценка памяти каждого допустимого способа в байтах
+    """
+    engine: str
+    memory_budget: int = 0
+    estimates: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def estimated_bytes(self) -> int:
+        """Оценка памяти выбранного способа в байтах."""
+        return self.estimates[self.engine]
+
+
+def estimate_engine_memory(generator: CommandGenerator, start_layer: int = 1) -> Dict[str, int]:
+    """
+    Оценивает память каждого способа генерации по параметрам задания.
+
+    Args:
+        generator: Генератор команд задания
+        start_layer: Номер первого генерируемого слоя
+
+    Returns:
+        Словарь {способ: байт}
+    """
+    layers = max(generator.amount_layers + generator.amount_virtual_layers - start_layer + 1, 0)
+    hits_per_layer = generator.num_row_y * generator.num_step_x * generator.num_pitch
+    layer_bytes = hits_per_layer * HIT_BYTES
+
+    # Генерируемый слой и предыдущий, ещё не отпущенный циклом записи
+    # (первый слой, по которому оценивается время, после оценки не хранится;
+    # текст слоя пишется кусками и в оценку не входит)
+    streaming = BASE_BYTES + 2 * layer_bytes + layers * LAYER_BYTES
+    windows = ceil(generator.nx * generator.ny / max(generator.num_pitch, 1))
+    directions = 2 if generator.is_rotation_direction else 1
+    templates = min(windows * directions, layers)
+
+    return {
+        ENGINE_TEMPLATE: streaming + templates * hits_per_layer * CACHED_MOVE_BYTES,
+        ENGINE_STREAMING: streaming,
+        ENGINE_MEMORY: BASE_BYTES + layers * (layer_bytes + LAYER_BYTES),
+    }
+
+
+def select_engine(generator: CommandGenerator, memory_budget: int = 0,
+                  need_all_layers: bool = False, start_layer: int = 1) -> EngineChoice:
+    """
+    Выбирает самый быстрый способ генерации, укладывающийся в бюджет памяти.
+
+    Args:
+        generator: Генератор команд задания
+        memory_budget: Бюджет памяти в байтах (0 — без ограничения)
+        need_all_layers: Нужен список всех слоёв (запись подпрограммами)
+        start_layer: Номер первого генерируемого слоя
+
+    Returns:
+        EngineChoice
+
+    Raises:
+        ValueError: Ни один способ не укладывается в бюджет
+    """
+    if memory_budget < 0:
+        raise ValueError('Бюджет памяти не может быть отрицательным')
+
+    estimates = estimate_engine_memory(generator, start_layer)
+    if need_all_layers:
+        candidates = [ENGINE_MEMORY]
+    elif generator.is_random_offsets:
+        # Случайные смещения у каждого слоя свои — шаблоны не переиспользуются
+        candidates = [ENGINE_STREAMING, ENGINE_MEMORY]
+    else:
+        candidates = list(ENGINES_BY_SPEED)
+    estimates = {engine: estimates[engine] for engine in candidates}
+
+    for engine in candidates:
+        if not memory_budget or estimates[engine] <= memory_budget:
+            return EngineChoice(engine, memory_budget, estimates)
+
+    best = min(estimates, key=estimates.get)
+    raise ValueError(f'Задание не помещается в бюджет памяти {memory_budget / (1 << 20):.0f} МБ: '
+                     f'нужно не менее {estimates[best] / (1 << 20):.0f} МБ ({best})')
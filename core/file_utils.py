@@ -8,13 +8,21 @@
 """
 
 import os
-from typing import Dict, Any
-from math import ceil as round_to_greater
+from typing import Dict, Any, Union
 
 from utils.crossplatform_utils import get_desktop_path
 
+from .job_spec import JobSpec, as_job_spec
 
-def get_filename(data_dict: Dict[str, Any]) -> str:
+
+def _required(value: Any, key: str) -> Any:
+    """Значение необязательного для генерации параметра, нужного для имени файла."""
+    if value is None:
+        raise KeyError(key)
+    return value
+
+
+def get_filename(data_dict: Union[Dict[str, Any], JobSpec]) -> str:
     """
     Генерирует имя файла на основе параметров.
 
@@ -22,44 +30,27 @@ def get_filename(data_dict: Dict[str, Any]) -> str:
     '{длина_X}x{длина_Y}x{высота} {кол-во_ударов} ударов {имя_головы}.tap'
 
     Args:
-        data_dict: Словарь с параметрами генерации
+        data_dict: Словарь с параметрами генерации или JobSpec
 
     Returns:
         Имя файла с расширением .tap
     """
-    is_automatic_name = data_dict["Автоматическая генерация имени файла"]
-
-    if not is_automatic_name:
-        return data_dict["Имя файла"]
-
-    head_name = data_dict['Выбранная игольница (ИП игольница)']
-    frame_length_x = data_dict['Габариты каркаса']['X']
-    frame_length_y = data_dict['Габариты каркаса']['Y']
-    selected_type_frame_size = data_dict['Задание размеров каркаса']
-    amount_layers = data_dict['Количество слоёв']
-    layer_thickness = data_dict['Толщина слоя (мм)']
-    num_pitch = data_dict['Параметры паттерна']['Кол-во ударов']
-
-    frame_height = int(amount_layers * layer_thickness)
+    spec = as_job_spec(data_dict)
 
-    if selected_type_frame_size == 'По шагам головы':
-        head_data = data_dict['Игольницы (ИП головы)'][head_name]
-        cell_size_x = head_data.get('needle_spacing_x', 8.0)
-        cell_size_y = head_data.get('needle_spacing_y', 8.0)
-        needles_x = head_data['X']
-        needles_y = head_data['Y']
-        num_step_x = data_dict['Количество шагов головы']['X']
-        num_row_y = data_dict['Количество шагов головы']['Y']
+    if not _required(spec.is_automatic_name, 'Автоматическая генерация имени файла'):
+        return _required(spec.file_name, 'Имя файла')
 
-        head_width_x = cell_size_x * needles_x
-        head_width_y = cell_size_y * needles_y
-        frame_length_x = num_step_x * head_width_x
-        frame_length_y = num_row_y * head_width_y
+    frame_length_x = spec.frame_length_x
+    frame_length_y = spec.frame_length_y
+    if spec.selected_type_frame_size == 'По шагам головы':
+        frame_length_x = spec.num_step_x * spec.head_width_x
+        frame_length_y = spec.num_row_y * spec.head_width_y
 
-    return f'{frame_length_x}x{frame_length_y}x{frame_height}_{num_pitch}_ударов_{head_name}.tap'
+    return (f'{frame_length_x}x{frame_length_y}x{spec.frame_height}_'
+            f'{spec.num_pitch}_ударов_{spec.head_name}.tap')
 
 
-def get_filename_path_and_create_directory_if_need(data_dict: Dict[str, Any]) -> str:
+def get_filename_path_and_create_directory_if_need(data_dict: Union[Dict[str, Any], JobSpec]) -> str:
     """
     Создаёт полный путь к файлу и директорию если нужно.
 
@@ -67,65 +58,45 @@ def get_filename_path_and_create_directory_if_need(data_dict: Dict[str, Any]) ->
     (или в текущей директории, если отключено сохранение на рабочий стол).
 
     Args:
-        data_dict: Словарь с параметрами генерации
+        data_dict: Словарь с параметрами генерации или JobSpec
 
     Returns:
         Полный путь к файлу
     """
-    on_the_desktop = data_dict["Создание файла на рабочем столе"]
-    head_name = data_dict['Выбранная игольница (ИП игольница)']
+    spec = as_job_spec(data_dict)
+    on_the_desktop = _required(spec.on_the_desktop, 'Создание файла на рабочем столе')
     path_desktop = str(get_desktop_path()) if on_the_desktop else ''
-    path_head = os.path.join(path_desktop, head_name)
-    filename = get_filename(data_dict)
+    path_head = os.path.join(path_desktop, spec.head_name)
+    filename = get_filename(spec)
 
     if not os.path.exists(path_head):
         os.mkdir(path_head)
 
-    path = os.path.join(path_desktop, head_name, filename)
+    path = os.path.join(path_desktop, spec.head_name, filename)
     print(path)
     return path
 
 
-def get_message(data_dict: Dict[str, Any]) -> str:
+def get_message(data_dict: Union[Dict[str, Any], JobSpec]) -> str:
     """
     Генерирует информационное сообщение о параметрах генерации.
 
     Показывает свесы и количество шагов при задании каркаса по габаритам.
 
     Args:
-        data_dict: Словарь с параметрами генерации
+        data_dict: Словарь с параметрами генерации или JobSpec
 
     Returns:
         Информационное сообщение или пустая строка
     """
-    head_name = data_dict['Выбранная игольница (ИП игольница)']
-    head_data = data_dict['Игольницы (ИП головы)'][head_name]
-    cell_size_x = head_data.get('needle_spacing_x', 8.0)
-    cell_size_y = head_data.get('needle_spacing_y', 8.0)
-    needles_x = head_data['X']
-    needles_y = head_data['Y']
-    frame_length_x = data_dict['Габариты каркаса']['X']
-    frame_length_y = data_dict['Габариты каркаса']['Y']
-    selected_type_frame_size = data_dict['Задание размеров каркаса']
-    num_step_x = data_dict['Количество шагов головы']['X']
-    num_row_y = data_dict['Количество шагов головы']['Y']
-
-    head_width_x = cell_size_x * needles_x
-    head_width_y = cell_size_y * needles_y
-
-    if selected_type_frame_size == 'По габаритам':
-        num_step_x = round_to_greater(frame_length_x / head_width_x)
-        num_row_y = round_to_greater(frame_length_y / head_width_y)
-
-    overhangs_x = (num_step_x * head_width_x - frame_length_x) / 2
-    overhangs_y = (num_row_y * head_width_y - frame_length_y) / 2
+    spec = as_job_spec(data_dict)
 
     message = ''
-    if selected_type_frame_size == 'По габаритам':
+    if spec.is_frame_by_dimensions:
         message = (
-            f'Свесы по Х: {overhangs_x}\n'
-            f'Свесы по Y: {overhangs_y}\n\n'
-            f'Количество шагов по Х: {num_step_x}\n'
-            f'Количество шагов по Y: {num_row_y}\n'
+            f'Свесы по Х: {spec.overhangs_x}\n'
+            f'Свесы по Y: {spec.overhangs_y}\n\n'
+            f'Количество шагов по Х: {spec.num_step_x}\n'
+            f'Количество шагов по Y: {spec.num_row_y}\n'
         )
     return message
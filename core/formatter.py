@@ -6,9 +6,9 @@
 - GCodeFormatter — класс для записи команд в файл
 """
 
-from typing import TextIO, Any
+from typing import TextIO, Any, List, Optional
 from dataclasses import dataclass
-from .commands import GCodeCommand, Layer
+from .commands import GCodeCommand, Layer, RawCommand
 
 
 @dataclass
@@ -38,6 +38,8 @@ class PreheadParams:
     is_frame_by_dimensions: bool  # True = 'По габаритам', False = 'По шагам'
     work_time: str = ""  # Время работы файла на станке
     layer_time: str = ""  # Время работы над одним слоем
+    seed: Optional[int] = None  # Зерно случайности (None — без случайности)
+    start_layer: int = 1  # Слой, с которого начинается файл (продолжение задания)
 
 
 class GCodeFormatter:
@@ -53,6 +55,19 @@ class GCodeFormatter:
     FIELD_WIDTH_NORMAL = 20
     FIELD_WIDTH_EXTENDED = 35
     COMMAND_WIDTH = 16
+    # Сколько команд слоя собирается в одну строку перед записью: текст
+    # большого слоя целиком занимал бы память наравне с самим слоем
+    WRITE_CHUNK_COMMANDS = 8192
+
+    # Поля заголовка, заполняемые после записи слоёв (см. write_prehead(reserve_stats=True)):
+    # ключ, название, ширина значения
+    RESERVED_FIELDS = (
+        ('layer_time', 'Время одного слоя', 16),
+        ('work_time', 'Время всех слоёв', 16),
+        ('hits', 'Удары', 12),
+        ('distance_m', 'Путь, м', 12),
+        ('bytes', 'Размер файла, байт', 14),
+    )
 
     def __init__(self, file_handle: TextIO, total_layers: int):
         """
@@ -62,20 +77,31 @@ class GCodeFormatter:
         """
         self._file = file_handle
         self._total_layers = total_layers
+        self._reserved = {}
 
-    def write_prehead(self, params: PreheadParams) -> None:
+    def write_prehead(self, params: PreheadParams, reserve_stats: bool = False) -> None:
         """
         Записывает заголовок файла с параметрами.
 
         Args:
             params: Структура с параметрами для заголовка
+            reserve_stats: Вместо времени из params оставить в заголовке поля
+                фиксированной ширины (RESERVED_FIELDS), которые заполняются
+                после записи слоёв через patch_prehead. Файл должен поддерживать
+                tell() и patch() (AtomicOutputWriter)
         """
         w = self.FIELD_WIDTH_NORMAL
 
         self._write_empty_line()
         self._write_info('ИП голова', params.head_name, w)
         self._write_empty_line()
-        if params.work_time:
+        if reserve_stats:
+            for key, name, size in self.RESERVED_FIELDS:
+                self._file.write(f'; {name:{w}}: ')
+                self._reserved[key] = (self._file.tell(), size)
+                self._file.write(' ' * size + '\n')
+            self._write_empty_line()
+        elif params.work_time:
             if params.layer_time:
                 self._write_info('Время одного слоя', params.layer_time, w)
             self._write_info('Время всех слоёв', params.work_time, w)
@@ -126,6 +152,60 @@ class GCodeFormatter:
             )
             self._write_empty_line()
 
+        if params.seed is not None:
+            self._write_info('Зерно случайности', params.seed, w)
+            self._write_empty_line()
+
+        if params.start_layer > 1:
+            self._write_info('Продолжение задания со слоя', params.start_layer, w)
+            self._write_empty_line()
+
+    def patch_prehead(self, **values: Any) -> None:
+        """
+        Заполняет поля заголовка, зарезервированные write_prehead(reserve_stats=True).
+
+        Args:
+            **values: Значения по ключам RESERVED_FIELDS
+
+        Raises:
+            KeyError: Поле не было зарезервировано
+            ValueError: Значение не помещается в поле
+        """
+        for key, value in values.items():
+            offset, size = self._reserved[key]
+            text = str(value)
+            if len(text.encode('utf-8')) > size:
+                raise ValueError(f'Значение {text!r} не помещается в поле заголовка {key} ({size} байт)')
+            self._file.patch(offset, text + ' ' * (size - len(text.encode('utf-8'))))
+
+    def write_part_info(self, part_number: int, parts_count: int,
+                        first_layer: int, last_layer: int) -> None:
+        """
+        Записывает в заголовок номер части и её диапазон слоёв.
+
+        Args:
+            part_number: Номер части (с 1)
+            parts_count: Количество частей
+            first_layer: Номер первого слоя части
+            last_layer: Номер последнего слоя части
+        """
+        w = self.FIELD_WIDTH_NORMAL
+        self._write_info('Часть', f'{part_number} из {parts_count}', w)
+        self._write_info('Слои части', f'{first_layer}-{last_layer}', w)
+        self._write_empty_line()
+
+    def write_reentry(self, commands: List[GCodeCommand], start_layer: int) -> None:
+        """
+        Записывает блок безопасного входа в задание перед слоем start_layer.
+
+        Args:
+            commands: Команды входа (см. CommandGenerator.reentry_commands)
+            start_layer: Номер слоя, с которого продолжается задание
+        """
+        self._file.write(f";\n; {'<' * 10} re-entry [{start_layer}] {'>' * 10}\n;\n")
+        for cmd in commands:
+            self.write_command(cmd, start_layer)
+
     def write_layer_header(self, layer_number: int, is_virtual: bool) -> None:
         """
         Записывает заголовок слоя (комментарий с номером).
@@ -157,8 +237,46 @@ class GCodeFormatter:
             layer: Объект Layer с командами
         """
         self.write_layer_header(layer.layer_number, layer.is_virtual)
-        for cmd in layer.commands:
-            self.write_command(cmd, layer.layer_number)
+        # Комментарий одинаков для всех команд слоя, слой пишется кусками
+        # по WRITE_CHUNK_COMMANDS команд
+        comment = f';{layer.layer_number}/{self._total_layers}\n'
+        width = self.COMMAND_WIDTH
+        commands = layer.commands
+        chunk = self.WRITE_CHUNK_COMMANDS
+        for start in range(0, len(commands), chunk):
+            self._file.write(''.join([f'{cmd.to_string():{width}}{comment}'
+                                      for cmd in commands[start:start + chunk]]))
+
+    def write_subprogram_call(self, program_number: int, z_shift: float,
+                              layer_number: int) -> None:
+        """
+        Записывает вызов подпрограммы со сдвигом Z (G52) и сброс сдвига.
+
+        Args:
+            program_number: Номер подпрограммы
+            z_shift: Сдвиг по Z (мм)
+            layer_number: Номер текущего слоя (для комментария)
+        """
+        self.write_command(RawCommand(code=f'G52 Z{round(z_shift, 1)}'), layer_number)
+        self.write_command(RawCommand(code=f'M98 P{program_number}'), layer_number)
+        self.write_command(RawCommand(code='G52 Z0'), layer_number)
+
+    def write_program_end(self) -> None:
+        """Записывает конец основной программы (M30)."""
+        self._write_empty_line()
+        self._file.write('M30\n')
+
+    def write_subprogram(self, program_number: int, commands: List[GCodeCommand]) -> None:
+        """
+        Записывает подпрограмму O<номер> ... M99.
+
+        Args:
+            program_number: Номер подпрограммы
+            commands: Команды подпрограммы
+        """
+        self._file.write(f';\nO{program_number}\n')
+        self._file.write(''.join(f'{cmd.to_string()}\n' for cmd in commands))
+        self._file.write('M99\n')
 
     def _write_empty_line(self) -> None:
         """Записывает пустую строку комментария."""
@@ -0,0 +1,445 @@
+"""
+Потоковое сравнение G-code файлов.
+
+Предназначено для проверки новых версий генератора на архивных
+производственных программах размером в несколько гигабайт: файлы читаются
+кусками, совпадающие участки пропускаются по хэшам блоков команд, а в отчёт
+попадают только первые N различий. После различия сравнение
+восстанавливает выравнивание по ближайшей общей последовательности команд,
+поэтому вставленная или удалённая строка даёт одно различие, а не сдвиг
+всех последующих блоков.
+
+Содержит:
+- GCodeDifference — одно различие между файлами
+- GCodeDiffResult — результат сравнения
+- iter_gcode_commands — потоковое чтение команд с номерами строк и слоёв
+- decode_command — разбор команды на слова (G1, X, Y, Z, F, ...)
+- layer_digests — SHA-256 команд каждого слоя
+- generated_layer_digests — те же дайджесты по слоям генератора, без записи файла
+- compare_gcode_files_streaming — сравнение двух файлов
+"""
+
+import hashlib
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .commands import GCodeCommand, Layer
+
+# Размер куска при чтении файла (байт)
+CHUNK_SIZE_DEFAULT = 1 << 20
+
+# Количество команд в блоке, который сравнивается по хэшу целиком
+BLOCK_SIZE_DEFAULT = 4096
+
+# Сколько команд подряд должны совпасть, чтобы считать файлы снова выровненными
+RESYNC_ANCHOR = 8
+
+_LAYER_HEADER_RE = re.compile(rb'^;\s*<+\s*\[(\d+)\]')
+_WORD_RE = re.compile(r'([A-Z])\s*([-+]?[0-9]*\.?[0-9]+)')
+
+
+@dataclass
+class GCodeDifference:
+    """
+    Одно различие между командами двух файлов.
+
+    Attributes:
+        command_index: Порядковый номер команды в первом файле (начиная с 0,
+            комментарии не считаются); для команды, которой нет в первом
+            файле, — номер во втором
+        reference_line: Номер строки в первом файле (None, если команды нет)
+        candidate_line: Номер строки во втором файле (None, если команды нет)
+        reference_layer: Номер слоя в первом файле
+        candidate_layer: Номер слоя во втором файле
+        reference: Команда из первого файла (None — команда вставлена во второй
+            файл или первый файл закончился)
+        candidate: Команда из второго файла (None — команда удалена из второго
+            файла или он закончился)
+    """
+    command_index: int
+    reference_line: Optional[int]
+    candidate_line: Optional[int]
+    reference_layer: Optional[int]
+    candidate_layer: Optional[int]
+    reference: Optional[str]
+    candidate: Optional[str]
+
+    @property
+    def layer_number(self) -> Optional[int]:
+        """Номер слоя, в котором найдено различие."""
+        return self.reference_layer if self.reference_layer is not None else self.candidate_layer
+
+    def describe(self) -> str:
+        """Возвращает читаемое описание различия."""
+        def side(cmd, line, layer):
+            if cmd is None:
+                return 'нет команды'
+            return f"'{cmd}' (строка {line}, слой {layer}) {decode_command(cmd)}"
+
+        return (
+            f"Команда #{self.command_index + 1}:\n"
+            f"  Файл 1: {side(self.reference, self.reference_line, self.reference_layer)}\n"
+            f"  Файл 2: {side(self.candidate, self.candidate_line, self.candidate_layer)}"
+        )
+
+
+@dataclass
+class GCodeDiffResult:
+    """
+    Результат сравнения двух G-code файлов.
+
+    Attributes:
+        identical: True если последовательности команд совпадают
+        commands_compared: Сколько команд было просмотрено в каждом файле
+        differences: Первые найденные различия (не больше max_differences)
+        truncated: True если сравнение остановлено после max_differences различий
+        differing_layers: Номера слоёв с разными хэшами (режим summary)
+        layers_reference: Количество слоёв в первом файле (режим summary)
+        layers_candidate: Количество слоёв во втором файле (режим summary)
+    """
+    identical: bool
+    commands_compared: int = 0
+    differences: List[GCodeDifference] = field(default_factory=list)
+    truncated: bool = False
+    differing_layers: List[int] = field(default_factory=list)
+    layers_reference: int = 0
+    layers_candidate: int = 0
+
+    def format_report(self) -> str:
+        """Формирует текстовый отчёт о сравнении."""
+        if self.identical:
+            return f"Файлы идентичны по командам ({self.commands_compared} команд)"
+
+        lines = []
+        if self.differences:
+            lines.append(f"Найдено различий: {len(self.differences)}"
+                         + (" (сравнение остановлено)" if self.truncated else ""))
+            lines.append(f"Первое различие в слое {self.differences[0].layer_number}")
+            lines.extend(d.describe() for d in self.differences)
+        if self.differing_layers:
+            lines.append(f"Слои с разными командами: {self.differing_layers}")
+        if self.layers_reference != self.layers_candidate:
+            lines.append(f"Разное количество слоёв: {self.layers_reference} vs {self.layers_candidate}")
+        return "\n".join(lines)
+
+
+def decode_command(command: str) -> Dict[str, Union[int, float]]:
+    """
+    Разбирает команду G-code на слова.
+
+    Args:
+        command: Строка команды, например 'G1 X486.0 Y1.2 F3000'
+
+    Returns:
+        Словарь {буква: значение}, например {'G': 1, 'X': 486.0, 'Y': 1.2, 'F': 3000}
+    """
+    words = {}
+    for letter, value in _WORD_RE.findall(command.upper()):
+        words[letter] = float(value) if '.' in value else int(value)
+    return words
+
+
+def _iter_lines(path: str, chunk_size: int) -> Iterator[bytes]:
+    """Читает файл кусками по chunk_size байт и отдаёт строки без '\\n'."""
+    with open(path, 'rb') as f:
+        tail = b''
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            lines = (tail + chunk).split(b'\n')
+            tail = lines.pop()
+            yield from lines
+        if tail:
+            yield tail
+
+
+def iter_gcode_commands(path: str,
+                        chunk_size: int = CHUNK_SIZE_DEFAULT) -> Iterator[Tuple[int, Optional[int], bytes]]:
+    """
+    Потоково извлекает команды из G-code файла, игнорируя комментарии.
+
+    Номер слоя берётся из заголовков слоёв вида '; <<<<<<<<<< [N] layer >>>>>>>>>>'.
+
+    Args:
+        path: Путь к .tap файлу
+        chunk_size: Размер куска чтения в байтах
+
+    Yields:
+        Кортежи (номер_строки, номер_слоя, команда_в_байтах)
+    """
+    layer = None
+    for line_number, line in enumerate(_iter_lines(path, chunk_size), start=1):
+        if line.startswith(b';'):
+            match = _LAYER_HEADER_RE.match(line)
+            if match:
+                layer = int(match.group(1))
+            continue
+        command = line.split(b';', 1)[0].strip()
+        if command:
+            yield line_number, layer, command
+
+
+def layer_digests(path: str, chunk_size: int = CHUNK_SIZE_DEFAULT) -> List[Tuple[Optional[int], str]]:
+    """
+    Вычисляет SHA-256 последовательности команд каждого слоя.
+
+    Команды до первого заголовка слоя попадают в слой None.
+
+    Args:
+        path: Путь к .tap файлу
+        chunk_size: Размер куска чтения в байтах
+
+    Returns:
+        Список (номер_слоя, hex-дайджест) в порядке следования слоёв
+    """
+    digests = []
+    current_layer = object()
+    sha = None
+    for _, layer, command in iter_gcode_commands(path, chunk_size):
+        if layer != current_layer:
+            if sha is not None:
+                digests.append((current_layer, sha.hexdigest()))
+            current_layer = layer
+            sha = hashlib.sha256()
+        sha.update(command)
+        sha.update(b'\n')
+    if sha is not None:
+        digests.append((current_layer, sha.hexdigest()))
+    return digests
+
+
+def generated_layer_digests(layers: Iterable[Layer],
+                            reentry: Iterable[GCodeCommand] = ()) -> List[Tuple[Optional[int], str]]:
+    """
+    Вычисляет SHA-256 команд каждого слоя по мере генерации слоёв.
+
+    Дайджесты совпадают с layer_digests файла, записанного из тех же слоёв:
+    хешируются те же строки команд без комментариев. Слои обрабатываются
+    по одному, поэтому layers может быть итератором (CommandGenerator.iter_layers).
+
+    Args:
+        layers: Слои программы
+        reentry: Блок входа в задание (в файле — до первого слоя, слой None)
+
+    Returns:
+        Список (номер_слоя, hex-дайджест) в порядке следования слоёв
+    """
+    def digest(commands):
+        sha = hashlib.sha256()
+        for cmd in commands:
+            command = cmd.to_string().split(';', 1)[0].strip()
+            if command:
+                sha.update(command.encode('ascii'))
+                sha.update(b'\n')
+        return sha.hexdigest()
+
+    reentry = list(reentry)
+    digests = [(None, digest(reentry))] if reentry else []
+    digests.extend((layer.layer_number, digest(layer.commands)) for layer in layers)
+    return digests
+
+
+def _block_digest(block: List[Tuple[int, Optional[int], bytes]]) -> bytes:
+    """Хэш блока команд (номера строк и слоёв не учитываются)."""
+    return hashlib.blake2b(b'\n'.join(item[2] for item in block), digest_size=16).digest()
+
+
+class _CommandStream:
+    """Команды файла с просмотром вперёд (для поиска точки выравнивания)."""
+
+    def __init__(self, path: str, chunk_size: int):
+        self._commands = iter_gcode_commands(path, chunk_size)
+        self._buffer = deque()
+        self.position = 0
+        self.exhausted = False
+
+    def peek(self, count: int) -> List[Tuple[int, Optional[int], bytes]]:
+        """Возвращает до count следующих команд, не продвигаясь по файлу."""
+        while len(self._buffer) < count and not self.exhausted:
+            item = next(self._commands, None)
+            if item is None:
+                self.exhausted = True
+            else:
+                self._buffer.append(item)
+        return list(islice(self._buffer, count))
+
+    def reaches_end(self, items: List) -> bool:
+        """True если items (результат peek) — все оставшиеся команды файла."""
+        return self.exhausted and len(items) == len(self._buffer)
+
+    def advance(self, count: int):
+        """Пропускает count команд (уже просмотренных через peek)."""
+        for _ in range(count):
+            self._buffer.popleft()
+        self.position += count
+
+
+def _find_resync(ref_block: List, cand_block: List, ref_end: bool, cand_end: bool,
+                 anchor: int = RESYNC_ANCHOR) -> Optional[Tuple[int, int]]:
+    """
+    Ищет ближайшую точку, с которой файлы снова совпадают.
+
+    Точка (i, j) — ref_block[i:] и cand_block[j:] начинаются с anchor
+    одинаковых команд (или с одинаковых хвостов, если оба файла
+    заканчиваются раньше). Выбирается точка с наименьшим i + j.
+
+    Args:
+        ref_block: Следующие команды первого файла
+        cand_block: Следующие команды второго файла
+        ref_end: True если ref_block доходит до конца первого файла
+        cand_end: True если cand_block доходит до конца второго файла
+        anchor: Длина совпадающей последовательности
+
+    Returns:
+        Кортеж (i, j) или None, если точка не найдена
+    """
+    first = {}
+    for j in range(len(cand_block)):
+        key = tuple(item[2] for item in cand_block[j:j + anchor])
+        if len(key) < anchor and not cand_end:
+            break
+        first.setdefault(key, j)
+
+    best = None
+    for i in range(len(ref_block)):
+        if best is not None and i >= best[0] + best[1]:
+            break
+        key = tuple(item[2] for item in ref_block[i:i + anchor])
+        if len(key) < anchor and not ref_end:
+            break
+        j = first.get(key)
+        if j is not None and (best is None or i + j < best[0] + best[1]):
+            best = (i, j)
+    return best
+
+
+def _difference(ref_index: int, cand_index: int, ref_item: Tuple, cand_item: Tuple) -> GCodeDifference:
+    """Различие между командами (пустой кортеж — команды нет)."""
+    ref_item = ref_item or (None, None, None)
+    cand_item = cand_item or (None, None, None)
+    return GCodeDifference(
+        command_index=ref_index if ref_item[2] is not None else cand_index,
+        reference_line=ref_item[0],
+        candidate_line=cand_item[0],
+        reference_layer=ref_item[1],
+        candidate_layer=cand_item[1],
+        reference=ref_item[2].decode('utf-8', 'replace') if ref_item[2] is not None else None,
+        candidate=cand_item[2].decode('utf-8', 'replace') if cand_item[2] is not None else None,
+    )
+
+
+def _compare_summary(reference_path: str, candidate_path: str, chunk_size: int) -> GCodeDiffResult:
+    """Сравнение только по хэшам слоёв."""
+    ref = layer_digests(reference_path, chunk_size)
+    cand = layer_digests(candidate_path, chunk_size)
+
+    differing = []
+    for i in range(max(len(ref), len(cand))):
+        ref_item = ref[i] if i < len(ref) else None
+        cand_item = cand[i] if i < len(cand) else None
+        if ref_item != cand_item:
+            layer = ref_item[0] if ref_item is not None else cand_item[0]
+            differing.append(layer)
+
+    return GCodeDiffResult(
+        identical=not differing,
+        differing_layers=differing,
+        layers_reference=len(ref),
+        layers_candidate=len(cand),
+    )
+
+
+def compare_gcode_files_streaming(reference_path: str, candidate_path: str,
+                                  max_differences: int = 10,
+                                  summary: bool = False,
+                                  block_size: int = BLOCK_SIZE_DEFAULT,
+                                  chunk_size: int = CHUNK_SIZE_DEFAULT) -> GCodeDiffResult:
+    """
+    Потоково сравнивает два G-code файла по последовательности команд.
+
+    Комментарии и расположение команд по строкам игнорируются, как и в
+    compare_gcode_files из тестов, но файлы не загружаются в память целиком:
+    команды читаются блоками по block_size, блоки с одинаковым хэшем
+    пропускаются, а в остальных ищется первое различие. После него файлы
+    выравниваются по ближайшим RESYNC_ANCHOR совпадающим командам в пределах
+    block_size команд: пропущенные до этой точки команды сообщаются как
+    изменённые, вставленные или удалённые. Сравнение останавливается после
+    max_differences различий.
+
+    Args:
+        reference_path: Путь к эталонному файлу
+        candidate_path: Путь к проверяемому файлу
+        max_differences: Сколько первых различий собрать
+        summary: Сравнивать только хэши слоёв (без поиска отдельных команд)
+        block_size: Количество команд в блоке (и предел поиска выравнивания)
+        chunk_size: Размер куска чтения в байтах
+
+    Returns:
+        GCodeDiffResult с результатом сравнения
+    """
+    if summary:
+        return _compare_summary(reference_path, candidate_path, chunk_size)
+
+    ref = _CommandStream(reference_path, chunk_size)
+    cand = _CommandStream(candidate_path, chunk_size)
+
+    differences = []
+
+    def report(ref_items, cand_items):
+        """Добавляет различия участка; True если набрано max_differences."""
+        for k in range(max(len(ref_items), len(cand_items))):
+            ref_item = ref_items[k] if k < len(ref_items) else ()
+            cand_item = cand_items[k] if k < len(cand_items) else ()
+            if ref_item and cand_item and ref_item[2] == cand_item[2]:
+                continue
+            differences.append(_difference(ref.position + min(k, len(ref_items)),
+                                           cand.position + min(k, len(cand_items)),
+                                           ref_item, cand_item))
+            if len(differences) >= max_differences:
+                ref.advance(min(k + 1, len(ref_items)))
+                cand.advance(min(k + 1, len(cand_items)))
+                return True
+        ref.advance(len(ref_items))
+        cand.advance(len(cand_items))
+        return False
+
+    while True:
+        ref_block = ref.peek(block_size)
+        cand_block = cand.peek(block_size)
+        if not ref_block and not cand_block:
+            break
+
+        if len(ref_block) == len(cand_block) and _block_digest(ref_block) == _block_digest(cand_block):
+            ref.advance(len(ref_block))
+            cand.advance(len(cand_block))
+            continue
+
+        # Совпадающее начало блока
+        same = 0
+        for ref_item, cand_item in zip(ref_block, cand_block):
+            if ref_item[2] != cand_item[2]:
+                break
+            same += 1
+        ref.advance(same)
+        cand.advance(same)
+
+        # Ближайшая точка, с которой файлы снова совпадают
+        ref_block = ref.peek(block_size)
+        cand_block = cand.peek(block_size)
+        resync = _find_resync(ref_block, cand_block,
+                              ref.reaches_end(ref_block), cand.reaches_end(cand_block))
+        if resync is None:
+            # Совпадения не видно — сравниваем участок попарно
+            resync = (len(ref_block), len(cand_block))
+        if report(ref_block[:resync[0]], cand_block[:resync[1]]):
+            return GCodeDiffResult(identical=False,
+                                   commands_compared=max(ref.position, cand.position),
+                                   differences=differences, truncated=True)
+
+    return GCodeDiffResult(identical=not differences,
+                           commands_compared=max(ref.position, cand.position),
+                           differences=differences)
@@ -2,72 +2,356 @@
 Генератор G-кодов для станка игольной пробивки.
 
 Содержит:
+- make_time_estimator — оценщик времени с параметрами станка задания
+- write_single_pass — однопроходная запись с итогами в заголовке
 - generate_G_codes_file — главная функция генерации файла
 """
 
-from typing import Dict, Any, Callable
+import os
+from typing import Dict, Any, Callable, Iterator, List, Optional, Union
 
 from .command_generator import CommandGenerator
+from .commands import Layer
+from .engine import ENGINE_MEMORY, ENGINE_TEMPLATE, select_engine
 from .formatter import GCodeFormatter
+from .geometry import get_ordered_list_of_rows
+from .job_spec import JobSpec, as_job_spec
 from .file_utils import get_filename_path_and_create_directory_if_need
+from .output_writer import AtomicOutputWriter, DURABILITY_DEFAULT
+from .preflight import EnvelopeError, axis_limits, check_envelope
+from .split_output import write_split_output
+from .subprograms import write_layers_as_subprograms
+from .telemetry import StageTimer, append_record, make_record
 from .time_estimator import TimeEstimator
 
 
-def generate_G_codes_file(data_dict: Dict[str, Any],
-                          display_percent_progress_func: Callable[[float], None]) -> Dict[str, Any]:
+def make_time_estimator(generator: CommandGenerator) -> TimeEstimator:
+    """
+    Создаёт TimeEstimator с параметрами станка из генератора.
+
+    Args:
+        generator: Генератор команд задания
+
+    Returns:
+        TimeEstimator для оценки времени, записываемой в заголовок файла
+    """
+    return TimeEstimator(
+        speed_mm_per_min=generator.speed,
+        acceleration=generator.acceleration,
+        axis_max_speed=generator.axis_max_speed,
+        axis_acceleration=generator.axis_acceleration
+    )
+
+
+def write_single_pass(path: str, generator: CommandGenerator,
+                      offset_list: Optional[List] = None, start_layer: int = 1,
+                      durability: str = DURABILITY_DEFAULT,
+                      display_percent_progress_func: Optional[Callable[[float], None]] = None,
+                      reuse_hits: bool = False, background_write: bool = False) -> Dict[str, Any]:
+    """
+    Записывает программу за один проход: каждый слой пишется сразу после генерации.
+
+    В заголовке резервируются поля фиксированной ширины, итоги (время по всем
+    слоям, удары, путь, размер файла) накапливаются при записи слоёв
+    и дописываются в заголовок в конце.
+
+    Args:
+        path: Путь к файлу
+        generator: Генератор команд задания
+        offset_list: Готовый паттерн пробивки (по умолчанию строится заново)
+        start_layer: Номер первого слоя (см. generate_G_codes_file)
+        durability: Политика fsync при записи файла (см. AtomicOutputWriter)
+        display_percent_progress_func: Функция для отображения прогресса (0-100)
+        reuse_hits: Переиспользовать XY перемещения ударов между слоями
+            (см. CommandGenerator.iter_layers)
+        background_write: Писать на диск в отдельном потоке (см. AtomicOutputWriter)
+
+    Returns:
+        Словарь: work_time_str, layer_time_str, hits, distance_mm, bytes, machine_seconds
+    """
+    if offset_list is None:
+        offset_list = generator.pattern_offsets()
+    layers = generator.iter_layers(offset_list, start_layer=start_layer, reuse_hits=reuse_hits)
+    total_layers = generator.amount_layers + generator.amount_virtual_layers - start_layer + 1
+    running = make_time_estimator(generator).running()
+    rows = _emitted_rows(generator)
+    hits = 0
+
+    with AtomicOutputWriter(path, durability=durability,
+                            background=background_write) as gcode_file:
+        formatter = GCodeFormatter(gcode_file, generator.amount_layers)
+        formatter.write_prehead(generator.get_prehead_params(start_layer=start_layer),
+                                reserve_stats=True)
+        if start_layer > 1:
+            formatter.write_reentry(generator.reentry_commands(start_layer), start_layer)
+
+        for i, layer in enumerate(layers):
+            formatter.write_layer(layer)
+            running.add(layer)
+            hits += _window_hits(generator, layer.layer_number - 1, len(offset_list), rows)
+            if display_percent_progress_func is not None:
+                display_percent_progress_func(i / total_layers * 100)
+
+        estimate = running.result()
+        formatter.patch_prehead(
+            layer_time=estimate.layer_to_dhms(),
+            work_time=estimate.to_dhms(),
+            hits=hits,
+            distance_m=f'{estimate.total_distance_mm / 1000:.1f}',
+            bytes=gcode_file.bytes_written,
+        )
+
+    return {
+        'work_time_str': estimate.to_dhms(),
+        'layer_time_str': estimate.layer_to_dhms(),
+        'hits': hits,
+        'distance_mm': estimate.total_distance_mm,
+        'bytes': gcode_file.bytes_written,
+        'machine_seconds': estimate.total_seconds,
+    }
+
+
+def generate_G_codes_file(data_dict: Union[Dict[str, Any], JobSpec],
+                          display_percent_progress_func: Callable[[float], None],
+                          output_path: Optional[str] = None,
+                          offset_list: Optional[List] = None,
+                          durability: str = DURABILITY_DEFAULT,
+                          subprograms: bool = False,
+                          split_layers: int = 0,
+                          split_bytes: int = 0,
+                          start_layer: int = 1,
+                          single_pass: bool = False,
+                          memory_budget: int = 0,
+                          background_write: bool = True,
+                          telemetry_path: Optional[str] = None) -> Dict[str, Any]:
     """
     Генерирует G-code файл.
 
     Args:
-        data_dict: Словарь с параметрами генерации
+        data_dict: Словарь с параметрами генерации или JobSpec
         display_percent_progress_func: Функция для отображения прогресса (0-100)
+        output_path: Путь к выходному файлу (по умолчанию — папка головы,
+            см. get_filename_path_and_create_directory_if_need)
+        offset_list: Готовый паттерн пробивки (см. CommandGenerator.pattern_offsets),
+            используется пакетной генерацией, чтобы не строить его для каждой головы
+        durability: Политика fsync при записи файла (см. AtomicOutputWriter)
+        subprograms: Записать удары слоёв подпрограммами, вызываемыми со сдвигом Z
+            (см. write_layers_as_subprograms); недоступно при случайных смещениях
+        split_layers: Записать программу частями не более чем по split_layers
+            слоёв (0 — без разбиения), см. write_split_output
+        split_bytes: Записать программу частями не более split_bytes байт
+            каждая (0 — без разбиения)
+        start_layer: Продолжить задание со слоя start_layer (с 1): генерируются
+            только слои start_layer..последний, перед ними — блок безопасного
+            входа (см. CommandGenerator.reentry_commands). При случайности
+            нужно зерно исходного задания ('Зерно случайности')
+        single_pass: Писать слои сразу после генерации, не держа их в памяти;
+            в заголовке — точные итоги (время, удары, путь, размер файла),
+            дописываемые в зарезервированные поля после записи слоёв
+            (см. write_single_pass). Несовместимо с подпрограммами и разбиением
+        memory_budget: Бюджет памяти генерации в байтах (0 — без ограничения):
+            выбирается самый быстрый способ генерации, укладывающийся в бюджет
+            (см. select_engine). Файл не зависит от выбранного способа
+        background_write: Писать на диск в отдельном потоке, пока генерируются
+            следующие слои (см. AtomicOutputWriter); файл тот же
+        telemetry_path: Журнал генераций (по умолчанию — см. core.telemetry,
+            '' — не записывать); строка пишется и при ошибке генерации
 
     Returns:
         Словарь с информацией о генерации:
         - work_time_str: общее время работы
         - layer_time_str: время одного слоя
         - density: плотность пробивки (уд/кв.см)
+        - seed: зерно случайности задания
+        - engine: выбранный способ генерации ('template', 'streaming', 'memory')
+        - layers, hits, bytes: количество слоёв и ударов, размер файла (всех частей)
+        - machine_seconds: расчётное время работы станка (с)
+        - parts, manifest_path: пути к частям и манифесту (только при разбиении)
+        - distance_mm: путь инструмента (только при single_pass)
+
+    Raises:
+        EnvelopeError: Программа выходит за пределы осей станка
+            ('Пределы осей станка (мм)', см. check_envelope); файл не создаётся
     """
-    # Создаём генератор команд
-    generator = CommandGenerator(data_dict)
+    timer = StageTimer()
+    spec = None
+    try:
+        spec = as_job_spec(data_dict)
+        result = _generate(spec, timer, display_percent_progress_func, output_path,
+                           offset_list, durability, subprograms, split_layers, split_bytes,
+                           start_layer, single_pass, memory_budget, background_write)
+    except Exception as e:
+        append_record(make_record(spec, timer, error=e), telemetry_path)
+        raise
+    append_record(make_record(spec, timer, result), telemetry_path)
+    return result
 
-    # Генерируем слои
-    layers = generator.generate_layers()
+
+def _count_hits(generator: CommandGenerator, pattern_len: int, start_layer: int) -> int:
+    """Количество ударов слоёв start_layer..последний (без генерации слоёв)."""
     total_layers = generator.amount_layers + generator.amount_virtual_layers
+    rows = _emitted_rows(generator)
+    return sum(_window_hits(generator, layer_idx, pattern_len, rows)
+               for layer_idx in range(start_layer - 1, total_layers))
 
-    # Рассчитываем время работы
-    time_estimator = TimeEstimator(
-        speed_mm_per_min=generator.speed,
-        acceleration=generator.acceleration
-    )
-    time_estimate = time_estimator.estimate_by_one_layer(layers)
-    work_time_str = time_estimate.to_dhms()
-    layer_time_str = time_estimator.estimate_layer(layers[0].commands).to_dhms()
+
+def _emitted_rows(generator: CommandGenerator) -> int:
+    """
+    Количество рядов, которые проходит голова в слое.
+
+    Может быть меньше num_row_y: порядок 'В центр' при 1-2 рядах не даёт ни одного ряда.
+    """
+    return len(get_ordered_list_of_rows(generator.num_row_y, generator.order))
+
+
+def _window_hits(generator: CommandGenerator, layer_idx: int, pattern_len: int, rows: int) -> int:
+    """Количество ударов слоя по его окну паттерна (без среза offset_list)."""
+    start_hit, finish_hit = generator.hit_window(layer_idx, pattern_len)
+    window = max(0, min(finish_hit, pattern_len) - min(start_hit, pattern_len))
+    return rows * generator.num_step_x * window
+
+
+def _with_first_layer(first_layer: Layer, layers: Iterator[Layer]) -> Iterator[Layer]:
+    """
+    Слои с уже сгенерированным первым.
+
+    В отличие от itertools.chain([first_layer], layers), первый слой
+    не удерживается до конца итерации.
+    """
+    yield first_layer
+    del first_layer
+    yield from layers
+
+
+def _generate(spec: JobSpec, timer: StageTimer,
+              display_percent_progress_func: Callable[[float], None],
+              output_path: Optional[str], offset_list: Optional[List], durability: str,
+              subprograms: bool, split_layers: int, split_bytes: int, start_layer: int,
+              single_pass: bool, memory_budget: int, background_write: bool) -> Dict[str, Any]:
+    """Генерация файла (параметры — см. generate_G_codes_file)."""
+    # Создаём генератор команд
+    generator = CommandGenerator(spec)
+    if subprograms and generator.is_random_offsets:
+        raise ValueError('Запись слоёв подпрограммами невозможна при случайных смещениях')
+    is_random = generator.is_random_order or generator.is_random_offsets
+    if start_layer > 1 and is_random and not spec.seed:
+        raise ValueError('Для продолжения задания со случайностью укажите зерно '
+                         'случайности из заголовка исходного файла')
+    if single_pass and (subprograms or split_layers or split_bytes):
+        raise ValueError('Однопроходная запись несовместима с подпрограммами и разбиением на части')
+
+    if offset_list is None:
+        offset_list = generator.pattern_offsets()
+
+    # Проверяем, что программа не выходит за пределы осей станка (до создания файла)
+    limits = axis_limits(generator)
+    if limits:
+        envelope = check_envelope(generator, offset_list, start_layer, limits)
+        if not envelope.ok:
+            raise EnvelopeError(envelope)
 
     # Рассчитываем плотность пробивки (уд/кв.см)
-    density = generator.num_pitch / generator.cell_size_x / generator.cell_size_y * 100
+    density = spec.density
+
+    # Путь к файлу
+    if output_path is None:
+        path = get_filename_path_and_create_directory_if_need(spec)
+    else:
+        path = output_path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    # Способ генерации по бюджету памяти
+    engine = select_engine(generator, memory_budget,
+                           need_all_layers=subprograms,
+                           start_layer=start_layer).engine
+    reuse_hits = engine == ENGINE_TEMPLATE
+    total_layers = generator.amount_layers + generator.amount_virtual_layers - start_layer + 1
+    timer.mark('prepare')
+
+    if single_pass:
+        result = write_single_pass(path, generator, offset_list, start_layer, durability,
+                                   display_percent_progress_func, reuse_hits=reuse_hits,
+                                   background_write=background_write)
+        result.update({'density': density, 'seed': generator.seed, 'engine': engine,
+                       'layers': total_layers})
+        timer.mark('write')
+        return result
+
+    # Генерируем слои: все сразу или по одному при записи
+    if engine == ENGINE_MEMORY:
+        layers = generator.generate_layers(offset_list, start_layer=start_layer)
+        first_layer = layers[0]
+    else:
+        layer_iter = generator.iter_layers(offset_list, start_layer=start_layer,
+                                           reuse_hits=reuse_hits)
+        first_layer = next(layer_iter)
+        layers = _with_first_layer(first_layer, layer_iter)
+    reentry = generator.reentry_commands(start_layer) if start_layer > 1 else []
+
+    # Рассчитываем время работы по первому слою
+    time_estimator = make_time_estimator(generator)
+    layer_estimate = time_estimator.estimate_layer(first_layer.commands)
+    # При записи по одному слою первый слой не живёт до конца записи
+    del first_layer
+    work_estimate = layer_estimate.repeated(total_layers)
+    work_time_str = work_estimate.to_dhms()
+    layer_time_str = layer_estimate.to_dhms()
+
+    result = {
+        'work_time_str': work_time_str,
+        'layer_time_str': layer_time_str,
+        'density': density,
+        'seed': generator.seed,
+        'engine': engine,
+        'layers': total_layers,
+        'hits': _count_hits(generator, len(offset_list), start_layer),
+        'machine_seconds': work_estimate.total_seconds,
+    }
+    timer.mark('generate' if engine == ENGINE_MEMORY else 'first_layer')
 
-    # Открываем файл и записываем
-    path = get_filename_path_and_create_directory_if_need(data_dict)
+    if split_layers or split_bytes:
+        # Части пишутся в два прохода по слоям (см. write_split_output):
+        # без подпрограмм слои генерируются заново, а не хранятся в памяти
+        split_layers_source = layers if engine == ENGINE_MEMORY else (
+            lambda: generator.iter_layers(offset_list, start_layer=start_layer,
+                                          reuse_hits=reuse_hits))
+        parts, manifest_file = write_split_output(
+            path, generator, split_layers_source, time_estimator,
+            max_layers=split_layers, max_bytes=split_bytes, durability=durability,
+            subprograms=subprograms, progress_func=display_percent_progress_func,
+            reentry=reentry, background_write=background_write, start_layer=start_layer
+        )
+        result['parts'] = [part.path for part in parts]
+        result['manifest_path'] = manifest_file
+        result['bytes'] = sum(part.bytes for part in parts)
+        timer.mark('write')
+        return result
 
-    with open(path, 'w', encoding='utf-8') as gcode_file:
+    # Файл появляется под своим именем только после успешной записи
+    with AtomicOutputWriter(path, durability=durability,
+                            background=background_write) as gcode_file:
         formatter = GCodeFormatter(gcode_file, generator.amount_layers)
 
         # Записываем заголовок
         formatter.write_prehead(generator.get_prehead_params(
             work_time=work_time_str,
-            layer_time=layer_time_str
+            layer_time=layer_time_str,
+            start_layer=start_layer
         ))
+        if reentry:
+            formatter.write_reentry(reentry, start_layer)
 
         # Записываем слои
-        for i, layer in enumerate(layers):
-            formatter.write_layer(layer)
-            # Отображаем процесс на progressbar
-            display_percent_progress_func(i / total_layers * 100)
+        if subprograms:
+            write_layers_as_subprograms(formatter, generator, layers,
+                                        display_percent_progress_func)
+        else:
+            for i, layer in enumerate(layers):
+                formatter.write_layer(layer)
+                # Отображаем процесс на progressbar
+                display_percent_progress_func(i / total_layers * 100)
+    result['bytes'] = gcode_file.bytes_written
+    timer.mark('write')
 
     # Возвращаем информацию о генерации
-    return {
-        'work_time_str': work_time_str,
-        'layer_time_str': layer_time_str,
-        'density': density
-    }
+    return result
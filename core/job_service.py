@@ -0,0 +1,556 @@
+"""
+Локальный сервис генерации G-кодов.
+
+Несколько операторов запускают приложение на своих ПК и генерируют похожие
+программы. Сервис принимает словари параметров по HTTP (localhost или
+локальная сеть), выполняет generate_G_codes_file в пуле процессов
+ограниченного размера, передаёт прогресс потоком событий и отдаёт готовые файлы.
+
+HTTP API (тела запросов и ответов — JSON):
+- POST /jobs                 — поставить задание в очередь, ответ {"id", "state"}
+- GET  /jobs                 — список заданий
+- GET  /jobs/<id>            — состояние задания
+- GET  /jobs/<id>/events     — поток событий (по одному JSON на строку) до завершения
+- GET  /jobs/<id>/file       — готовый .tap файл
+
+Содержит:
+- GenerationJob — задание и его состояние
+- GenerationJobService — asyncio сервер с пулом процессов
+- JobServiceClient — синхронный клиент (используется GUI)
+- run_job_service — блокирующий запуск сервиса (для main.py --serve)
+"""
+
+import asyncio
+import http.client
+import json
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+from .file_utils import get_filename
+from .generator import generate_G_codes_file
+from .output_writer import AtomicOutputWriter
+
+# Адрес и порт сервиса по умолчанию
+HOST_DEFAULT = '127.0.0.1'
+PORT_DEFAULT = 8765
+
+# Количество одновременно выполняемых заданий по умолчанию
+WORKERS_DEFAULT = 2
+
+# Максимальный размер тела запроса (байт)
+MAX_BODY_SIZE = 8 << 20
+
+# Состояния задания
+STATE_QUEUED = 'queued'
+STATE_RUNNING = 'running'
+STATE_DONE = 'done'
+STATE_ERROR = 'error'
+
+_FINAL_STATES = (STATE_DONE, STATE_ERROR)
+
+# Символы, недопустимые в имени файла задания (разделители путей и диск Windows)
+_PATH_CHARACTERS = ('/', '\\', ':')
+
+_REASONS = {
+    200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found',
+    405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large',
+}
+
+
+def _run_job(job_id: str, data_dict: Dict[str, Any], output_path: str, events) -> Dict[str, Any]:
+    """
+    Выполняет задание в процессе пула.
+
+    Прогресс отправляется в очередь events только при изменении целого процента,
+    чтобы не перегружать очередь между процессами.
+
+    Args:
+        job_id: Идентификатор задания
+        data_dict: Параметры генерации
+        output_path: Путь к выходному файлу
+        events: Очередь multiprocessing.Manager для событий прогресса
+
+    Returns:
+        Результат generate_G_codes_file
+    """
+    events.put((job_id, STATE_RUNNING, 0))
+    last = [0]
+
+    def display_progress(percent):
+        percent = int(percent)
+        if percent != last[0]:
+            last[0] = percent
+            events.put((job_id, STATE_RUNNING, percent))
+
+    return generate_G_codes_file(data_dict, display_progress, output_path=output_path)
+
+
+def _check_filename(filename: str) -> None:
+    """
+    Проверяет, что имя файла от клиента не выводит за пределы папки задания.
+
+    Raises:
+        ValueError: Имя пустое, абсолютное, содержит разделитель пути или '..'
+    """
+    if (not filename or os.path.isabs(filename) or '..' in filename
+            or any(char in filename for char in _PATH_CHARACTERS)):
+        raise ValueError(f'Недопустимое имя файла: {filename!r}')
+
+
+@dataclass
+class GenerationJob:
+    """
+    Задание на генерацию и его состояние.
+
+    Attributes:
+        id: Идентификатор задания
+        filename: Имя выходного файла
+        path: Полный путь к выходному файлу на стороне сервиса
+        state: Состояние (queued, running, done, error)
+        progress: Прогресс в процентах
+        result: Результат generate_G_codes_file (после завершения)
+        error: Текст ошибки (если генерация не удалась)
+        events: Все события задания в порядке появления
+    """
+    id: str
+    filename: str
+    path: str
+    state: str = STATE_QUEUED
+    progress: int = 0
+    result: Optional[Dict[str, Any]] = None
+    error: str = ''
+    events: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Возвращает состояние задания для ответа клиенту."""
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'state': self.state,
+            'progress': self.progress,
+            'result': self.result,
+            'error': self.error,
+        }
+
+
+class GenerationJobService:
+    """
+    asyncio сервис генерации с пулом процессов ограниченного размера.
+
+    Одновременно выполняется не больше max_workers заданий, остальные ждут
+    в очереди пула. Прогресс из процессов пула приходит через очередь
+    multiprocessing.Manager и пересылается в цикл событий отдельным потоком.
+    """
+
+    def __init__(self, output_dir: str, max_workers: int = WORKERS_DEFAULT,
+                 host: str = HOST_DEFAULT, port: int = PORT_DEFAULT):
+        """
+        Args:
+            output_dir: Папка, в которую сервис сохраняет файлы заданий
+            max_workers: Количество одновременно выполняемых заданий
+            host: Адрес для прослушивания
+            port: Порт (0 — выбрать свободный)
+        """
+        self.output_dir = output_dir
+        self.max_workers = max_workers
+        self.host = host
+        self.port = port
+        self.jobs: Dict[str, GenerationJob] = {}
+
+        self._server = None
+        self._loop = None
+        self._executor = None
+        self._manager = None
+        self._events = None
+        self._pump = None
+        self._changed = None
+        # Задачи оповещения: цикл событий хранит на задачи только слабые ссылки
+        self._notify_tasks = set()
+
+    async def start(self):
+        """
+        Запускает пул процессов и HTTP сервер.
+
+        Returns:
+            Кортеж (адрес, порт), на котором слушает сервис
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Condition()
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        self._manager = multiprocessing.Manager()
+        self._events = self._manager.Queue()
+        self._pump = threading.Thread(target=self._pump_events, daemon=True)
+        self._pump.start()
+
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.host, self.port = self._server.sockets[0].getsockname()[:2]
+        return self.host, self.port
+
+    async def serve_forever(self):
+        """Обслуживает запросы до отмены."""
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """Останавливает сервер, пул процессов и поток событий."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._executor is not None:
+            await self._loop.run_in_executor(None, self._executor.shutdown)
+        if self._events is not None:
+            self._events.put(None)
+            await self._loop.run_in_executor(None, self._pump.join)
+            self._manager.shutdown()
+
+    def submit(self, data_dict: Dict[str, Any]) -> GenerationJob:
+        """
+        Ставит задание в очередь пула процессов.
+
+        Args:
+            data_dict: Параметры генерации
+
+        Returns:
+            Созданное задание
+
+        Raises:
+            ValueError: Если по параметрам нельзя определить имя файла
+                или имя файла выводит за пределы папки задания
+        """
+        try:
+            filename = get_filename(data_dict)
+        except (KeyError, TypeError) as e:
+            raise ValueError(f'Отсутствует параметр: {e}')
+        _check_filename(filename)
+
+        job_id = uuid.uuid4().hex
+        path = os.path.join(self.output_dir, job_id, filename)
+        job = GenerationJob(id=job_id, filename=filename, path=path)
+        self.jobs[job_id] = job
+        self._publish(job)
+
+        future = self._loop.run_in_executor(self._executor, _run_job,
+                                            job_id, data_dict, path, self._events)
+        future.add_done_callback(lambda f: self._finish(job, f))
+        return job
+
+    def _pump_events(self):
+        """Пересылает события прогресса из процессов пула в цикл событий."""
+        while True:
+            item = self._events.get()
+            if item is None:
+                return
+            self._loop.call_soon_threadsafe(self._on_progress, *item)
+
+    def _on_progress(self, job_id: str, state: str, progress: int):
+        """Обновляет прогресс задания (в цикле событий)."""
+        job = self.jobs.get(job_id)
+        if job is None or job.state in _FINAL_STATES:
+            return
+        job.state = state
+        job.progress = progress
+        self._publish(job)
+
+    def _finish(self, job: GenerationJob, future):
+        """Фиксирует результат задания (в цикле событий)."""
+        try:
+            job.result = future.result()
+            job.state = STATE_DONE
+            job.progress = 100
+        except BaseException as e:
+            job.state = STATE_ERROR
+            job.error = str(e) or type(e).__name__
+        self._publish(job)
+
+    def _publish(self, job: GenerationJob):
+        """Добавляет событие задания и будит ожидающие потоки событий."""
+        job.events.append(job.to_dict())
+
+        async def notify():
+            async with self._changed:
+                self._changed.notify_all()
+
+        task = self._loop.create_task(notify())
+        self._notify_tasks.add(task)
+        task.add_done_callback(self._notify_tasks.discard)
+
+    async def _handle_connection(self, reader, writer):
+        """Обрабатывает одно HTTP соединение (один запрос)."""
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            if len(request_line) < 2:
+                await self._respond(writer, 400, {'error': 'Некорректный запрос'})
+                return
+
+            try:
+                length = int(headers.get('content-length', 0))
+            except ValueError:
+                length = -1
+            if length < 0:
+                await self._respond(writer, 400, {'error': 'Некорректный Content-Length'})
+                return
+            if length > MAX_BODY_SIZE:
+                await self._respond(writer, 413, {'error': 'Слишком большой запрос'})
+                return
+            body = await reader.readexactly(length) if length else b''
+            await self._route(request_line[0].upper(), request_line[1], body, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, target: str, body: bytes, writer):
+        """Выбирает обработчик по методу и пути."""
+        parts = [p for p in urlsplit(target).path.split('/') if p]
+        if not parts or parts[0] != 'jobs':
+            await self._respond(writer, 404, {'error': 'Неизвестный путь'})
+            return
+
+        if len(parts) == 1:
+            if method == 'POST':
+                try:
+                    job = self.submit(json.loads(body.decode('utf-8')))
+                except (ValueError, KeyError, TypeError) as e:
+                    await self._respond(writer, 400, {'error': str(e)})
+                    return
+                await self._respond(writer, 202, {'id': job.id, 'state': job.state})
+            elif method == 'GET':
+                await self._respond(writer, 200, [job.to_dict() for job in self.jobs.values()])
+            else:
+                await self._respond(writer, 405, {'error': 'Метод не поддерживается'})
+            return
+
+        job = self.jobs.get(parts[1])
+        if job is None:
+            await self._respond(writer, 404, {'error': 'Задание не найдено'})
+        elif method != 'GET':
+            await self._respond(writer, 405, {'error': 'Метод не поддерживается'})
+        elif len(parts) == 2:
+            await self._respond(writer, 200, job.to_dict())
+        elif parts[2] == 'events':
+            await self._stream_events(job, writer)
+        elif parts[2] == 'file':
+            await self._send_file(job, writer)
+        else:
+            await self._respond(writer, 404, {'error': 'Неизвестный путь'})
+
+    async def _respond(self, writer, status: int, payload: Any):
+        """Отправляет JSON ответ."""
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self._write_head(writer, status, 'application/json; charset=utf-8', len(body))
+        writer.write(body)
+        await writer.drain()
+
+    @staticmethod
+    def _write_head(writer, status: int, content_type: str, length: Optional[int] = None,
+                    extra: str = ''):
+        """Записывает строку статуса и заголовки ответа."""
+        head = f'HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: {content_type}\r\n'
+        if length is not None:
+            head += f'Content-Length: {length}\r\n'
+        head += f'{extra}Connection: close\r\n\r\n'
+        writer.write(head.encode('latin-1'))
+
+    async def _stream_events(self, job: GenerationJob, writer):
+        """Передаёт события задания по одному JSON на строку до завершения."""
+        self._write_head(writer, 200, 'application/x-ndjson; charset=utf-8')
+        sent = 0
+        while True:
+            while sent < len(job.events):
+                event = job.events[sent]
+                writer.write(json.dumps(event, ensure_ascii=False).encode('utf-8') + b'\n')
+                sent += 1
+                if event['state'] in _FINAL_STATES:
+                    await writer.drain()
+                    return
+            await writer.drain()
+            async with self._changed:
+                await self._changed.wait_for(lambda: sent < len(job.events))
+
+    async def _send_file(self, job: GenerationJob, writer):
+        """Отправляет готовый файл задания."""
+        if job.state != STATE_DONE:
+            await self._respond(writer, 409, {'error': f'Задание в состоянии {job.state}'})
+            return
+        size = os.path.getsize(job.path)
+        self._write_head(writer, 200, 'application/octet-stream', size)
+        with open(job.path, 'rb') as f:
+            while True:
+                chunk = f.read(1 << 20)
+                if not chunk:
+                    break
+                writer.write(chunk)
+                await writer.drain()
+
+
+def run_job_service(output_dir: str, host: str = HOST_DEFAULT, port: int = PORT_DEFAULT,
+                    max_workers: int = WORKERS_DEFAULT) -> None:
+    """
+    Запускает сервис и обслуживает запросы до прерывания (Ctrl+C).
+
+    Args:
+        output_dir: Папка для файлов заданий
+        host: Адрес для прослушивания
+        port: Порт
+        max_workers: Количество одновременно выполняемых заданий
+    """
+    async def main():
+        service = GenerationJobService(output_dir, max_workers, host, port)
+        address = await service.start()
+        print(f'Сервис генерации запущен: http://{address[0]}:{address[1]}')
+        try:
+            await service.serve_forever()
+        finally:
+            await service.close()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+
+class JobServiceClient:
+    """Синхронный клиент сервиса генерации."""
+
+    def __init__(self, url: str, timeout: Optional[float] = None):
+        """
+        Args:
+            url: Адрес сервиса, например 'http://127.0.0.1:8765' или '127.0.0.1:8765'
+            timeout: Таймаут сокета в секундах (None — без ограничения)
+        """
+        if '//' not in url:
+            url = 'http://' + url
+        parts = urlsplit(url)
+        self.host = parts.hostname or HOST_DEFAULT
+        self.port = parts.port or PORT_DEFAULT
+        self.timeout = timeout
+
+    def _request(self, method: str, path: str, payload: Any = None):
+        """Выполняет запрос и возвращает (соединение, ответ)."""
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        body = None
+        headers = {}
+        if payload is not None:
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            headers['Content-Type'] = 'application/json; charset=utf-8'
+        connection.request(method, path, body=body, headers=headers)
+        return connection, connection.getresponse()
+
+    def _json(self, method: str, path: str, payload: Any = None) -> Any:
+        """Выполняет запрос с JSON ответом."""
+        connection, response = self._request(method, path, payload)
+        try:
+            data = json.loads(response.read().decode('utf-8'))
+        finally:
+            connection.close()
+        if response.status >= 400:
+            raise RuntimeError(data.get('error', response.reason))
+        return data
+
+    def submit(self, data_dict: Dict[str, Any]) -> str:
+        """
+        Отправляет задание.
+
+        Returns:
+            Идентификатор задания
+        """
+        return self._json('POST', '/jobs', data_dict)['id']
+
+    def status(self, job_id: str) -> Dict[str, Any]:
+        """Возвращает состояние задания."""
+        return self._json('GET', f'/jobs/{job_id}')
+
+    def jobs(self) -> List[Dict[str, Any]]:
+        """Возвращает список заданий сервиса."""
+        return self._json('GET', '/jobs')
+
+    def iter_events(self, job_id: str) -> Iterator[Dict[str, Any]]:
+        """
+        Читает поток событий задания до его завершения.
+
+        Yields:
+            Словари состояния задания (как status)
+        """
+        connection, response = self._request('GET', f'/jobs/{job_id}/events')
+        try:
+            if response.status >= 400:
+                raise RuntimeError(json.loads(response.read().decode('utf-8')).get('error'))
+            for line in response:
+                if line.strip():
+                    yield json.loads(line.decode('utf-8'))
+        finally:
+            connection.close()
+
+    def wait(self, job_id: str,
+             display_percent_progress_func: Optional[Callable[[float], None]] = None) -> Dict[str, Any]:
+        """
+        Ожидает завершения задания, передавая прогресс в функцию.
+
+        Returns:
+            Итоговое состояние задания
+
+        Raises:
+            RuntimeError: Если генерация завершилась ошибкой
+        """
+        final = None
+        for event in self.iter_events(job_id):
+            if display_percent_progress_func is not None:
+                display_percent_progress_func(event['progress'])
+            final = event
+        if final is None or final['state'] != STATE_DONE:
+            raise RuntimeError(final['error'] if final else 'Поток событий прерван')
+        return final
+
+    def download(self, job_id: str, path: str) -> str:
+        """
+        Скачивает готовый файл задания.
+
+        Файл пишется атомарно (см. AtomicOutputWriter): если соединение
+        оборвалось, на месте path остаётся прежний файл (или ничего),
+        а не обрезанная программа.
+
+        Args:
+            job_id: Идентификатор задания
+            path: Куда сохранить файл
+
+        Returns:
+            Путь к сохранённому файлу
+
+        Raises:
+            RuntimeError: Ошибка сервиса или файл получен не полностью
+        """
+        connection, response = self._request('GET', f'/jobs/{job_id}/file')
+        try:
+            if response.status >= 400:
+                raise RuntimeError(json.loads(response.read().decode('utf-8')).get('error'))
+            expected = response.getheader('Content-Length')
+            with AtomicOutputWriter(path) as f:
+                while True:
+                    try:
+                        chunk = response.read(1 << 20)
+                    except (http.client.IncompleteRead, ConnectionError) as e:
+                        raise RuntimeError(f'Соединение прервано при получении файла: {e}') from e
+                    if not chunk:
+                        break
+                    f.write_bytes(chunk)
+                if expected is not None and f.bytes_written != int(expected):
+                    raise RuntimeError(f'Файл получен не полностью: {f.bytes_written} '
+                                       f'из {expected} байт')
+        finally:
+            connection.close()
+        return path
@@ -0,0 +1,307 @@
+"""
+Разобранные параметры задания.
+
+Словарь параметров (ключи на русском, как в json файле) разбирается один
+раз в неизменяемый JobSpec: старые форматы значений (строка/список/словарь
+у перечислений, шаг игл вне описания головы) приводятся к одному виду.
+Производные величины (ширина головы, шаги, высота каркаса, форма паттерна,
+количество ударов) вычисляются при первом обращении и запоминаются.
+
+JobSpec хешируем, поэтому служит ключом кэшей (см. predict_job).
+
+Содержит:
+- JobSpec — параметры задания
+- as_job_spec — JobSpec из словаря параметров (или сам JobSpec)
+"""
+
+from dataclasses import dataclass
+from functools import cached_property
+from math import ceil as round_to_greater
+from typing import Any, Dict, Optional, Tuple, Union
+
+from .geometry import get_nx_ny, get_ordered_list_of_rows
+
+# Значение 'Задание размеров каркаса' при задании каркаса габаритами
+FRAME_BY_DIMENSIONS = 'По габаритам'
+
+
+def _enum_value(value: Any) -> Any:
+    """Значение перечисления: новый формат {'value': ..}, старые — список или строка."""
+    if isinstance(value, dict):
+        return value["value"]
+    if isinstance(value, list):
+        return value[0]
+    return value
+
+
+def _frozen_mapping(value: Dict[str, Any]) -> Tuple[Tuple[str, Any], ...]:
+    """Словарь в виде хешируемого кортежа пар (ключ, значение)."""
+    return tuple(sorted(value.items()))
+
+
+@dataclass(frozen=True)
+class JobSpec:
+    """
+    Неизменяемые параметры задания.
+
+    Поля — значения из словаря параметров (в текущем формате), свойства —
+    производные величины, вычисляемые один раз.
+    """
+    # Голова
+    head_name: str
+    needles_x: int
+    needles_y: int
+    cell_size_x: float
+    cell_size_y: float
+
+    # Паттерн
+    num_pitch: int
+    generate_nx_ny: bool
+    pattern_nx: int
+    pattern_ny: int
+
+    # Каркас
+    steps_x: int
+    steps_y: int
+    frame_length_x: float
+    frame_length_y: float
+    selected_type_frame_size: str
+
+    # Пробивка
+    is_progressive_depth: bool
+    initial_depth: float
+    max_depth: float
+
+    # Слои
+    amount_layers: int
+    amount_virtual_layers: int
+    layer_thickness: float
+    dist_to_material: float
+
+    # Позиция укладки
+    layer_laying_position_x: float
+    layer_laying_position_y: float
+    layer_laying_position_z: float
+    pause: float
+    sound_signal_duration: float
+    sound_signal_mode: str
+    is_growing_z: bool
+
+    # Опции
+    is_random_order: bool
+    is_random_offsets: bool
+    is_rotation_direction: bool
+    is_swap_xy: bool
+    coefficient_random_offsets: float
+    order: str
+    seed: int
+
+    # Скорости
+    speed_xy: float
+    speed_z_insert: float
+    speed_z_extract: float
+    acceleration: float
+    axis_max_speed: Tuple[Tuple[str, float], ...] = ()
+    axis_acceleration: Tuple[Tuple[str, float], ...] = ()
+    axis_limits: Tuple[Tuple[str, float], ...] = ()
+
+    # Имя и место файла (None — параметра нет, генерации команд он не нужен)
+    is_automatic_name: Optional[bool] = None
+    file_name: Optional[str] = None
+    on_the_desktop: Optional[bool] = None
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> 'JobSpec':
+        """
+        Разбирает словарь параметров генерации.
+
+        Args:
+            d: Словарь с параметрами генерации
+
+        Returns:
+            JobSpec
+
+        Raises:
+            KeyError: Отсутствует обязательный параметр
+        """
+        head_name = d['Выбранная игольница (ИП игольница)']
+        head_data = d['Игольницы (ИП головы)'][head_name]
+
+        # Поддержка старого формата: шаг игл вне описания головы
+        if 'needle_spacing_x' in head_data:
+            cell_size_x = head_data['needle_spacing_x']
+            cell_size_y = head_data['needle_spacing_y']
+        else:
+            cell_size_x = d.get('Расстояние между иглами (мм)', {}).get('X', 8.0)
+            cell_size_y = d.get('Расстояние между иглами (мм)', {}).get('Y', 8.0)
+
+        pattern = d['Параметры паттерна']
+        punching = d['Пробивка']
+        laying = d['Позиция при ручной укладки слоя']
+        speed = d['Скорость (мм/мин)']
+
+        return cls(
+            head_name=head_name,
+            needles_x=head_data['X'],
+            needles_y=head_data['Y'],
+            cell_size_x=cell_size_x,
+            cell_size_y=cell_size_y,
+            num_pitch=pattern['Кол-во ударов'],
+            generate_nx_ny=pattern['Автоматическое определение формы паттерна'],
+            pattern_nx=pattern['nx'],
+            pattern_ny=pattern['ny'],
+            steps_x=d['Количество шагов головы']['X'],
+            steps_y=d['Количество шагов головы']['Y'],
+            frame_length_x=d['Габариты каркаса']['X'],
+            frame_length_y=d['Габариты каркаса']['Y'],
+            selected_type_frame_size=_enum_value(d['Задание размеров каркаса']),
+            is_progressive_depth=punching['Пробивка с нарастанием глубины'],
+            initial_depth=punching['Начальная глубина удара (мм)'],
+            max_depth=punching['Глубина удара (мм)'],
+            amount_layers=d['Количество слоёв'],
+            amount_virtual_layers=d['Количество пустых слоёв'],
+            layer_thickness=d['Толщина слоя (мм)'],
+            dist_to_material=d['Расстояние от каркаса до головы перед ударом (мм)'],
+            layer_laying_position_x=laying['X'],
+            layer_laying_position_y=laying['Y'],
+            layer_laying_position_z=laying['Z'],
+            pause=laying['Пауза в конце слоя (сек)'],
+            sound_signal_duration=laying['Звуковой сигнал (сек)'],
+            sound_signal_mode=_enum_value(laying['Режим звукового сигнала']),
+            is_growing_z=laying['Рост Z с каждым слоем'],
+            is_random_order=d['Случайный порядок ударов'],
+            is_random_offsets=d['Случайные смещения'],
+            is_rotation_direction=d['Чередование направлений прохода слоя'],
+            is_swap_xy=d['Смена осей X↔Y'],
+            coefficient_random_offsets=d['Коэффициент случайных смещений'],
+            order=_enum_value(d['Порядок прохождения рядов']),
+            # 0 или отсутствие ключа — новое зерно для каждого задания
+            seed=d.get('Зерно случайности') or 0,
+            speed_xy=speed['Движение осей X и Y'],
+            speed_z_insert=speed['Внедрение игл по Z'],
+            speed_z_extract=speed['Извлечение игл по Z'],
+            acceleration=d['Ускорение осей станка (мм/с²)'],
+            # Ограничения по осям (необязательные, в старых конфигурациях отсутствуют)
+            axis_max_speed=_frozen_mapping(d.get('Максимальная скорость осей (мм/мин)', {})),
+            axis_acceleration=_frozen_mapping(d.get('Ускорение по осям (мм/с²)', {})),
+            # Пределы осей для проверки программы (см. check_envelope)
+            axis_limits=_frozen_mapping(d.get('Пределы осей станка (мм)', {})),
+            is_automatic_name=d.get('Автоматическая генерация имени файла'),
+            file_name=d.get('Имя файла'),
+            on_the_desktop=d.get('Создание файла на рабочем столе'),
+        )
+
+    @property
+    def is_frame_by_dimensions(self) -> bool:
+        """True если каркас задан габаритами (шаги вычисляются по ширине головы)."""
+        return self.selected_type_frame_size == FRAME_BY_DIMENSIONS
+
+    @cached_property
+    def head_width_x(self) -> float:
+        """Ширина головы по X (мм)."""
+        return self.cell_size_x * self.needles_x
+
+    @cached_property
+    def head_width_y(self) -> float:
+        """Ширина головы по Y (мм)."""
+        return self.cell_size_y * self.needles_y
+
+    @cached_property
+    def num_step_x(self) -> int:
+        """Количество шагов головы по X."""
+        if self.is_frame_by_dimensions:
+            return round_to_greater(self.frame_length_x / self.head_width_x)
+        return self.steps_x
+
+    @cached_property
+    def num_row_y(self) -> int:
+        """Количество шагов (рядов) головы по Y."""
+        if self.is_frame_by_dimensions:
+            return round_to_greater(self.frame_length_y / self.head_width_y)
+        return self.steps_y
+
+    @cached_property
+    def passed_rows(self) -> int:
+        """
+        Количество рядов, которые голова проходит в слое.
+
+        Меньше num_row_y, если порядок прохождения пропускает ряды
+        ('В центр' при 1-2 рядах не даёт ни одного ряда).
+        """
+        return len(get_ordered_list_of_rows(self.num_row_y, self.order))
+
+    @cached_property
+    def overhangs_x(self) -> float:
+        """Свес головы за каркас по X с каждой стороны (мм)."""
+        return (self.num_step_x * self.head_width_x - self.frame_length_x) / 2
+
+    @cached_property
+    def overhangs_y(self) -> float:
+        """Свес головы за каркас по Y с каждой стороны (мм)."""
+        return (self.num_row_y * self.head_width_y - self.frame_length_y) / 2
+
+    @cached_property
+    def frame_height(self) -> int:
+        """Высота каркаса (мм)."""
+        return int(self.amount_layers * self.layer_thickness)
+
+    @cached_property
+    def nx_ny(self) -> Tuple[int, int]:
+        """Форма паттерна (nx, ny): заданная или подобранная по количеству ударов."""
+        if self.generate_nx_ny:
+            return get_nx_ny(self.num_pitch)
+        return self.pattern_nx, self.pattern_ny
+
+    @property
+    def nx(self) -> int:
+        """Количество точек паттерна по X."""
+        return self.nx_ny[0]
+
+    @property
+    def ny(self) -> int:
+        """Количество точек паттерна по Y."""
+        return self.nx_ny[1]
+
+    @property
+    def total_layers(self) -> int:
+        """Количество слоёв вместе с пустыми."""
+        return self.amount_layers + self.amount_virtual_layers
+
+    @cached_property
+    def hits_per_layer(self) -> int:
+        """Наибольшее количество ударов в слое (окно паттерна — num_pitch точек)."""
+        return self.num_step_x * self.passed_rows * min(self.num_pitch, self.nx * self.ny)
+
+    @cached_property
+    def total_hits(self) -> int:
+        """
+        Количество ударов всех слоёв.
+
+        Окна паттерна повторяются с периодом ceil(nx·ny / num_pitch) слоёв
+        и за период покрывают паттерн ровно один раз (см. CommandGenerator.hit_window).
+        """
+        pattern_len = self.nx * self.ny
+        period = max(round_to_greater(pattern_len / self.num_pitch), 1)
+        cycles, rest = divmod(self.total_layers, period)
+        return (self.num_step_x * self.passed_rows
+                * (cycles * pattern_len + rest * min(self.num_pitch, pattern_len)))
+
+    @cached_property
+    def density(self) -> float:
+        """Плотность пробивки (уд/кв.см)."""
+        return self.num_pitch / self.cell_size_x / self.cell_size_y * 100
+
+
+def as_job_spec(data: Union[Dict[str, Any], JobSpec]) -> JobSpec:
+    """
+    Возвращает JobSpec для словаря параметров (JobSpec возвращается как есть).
+
+    Args:
+        data: Словарь с параметрами генерации или JobSpec
+
+    Returns:
+        JobSpec
+    """
+    if isinstance(data, JobSpec):
+        return data
+    return JobSpec.from_dict(data)
@@ -0,0 +1,258 @@
+"""
+Планировщик движения с просмотром вперёд (look-ahead) для оценки времени.
+
+Моделирует поведение типичных прошивок контроллеров: соседние почти
+коллинеарные перемещения сопрягаются без остановки, скорость в стыке
+ограничивается отклонением стыка (junction deviation), а в буфере
+контроллера находится не больше N перемещений, поэтому последнее
+перемещение буфера должно заканчиваться остановкой.
+
+Команды слоя переводятся в столбцовые массивы NumPy (длины, направления,
+скорости), а прямой и обратный проходы планировщика вычисляются без
+цикла по перемещениям — через накопленный минимум (np.minimum.accumulate).
+
+Содержит:
+- LayerColumns — столбцовое представление перемещений слоя
+- axis_limited — ограничение скорости и ускорения по проекциям на оси
+- layer_columns — преобразование команд слоя в LayerColumns
+- plan_entry_speeds — квадраты скоростей в стыках после прямого/обратного проходов
+- planned_move_times — время каждого перемещения
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .commands import GCodeCommand, MoveCommand, PauseCommand
+
+
+# Допустимое отклонение траектории в стыке перемещений (мм), как $11 в Grbl
+JUNCTION_DEVIATION_DEFAULT = 0.01
+
+# Количество перемещений в буфере планировщика контроллера
+LOOKAHEAD_DEFAULT = 16
+
+
+@dataclass
+class LayerColumns:
+    """
+    Перемещения слоя в столбцовом виде (только ненулевые перемещения).
+
+    Attributes:
+        delta: Массив (n, 3) смещений по X, Y, Z в мм
+        length: Длины перемещений в мм
+        speed: Максимальная скорость каждого перемещения в мм/с
+            (с учётом ограничений скорости по осям)
+        accel: Ускорение каждого перемещения в мм/с²
+            (с учётом ограничений ускорения по осям)
+        stop_before: True, если перед перемещением станок обязан остановиться
+            (начало слоя или любая команда, кроме G1, между перемещениями)
+        pause_ms: Суммарная длительность пауз G4 в миллисекундах
+        end: Позиция станка после слоя
+    """
+    delta: np.ndarray
+    length: np.ndarray
+    speed: np.ndarray
+    accel: np.ndarray
+    stop_before: np.ndarray
+    pause_ms: float
+    end: Tuple[float, float, float] = (0.0, 0.0, 0.0)
+
+
+def axis_limited(delta: np.ndarray, length: np.ndarray, speed: np.ndarray,
+                 acceleration: float,
+                 axis_max_speed: Optional[Dict[str, float]] = None,
+                 axis_acceleration: Optional[Dict[str, float]] = None):
+    """
+    Ограничивает скорость и ускорение перемещений по проекциям на оси.
+
+    Для перемещения с направлением u скорость по оси i равна v·|u_i|, поэтому
+    допустимая скорость перемещения — min(F, min_i v_max_i / |u_i|),
+    ускорение — min_i a_i / |u_i|. Оси без заданного ускорения используют
+    общее ускорение acceleration, оси без заданной скорости не ограничивают.
+    Если ускорения по осям не заданы вовсе, общее ускорение относится ко
+    всему перемещению, как и раньше.
+
+    Args:
+        delta: Массив (n, 3) смещений по X, Y, Z в мм
+        length: Длины перемещений в мм
+        speed: Скорости из команд в мм/с
+        acceleration: Общее ускорение в мм/с²
+        axis_max_speed: Максимальные скорости по осям {'X': .., 'Y': .., 'Z': ..} в мм/мин
+        axis_acceleration: Ускорения по осям {'X': .., 'Y': .., 'Z': ..} в мм/с²
+
+    Returns:
+        Кортеж (скорости в мм/с, ускорения в мм/с²)
+    """
+    axis_max_speed = axis_max_speed or {}
+    axis_acceleration = axis_acceleration or {}
+
+    abs_delta = np.abs(delta)
+    moving = abs_delta > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(moving, length[:, None] / abs_delta, np.inf)
+
+    if axis_acceleration:
+        axis_accel = np.array([axis_acceleration.get(a, acceleration) for a in 'XYZ'], dtype=float)
+        accel = np.where(moving, axis_accel * ratio, np.inf).min(axis=1)
+    else:
+        accel = np.full(len(length), float(acceleration))
+
+    if axis_max_speed:
+        axis_speed = np.array([axis_max_speed.get(a, np.inf) / 60.0 for a in 'XYZ'], dtype=float)
+        speed = np.minimum(speed, np.where(moving, axis_speed * ratio, np.inf).min(axis=1))
+
+    return speed, accel
+
+
+def layer_columns(commands: List[GCodeCommand], default_speed: float,
+                  acceleration: float,
+                  axis_max_speed: Optional[Dict[str, float]] = None,
+                  axis_acceleration: Optional[Dict[str, float]] = None,
+                  start: Tuple[float, float, float] = (0.0, 0.0, 0.0)) -> LayerColumns:
+    """
+    Переводит команды слоя в столбцовое представление.
+
+    Args:
+        commands: Команды слоя
+        default_speed: Скорость в мм/с для команд без F
+        acceleration: Общее ускорение в мм/с²
+        axis_max_speed: Максимальные скорости по осям в мм/мин (см. axis_limited)
+        axis_acceleration: Ускорения по осям в мм/с² (см. axis_limited)
+        start: Позиция станка перед слоем (по умолчанию начало координат)
+
+    Returns:
+        LayerColumns с перемещениями слоя
+    """
+    targets = []
+    speeds = []
+    stops = []
+    pause_ms = 0.0
+
+    x, y, z = start
+    stop = True
+    for cmd in commands:
+        if isinstance(cmd, MoveCommand):
+            new_x = cmd.x if cmd.x is not None else x
+            new_y = cmd.y if cmd.y is not None else y
+            new_z = cmd.z if cmd.z is not None else z
+            if new_x != x or new_y != y or new_z != z:
+                targets.append((new_x, new_y, new_z))
+                speeds.append(cmd.f / 60.0 if cmd.f is not None else default_speed)
+                stops.append(stop)
+                stop = False
+            x, y, z = new_x, new_y, new_z
+        else:
+            if isinstance(cmd, PauseCommand):
+                pause_ms += cmd.milliseconds
+            stop = True
+
+    points = np.array([tuple(start)] + targets, dtype=float)
+    delta = np.diff(points, axis=0)
+    length = np.sqrt((delta * delta).sum(axis=1))
+    speed, accel = axis_limited(delta, length, np.array(speeds, dtype=float),
+                                acceleration, axis_max_speed, axis_acceleration)
+    return LayerColumns(
+        delta=delta,
+        length=length,
+        speed=speed,
+        accel=accel,
+        stop_before=np.array(stops, dtype=bool),
+        pause_ms=pause_ms,
+        end=(x, y, z),
+    )
+
+
+def plan_entry_speeds(cols: LayerColumns, junction_deviation: float,
+                      lookahead: int) -> np.ndarray:
+    """
+    Вычисляет квадраты скоростей в стыках перемещений.
+
+    Элемент i — квадрат скорости в начале перемещения i, последний элемент
+    (n) — скорость в конце слоя (всегда 0).
+
+    Обратный проход: v²[i] <= v²[i+1] + 2·a·L[i] — успеваем затормозить.
+    Прямой проход: v²[i+1] <= v²[i] + 2·a·L[i] — успеваем разогнаться.
+    Оба ограничения — min-plus свёртки по накопленной сумме 2·a·L, поэтому
+    вычисляются накопленным минимумом по массиву целиком (ускорение a своё
+    у каждого перемещения, см. LayerColumns.accel).
+
+    Args:
+        cols: Перемещения слоя
+        junction_deviation: Отклонение в стыке в мм
+        lookahead: Размер буфера планировщика (количество перемещений)
+
+    Returns:
+        Массив длины n + 1 с квадратами скоростей в стыках (мм²/с²)
+    """
+    n = len(cols.length)
+    if n == 0:
+        return np.zeros(1)
+
+    unit = cols.delta / cols.length[:, None]
+
+    # Ограничение скорости в стыке по отклонению траектории (как в Grbl)
+    limit = np.zeros(n + 1)
+    if n > 1:
+        cos_theta = -(unit[:-1] * unit[1:]).sum(axis=1)
+        cos_theta = np.clip(cos_theta, -1.0, 1.0)
+        sin_half = np.sqrt(0.5 * (1.0 - cos_theta))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            junction_accel = np.minimum(cols.accel[:-1], cols.accel[1:])
+            v2 = junction_accel * junction_deviation * sin_half / (1.0 - sin_half)
+        v2 = np.where(cos_theta > 0.999999, 0.0, v2)          # разворот — остановка
+        v2 = np.where(cos_theta < -0.999999, np.inf, v2)      # прямая — без ограничения
+        speed2 = cols.speed * cols.speed
+        limit[1:n] = np.minimum(v2, np.minimum(speed2[:-1], speed2[1:]))
+    limit[:n] = np.where(cols.stop_before, 0.0, limit[:n])
+
+    # Накопленный "запас" квадрата скорости: C[k] = сумма 2·a·L[0..k-1]
+    budget = np.concatenate(([0.0], np.cumsum(2.0 * cols.accel * cols.length)))
+
+    # Буфер контроллера: из стыка i нужно успеть остановиться за lookahead перемещений
+    if lookahead > 0:
+        ahead = np.minimum(np.arange(n + 1) + lookahead, n)
+        limit = np.minimum(limit, budget[ahead] - budget)
+
+    # Обратный проход: v²[i] = min_{k>=i} (limit[k] + C[k]) - C[i]
+    backward = np.minimum.accumulate((limit + budget)[::-1])[::-1] - budget
+    # Прямой проход: v²[i] = min_{k<=i} (v²[k] - C[k]) + C[i]
+    forward = np.minimum.accumulate(backward - budget) + budget
+
+    return np.maximum(forward, 0.0)
+
+
+def planned_move_times(cols: LayerColumns, entry_speed2: np.ndarray) -> np.ndarray:
+    """
+    Вычисляет время каждого перемещения по трапецеидальному профилю
+    с заданными скоростями входа и выхода.
+
+    Args:
+        cols: Перемещения слоя
+        entry_speed2: Квадраты скоростей в стыках (результат plan_entry_speeds)
+
+    Returns:
+        Массив времени перемещений в секундах
+    """
+    if len(cols.length) == 0:
+        return np.zeros(0)
+
+    a = cols.accel
+    length = cols.length
+    v_max = cols.speed
+    v_in = np.sqrt(np.minimum(entry_speed2[:-1], v_max * v_max))
+    v_out = np.sqrt(np.minimum(entry_speed2[1:], v_max * v_max))
+
+    d_acc = (v_max * v_max - v_in * v_in) / (2.0 * a)
+    d_dec = (v_max * v_max - v_out * v_out) / (2.0 * a)
+    cruise = length - d_acc - d_dec
+
+    # Трапецеидальный профиль: разгон + движение на макс. скорости + торможение
+    t_trapezoid = (v_max - v_in) / a + (v_max - v_out) / a + np.maximum(cruise, 0.0) / v_max
+
+    # Треугольный профиль: не успеваем разогнаться до макс. скорости
+    v_peak = np.sqrt(np.maximum((2.0 * a * length + v_in * v_in + v_out * v_out) / 2.0, 0.0))
+    t_triangle = (v_peak - v_in) / a + (v_peak - v_out) / a
+
+    return np.where(cruise >= 0.0, t_trapezoid, t_triangle)
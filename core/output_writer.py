@@ -0,0 +1,280 @@
+"""
+Атомарная запись выходного файла.
+
+Файл пишется во временный файл в той же папке и переименовывается
+в итоговое имя (os.replace) только после успешного завершения записи.
+Если генерация прервалась, на месте .tap файла остаётся предыдущая версия
+(или ничего), а не обрезанная программа, которую контроллер примет за целую.
+
+При background=True запись на диск идёт в отдельном потоке: текст
+собирается в блоки по buffer_size байт, блоки передаются потоку записи
+через очередь ограниченной длины. Генерация продолжается, пока поток
+ждёт диск (сетевые папки), а если диск не успевает — генерация ждёт
+места в очереди. Ошибка записи прерывает генерацию при следующей
+записи, ошибка генерации — поток записи; временный файл удаляется.
+
+Содержит:
+- AtomicOutputWriter — файловый объект для GCodeFormatter
+"""
+
+import os
+import queue
+import secrets
+import threading
+from typing import List, Optional
+
+# Размер буфера записи по умолчанию (байт)
+BUFFER_SIZE_DEFAULT = 1 << 20
+
+# Сколько блоков может ждать записи в фоновом потоке
+QUEUE_CHUNKS_DEFAULT = 4
+
+# Политики сохранности данных на диске
+DURABILITY_NONE = 'none'          # без fsync — данные в кэше ОС
+DURABILITY_FILE = 'file'          # fsync файла перед переименованием
+DURABILITY_FULL = 'file+dir'      # fsync файла и папки после переименования
+
+DURABILITY_DEFAULT = DURABILITY_FILE
+
+_DURABILITY_POLICIES = (DURABILITY_NONE, DURABILITY_FILE, DURABILITY_FULL)
+
+# Права временного (а после переименования — итогового) файла: как у open(),
+# 0666 без битов umask; umask применяет ОС при создании файла
+_FILE_MODE = 0o666
+
+
+class AtomicOutputWriter:
+    """
+    Пишет текст во временный файл и атомарно заменяет им итоговый файл.
+
+    Используется как контекстный менеджер; внутри доступен метод write(str),
+    поэтому объект можно передать в GCodeFormatter вместо открытого файла
+    (готовые байты пишет write_bytes).
+    Текст кодируется в UTF-8 (тело программы — ASCII, кириллица только
+    в комментариях заголовка) и пишется в двоичном режиме через буфер
+    размера buffer_size.
+
+    Пример:
+        with AtomicOutputWriter(path) as f:
+            formatter = GCodeFormatter(f, total_layers)
+            ...
+    """
+
+    def __init__(self, path: str, buffer_size: int = BUFFER_SIZE_DEFAULT,
+                 durability: str = DURABILITY_DEFAULT, newline: Optional[str] = None,
+                 background: bool = False, queue_chunks: int = QUEUE_CHUNKS_DEFAULT):
+        """
+        Args:
+            path: Итоговый путь файла
+            buffer_size: Размер буфера записи в байтах (и блока при background)
+            durability: Политика fsync: 'none', 'file' или 'file+dir'
+            newline: Перевод строки в файле (по умолчанию os.linesep,
+                как при записи в текстовом режиме)
+            background: Писать на диск в отдельном потоке
+            queue_chunks: Сколько блоков может ждать записи (при background)
+
+        Raises:
+            ValueError: Неизвестная политика durability
+        """
+        if durability not in _DURABILITY_POLICIES:
+            raise ValueError(f'Неизвестная политика записи: {durability}. '
+                             f'Допустимые: {", ".join(_DURABILITY_POLICIES)}')
+        self.path = path
+        self.buffer_size = buffer_size
+        self.durability = durability
+        self.newline = os.linesep if newline is None else newline
+        self.background = background
+        self.queue_chunks = queue_chunks
+        self.bytes_written = 0
+        self._file = None
+        self._temp_path = None
+
+        # Фоновая запись: собираемый блок, очередь блоков и ошибка потока записи
+        self._chunk: List[bytes] = []
+        self._chunk_size = 0
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._abort = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    def __enter__(self) -> 'AtomicOutputWriter':
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, self._temp_path = _create_temp_file(directory, os.path.basename(self.path))
+        self._file = os.fdopen(fd, 'wb', buffering=self.buffer_size)
+        if self.background:
+            self._queue = queue.Queue(maxsize=self.queue_chunks)
+            self._thread = threading.Thread(target=self._drain, daemon=True,
+                                            name=f'writer {os.path.basename(self.path)}')
+            self._thread.start()
+        return self
+
+    def write(self, text: str) -> int:
+        """
+        Записывает текст.
+
+        Args:
+            text: Строка ('\\n' — перевод строки)
+
+        Returns:
+            Количество записанных символов
+        """
+        if self.newline != '\n':
+            text = text.replace('\n', self.newline)
+        self.write_bytes(text.encode('utf-8'))
+        return len(text)
+
+    def write_bytes(self, data: bytes) -> int:
+        """
+        Записывает готовые байты (без перекодирования и замены переводов строк).
+
+        Args:
+            data: Байты файла (например, файл, полученный от сервиса генерации)
+
+        Returns:
+            Количество записанных байт
+        """
+        if self.background:
+            self._chunk.append(data)
+            self._chunk_size += len(data)
+            if self._chunk_size >= self.buffer_size:
+                self._put_chunk()
+        else:
+            self._file.write(data)
+        self.bytes_written += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        """Возвращает текущую позицию в файле в байтах."""
+        return self.bytes_written
+
+    def patch(self, offset: int, text: str) -> None:
+        """
+        Перезаписывает уже записанный фрагмент файла (например, заголовок).
+
+        Новый текст должен занимать столько же байт, сколько заменяемый:
+        место под него резервируется заранее.
+
+        Args:
+            offset: Позиция начала фрагмента в байтах (см. tell)
+            text: Новый текст (без переводов строк)
+
+        Raises:
+            ValueError: Фрагмент выходит за пределы записанного
+        """
+        data = text.encode('utf-8')
+        if offset < 0 or offset + len(data) > self.bytes_written:
+            raise ValueError('Исправляемый фрагмент выходит за пределы записанного файла')
+        if self.background:
+            # Дожидаемся записи всех блоков: после этого поток записи не трогает файл
+            self._put_chunk()
+            self._queue.join()
+            self._raise_writer_error()
+        self._file.flush()
+        self._file.seek(offset)
+        self._file.write(data)
+        self._file.flush()
+        self._file.seek(0, os.SEEK_END)
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is not None:
+            self._discard()
+            return False
+
+        try:
+            if self.background:
+                self._put_chunk()
+                self._stop_writer()
+                self._raise_writer_error()
+            self._file.flush()
+            if self.durability != DURABILITY_NONE:
+                os.fsync(self._file.fileno())
+            self._file.close()
+            os.replace(self._temp_path, self.path)
+        except BaseException:
+            self._discard()
+            raise
+
+        if self.durability == DURABILITY_FULL:
+            _fsync_directory(os.path.dirname(os.path.abspath(self.path)))
+        return False
+
+    # --- фоновая запись ---
+
+    def _put_chunk(self) -> None:
+        """Передаёт собранный блок потоку записи (ждёт места в очереди)."""
+        self._raise_writer_error()
+        if not self._chunk:
+            return
+        chunk = b''.join(self._chunk)
+        self._chunk.clear()
+        self._chunk_size = 0
+        self._queue.put(chunk)
+
+    def _drain(self) -> None:
+        """Поток записи: пишет блоки из очереди до None."""
+        while True:
+            chunk = self._queue.get()
+            try:
+                if chunk is None:
+                    return
+                if self._error is None and not self._abort.is_set():
+                    self._file.write(chunk)
+            except BaseException as e:
+                # Очередь продолжает разбираться, чтобы генерация не зависла на put
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _stop_writer(self) -> None:
+        """Завершает поток записи после записи очереди."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _raise_writer_error(self) -> None:
+        """Передаёт генерации ошибку потока записи."""
+        if self._error is not None:
+            raise self._error
+
+    def _discard(self) -> None:
+        """Закрывает и удаляет временный файл."""
+        if self.background:
+            # Оставшиеся блоки не пишутся, поток завершается
+            self._abort.set()
+            self._stop_writer()
+        try:
+            self._file.close()
+        finally:
+            if os.path.exists(self._temp_path):
+                os.remove(self._temp_path)
+
+
+def _fsync_directory(directory: str) -> None:
+    """Сбрасывает на диск запись папки (переименование). В Windows не требуется."""
+    if os.name != 'posix':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _create_temp_file(directory: str, name: str):
+    """
+    Создаёт временный файл '.<name>.<случайный суффикс>.tmp' в папке directory.
+
+    В отличие от tempfile.mkstemp (права 0600) файл создаётся с правами
+    _FILE_MODE с учётом umask процесса, как обычный open().
+
+    Returns:
+        Пара (файловый дескриптор, путь)
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+    while True:
+        path = os.path.join(directory, f'.{name}.{secrets.token_hex(4)}.tmp')
+        try:
+            return os.open(path, flags, _FILE_MODE), path
+        except FileExistsError:
+            continue
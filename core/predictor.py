@@ -0,0 +1,377 @@
+"""
+Прогноз размера и времени работы программы без её генерации.
+
+Кроме размера и времени прогноз содержит плотность пробивки, количество
+шагов головы и свесы — всё, что GUI показывает оператору до генерации.
+
+Количество команд и размер файла считаются по раскладке GCodeFormatter
+без перебора слоёв и ударов. Слои с одинаковым окном паттерна содержат одни
+и те же XY перемещения (порядок прохода на размер не влияет), поэтому длина
+XY команд вычисляется один раз на окно — за O((шаги X + ряды Y) · nx · ny),
+— и суммируется по периоду окон. Остальное зависит от слоя только через
+знак и длину Z команд, количество цифр номера слоя и тип слоя: слои
+разбиваются на участки, где они постоянны, и каждый участок считается целиком.
+Время — то же, что будет записано в заголовок файла: время первого слоя,
+умноженное на количество слоёв. Оно складывается из переходов между
+ударами, сгруппированных по смещению, и Z хода каждого удара.
+
+Прогнозы запоминаются по JobSpec: GUI пересчитывает прогноз при каждом
+изменении полей, и возврат к уже виденным параметрам не требует расчёта.
+
+Содержит:
+- JobPrediction — прогноз задания
+- predict_job — расчёт прогноза по параметрам генерации
+"""
+
+import io
+import math
+import os
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .command_generator import CommandGenerator, r
+from .commands import MoveCommand
+from .formatter import GCodeFormatter
+from .generator import make_time_estimator
+from .geometry import get_ordered_list_of_rows
+from .job_spec import JobSpec, as_job_spec
+from .time_estimator import TimeEstimate, TimeEstimator
+
+# Количество запоминаемых прогнозов
+PREDICTION_CACHE_SIZE = 64
+
+
+@dataclass
+class JobPrediction:
+    """
+    Прогноз задания.
+
+    Attributes:
+        commands: Количество команд G-кода
+        hits: Количество ударов
+        bytes: Размер файла в байтах
+        seconds: Время работы на станке в секундах
+        work_time_str: Время всех слоёв (как в заголовке файла)
+        layer_time_str: Время одного слоя (как в заголовке файла)
+        exact: True если количество байт точное; False при случайных
+            смещениях или случайном порядке без заданного зерна — тогда
+            длина координат и время оцениваются без учёта случайности
+        density: Плотность пробивки (уд/кв.см)
+        num_step_x: Количество шагов головы по X
+        num_row_y: Количество шагов головы по Y
+        overhangs_x: Свес по X (мм)
+        overhangs_y: Свес по Y (мм)
+        is_frame_by_dimensions: True если каркас задан габаритами
+    """
+    commands: int
+    hits: int
+    bytes: int
+    seconds: float
+    work_time_str: str
+    layer_time_str: str
+    exact: bool
+    density: float = 0.0
+    num_step_x: int = 0
+    num_row_y: int = 0
+    overhangs_x: float = 0.0
+    overhangs_y: float = 0.0
+    is_frame_by_dimensions: bool = False
+
+    @property
+    def megabytes(self) -> float:
+        """Размер файла в мегабайтах."""
+        return self.bytes / (1 << 20)
+
+    def describe(self) -> str:
+        """Возвращает краткое описание прогноза."""
+        approx = '' if self.exact else '~'
+        text = (f'Команд: {self.commands:,}'.replace(',', ' ')
+                + f'\nРазмер файла: {approx}{self.megabytes:.1f} МБ'
+                + f'\nВремя работы: {self.work_time_str}'
+                + f'\nПлотность пробивки: {self.density:.2f} уд/кв.см')
+        if self.is_frame_by_dimensions:
+            # Как в get_message
+            text += (f'\nСвесы по Х: {self.overhangs_x}'
+                     f'\nСвесы по Y: {self.overhangs_y}'
+                     f'\nКоличество шагов по Х: {self.num_step_x}'
+                     f'\nКоличество шагов по Y: {self.num_row_y}')
+        return text
+
+
+def _padded(command, width: int = GCodeFormatter.COMMAND_WIDTH) -> int:
+    """Длина команды в файле с выравниванием до ширины поля."""
+    return max(width, len(command.to_string()))
+
+
+def _window_tables(generator: CommandGenerator, window: List,
+                   rows: List[int]) -> Tuple[List[List[float]], List[List[float]]]:
+    """
+    Таблицы координат ударов окна (как в CommandGenerator._hit_moves).
+
+    Returns:
+        Кортеж (X по шагам головы и точкам окна, Y по рядам и точкам окна)
+    """
+    x_table = [[r(generator.head_width_x * step + offs_x) for offs_x, _ in window]
+               for step in range(generator.num_step_x)]
+    y_table = [[r(generator.head_width_y * row + offs_y) for _, offs_y in window]
+               for row in rows]
+    return x_table, y_table
+
+
+def _window_xy_bytes(x_table: List[List[float]], y_table: List[List[float]],
+                     speed_length: int) -> int:
+    """
+    Суммарная длина XY команд ударов слоя с данным окном паттерна.
+
+    Строка удара 'G1 X.. Y.. F..' имеет длину 8 + len(X) + len(Y) + len(F).
+    Для каждой точки окна длины X (по шагам) и Y (по рядам) группируются,
+    поэтому выравнивание до ширины поля учитывается без перебора ударов.
+    """
+    width = GCodeFormatter.COMMAND_WIDTH
+    base = 8 + speed_length
+    total = 0
+    for k in range(len(x_table[0]) if x_table else 0):
+        x_lengths = Counter(len(f'{x_row[k]}') for x_row in x_table)
+        y_lengths = Counter(len(f'{y_row[k]}') for y_row in y_table)
+        for x_length, x_count in x_lengths.items():
+            for y_length, y_count in y_lengths.items():
+                total += x_count * y_count * max(width, base + x_length + y_length)
+    return total
+
+
+class _LayerTime:
+    """Сумма времени и пути перемещений слоя, добавляемых группами."""
+
+    def __init__(self, time_estimator: TimeEstimator, swap: bool):
+        self._time_estimator = time_estimator
+        self._swap = swap
+        self.seconds = 0.0
+        self.distance = 0.0
+
+    def add(self, dx: float, dy: float, dz: float, feed: Optional[float], count: int = 1):
+        """Добавляет count одинаковых перемещений (dx, dy — в осях паттерна)."""
+        if count <= 0:
+            return
+        if self._swap:
+            dx, dy = dy, dx
+        self.seconds += count * self._time_estimator.move_seconds(dx, dy, dz, feed)
+        self.distance += count * math.sqrt(dx*dx + dy*dy + dz*dz)
+
+    def add_pairs(self, dx_values: Counter, dy_values: Counter, feed: Optional[float]):
+        """Добавляет перемещения для всех сочетаний сгруппированных смещений."""
+        for dx, x_count in dx_values.items():
+            for dy, y_count in dy_values.items():
+                self.add(dx, dy, 0, feed, x_count * y_count)
+
+
+def _first_layer_estimate(generator: CommandGenerator, time_estimator: TimeEstimator,
+                          offset_list: List, rows: List[int]) -> TimeEstimate:
+    """
+    Время первого слоя без генерации его команд.
+
+    Удары слоя проходятся по рядам, шагам головы и точкам окна, поэтому
+    переходы между ударами повторяются: смещения между точками окна зависят
+    только от шага (по X) и ряда (по Y) и группируются по значению. Время
+    перемещения считается тем же TimeEstimator.move_seconds, что и при оценке
+    сгенерированного слоя (без планировщика). Случайные смещения ударов
+    не учитываются.
+    """
+    z_offset, needle_depth, z_layer_position = generator.layer_heights(0)
+    z_laying = r(z_layer_position)
+    z_insert = r(z_offset - needle_depth)
+    z_extract = r(generator.dist_to_material + z_offset)
+    laying_x = r(generator.layer_laying_position_x)
+    laying_y = r(generator.layer_laying_position_y)
+    speed_xy = generator.speed_xy
+
+    layer_time = _LayerTime(time_estimator, generator.is_swap_xy)
+    # Выезд на позицию укладки из начала координат
+    layer_time.add(0, 0, z_laying, generator.speed_z_extract)
+    layer_time.add(laying_x, laying_y, 0, speed_xy)
+
+    start_hit, finish_hit = generator.hit_window(0, len(offset_list))
+    window = offset_list[start_hit:finish_hit]
+    x_table, y_table = _window_tables(generator, window, rows)
+    if generator.is_rotation_direction:
+        x_table = [x_row[::-1] for x_row in reversed(x_table)]
+        y_table = [y_row[::-1] for y_row in y_table]
+    hits = len(x_table) * len(y_table) * len(window)
+
+    if hits:
+        first_x, first_y = x_table[0][0], y_table[0][0]
+        last_x, last_y = x_table[-1][-1], y_table[-1][-1]
+
+        # Подход к первому удару, удары, возврат на позицию укладки
+        layer_time.add(first_x - laying_x, first_y - laying_y, 0, speed_xy)
+        layer_time.add(0, 0, z_insert - z_laying, generator.speed_z_insert)
+        layer_time.add(0, 0, z_extract - z_insert, generator.speed_z_extract, hits)
+        layer_time.add(0, 0, z_insert - z_extract, generator.speed_z_insert, hits - 1)
+        layer_time.add(0, 0, z_laying - z_extract, generator.speed_z_extract)
+        layer_time.add(laying_x - last_x, laying_y - last_y, 0, speed_xy)
+
+        # Переходы между точками окна
+        for k in range(1, len(window)):
+            layer_time.add_pairs(Counter(x_row[k] - x_row[k - 1] for x_row in x_table),
+                                 Counter(y_row[k] - y_row[k - 1] for y_row in y_table),
+                                 speed_xy)
+        # Переходы между шагами головы в ряду
+        layer_time.add_pairs(Counter(x_table[i][0] - x_table[i - 1][-1]
+                                     for i in range(1, len(x_table))),
+                             Counter(y_row[0] - y_row[-1] for y_row in y_table),
+                             speed_xy)
+        # Переходы между рядами
+        for i in range(1, len(y_table)):
+            layer_time.add(first_x - last_x, y_table[i][0] - y_table[i - 1][-1], 0, speed_xy)
+
+    # Конец слоя — звуковой сигнал и паузы, без перемещений
+    tail = time_estimator.estimate_layer(generator.layer_tail())
+    total_seconds = layer_time.seconds + tail.total_seconds
+    return TimeEstimate(
+        total_seconds=total_seconds,
+        layer_seconds=total_seconds,
+        movement_seconds=layer_time.seconds + tail.movement_seconds,
+        pause_seconds=tail.pause_seconds,
+        total_distance_mm=layer_time.distance + tail.total_distance_mm,
+    )
+
+
+def predict_job(data_dict: Union[Dict[str, Any], JobSpec],
+                newline: Optional[str] = None) -> JobPrediction:
+    """
+    Прогнозирует количество команд, размер файла и время работы.
+
+    Args:
+        data_dict: Словарь с параметрами генерации или JobSpec
+        newline: Перевод строки в файле (по умолчанию os.linesep, как при записи)
+
+    Returns:
+        JobPrediction (общий для равных параметров, не изменяйте его)
+    """
+    newline = os.linesep if newline is None else newline
+    return _predict_spec(as_job_spec(data_dict), newline)
+
+
+@lru_cache(maxsize=PREDICTION_CACHE_SIZE)
+def _predict_spec(spec: JobSpec, newline: str) -> JobPrediction:
+    """Прогноз по разобранным параметрам (см. predict_job)."""
+    extra_newline = len(newline) - 1
+
+    generator = CommandGenerator(spec)
+    offset_list = generator.pattern_offsets()
+    rows = get_ordered_list_of_rows(generator.num_row_y, generator.order)
+    total_layers = generator.amount_layers + generator.amount_virtual_layers
+
+    # Время — как в заголовке файла: первый слой × количество слоёв
+    time_estimator = make_time_estimator(generator)
+    if total_layers > 0:
+        layer_estimate = _first_layer_estimate(generator, time_estimator, offset_list, rows)
+    else:
+        layer_estimate = time_estimator.estimate_layer([])
+    work_estimate = layer_estimate.repeated(total_layers)
+
+    # Заголовок файла
+    prehead = io.StringIO()
+    GCodeFormatter(prehead, generator.amount_layers).write_prehead(generator.get_prehead_params(
+        work_time=work_estimate.to_dhms(),
+        layer_time=layer_estimate.to_dhms()
+    ))
+    prehead_text = prehead.getvalue()
+    total_bytes = len(prehead_text.encode('utf-8')) + extra_newline * prehead_text.count('\n')
+
+    # Удары и XY команды — по одному разу на окно паттерна; окна повторяются
+    # с периодом period слоёв, суммы по слоям берутся из префиксных сумм
+    speed_length = len(f'{round(generator.speed_xy, 1)}')
+    period = max(math.ceil(len(offset_list) / generator.num_pitch), 1)
+    hit_sums = [0]
+    xy_sums = [0]
+    for layer_idx in range(min(period, total_layers)):
+        start_hit, finish_hit = generator.hit_window(layer_idx, len(offset_list))
+        window = offset_list[start_hit:finish_hit]
+        x_table, y_table = _window_tables(generator, window, rows)
+        hit_sums.append(hit_sums[-1] + len(rows) * generator.num_step_x * len(window))
+        xy_sums.append(xy_sums[-1] + _window_xy_bytes(x_table, y_table, speed_length))
+
+    def periodic_sum(sums: List[int], first: int, last: int) -> int:
+        """Сумма по слоям first..last-1 для величины с периодом period."""
+        def prefix(count: int) -> int:
+            full, rest = divmod(count, period)
+            return full * sums[-1] + sums[rest]
+        return prefix(last) - prefix(first)
+
+    # Команды, одинаковые во всех слоях
+    # (смена осей X↔Y на длину команд не влияет)
+    laying_xy = _padded(MoveCommand(x=r(generator.layer_laying_position_x),
+                                    y=r(generator.layer_laying_position_y),
+                                    f=generator.speed_xy))
+    tail = generator.layer_tail()
+    tail_bytes = sum(_padded(cmd) for cmd in tail)
+
+    # Остальное зависит от слоя только через длины Z команд, номер слоя
+    # и его тип, поэтому слои группируются в участки, где они постоянны
+    def z_commands(layer_idx: int) -> Tuple[Tuple[bool, int], ...]:
+        """Знак и длина Z команд слоя (укладка, внедрение, извлечение)."""
+        z_offset, needle_depth, z_layer_position = generator.layer_heights(layer_idx)
+        texts = (MoveCommand(z=r(z_layer_position), f=generator.speed_z_extract).to_string(),
+                 MoveCommand(z=r(z_offset - needle_depth), f=generator.speed_z_insert).to_string(),
+                 MoveCommand(z=r(generator.dist_to_material + z_offset),
+                             f=generator.speed_z_extract).to_string())
+        return tuple((' Z-' in text, len(text)) for text in texts)
+
+    total_commands = 0
+    total_hits = 0
+    first = 0
+    while first < total_layers:
+        z_key = z_commands(first)
+        last = min(total_layers, 10 ** len(str(first + 1)) - 1)
+        if first < generator.amount_layers:
+            last = min(last, generator.amount_layers)
+        # Высоты слоёв монотонны, поэтому знак и длина каждой Z команды
+        # постоянны на отрезках слоёв — конец участка ищется делением пополам
+        low, high = first + 1, last
+        while low < high:
+            middle = (low + high) // 2
+            if z_commands(middle) == z_key:
+                low = middle + 1
+            else:
+                high = middle
+        last = low
+        count = last - first
+        z_laying, z_insert, z_extract = (max(GCodeFormatter.COMMAND_WIDTH, length)
+                                         for _, length in z_key)
+
+        layer_number = first + 1
+        layer_type = 'layer (holostoy)' if first >= generator.amount_layers else 'layer'
+        header = f";\n; {'<' * 10} [{layer_number}] {layer_type} {'>' * 10}\n;\n"
+        comment = len(f';{layer_number}/{generator.amount_layers}\n') + extra_newline
+
+        hits = periodic_sum(hit_sums, first, last)
+        commands = count * (4 + len(tail)) + 3 * hits
+        total_bytes += (count * (len(header) + 3 * extra_newline
+                                 + 2 * (z_laying + laying_xy) + tail_bytes)
+                        + periodic_sum(xy_sums, first, last)
+                        + hits * (z_insert + z_extract)
+                        + commands * comment)
+        total_commands += commands
+        total_hits += hits
+        first = last
+
+    seed_given = bool(spec.seed)
+    exact = not generator.is_random_offsets and (not generator.is_random_order or seed_given)
+
+    return JobPrediction(
+        commands=total_commands,
+        hits=total_hits,
+        bytes=total_bytes,
+        seconds=work_estimate.total_seconds,
+        work_time_str=work_estimate.to_dhms(),
+        layer_time_str=layer_estimate.to_dhms(),
+        exact=exact,
+        density=spec.density,
+        num_step_x=spec.num_step_x,
+        num_row_y=spec.num_row_y,
+        overhangs_x=spec.overhangs_x,
+        overhangs_y=spec.overhangs_y,
+        is_frame_by_dimensions=spec.is_frame_by_dimensions,
+    )
@@ -0,0 +1,278 @@
+"""
+Проверка выхода координат программы за пределы осей станка.
+
+Перед записью вычисляются точные минимум и максимум каждой оси по всей
+программе без генерации слоёв: XY ударов — по крайним шагам головы,
+рядам и точкам используемых окон паттерна, Z — по высотам слоёв
+(векторно по всем слоям). Координаты в файле округляются до 0.1,
+округление монотонно, поэтому крайние значения в файле — округлённые
+крайние значения. При случайных смещениях к XY добавляется их предел
+±коэффициент (оценка сверху, не точное значение).
+
+Пределы задаются в параметрах станка 'Пределы осей станка (мм)'
+ключами 'X мин', 'X макс', 'Y мин', ... Ось без пределов не проверяется.
+
+Содержит:
+- AxisExtent — крайние значения оси и команды, где они достигаются
+- EnvelopeViolation — выход оси за предел
+- EnvelopeReport — результат проверки
+- EnvelopeError — ошибка выхода за пределы (запись не выполняется)
+- program_extents — крайние значения осей программы
+- check_envelope — проверка программы по пределам осей
+"""
+
+from dataclasses import dataclass, field
+from math import ceil as round_to_greater
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .command_generator import CommandGenerator, r
+
+AXES = ('X', 'Y', 'Z')
+
+
+@dataclass
+class AxisExtent:
+    """
+    Крайние значения одной оси.
+
+    Attributes:
+        axis: Ось ('X', 'Y' или 'Z')
+        min: Наименьшая координата в программе
+        max: Наибольшая координата в программе
+        min_source: Команда, в которой достигается минимум
+        max_source: Команда, в которой достигается максимум
+    """
+    axis: str
+    min: float
+    max: float
+    min_source: str
+    max_source: str
+
+    def include(self, value: float, source: str) -> None:
+        """Учитывает координату value команды source."""
+        if value < self.min:
+            self.min, self.min_source = value, source
+        if value > self.max:
+            self.max, self.max_source = value, source
+
+
+@dataclass
+class EnvelopeViolation:
+    """
+    Выход оси за предел.
+
+    Attributes:
+        axis: Ось
+        bound: 'мин' или 'макс'
+        limit: Предел оси
+        value: Координата в программе
+        source: Команда, в которой достигается координата
+    """
+    axis: str
+    bound: str
+    limit: float
+    value: float
+    source: str
+
+    def describe(self) -> str:
+        """Описание нарушения одной строкой."""
+        return (f'{self.axis} = {self.value} ({self.source}): '
+                f'предел {self.axis} {self.bound} = {self.limit}, '
+                f'выход на {abs(self.value - self.limit):.1f} мм')
+
+
+@dataclass
+class EnvelopeReport:
+    """
+    Результат проверки программы по пределам осей.
+
+    Attributes:
+        extents: Крайние значения по осям
+        limits: Пределы по осям (мин, макс); None — предел не задан
+        exact: False если XY оценены с запасом на случайные смещения
+        violations: Выходы за пределы
+    """
+    extents: Dict[str, AxisExtent]
+    limits: Dict[str, Tuple[Optional[float], Optional[float]]]
+    exact: bool = True
+    violations: List[EnvelopeViolation] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        """True если программа не выходит за пределы осей."""
+        return not self.violations
+
+    def describe(self) -> str:
+        """Отчёт: диапазоны осей и выходы за пределы."""
+        lines = []
+        if self.violations:
+            lines.append('Программа выходит за пределы осей станка:')
+            lines.extend(f'  {violation.describe()}' for violation in self.violations)
+        lines.append('Диапазоны осей' + ('' if self.exact else ' (XY с запасом на случайные смещения)') + ':')
+        for axis, extent in self.extents.items():
+            low, high = self.limits.get(axis, (None, None))
+            limits = '' if low is None and high is None else \
+                f'  [предел {"—" if low is None else low} .. {"—" if high is None else high}]'
+            lines.append(f'  {axis}: {extent.min} .. {extent.max}{limits}')
+        return '\n'.join(lines)
+
+
+class EnvelopeError(ValueError):
+    """Программа выходит за пределы осей станка."""
+
+    def __init__(self, report: EnvelopeReport):
+        super().__init__(report.describe())
+        self.report = report
+
+
+def axis_limits(generator: CommandGenerator) -> Dict[str, Tuple[Optional[float], Optional[float]]]:
+    """
+    Возвращает пределы осей из параметров задания.
+
+    Args:
+        generator: Генератор команд задания
+
+    Returns:
+        Словарь {ось: (мин, макс)} только для осей с заданным пределом
+    """
+    values = dict(generator.spec.axis_limits)
+    limits = {}
+    for axis in AXES:
+        low, high = values.get(f'{axis} мин'), values.get(f'{axis} макс')
+        if low is not None or high is not None:
+            limits[axis] = (low, high)
+    return limits
+
+
+def _used_offsets(generator: CommandGenerator, offset_list: List,
+                  layer_indices: range) -> List:
+    """Точки паттерна, по которым бьют слои layer_indices."""
+    pattern_len = len(offset_list)
+    # Окна повторяются с периодом ceil(pattern_len / num_pitch) слоёв
+    period = max(round_to_greater(pattern_len / generator.num_pitch), 1)
+    if len(layer_indices) >= period:
+        return offset_list
+    used = []
+    for layer_idx in layer_indices:
+        start_hit, finish_hit = generator.hit_window(layer_idx, pattern_len)
+        used.extend(offset_list[start_hit:finish_hit])
+    return used
+
+
+def program_extents(generator: CommandGenerator, offset_list: Optional[List] = None,
+                    start_layer: int = 1) -> Tuple[Dict[str, AxisExtent], bool]:
+    """
+    Вычисляет крайние координаты осей программы без генерации слоёв.
+
+    Args:
+        generator: Генератор команд задания
+        offset_list: Готовый паттерн (по умолчанию строится заново)
+        start_layer: Номер первого слоя программы (с 1)
+
+    Returns:
+        Кортеж (крайние значения по осям, точность): точность False,
+        если XY ударов оценены с запасом на случайные смещения
+    """
+    if offset_list is None:
+        offset_list = generator.pattern_offsets()
+    total_layers = generator.amount_layers + generator.amount_virtual_layers
+    layer_indices = range(start_layer - 1, total_layers)
+
+    # XY в координатах программы (до смены осей X↔Y)
+    laying_x, laying_y = r(generator.layer_laying_position_x), r(generator.layer_laying_position_y)
+    laying = 'позиция укладки слоя'
+    program_x = AxisExtent('X', laying_x, laying_x, laying, laying)
+    program_y = AxisExtent('Y', laying_y, laying_y, laying, laying)
+
+    exact = True
+    used = _used_offsets(generator, offset_list, layer_indices) if layer_indices else []
+    if used and generator.num_step_x > 0 and generator.num_row_y > 0:
+        xs = [offs_x for offs_x, _ in used]
+        ys = [offs_y for _, offs_y in used]
+        jitter = 0.0
+        if generator.is_random_offsets:
+            jitter = generator.coefficient_random_offsets
+            exact = False
+        last_step, last_row = generator.num_step_x - 1, generator.num_row_y - 1
+        # Как в CommandGenerator._hit_moves: шаг головы + точка паттерна
+        program_x.include(r(min(xs) - jitter), 'удар, шаг головы 1 по X')
+        program_x.include(r(generator.head_width_x * last_step + max(xs) + jitter),
+                          f'удар, шаг головы {last_step + 1} по X')
+        program_y.include(r(min(ys) - jitter), 'удар, ряд 1 по Y')
+        program_y.include(r(generator.head_width_y * last_row + max(ys) + jitter),
+                          f'удар, ряд {last_row + 1} по Y')
+
+    if generator.is_swap_xy:
+        program_x, program_y = program_y, program_x
+    program_x.axis, program_y.axis = 'X', 'Y'
+
+    # Z по всем слоям сразу: ищем номера крайних слоёв, значения берём из layer_heights
+    z_extent = None
+    if layer_indices:
+        idx = np.arange(layer_indices.start, layer_indices.stop)
+        z_offset = generator.layer_thickness * idx
+        if generator.is_progressive_depth:
+            depth = np.minimum(generator.initial_depth + generator.layer_thickness * idx,
+                               generator.max_depth)
+        else:
+            depth = np.full(len(idx), generator.max_depth, dtype=float)
+        if generator.is_growing_z:
+            laying_z = generator.layer_laying_position_z + z_offset
+        else:
+            laying_z = np.full(len(idx), generator.layer_laying_position_z, dtype=float)
+        columns = [(laying_z, 2, 'позиция укладки по Z')]
+        if used and generator.num_step_x > 0 and generator.num_row_y > 0:
+            columns += [(z_offset - depth, 0, 'внедрение игл'),
+                        (generator.dist_to_material + z_offset, 1, 'извлечение игл')]
+
+        for values, kind, label in columns:
+            for layer_idx in (int(idx[np.argmin(values)]), int(idx[np.argmax(values)])):
+                z_offset_i, depth_i, laying_z_i = generator.layer_heights(layer_idx)
+                value = r((z_offset_i - depth_i, generator.dist_to_material + z_offset_i,
+                           laying_z_i)[kind])
+                source = f'{label}, слой {layer_idx + 1}'
+                if z_extent is None:
+                    z_extent = AxisExtent('Z', value, value, source, source)
+                else:
+                    z_extent.include(value, source)
+
+    extents = {'X': program_x, 'Y': program_y}
+    if z_extent is not None:
+        extents['Z'] = z_extent
+    return extents, exact
+
+
+def check_envelope(generator: CommandGenerator, offset_list: Optional[List] = None,
+                   start_layer: int = 1,
+                   limits: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None
+                   ) -> EnvelopeReport:
+    """
+    Проверяет, что координаты программы не выходят за пределы осей станка.
+
+    Args:
+        generator: Генератор команд задания
+        offset_list: Готовый паттерн (по умолчанию строится заново)
+        start_layer: Номер первого слоя программы (с 1)
+        limits: Пределы {ось: (мин, макс)}; по умолчанию — из параметров задания
+
+    Returns:
+        EnvelopeReport (report.ok — True, если выхода за пределы нет)
+    """
+    if limits is None:
+        limits = axis_limits(generator)
+    extents, exact = program_extents(generator, offset_list, start_layer)
+    report = EnvelopeReport(extents=extents, limits=limits, exact=exact)
+
+    for axis, (low, high) in limits.items():
+        extent = extents.get(axis)
+        if extent is None:
+            continue
+        if low is not None and extent.min < low:
+            report.violations.append(EnvelopeViolation(axis, 'мин', low, extent.min,
+                                                       extent.min_source))
+        if high is not None and extent.max > high:
+            report.violations.append(EnvelopeViolation(axis, 'макс', high, extent.max,
+                                                       extent.max_source))
+    return report
@@ -0,0 +1,360 @@
+"""
+Отправка программы на контроллер по мере генерации.
+
+Вместо записи файла и его загрузки в контроллер команды слоёв
+отправляются по TCP сразу после генерации: станок начинает работу,
+как только готов первый слой, а следующие слои генерируются, пока
+контроллер выполняет предыдущие.
+
+Управление потоком — подсчёт символов (как у потоковых отправителей
+Grbl): отправитель помнит длины строк, на которые контроллер ещё не
+ответил 'ok', и отправляет следующую строку, только если она помещается
+в приёмный буфер контроллера. Комментарии и пустые строки не отправляются.
+
+Команды реального времени (вне очереди строк): пауза подачи '!',
+продолжение '~' и коррекция подачи (байты 0x90-0x94, как в Grbl).
+
+Единицы паузы G4 P зависят от контроллера: в файле .tap (Mach3) P задаётся
+в миллисекундах, Grbl понимает P в секундах. send_job по умолчанию
+переводит паузы в секунды (DWELL_SECONDS); для контроллера с паузами
+в миллисекундах передайте dwell_units=DWELL_MILLISECONDS.
+
+Содержит:
+- SenderError — контроллер отклонил строку или не ответил
+- SendResult — итог отправки
+- program_lines — команды программы по слоям без записи файла
+- GCodeSender — отправка строк с управлением потоком
+- send_job — генерация и отправка задания на контроллер
+"""
+
+import logging
+import socket
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .command_generator import CommandGenerator
+from .commands import PauseCommand
+from .job_spec import JobSpec, as_job_spec
+from .preflight import EnvelopeError, axis_limits, check_envelope
+
+logger = logging.getLogger(__name__)
+
+# Приёмный буфер контроллера по умолчанию (байт, как у Grbl)
+RX_BUFFER_SIZE_DEFAULT = 128
+
+# Сколько ждать ответа контроллера (с)
+RESPONSE_TIMEOUT_DEFAULT = 30.0
+
+# Команды реального времени
+FEED_HOLD = b'!'
+CYCLE_START = b'~'
+FEED_OVERRIDE_RESET = b'\x90'
+FEED_OVERRIDE_PLUS_10 = b'\x91'
+FEED_OVERRIDE_MINUS_10 = b'\x92'
+FEED_OVERRIDE_PLUS_1 = b'\x93'
+FEED_OVERRIDE_MINUS_1 = b'\x94'
+REALTIME_COMMANDS = (FEED_HOLD + CYCLE_START + FEED_OVERRIDE_RESET + FEED_OVERRIDE_PLUS_10
+                     + FEED_OVERRIDE_MINUS_10 + FEED_OVERRIDE_PLUS_1 + FEED_OVERRIDE_MINUS_1)
+
+# Пределы коррекции подачи (%)
+FEED_OVERRIDE_MIN = 10
+FEED_OVERRIDE_MAX = 200
+
+# Единицы P в паузе G4
+DWELL_MILLISECONDS = 'ms'   # Mach3 и файл .tap
+DWELL_SECONDS = 's'         # Grbl
+
+_DWELL_UNITS = (DWELL_MILLISECONDS, DWELL_SECONDS)
+
+
+class SenderError(RuntimeError):
+    """Контроллер отклонил строку, оборвал соединение или не ответил."""
+
+
+@dataclass
+class SendResult:
+    """
+    Итог отправки.
+
+    Attributes:
+        lines: Количество отправленных строк
+        bytes: Количество отправленных байт (без команд реального времени)
+        seconds: Время отправки
+        first_line_seconds: Время от начала до подтверждения первой строки
+        max_buffered: Наибольшее количество байт в буфере контроллера
+    """
+    lines: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    first_line_seconds: float = 0.0
+    max_buffered: int = 0
+
+
+def program_lines(generator: CommandGenerator, offset_list: Optional[List] = None,
+                  start_layer: int = 1,
+                  dwell_units: str = DWELL_MILLISECONDS) -> Iterator[Tuple[int, str]]:
+    """
+    Генерирует команды программы по одному слою (как в файле, без комментариев).
+
+    Args:
+        generator: Генератор команд задания
+        offset_list: Готовый паттерн (по умолчанию строится заново)
+        start_layer: Номер первого слоя (с 1); перед ним — блок входа в задание
+        dwell_units: Единицы P в паузах G4: DWELL_MILLISECONDS (как в файле)
+            или DWELL_SECONDS (Grbl)
+
+    Returns:
+        Итератор пар (номер слоя, строка команды)
+
+    Raises:
+        ValueError: Неизвестные единицы паузы
+    """
+    _check_dwell_units(dwell_units)
+    to_line = _pause_in_seconds if dwell_units == DWELL_SECONDS else _command_line
+    layers = generator.iter_layers(offset_list, start_layer=start_layer, reuse_hits=True)
+    if start_layer > 1:
+        for cmd in generator.reentry_commands(start_layer):
+            yield start_layer, to_line(cmd)
+    for layer in layers:
+        for cmd in layer.commands:
+            yield layer.layer_number, to_line(cmd)
+
+
+def _check_dwell_units(dwell_units: str) -> None:
+    if dwell_units not in _DWELL_UNITS:
+        raise ValueError(f'Неизвестные единицы паузы: {dwell_units}. '
+                         f'Допустимые: {", ".join(_DWELL_UNITS)}')
+
+
+def _command_line(cmd) -> str:
+    return cmd.to_string()
+
+
+def _pause_in_seconds(cmd) -> str:
+    """Строка команды; пауза G4 — с P в секундах (Grbl)."""
+    if type(cmd) is PauseCommand:
+        return f"G4 P{round(cmd.milliseconds / 1000, 4)}"
+    return cmd.to_string()
+
+
+class GCodeSender:
+    """
+    Отправляет строки на контроллер с управлением потоком по подсчёту символов.
+
+    Пример:
+        with socket.create_connection(('192.168.0.10', 23)) as connection:
+            sender = GCodeSender(connection)
+            sender.stream(lines)
+    """
+
+    def __init__(self, connection: socket.socket,
+                 rx_buffer_size: int = RX_BUFFER_SIZE_DEFAULT,
+                 timeout: float = RESPONSE_TIMEOUT_DEFAULT):
+        """
+        Args:
+            connection: Подключённый сокет контроллера
+            rx_buffer_size: Размер приёмного буфера контроллера (байт)
+            timeout: Сколько ждать ответа контроллера (с)
+        """
+        self.connection = connection
+        self.rx_buffer_size = rx_buffer_size
+        self.timeout = timeout
+        self.feed_override = 100
+        self.paused = False
+
+        self._responses = connection.makefile('rb')
+        self._send_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    # --- команды реального времени (можно вызывать из другого потока) ---
+
+    def pause(self) -> None:
+        """Останавливает подачу (feed hold)."""
+        self._realtime(FEED_HOLD)
+        self.paused = True
+
+    def resume(self) -> None:
+        """Продолжает подачу после паузы."""
+        self._realtime(CYCLE_START)
+        self.paused = False
+
+    def set_feed_override(self, percent: int) -> int:
+        """
+        Устанавливает коррекцию подачи.
+
+        Args:
+            percent: Подача в процентах от заданной в программе
+
+        Returns:
+            Установленная коррекция (ограничена FEED_OVERRIDE_MIN..MAX)
+        """
+        percent = max(FEED_OVERRIDE_MIN, min(FEED_OVERRIDE_MAX, int(percent)))
+        delta = percent - 100
+        tens, ones = divmod(abs(delta), 10)
+        step_10, step_1 = ((FEED_OVERRIDE_PLUS_10, FEED_OVERRIDE_PLUS_1) if delta > 0
+                           else (FEED_OVERRIDE_MINUS_10, FEED_OVERRIDE_MINUS_1))
+        self._realtime(FEED_OVERRIDE_RESET + step_10 * tens + step_1 * ones)
+        self.feed_override = percent
+        return percent
+
+    def stop(self) -> None:
+        """Прерывает отправку: stream завершится с SenderError после текущей строки."""
+        self._stop.set()
+
+    def _realtime(self, command: bytes) -> None:
+        with self._send_lock:
+            self.connection.sendall(command)
+
+    # --- поток строк ---
+
+    def stream(self, lines: Iterable[Union[str, Tuple[int, str]]],
+               progress_func: Optional[Callable[[int], None]] = None) -> SendResult:
+        """
+        Отправляет строки и ждёт подтверждения всех.
+
+        Args:
+            lines: Строки G-кода или пары (номер слоя, строка) из program_lines
+            progress_func: Вызывается с номером слоя, все строки которого подтверждены
+
+        Returns:
+            SendResult
+
+        Raises:
+            SenderError: Ошибка контроллера, обрыв соединения, нет ответа,
+                строка длиннее буфера или отправка прервана stop()
+        """
+        result = SendResult()
+        start = time.perf_counter()
+        in_flight = deque()  # (длина, номер строки, строка, номер слоя)
+        buffered = 0
+        acked_layer = None
+
+        def acknowledge():
+            nonlocal buffered, acked_layer
+            length, number, line, layer = in_flight.popleft()
+            self._read_ok(number, line)
+            buffered -= length
+            if number == 1:
+                result.first_line_seconds = time.perf_counter() - start
+            # Подтверждена первая строка следующего слоя — предыдущий слой принят
+            if layer != acked_layer:
+                if acked_layer is not None and progress_func is not None:
+                    progress_func(acked_layer)
+                acked_layer = layer
+
+        for number, item in enumerate(_numbered(lines), 1):
+            layer, line = item
+            if self._stop.is_set():
+                raise SenderError(f'Отправка прервана на строке {number}')
+            data = (line + '\n').encode('ascii')
+            if len(data) > self.rx_buffer_size:
+                raise SenderError(f'Строка {number} длиннее буфера контроллера: {line}')
+
+            # Ждём, пока строка не поместится в буфер контроллера
+            while in_flight and buffered + len(data) > self.rx_buffer_size:
+                acknowledge()
+
+            with self._send_lock:
+                self.connection.sendall(data)
+            in_flight.append((len(data), number, line, layer))
+            buffered += len(data)
+            result.max_buffered = max(result.max_buffered, buffered)
+            result.lines += 1
+            result.bytes += len(data)
+
+        while in_flight:
+            acknowledge()
+        if acked_layer is not None and progress_func is not None:
+            progress_func(acked_layer)
+
+        result.seconds = time.perf_counter() - start
+        return result
+
+    def _read_ok(self, number: int, line: str) -> None:
+        """Читает ответ контроллера на строку number."""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            self.connection.settimeout(max(deadline - time.monotonic(), 0.001))
+            try:
+                response = self._responses.readline()
+            except socket.timeout:
+                raise SenderError(f'Контроллер не ответил на строку {number}: {line}')
+            if not response:
+                raise SenderError(f'Контроллер закрыл соединение на строке {number}')
+            response = response.decode('ascii', 'replace').strip()
+            if response == 'ok':
+                return
+            if response.startswith('error'):
+                raise SenderError(f'Контроллер отклонил строку {number} ({line}): {response}')
+            # Сообщения контроллера вне очереди ответов
+            if response:
+                logger.info('Контроллер: %s', response)
+
+
+def _numbered(lines: Iterable[Union[str, Tuple[int, str]]]) -> Iterator[Tuple[int, str]]:
+    """Пары (номер слоя, строка) без комментариев и пустых строк."""
+    for item in lines:
+        layer, line = item if isinstance(item, tuple) else (0, item)
+        line = line.split(';', 1)[0].strip()
+        if line:
+            yield layer, line
+
+
+def send_job(data_dict: Union[Dict[str, Any], JobSpec], host: str, port: int,
+             start_layer: int = 1,
+             rx_buffer_size: int = RX_BUFFER_SIZE_DEFAULT,
+             timeout: float = RESPONSE_TIMEOUT_DEFAULT,
+             dwell_units: str = DWELL_SECONDS,
+             display_percent_progress_func: Optional[Callable[[float], None]] = None,
+             on_connect: Optional[Callable[[GCodeSender], None]] = None) -> SendResult:
+    """
+    Генерирует задание и отправляет его на контроллер по мере генерации.
+
+    Args:
+        data_dict: Словарь с параметрами генерации или JobSpec
+        host: Адрес контроллера
+        port: TCP порт контроллера
+        start_layer: Продолжить задание со слоя start_layer (см. generate_G_codes_file)
+        rx_buffer_size: Размер приёмного буфера контроллера (байт)
+        timeout: Сколько ждать ответа контроллера (с)
+        dwell_units: Единицы P в паузах G4 на контроллере (по умолчанию
+            секунды, как в Grbl)
+        display_percent_progress_func: Функция отображения прогресса (0-100)
+        on_connect: Вызывается с отправителем после подключения (для пауз
+            и коррекции подачи из другого потока)
+
+    Returns:
+        SendResult
+
+    Raises:
+        EnvelopeError: Программа выходит за пределы осей станка
+        SenderError: Ошибка отправки
+        ValueError: Неизвестные единицы паузы
+    """
+    _check_dwell_units(dwell_units)
+    generator = CommandGenerator(as_job_spec(data_dict))
+    offset_list = generator.pattern_offsets()
+
+    # Выход за пределы осей нужно обнаружить до начала работы станка
+    limits = axis_limits(generator)
+    if limits:
+        envelope = check_envelope(generator, offset_list, start_layer, limits)
+        if not envelope.ok:
+            raise EnvelopeError(envelope)
+
+    total_layers = generator.amount_layers + generator.amount_virtual_layers
+    lines = program_lines(generator, offset_list, start_layer, dwell_units)
+
+    def progress(layer_number):
+        if display_percent_progress_func is not None:
+            done = layer_number - start_layer + 1
+            display_percent_progress_func(done / (total_layers - start_layer + 1) * 100)
+
+    with socket.create_connection((host, port), timeout=timeout) as connection:
+        sender = GCodeSender(connection, rx_buffer_size, timeout)
+        if on_connect is not None:
+            on_connect(sender)
+        return sender.stream(lines, progress)
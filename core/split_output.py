@@ -0,0 +1,290 @@
+"""
+Разбиение программы на несколько файлов.
+
+У контроллера есть ограничение на размер программы, поэтому большую
+программу можно записать частями: по заданному количеству слоёв или
+так, чтобы каждая часть укладывалась в заданное количество байт.
+Части разрезаются только по границам слоёв. Каждый слой начинается
+с выезда на позицию укладки в абсолютных координатах, поэтому любая
+часть начинается с известного положения Z. У каждой части свой заголовок
+(с номером части, диапазоном слоёв и временем части), нумерация слоёв
+в комментариях — сквозная.
+
+Рядом с частями записывается манифест <имя>.manifest.json со списком
+частей. Манифест пишется последним: если он есть, все части на месте.
+
+Все слои в памяти не нужны: write_split_output принимает функцию,
+возвращающую новый итератор слоёв, и проходит слои дважды — первый
+проход определяет границы и время частей (оно пишется в заголовок части),
+второй записывает части. В памяти одновременно находится один слой.
+
+Содержит:
+- OutputPart — описание одной части
+- plan_parts — разбиение слоёв на части
+- write_split_output — запись частей и манифеста
+"""
+
+import json
+import os
+from dataclasses import asdict, dataclass
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .command_generator import CommandGenerator
+from .commands import GCodeCommand, Layer
+from .formatter import GCodeFormatter
+from .output_writer import AtomicOutputWriter, DURABILITY_DEFAULT
+from .subprograms import write_layers_as_subprograms
+from .time_estimator import TimeEstimator
+
+# Строка времени для оценки размера заголовка (не короче любой реальной)
+_LONGEST_TIME = '99999 д 23:59:59'
+
+
+@dataclass
+class OutputPart:
+    """
+    Одна часть программы.
+
+    Attributes:
+        number: Номер части (с 1)
+        path: Путь к файлу части
+        first_layer: Номер первого слоя части (с 1)
+        last_layer: Номер последнего слоя части
+        bytes: Размер файла в байтах
+        seconds: Оценка времени работы части в секундах
+        work_time_str: Оценка времени работы части (как в заголовке)
+    """
+    number: int
+    path: str
+    first_layer: int
+    last_layer: int
+    bytes: int = 0
+    seconds: float = 0.0
+    work_time_str: str = ''
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Описание части для манифеста (путь — только имя файла)."""
+        data = asdict(self)
+        data['file'] = os.path.basename(data.pop('path'))
+        data['layers'] = self.last_layer - self.first_layer + 1
+        return data
+
+
+class _ByteCounter:
+    """Файловый объект, считающий байты вместо записи."""
+
+    def __init__(self, newline: str):
+        self.extra_newline = len(newline) - 1
+        self.bytes = 0
+
+    def write(self, text: str) -> int:
+        self.bytes += len(text.encode('utf-8')) + self.extra_newline * text.count('\n')
+        return len(text)
+
+
+def part_path(path: str, number: int, count: int) -> str:
+    """
+    Возвращает путь к файлу части: <имя>_part01.tap.
+
+    Args:
+        path: Путь к файлу без разбиения
+        number: Номер части (с 1)
+        count: Количество частей (для ширины номера)
+    """
+    stem, ext = os.path.splitext(path)
+    return f'{stem}_part{number:0{max(len(str(count)), 2)}d}{ext}'
+
+
+def manifest_path(path: str) -> str:
+    """Возвращает путь к манифесту частей для файла path."""
+    return os.path.splitext(path)[0] + '.manifest.json'
+
+
+def _write_part_prehead(formatter: GCodeFormatter, generator: CommandGenerator,
+                        part: OutputPart, count: int, work_time: str, layer_time: str,
+                        reentry: List[GCodeCommand], start_layer: int = 1) -> None:
+    """Записывает заголовок части (и блок входа в задание перед первым слоем)."""
+    formatter.write_prehead(generator.get_prehead_params(work_time=work_time,
+                                                         layer_time=layer_time,
+                                                         start_layer=start_layer))
+    formatter.write_part_info(part.number, count, part.first_layer, part.last_layer)
+    if reentry:
+        formatter.write_reentry(reentry, part.first_layer)
+
+
+def _iter_part_starts(generator: CommandGenerator, layers: Iterable[Layer],
+                      max_layers: int, max_bytes: int, newline: Optional[str],
+                      reentry: Optional[List[GCodeCommand]],
+                      start_layer: int = 1) -> Iterator[Tuple[Layer, bool]]:
+    """
+    Разбивает слои на части по мере их поступления.
+
+    Returns:
+        Итератор пар (слой, True если слой начинает новую часть)
+
+    Raises:
+        ValueError: Некорректные ограничения или слой не помещается в max_bytes
+    """
+    if max_layers < 0 or max_bytes < 0:
+        raise ValueError('Ограничения размера части не могут быть отрицательными')
+
+    counter = None
+    prehead_bytes = 0
+    if max_bytes:
+        # Заголовок части с запасом: номера частей и слоёв не длиннее номера последнего слоя
+        counter = _ByteCounter(os.linesep if newline is None else newline)
+        formatter = GCodeFormatter(counter, generator.amount_layers)
+        total = generator.amount_layers + generator.amount_virtual_layers
+        _write_part_prehead(formatter, generator, OutputPart(total, '', total, total),
+                            total, _LONGEST_TIME, _LONGEST_TIME, reentry or [], start_layer)
+        prehead_bytes = counter.bytes
+
+    part_layers, part_bytes = 0, prehead_bytes
+    for layer in layers:
+        layer_bytes = 0
+        if counter is not None:
+            counter.bytes = 0
+            formatter.write_layer(layer)
+            layer_bytes = counter.bytes
+            if prehead_bytes + layer_bytes > max_bytes:
+                raise ValueError(f'Слой {layer.layer_number} с заголовком ({prehead_bytes + layer_bytes} байт) '
+                                 f'не помещается в часть размером {max_bytes} байт')
+        new_part = not part_layers or bool(
+            (max_bytes and part_bytes + layer_bytes > max_bytes)
+            or (max_layers and part_layers >= max_layers))
+        if new_part:
+            part_layers, part_bytes = 0, prehead_bytes
+        part_layers += 1
+        part_bytes += layer_bytes
+        yield layer, new_part
+
+
+def plan_parts(generator: CommandGenerator, layers: List[Layer],
+               max_layers: int = 0, max_bytes: int = 0,
+               newline: Optional[str] = None,
+               reentry: Optional[List[GCodeCommand]] = None,
+               start_layer: int = 1) -> List[Tuple[int, int]]:
+    """
+    Разбивает слои на части.
+
+    Args:
+        generator: Генератор, создавший слои
+        layers: Слои задания
+        max_layers: Наибольшее количество слоёв в части (0 — без ограничения)
+        max_bytes: Наибольший размер части в байтах (0 — без ограничения);
+            в него входит и заголовок части
+        newline: Перевод строки в файле (по умолчанию os.linesep, как при записи)
+        reentry: Блок входа в задание в первой части (учитывается в запасе заголовка)
+        start_layer: Слой, с которого продолжается задание (строка заголовка
+            учитывается в запасе заголовка)
+
+    Returns:
+        Список диапазонов (start, stop) индексов слоёв для каждой части
+
+    Raises:
+        ValueError: Некорректные ограничения или слой не помещается в max_bytes
+    """
+    starts = [i for i, (_, new_part) in enumerate(
+        _iter_part_starts(generator, layers, max_layers, max_bytes, newline, reentry,
+                          start_layer)) if new_part]
+    return list(zip(starts, starts[1:] + [len(layers)]))
+
+
+def write_split_output(path: str, generator: CommandGenerator,
+                       layers: Union[List[Layer], Callable[[], Iterable[Layer]]],
+                       time_estimator: TimeEstimator,
+                       max_layers: int = 0, max_bytes: int = 0,
+                       durability: str = DURABILITY_DEFAULT,
+                       subprograms: bool = False,
+                       progress_func: Optional[Callable[[float], None]] = None,
+                       reentry: Optional[List[GCodeCommand]] = None,
+                       background_write: bool = False,
+                       start_layer: int = 1
+                       ) -> Tuple[List[OutputPart], str]:
+    """
+    Записывает программу частями и манифест частей.
+
+    Args:
+        path: Путь к файлу без разбиения (имена частей строятся от него)
+        generator: Генератор, создавший слои
+        layers: Слои задания или функция, возвращающая новый итератор слоёв
+            (например, generator.iter_layers) — тогда все слои в памяти не хранятся
+        time_estimator: Оценщик времени для заголовков частей
+        max_layers: Наибольшее количество слоёв в части (0 — без ограничения)
+        max_bytes: Наибольший размер части в байтах (0 — без ограничения)
+        durability: Политика fsync при записи (см. AtomicOutputWriter)
+        subprograms: Записывать удары подпрограммами (см. write_layers_as_subprograms);
+            несовместимо с max_bytes
+        progress_func: Функция отображения прогресса (0-100)
+        reentry: Блок входа в задание перед первым слоем первой части
+            (при продолжении задания, см. CommandGenerator.reentry_commands)
+        background_write: Писать части на диск в отдельном потоке (см. AtomicOutputWriter)
+        start_layer: Слой, с которого продолжается задание (пишется в заголовок
+            каждой части, как в файле без разбиения)
+
+    Returns:
+        Кортеж (список OutputPart, путь к манифесту)
+
+    Raises:
+        ValueError: Некорректные ограничения или слой не помещается в max_bytes
+    """
+    if subprograms and max_bytes:
+        raise ValueError('Разбиение по размеру несовместимо с записью слоёв подпрограммами')
+    layer_source = layers if callable(layers) else lambda: layers
+
+    # Первый проход: границы частей, время частей и первого слоя каждой части
+    plans = []  # [первый слой, последний слой, RunningEstimate, время первого слоя]
+    for layer, new_part in _iter_part_starts(generator, layer_source(), max_layers, max_bytes,
+                                             None, reentry, start_layer):
+        if new_part:
+            layer_time = time_estimator.estimate_layer(layer.commands).to_dhms()
+            plans.append([layer.layer_number, layer.layer_number, time_estimator.running(),
+                          layer_time])
+        plans[-1][1] = layer.layer_number
+        plans[-1][2].add(layer)
+
+    parts = [OutputPart(number=i + 1, path=part_path(path, i + 1, len(plans)),
+                        first_layer=first_layer, last_layer=last_layer)
+             for i, (first_layer, last_layer, _, _) in enumerate(plans)]
+    total_layers = sum(part.last_layer - part.first_layer + 1 for part in parts)
+
+    # Второй проход: запись частей
+    layer_iter = iter(layer_source())
+    done = 0
+    for part, (_, _, running, layer_time) in zip(parts, plans):
+        estimate = running.result()
+        part.seconds = estimate.total_seconds
+        part.work_time_str = estimate.to_dhms()
+        part_layers = islice(layer_iter, part.last_layer - part.first_layer + 1)
+
+        with AtomicOutputWriter(part.path, durability=durability,
+                                background=background_write) as part_file:
+            formatter = GCodeFormatter(part_file, generator.amount_layers)
+            _write_part_prehead(formatter, generator, part, len(parts),
+                                part.work_time_str, layer_time,
+                                reentry if part.number == 1 else [], start_layer)
+            if subprograms:
+                write_layers_as_subprograms(formatter, generator, list(part_layers))
+            else:
+                for layer in part_layers:
+                    formatter.write_layer(layer)
+        part.bytes = part_file.bytes_written
+
+        done += part.last_layer - part.first_layer + 1
+        if progress_func is not None:
+            progress_func(done / total_layers * 100)
+
+    manifest = {
+        'file': os.path.basename(path),
+        'seed': generator.seed,
+        'layers': total_layers,
+        'seconds': sum(part.seconds for part in parts),
+        'max_layers': max_layers,
+        'max_bytes': max_bytes,
+        'parts': [part.to_dict() for part in parts],
+    }
+    manifest_file = manifest_path(path)
+    with AtomicOutputWriter(manifest_file, durability=durability, newline='\n') as f:
+        f.write(json.dumps(manifest, ensure_ascii=False, indent=2) + '\n')
+    return parts, manifest_file
@@ -0,0 +1,122 @@
+"""
+Запись слоёв подпрограммами контроллера.
+
+Без случайных смещений удары слоя повторяют удары другого слоя с тем же
+окном паттерна и направлением прохода, сдвинутые по Z на смещение слоя.
+В этом режиме тело слоя (удары) записывается один раз как подпрограмма
+O<номер> ... M99 после конца программы (M30), а каждый слой в основной
+программе вызывает её через M98 P<номер> со сдвигом Z, заданным локальной
+системой координат G52. Выезд на позицию укладки, звуковой сигнал и пауза
+остаются в основной программе в абсолютных координатах.
+
+Глубина удара входит в ключ подпрограммы: при нарастании глубины слои
+с разной глубиной получают разные подпрограммы. Слои, тело которых
+не повторяется, записываются целиком, как в обычном файле.
+
+Формат (M98 P / O / M99 / G52) — диалект Mach3.
+
+Содержит:
+- write_layers_as_subprograms — запись слоёв основной программой и подпрограммами
+"""
+
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .command_generator import CommandGenerator, r
+from .commands import GCodeCommand, Layer, MoveCommand
+from .formatter import GCodeFormatter
+
+# Номер первой подпрограммы
+SUBPROGRAM_FIRST_NUMBER = 1000
+
+
+def _relative_body(body: List[GCodeCommand], z_shift: float) -> List[GCodeCommand]:
+    """Переводит Z команд ударов в координаты относительно z_shift."""
+    relative = {}
+    result = []
+    for cmd in body:
+        if isinstance(cmd, MoveCommand) and cmd.z is not None:
+            # Z ударов — общие объекты (см. CommandGenerator._move_cmd)
+            key = id(cmd)
+            if key not in relative:
+                relative[key] = MoveCommand(x=cmd.x, y=cmd.y, z=r(cmd.z - z_shift), f=cmd.f)
+            cmd = relative[key]
+        result.append(cmd)
+    return result
+
+
+def _body_key(layer: Layer, body: List[GCodeCommand], z_shift: float) -> Tuple:
+    """
+    Ключ тела слоя: окно паттерна, направление прохода и Z ударов относительно сдвига.
+
+    Z команд в файле округлены до 0.1, сдвиг — тоже, поэтому
+    сдвиг + относительная Z на контроллере даёт ту же Z, что и в обычном файле.
+    """
+    start_hit, is_reversed = layer.signature[:2]
+    # Удар: XY, внедрение по Z, извлечение по Z
+    _, insert, extract = body[:3]
+    return start_hit, is_reversed, r(insert.z - z_shift), r(extract.z - z_shift)
+
+
+def write_layers_as_subprograms(formatter: GCodeFormatter, generator: CommandGenerator,
+                                layers: List[Layer],
+                                progress_func: Optional[Callable[[float], None]] = None) -> int:
+    """
+    Записывает слои основной программой с вызовами подпрограмм ударов.
+
+    Args:
+        formatter: GCodeFormatter (заголовок файла уже записан)
+        generator: Генератор, создавший слои
+        layers: Слои задания (из generator.generate_layers)
+        progress_func: Функция отображения прогресса (0-100)
+
+    Returns:
+        Количество записанных подпрограмм
+
+    Raises:
+        ValueError: Слои неповторимы (случайные смещения)
+    """
+    if generator.is_random_offsets:
+        raise ValueError('Запись слоёв подпрограммами невозможна при случайных смещениях: '
+                         'удары каждого слоя уникальны')
+
+    tail_length = len(generator.layer_tail())
+
+    # Первый проход: ключи тел слоёв, чтобы не выносить в подпрограммы неповторяющиеся
+    keys = []
+    for layer in layers:
+        # Слой: выезд на укладку (2 команды), удары, выезд на укладку, сигнал и пауза
+        body = layer.commands[2:len(layer.commands) - 2 - tail_length]
+        if body:
+            z_offset, _, _ = generator.layer_heights(layer.layer_number - 1)
+            z_shift = r(z_offset)
+            keys.append((_body_key(layer, body, z_shift), z_shift))
+        else:
+            keys.append((None, 0.0))
+    usage = Counter(key for key, _ in keys)
+
+    bodies: Dict[Tuple, Tuple[int, List[GCodeCommand]]] = {}
+    for i, (layer, (key, z_shift)) in enumerate(zip(layers, keys)):
+        if key is None or usage[key] < 2:
+            formatter.write_layer(layer)
+        else:
+            commands = layer.commands
+            body_end = len(commands) - 2 - tail_length
+            if key not in bodies:
+                bodies[key] = (SUBPROGRAM_FIRST_NUMBER + len(bodies),
+                               _relative_body(commands[2:body_end], z_shift))
+
+            formatter.write_layer_header(layer.layer_number, layer.is_virtual)
+            for cmd in commands[:2]:
+                formatter.write_command(cmd, layer.layer_number)
+            formatter.write_subprogram_call(bodies[key][0], z_shift, layer.layer_number)
+            for cmd in commands[body_end:]:
+                formatter.write_command(cmd, layer.layer_number)
+
+        if progress_func is not None:
+            progress_func(i / len(layers) * 100)
+
+    formatter.write_program_end()
+    for number, body in bodies.values():
+        formatter.write_subprogram(number, body)
+    return len(bodies)
@@ -0,0 +1,322 @@
+"""
+Журнал генераций и отчёт о загрузке станков.
+
+Каждый вызов generate_G_codes_file (GUI, командная строка, сервис,
+пакетная генерация) дописывает в журнал одну JSON строку: хеш параметров,
+голова, удары, слои, размер файла, расчётное время станка, время этапов
+генерации, способ генерации, компьютер и версия программы. Неудачные
+генерации записываются с текстом ошибки.
+
+Журнал по умолчанию — data/telemetry.jsonl рядом с программой; путь
+задаётся переменной окружения GCODE_TELEMETRY (пустое значение отключает
+журнал). Ошибка записи журнала не прерывает генерацию.
+
+Строка дописывается одной записью в режиме добавления, поэтому несколько
+процессов (пул сервиса) могут писать в один журнал.
+
+Содержит:
+- StageTimer — время этапов генерации
+- parameter_hash — хеш параметров, влияющих на программу
+- telemetry_path — путь к журналу
+- make_record — строка журнала по итогам генерации
+- append_record — запись строки журнала
+- read_records — чтение журнала
+- UsageRow — строка сводки
+- TelemetryReport — сводка журнала: загрузка по головам и скорость генерации
+- build_report — сводка по журналу
+"""
+
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import platform
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from utils.crossplatform_utils import get_resource_path
+
+from .job_spec import JobSpec
+from .version import VERSION
+
+logger = logging.getLogger(__name__)
+
+# Переменная окружения с путём к журналу (пустое значение — журнал отключён)
+TELEMETRY_ENV = 'GCODE_TELEMETRY'
+TELEMETRY_FILE_DEFAULT = os.path.join('data', 'telemetry.jsonl')
+
+# Поля JobSpec, не влияющие на программу (имя и место файла)
+_FILE_FIELDS = ('is_automatic_name', 'file_name', 'on_the_desktop')
+
+
+class StageTimer:
+    """
+    Время этапов генерации: каждый этап длится от предыдущей отметки.
+
+    Пример:
+        timer = StageTimer()
+        ...
+        timer.mark('preflight')
+        ...
+        timer.mark('write')
+        print(timer.stages, timer.total_seconds)
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now(timezone.utc)
+        self.stages: Dict[str, float] = {}
+        self._start = self._last = time.perf_counter()
+
+    def mark(self, stage: str) -> None:
+        """Завершает этап stage."""
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self._last
+        self._last = now
+
+    @property
+    def total_seconds(self) -> float:
+        """Время от создания до последней отметки."""
+        return self._last - self._start
+
+
+def parameter_hash(spec: JobSpec) -> str:
+    """
+    Хеш параметров задания (без имени и места файла).
+
+    Одинаковые параметры дают одинаковый хеш на любом компьютере.
+
+    Args:
+        spec: Параметры задания
+
+    Returns:
+        Первые 16 шестнадцатеричных символов SHA-256
+    """
+    values = {name: value for name, value in dataclasses.asdict(spec).items()
+              if name not in _FILE_FIELDS}
+    data = json.dumps(values, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()[:16]
+
+
+def telemetry_path(path: Optional[str] = None) -> Optional[str]:
+    """
+    Путь к журналу.
+
+    Args:
+        path: Явный путь ('' — журнал отключён); по умолчанию — из
+            переменной GCODE_TELEMETRY или data/telemetry.jsonl
+
+    Returns:
+        Путь или None, если журнал отключён
+    """
+    if path is None:
+        path = os.environ.get(TELEMETRY_ENV)
+        if path is None:
+            path = get_resource_path(TELEMETRY_FILE_DEFAULT)
+    return path or None
+
+
+def make_record(spec: Optional[JobSpec], timer: StageTimer,
+                result: Optional[Dict[str, Any]] = None,
+                error: Optional[BaseException] = None) -> Dict[str, Any]:
+    """
+    Строка журнала по итогам генерации.
+
+    Args:
+        spec: Параметры задания (None — параметры не разобраны)
+        timer: Время этапов генерации
+        result: Результат generate_G_codes_file (None при ошибке)
+        error: Ошибка генерации
+
+    Returns:
+        Словарь для записи в журнал
+    """
+    result = result or {}
+    record = {
+        'time': timer.started_at.isoformat(timespec='seconds'),
+        'version': VERSION,
+        'host': platform.node(),
+        'status': 'ok' if error is None else 'error',
+        'params': parameter_hash(spec) if spec is not None else None,
+        'head': spec.head_name if spec is not None else None,
+        'seed': result.get('seed'),
+        'layers': result.get('layers'),
+        'hits': result.get('hits'),
+        'bytes': result.get('bytes'),
+        'machine_seconds': result.get('machine_seconds'),
+        'engine': result.get('engine'),
+        'seconds': round(timer.total_seconds, 4),
+        'stages': {stage: round(seconds, 4) for stage, seconds in timer.stages.items()},
+    }
+    if error is not None:
+        record['error'] = f'{type(error).__name__}: {error}'
+    return record
+
+
+def append_record(record: Dict[str, Any], path: Optional[str] = None) -> bool:
+    """
+    Дописывает строку в журнал.
+
+    Args:
+        record: Строка журнала (см. make_record)
+        path: Путь к журналу (см. telemetry_path)
+
+    Returns:
+        True если строка записана (False — журнал отключён или ошибка записи)
+    """
+    path = telemetry_path(path)
+    if path is None:
+        return False
+    line = json.dumps(record, ensure_ascii=False) + '\n'
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line)
+    except OSError as e:
+        logger.warning('Не удалось записать журнал генераций %s: %s', path, e)
+        return False
+    return True
+
+
+def read_records(path: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Читает строки журнала; повреждённые строки пропускаются.
+
+    Args:
+        path: Путь к журналу (см. telemetry_path)
+
+    Returns:
+        Итератор словарей
+    """
+    path = telemetry_path(path)
+    if path is None or not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning('Журнал %s: пропущена повреждённая строка %d', path, number)
+
+
+@dataclass
+class UsageRow:
+    """
+    Строка сводки: генерации одной головы или одного периода.
+
+    Attributes:
+        key: Голова или период (день, версия)
+        runs: Количество успешных генераций
+        errors: Количество неудачных генераций
+        hits: Удары всех генераций
+        bytes: Размер всех файлов (байт)
+        machine_seconds: Расчётное время станка (с)
+        seconds: Время генерации (с)
+    """
+    key: str
+    runs: int = 0
+    errors: int = 0
+    hits: int = 0
+    bytes: int = 0
+    machine_seconds: float = 0.0
+    seconds: float = 0.0
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """Учитывает строку журнала."""
+        if record.get('status') != 'ok':
+            self.errors += 1
+            return
+        self.runs += 1
+        self.hits += record.get('hits') or 0
+        self.bytes += record.get('bytes') or 0
+        self.machine_seconds += record.get('machine_seconds') or 0.0
+        self.seconds += record.get('seconds') or 0.0
+
+    @property
+    def machine_hours(self) -> float:
+        """Расчётное время станка в часах."""
+        return self.machine_seconds / 3600
+
+    @property
+    def hits_per_second(self) -> float:
+        """Скорость генерации (ударов в секунду)."""
+        return self.hits / self.seconds if self.seconds else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        """Скорость генерации (МБ в секунду)."""
+        return self.bytes / (1 << 20) / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class TelemetryReport:
+    """
+    Сводка журнала генераций.
+
+    Attributes:
+        heads: Загрузка по головам
+        days: Скорость генерации по дням
+        versions: Скорость генерации по версиям программы
+        engines: Скорость генерации по способам генерации
+    """
+    heads: List[UsageRow] = field(default_factory=list)
+    days: List[UsageRow] = field(default_factory=list)
+    versions: List[UsageRow] = field(default_factory=list)
+    engines: List[UsageRow] = field(default_factory=list)
+
+    def describe(self) -> str:
+        """Отчёт в виде текстовых таблиц."""
+        lines = ['Загрузка станков по головам:',
+                 f'  {"Голова":30} {"Заданий":>8} {"Ошибок":>7} {"Ударов":>14} {"Станко-часов":>13}']
+        for row in self.heads:
+            lines.append(f'  {row.key:30} {row.runs:8} {row.errors:7} {row.hits:14} '
+                         f'{row.machine_hours:13.1f}')
+        for title, rows in (('Скорость генерации по дням:', self.days),
+                            ('Скорость генерации по версиям:', self.versions),
+                            ('Скорость генерации по способам:', self.engines)):
+            lines.append(title)
+            lines.append(f'  {"":30} {"Заданий":>8} {"Ошибок":>7} {"уд/с":>14} {"МБ/с":>13}')
+            for row in rows:
+                lines.append(f'  {row.key:30} {row.runs:8} {row.errors:7} '
+                             f'{row.hits_per_second:14.0f} {row.megabytes_per_second:13.2f}')
+        return '\n'.join(lines)
+
+
+def build_report(records: Iterator[Dict[str, Any]]) -> TelemetryReport:
+    """
+    Сводит строки журнала: загрузка по головам, скорость генерации по дням,
+    версиям и способам генерации.
+
+    Args:
+        records: Строки журнала (см. read_records)
+
+    Returns:
+        TelemetryReport
+    """
+    groups = {name: {} for name in ('heads', 'days', 'versions', 'engines')}
+    for record in records:
+        keys = {
+            'heads': record.get('head') or '—',
+            'days': (record.get('time') or '—')[:10],
+            'versions': record.get('version') or '—',
+            'engines': record.get('engine') or '—',
+        }
+        for name, key in keys.items():
+            row = groups[name].get(key)
+            if row is None:
+                row = groups[name][key] = UsageRow(key)
+            row.add(record)
+
+    report = TelemetryReport()
+    # Головы — по убыванию загрузки, периоды — по порядку
+    report.heads = sorted(groups['heads'].values(), key=lambda row: -row.machine_seconds)
+    report.days = sorted(groups['days'].values(), key=lambda row: row.key)
+    report.versions = sorted(groups['versions'].values(),
+                             key=lambda row: [int(part) if part.isdigit() else -1
+                                              for part in row.key.split('.')])
+    report.engines = sorted(groups['engines'].values(), key=lambda row: row.key)
+    return report
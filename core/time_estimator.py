@@ -5,19 +5,37 @@
 - Ускорение и торможение (трапецеидальный/треугольный профиль скорости)
 - Паузы G4
 - Оптимизацию: время_слоя × количество_слоёв
+- Мемоизацию: слои с одинаковой сигнатурой считаются один раз
+- Опционально: сопряжение перемещений в стыках (режим планировщика, см. motion_planner)
 """
 
 import math
-from typing import List
+from collections import OrderedDict, namedtuple
+from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 
 from .commands import GCodeCommand, Layer, MoveCommand, PauseCommand
+from .motion_planner import (
+    JUNCTION_DEVIATION_DEFAULT,
+    LOOKAHEAD_DEFAULT,
+    layer_columns,
+    plan_entry_speeds,
+    planned_move_times,
+)
 
 
 # Ускорение для линейных осей (мм/с²)
 # Значение по умолчанию, можно переопределить при создании TimeEstimator
 ACCEL_LINEAR_DEFAULT = 300.0
 
+# Максимальное количество слоёв в LRU-кэше оценок по сигнатуре слоя
+LAYER_MEMO_SIZE_DEFAULT = 256
+
+# Статистика кэша оценок слоёв (аналог functools.lru_cache().cache_info())
+LayerMemoInfo = namedtuple('LayerMemoInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+Position = Tuple[float, float, float]
+
 
 def _time_for_move(distance: float, velocity: float, acceleration: float) -> float:
     """
@@ -107,6 +125,28 @@ class TimeEstimate:
         """
         return _seconds_to_dhms(self.total_seconds)
 
+    def layer_to_dhms(self) -> str:
+        """Форматирует среднее время одного слоя, как to_dhms."""
+        return _seconds_to_dhms(self.layer_seconds)
+
+    def repeated(self, count: int) -> 'TimeEstimate':
+        """
+        Оценка для count одинаковых слоёв (эта оценка — один слой).
+
+        Args:
+            count: Количество слоёв
+
+        Returns:
+            TimeEstimate для всех слоёв
+        """
+        return TimeEstimate(
+            total_seconds=self.total_seconds * count,
+            layer_seconds=self.layer_seconds,
+            movement_seconds=self.movement_seconds * count,
+            pause_seconds=self.pause_seconds * count,
+            total_distance_mm=self.total_distance_mm * count
+        )
+
     def __str__(self) -> str:
         return self.to_dhms()
 
@@ -117,42 +157,146 @@ class TimeEstimator:
 
     Предположения:
     - 3-осевой станок с линейными осями
-    - Все оси имеют одинаковую максимальную скорость и ускорение
+    - Если не заданы ограничения по осям, все оси имеют одинаковую
+      максимальную скорость и ускорение
     - Время на каждом слое примерно одинаковое
+    - Без планировщика каждое перемещение начинается и заканчивается
+      с нулевой скоростью
+
+    Ограничения по осям (axis_max_speed, axis_acceleration) задают скорость
+    и ускорение каждой оси отдельно: перемещение ограничивается самой
+    медленной осью с учётом проекции направления на неё (например, удары
+    по Z считаются с ускорением оси Z, а не X/Y).
+
+    Режим планировщика (planner=True) учитывает сопряжение соседних
+    перемещений: скорость в стыке ограничивается отклонением junction_deviation,
+    а торможение планируется на lookahead перемещений вперёд.
 
     Оптимизация:
         total_time = layer_time × (amount_layers + amount_virtual_layers)
     """
 
     def __init__(self, speed_mm_per_min: float,
-                 acceleration: float = ACCEL_LINEAR_DEFAULT):
+                 acceleration: float = ACCEL_LINEAR_DEFAULT,
+                 planner: bool = False,
+                 junction_deviation: float = JUNCTION_DEVIATION_DEFAULT,
+                 lookahead: int = LOOKAHEAD_DEFAULT,
+                 axis_max_speed: Optional[Dict[str, float]] = None,
+                 axis_acceleration: Optional[Dict[str, float]] = None,
+                 memo_size: int = LAYER_MEMO_SIZE_DEFAULT):
         """
         Args:
             speed_mm_per_min: Скорость перемещения в мм/мин (параметр F)
-            acceleration: Ускорение в мм/с² (по умолчанию 300)
+            acceleration: Ускорение в мм/с² (по умолчанию 300), используется
+                для осей, которых нет в axis_acceleration
+            planner: Учитывать сопряжение перемещений (look-ahead планировщик)
+            junction_deviation: Отклонение в стыке перемещений в мм (для planner)
+            lookahead: Размер буфера планировщика в перемещениях (для planner)
+            axis_max_speed: Максимальные скорости осей {'X': .., 'Y': .., 'Z': ..} в мм/мин
+            axis_acceleration: Ускорения осей {'X': .., 'Y': .., 'Z': ..} в мм/с²
+            memo_size: Размер LRU-кэша оценок слоёв по сигнатуре (0 — без кэша)
         """
         self._speed_mm_per_min = speed_mm_per_min
         self._speed_mm_per_sec = speed_mm_per_min / 60.0
         self._acceleration = acceleration
+        self._planner = planner
+        self._junction_deviation = junction_deviation
+        self._lookahead = lookahead
+        self._axis_max_speed = dict(axis_max_speed or {})
+        self._axis_acceleration = dict(axis_acceleration or {})
+        self._has_axis_limits = bool(self._axis_max_speed or self._axis_acceleration)
+        self._memo_size = memo_size
+        self._layer_memo = OrderedDict()
+        self._memo_hits = 0
+        self._memo_misses = 0
+
+    def _axis_limits(self, dx: float, dy: float, dz: float, distance: float,
+                     speed: float):
+        """
+        Ограничивает скорость и ускорение перемещения самой медленной осью.
+
+        Args:
+            dx, dy, dz: Смещения по осям в мм
+            distance: Длина перемещения в мм
+            speed: Скорость из команды в мм/с
 
-    def estimate_layer(self, commands: List[GCodeCommand]) -> TimeEstimate:
+        Returns:
+            Кортеж (скорость в мм/с, ускорение в мм/с²)
+        """
+        acceleration = math.inf if self._axis_acceleration else self._acceleration
+        for axis, d in (('X', dx), ('Y', dy), ('Z', dz)):
+            if d == 0:
+                continue
+            ratio = distance / abs(d)
+            if self._axis_acceleration:
+                acceleration = min(acceleration,
+                                   self._axis_acceleration.get(axis, self._acceleration) * ratio)
+            if axis in self._axis_max_speed:
+                speed = min(speed, self._axis_max_speed[axis] / 60.0 * ratio)
+        return speed, acceleration
+
+    def _move_time(self, dx: float, dy: float, dz: float, distance: float,
+                   feed: Optional[float]) -> float:
+        """Время перемещения длиной distance > 0 без сопряжения (feed — F команды или None)."""
+        # Используем скорость из команды, если задана
+        speed = feed / 60.0 if feed is not None else self._speed_mm_per_sec
+        if self._has_axis_limits:
+            speed, acceleration = self._axis_limits(dx, dy, dz, distance, speed)
+        else:
+            acceleration = self._acceleration
+        return _time_for_move(distance, speed, acceleration)
+
+    def move_seconds(self, dx: float, dy: float, dz: float,
+                     feed: Optional[float] = None) -> float:
+        """
+        Время одного перемещения, начинающегося и заканчивающегося остановкой
+        (как в estimate_layer без планировщика).
+
+        Args:
+            dx, dy, dz: Смещения по осям в мм
+            feed: Скорость F команды в мм/мин (None — скорость по умолчанию)
+
+        Returns:
+            Время в секундах
+        """
+        distance = math.sqrt(dx*dx + dy*dy + dz*dz)
+        return self._move_time(dx, dy, dz, distance, feed) if distance > 0 else 0.0
+
+    def estimate_layer(self, commands: List[GCodeCommand],
+                       start: Position = (0.0, 0.0, 0.0)) -> TimeEstimate:
         """
         Оценивает время выполнения одного слоя.
 
         Args:
             commands: Список команд слоя
+            start: Позиция станка перед слоем (по умолчанию начало координат)
 
         Returns:
             TimeEstimate с оценкой времени
         """
+        return self._estimate_layer_from(commands, start)[0]
+
+    def _estimate_layer_from(self, commands: List[GCodeCommand],
+                             start: Position) -> Tuple[TimeEstimate, Position]:
+        """
+        Оценивает время слоя, начиная с позиции start.
+
+        Args:
+            commands: Список команд слоя
+            start: Позиция станка перед слоем
+
+        Returns:
+            Кортеж (TimeEstimate, позиция станка после слоя)
+        """
+        if self._planner and self._acceleration > 0:
+            return self._estimate_layer_planned(commands, start)
+
         total_time = 0.0
         total_pause_ms = 0.0
         total_distance = 0.0
 
-        # Текущая позиция (начинаем с нуля)
-        current_x = 0.0
-        current_y = 0.0
-        current_z = 0.0
+        # Текущая позиция
+        current_x, current_y, current_z = start
 
         for cmd in commands:
             if isinstance(cmd, MoveCommand):
@@ -169,14 +313,7 @@ class TimeEstimator:
 
                 if distance > 0:
                     total_distance += distance
-                    # Используем скорость из команды, если задана
-                    if cmd.f is not None:
-                        speed = cmd.f / 60.0
-                    else:
-                        speed = self._speed_mm_per_sec
-                    move_time = _time_for_move(distance, speed,
-                                               self._acceleration)
-                    total_time += move_time
+                    total_time += self._move_time(dx, dy, dz, distance, cmd.f)
 
                 # Обновляем текущую позицию
                 current_x = new_x
@@ -196,7 +333,34 @@ class TimeEstimator:
             movement_seconds=movement_seconds,
             pause_seconds=pause_seconds,
             total_distance_mm=total_distance
-        )
+        ), (current_x, current_y, current_z)
+
+    def _estimate_layer_planned(self, commands: List[GCodeCommand],
+                                start: Position) -> Tuple[TimeEstimate, Position]:
+        """
+        Оценивает время слоя с учётом сопряжения перемещений.
+
+        Args:
+            commands: Список команд слоя
+            start: Позиция станка перед слоем
+
+        Returns:
+            Кортеж (TimeEstimate, позиция станка после слоя)
+        """
+        cols = layer_columns(commands, self._speed_mm_per_sec, self._acceleration,
+                             self._axis_max_speed, self._axis_acceleration, start)
+        entry_speed2 = plan_entry_speeds(cols, self._junction_deviation, self._lookahead)
+        movement_seconds = float(planned_move_times(cols, entry_speed2).sum())
+        pause_seconds = cols.pause_ms / 1000.0
+        total_time = movement_seconds + pause_seconds
+
+        return TimeEstimate(
+            total_seconds=total_time,
+            layer_seconds=total_time,
+            movement_seconds=movement_seconds,
+            pause_seconds=pause_seconds,
+            total_distance_mm=float(cols.length.sum())
+        ), cols.end
 
     def estimate_total(self, layer_commands: List[GCodeCommand],
                        total_layers: int) -> TimeEstimate:
@@ -248,50 +412,141 @@ class TimeEstimator:
         layer_estimate = self.estimate_layer(first_layer.commands)
 
         # Умножаем на количество всех слоёв
-        return TimeEstimate(
-            total_seconds=layer_estimate.total_seconds * total_layers,
-            layer_seconds=layer_estimate.layer_seconds,
-            movement_seconds=layer_estimate.movement_seconds * total_layers,
-            pause_seconds=layer_estimate.pause_seconds * total_layers,
-            total_distance_mm=layer_estimate.total_distance_mm * total_layers
-        )
+        return layer_estimate.repeated(total_layers)
 
     def estimate_from_layers(self, layers: List[Layer]) -> TimeEstimate:
         """
         Оценивает время по списку слоёв.
 
-        УСТАРЕЛО: Используйте estimate_by_one_layer() для лучшей производительности.
-
         Более точный метод — суммирует время каждого слоя.
         Полезно если слои различаются (например, разная глубина пробивки).
 
+        Каждый слой начинается в позиции, где закончился предыдущий (первый —
+        в начале координат). Слои с одинаковой сигнатурой (Layer.signature)
+        и одинаковым положением относительно предыдущего слоя отличаются
+        только сдвигом по Z, поэтому считаются один раз через LRU-кэш:
+        стоимость оценки определяется количеством различающихся слоёв.
+
         Args:
             layers: Список объектов Layer
 
         Returns:
             TimeEstimate с общей оценкой
         """
-        if not layers:
-            return TimeEstimate(0, 0, 0, 0, 0)
+        running = self.running()
+        for layer in layers:
+            running.add(layer)
+        return running.result()
 
-        total_seconds = 0.0
-        total_movement = 0.0
-        total_pause = 0.0
-        total_distance = 0.0
+    def running(self) -> 'RunningEstimate':
+        """
+        Создаёт накопитель оценки для слоёв, поступающих по одному
+        (см. RunningEstimate). Итог совпадает с estimate_from_layers.
+        """
+        return RunningEstimate(self)
 
-        for layer in layers:
-            layer_est = self.estimate_layer(layer.commands)
-            total_seconds += layer_est.total_seconds
-            total_movement += layer_est.movement_seconds
-            total_pause += layer_est.pause_seconds
-            total_distance += layer_est.total_distance_mm
+    def _estimate_layer_memoized(self, layer: Layer,
+                                 start: Position) -> Tuple[TimeEstimate, Position]:
+        """
+        Оценивает время слоя с использованием кэша по сигнатуре.
+
+        Ключ кэша — сигнатура слоя и начальная позиция относительно Z первой
+        команды слоя (позиции укладки), поэтому сдвиг слоя по Z не мешает
+        найти его в кэше.
+
+        Args:
+            layer: Слой
+            start: Позиция станка перед слоем
+
+        Returns:
+            Кортеж (TimeEstimate, позиция станка после слоя)
+        """
+        anchor = _first_z(layer.commands)
+        if layer.signature is None or anchor is None or self._memo_size <= 0:
+            return self._estimate_layer_from(layer.commands, start)
+
+        key = (layer.signature, start[0], start[1], round(start[2] - anchor, 6))
+        cached = self._layer_memo.get(key)
+        if cached is not None:
+            self._memo_hits += 1
+            self._layer_memo.move_to_end(key)
+            estimate, (end_x, end_y, end_dz) = cached
+            return estimate, (end_x, end_y, anchor + end_dz)
+
+        self._memo_misses += 1
+        estimate, end = self._estimate_layer_from(layer.commands, start)
+        self._layer_memo[key] = (estimate, (end[0], end[1], end[2] - anchor))
+        if len(self._layer_memo) > self._memo_size:
+            self._layer_memo.popitem(last=False)
+        return estimate, end
+
+    def memo_info(self) -> LayerMemoInfo:
+        """Возвращает статистику кэша оценок слоёв."""
+        return LayerMemoInfo(self._memo_hits, self._memo_misses,
+                             self._memo_size, len(self._layer_memo))
+
+    def memo_clear(self) -> None:
+        """Очищает кэш оценок слоёв и статистику."""
+        self._layer_memo.clear()
+        self._memo_hits = 0
+        self._memo_misses = 0
+
+
+class RunningEstimate:
+    """
+    Накопление оценки времени по мере генерации слоёв.
+
+    Позволяет считать точное время, не держа в памяти все слои:
+    каждый слой передаётся в add сразу после генерации.
+    """
+
+    def __init__(self, estimator: TimeEstimator):
+        """
+        Args:
+            estimator: TimeEstimator (его кэш слоёв используется при оценке)
+        """
+        self._estimator = estimator
+        self._position = (0.0, 0.0, 0.0)
+        self.layers = 0
+        self.total_seconds = 0.0
+        self.movement_seconds = 0.0
+        self.pause_seconds = 0.0
+        self.total_distance_mm = 0.0
+
+    def add(self, layer: Layer) -> TimeEstimate:
+        """
+        Добавляет слой, начинающийся там, где закончился предыдущий.
 
-        layer_avg = total_seconds / len(layers)
+        Args:
+            layer: Слой
 
+        Returns:
+            TimeEstimate этого слоя
+        """
+        estimate, self._position = self._estimator._estimate_layer_memoized(layer, self._position)
+        self.layers += 1
+        self.total_seconds += estimate.total_seconds
+        self.movement_seconds += estimate.movement_seconds
+        self.pause_seconds += estimate.pause_seconds
+        self.total_distance_mm += estimate.total_distance_mm
+        return estimate
+
+    def result(self) -> TimeEstimate:
+        """Возвращает оценку всех добавленных слоёв."""
+        if not self.layers:
+            return TimeEstimate(0, 0, 0, 0, 0)
         return TimeEstimate(
-            total_seconds=total_seconds,
-            layer_seconds=layer_avg,
-            movement_seconds=total_movement,
-            pause_seconds=total_pause,
-            total_distance_mm=total_distance
+            total_seconds=self.total_seconds,
+            layer_seconds=self.total_seconds / self.layers,
+            movement_seconds=self.movement_seconds,
+            pause_seconds=self.pause_seconds,
+            total_distance_mm=self.total_distance_mm
         )
+
+
+def _first_z(commands: List[GCodeCommand]) -> Optional[float]:
+    """Возвращает Z первой команды перемещения с заданным Z."""
+    for cmd in commands:
+        if isinstance(cmd, MoveCommand) and cmd.z is not None:
+            return cmd.z
+    return None
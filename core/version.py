@@ -0,0 +1,5 @@
+"""
+Версия программы (заголовок окна, журнал генераций).
+"""
+
+VERSION = '1.12.0'
@@ -0,0 +1,584 @@
+"""
+Дифференциальная проверка способов генерации на случайных параметрах.
+
+Все ускоренные способы вывода (генерация по одному слою, шаблоны ударов,
+однопроходная запись, фоновая запись, разбиение на части, отправка на
+контроллер) должны давать те же команды, что исходный способ: все слои
+исходным циклом генератора (baseline_layers — копия цикла первой версии,
+не использующая ускоренный код CommandGenerator) и запись через GCodeFormatter.
+
+Проверка генерирует случайные допустимые параметры задания (с фиксированным
+зерном — результат воспроизводим), прогоняет исходный и каждый ускоренный
+способ и сравнивает разобранные команды (decode_command). Параметры, на
+которых способы расходятся, упрощаются до минимального воспроизводящего
+набора (уменьшаются количества, отключаются опции).
+
+Запуск:
+    python fuzz_engines.py --samples 200 --seed 1 --seconds 60
+
+Содержит:
+- FuzzCase — параметры задания и слой начала
+- Mismatch — расхождение способа с исходным
+- FuzzResult — итог проверки
+- baseline_layers — слои исходным циклом генератора
+- ENGINES — проверяемые способы
+- random_case — случайные допустимые параметры
+- compare_engines — сравнение способов на одном наборе параметров
+- shrink_case — упрощение параметров с расхождением
+- fuzz — проверка на серии случайных параметров
+"""
+
+import argparse
+import copy
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core import (
+    CommandGenerator,
+    GCodeFormatter,
+    Layer,
+    PauseCommand,
+    decode_command,
+    generate_G_codes_file,
+    iter_gcode_commands,
+    program_lines,
+    write_single_pass,
+)
+from core.command_generator import r
+from core.geometry import get_ordered_list_of_rows
+
+# Имя головы в случайных параметрах
+FUZZ_HEAD = 'Игольница_fuzz'
+
+ORDERS = ["По очереди", "Сначала чётные", "Сначала нечётные", "Из центра", "В центр"]
+SOUND_MODES = ["Непрерывный", "Прерывистый", "Частый прерывистый"]
+FRAME_TYPES = ["По шагам головы", "По габаритам"]
+
+# Команда в виде слов: {'G': 1, 'X': 10.5, ...}
+Command = Dict[str, Any]
+
+
+@dataclass
+class FuzzCase:
+    """
+    Набор параметров для проверки.
+
+    Attributes:
+        config: Словарь параметров задания
+        start_layer: Номер первого слоя (см. generate_G_codes_file)
+    """
+    config: Dict[str, Any]
+    start_layer: int = 1
+
+    def to_json(self) -> str:
+        """Параметры в виде json (воспроизведение расхождения)."""
+        return json.dumps({'start_layer': self.start_layer, 'config': self.config},
+                          ensure_ascii=False, indent=2)
+
+
+@dataclass
+class Mismatch:
+    """
+    Расхождение способа генерации с исходным.
+
+    Attributes:
+        engine: Способ генерации
+        index: Номер первой различающейся команды (с 0)
+        expected: Команда исходного способа (None — команды закончились)
+        actual: Команда проверяемого способа (None — команды закончились)
+        error: Исключение проверяемого способа
+    """
+    engine: str
+    index: int = 0
+    expected: Optional[Command] = None
+    actual: Optional[Command] = None
+    error: Optional[str] = None
+
+    def describe(self) -> str:
+        """Описание расхождения одной строкой."""
+        if self.error is not None:
+            return f'{self.engine}: ошибка {self.error}'
+        return f'{self.engine}: команда {self.index}: ожидалось {self.expected}, получено {self.actual}'
+
+
+@dataclass
+class FuzzResult:
+    """
+    Итог проверки.
+
+    Attributes:
+        samples: Количество проверенных наборов параметров
+        seconds: Время проверки
+        failures: Пары (упрощённые параметры, расхождения на них)
+    """
+    samples: int = 0
+    seconds: float = 0.0
+    failures: List[Tuple[FuzzCase, List[Mismatch]]] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        """True если расхождений нет."""
+        return not self.failures
+
+
+def random_case(rng: random.Random) -> FuzzCase:
+    """
+    Случайные допустимые параметры задания (небольшие, чтобы проверка шла быстро).
+
+    Args:
+        rng: Генератор случайных чисел
+
+    Returns:
+        FuzzCase
+    """
+    auto_pattern = rng.random() < 0.7
+    nx, ny = rng.randint(1, 6), rng.randint(1, 6)
+    layers, virtual_layers = rng.randint(1, 5), rng.randint(0, 3)
+    config = {
+        "Количество слоёв": layers,
+        "Количество пустых слоёв": virtual_layers,
+        "Толщина слоя (мм)": rng.choice([0.5, 0.82, 1.0, 1.37]),
+        "Расстояние от каркаса до головы перед ударом (мм)": rng.choice([10, 30, 12.5]),
+        "Скорость (мм/мин)": {
+            "Движение осей X и Y": rng.choice([1500, 3000, 6000]),
+            "Внедрение игл по Z": rng.choice([1000, 3000]),
+            "Извлечение игл по Z": rng.choice([1000, 3000]),
+        },
+        "Ускорение осей станка (мм/с²)": rng.choice([100, 300]),
+        "Пробивка": {
+            "Пробивка с нарастанием глубины": rng.random() < 0.5,
+            "Начальная глубина удара (мм)": rng.choice([2, 4.5, 8]),
+            "Глубина удара (мм)": rng.choice([10, 18, 20.5]),
+        },
+        "Параметры паттерна": {
+            "Автоматическое определение формы паттерна": auto_pattern,
+            "nx": nx,
+            "ny": ny,
+            "Кол-во ударов": rng.randint(1, 12) if auto_pattern else rng.randint(1, nx * ny),
+        },
+        "Позиция при ручной укладки слоя": {
+            "X": rng.choice([0, 50, -20.5]),
+            "Y": rng.choice([-400, 0, 120]),
+            "Z": rng.choice([100, 60.3]),
+            "Пауза в конце слоя (сек)": rng.choice([0, 0, 2, 10]),
+            "Звуковой сигнал (сек)": rng.choice([0, 0, 1, 3]),
+            "Режим звукового сигнала": {"value": rng.choice(SOUND_MODES), "options": SOUND_MODES},
+            "Рост Z с каждым слоем": rng.random() < 0.7,
+        },
+        "Расстояние между иглами (мм)": {"X": 8.0, "Y": 8.0},
+        "Количество шагов головы": {"X": rng.randint(1, 4), "Y": rng.randint(1, 5)},
+        "Габариты каркаса": {"X": round(rng.uniform(10, 120), 1),
+                             "Y": round(rng.uniform(10, 120), 1)},
+        "Случайный порядок ударов": rng.random() < 0.3,
+        "Случайные смещения": rng.random() < 0.3,
+        "Коэффициент случайных смещений": rng.choice([0.15, 0.5]),
+        "Чередование направлений прохода слоя": rng.random() < 0.5,
+        "Смена осей X↔Y": rng.random() < 0.3,
+        "Создание файла на рабочем столе": False,
+        "Автоматическая генерация имени файла": False,
+        "Имя файла": "fuzz.tap",
+        "Порядок прохождения рядов": {"value": rng.choice(ORDERS), "options": ORDERS},
+        "Задание размеров каркаса": {"value": rng.choice(FRAME_TYPES), "options": FRAME_TYPES},
+        "Игольницы (ИП головы)": {
+            FUZZ_HEAD: {
+                "X": rng.randint(1, 6),
+                "Y": rng.randint(1, 6),
+                "needle_spacing_x": rng.choice([8.0, 6.5, 10.0]),
+                "needle_spacing_y": rng.choice([8.0, 7.5]),
+                "path": "",
+            }
+        },
+        "Выбранная игольница (ИП игольница)": FUZZ_HEAD,
+        # Фиксированное зерно: результат не зависит от запуска
+        "Зерно случайности": rng.randint(1, 2 ** 31 - 1),
+    }
+    start_layer = rng.randint(1, layers + virtual_layers) if rng.random() < 0.3 else 1
+    return FuzzCase(config, start_layer)
+
+
+# --- способы генерации: параметры -> команды файла ---
+
+def _file_commands(*paths: str) -> List[Command]:
+    """Разобранные команды файлов (по порядку)."""
+    return [decode_command(command.decode('ascii'))
+            for path in paths for _, _, command in iter_gcode_commands(path)]
+
+
+def _write_with_formatter(path: str, generator: CommandGenerator, layers,
+                          start_layer: int) -> None:
+    """Записывает слои через GCodeFormatter, как generate_G_codes_file."""
+    with open(path, 'w', encoding='utf-8') as f:
+        formatter = GCodeFormatter(f, generator.amount_layers)
+        formatter.write_prehead(generator.get_prehead_params(start_layer=start_layer))
+        if start_layer > 1:
+            formatter.write_reentry(generator.reentry_commands(start_layer), start_layer)
+        for layer in layers:
+            formatter.write_layer(layer)
+
+
+def baseline_layers(generator: CommandGenerator, start_layer: int = 1) -> List[Layer]:
+    """
+    Слои исходным циклом генератора (копия цикла первой версии CommandGenerator).
+
+    Эталон не зависит от ускорений генератора: каждая команда создаётся
+    заново по рядам, шагам и ударам, окно паттерна сдвигается от первого
+    слоя, а слои до start_layer строятся и отбрасываются. Из CommandGenerator
+    берутся только параметры задания, паттерн (pattern_offsets), случайные
+    смещения слоя (layer_jitter) и звуковой сигнал.
+
+    Args:
+        generator: Генератор команд задания
+        start_layer: Номер первого возвращаемого слоя (с 1)
+
+    Returns:
+        Список Layer (слои start_layer..последний)
+    """
+    g = generator
+    layers = []
+    offset_list = g.pattern_offsets()
+    rows = get_ordered_list_of_rows(g.num_row_y, g.order)
+
+    start_hit = 0
+    finish_hit = g.num_pitch
+    for layer_idx in range(g.amount_layers + g.amount_virtual_layers):
+        commands = []
+        z_offset = g.layer_thickness * layer_idx
+        if g.is_progressive_depth:
+            needle_depth = min(g.initial_depth + g.layer_thickness * layer_idx, g.max_depth)
+        else:
+            needle_depth = g.max_depth
+        z_layer_position = (g.layer_laying_position_z + z_offset
+                            if g.is_growing_z else g.layer_laying_position_z)
+
+        commands.append(g._move_cmd(z=r(z_layer_position), f=g.speed_z_extract))
+        commands.append(g._move_cmd(x=r(g.layer_laying_position_x),
+                                    y=r(g.layer_laying_position_y), f=g.speed_xy))
+
+        is_reversed = g.is_rotation_direction and (layer_idx + 1) % 2
+        offset_range = offset_list[start_hit:finish_hit]
+        if is_reversed:
+            offset_range = list(reversed(offset_range))
+        if g.is_random_offsets:
+            jitter = iter(g.layer_jitter(layer_idx, len(rows) * g.num_step_x * len(offset_range)))
+        for row in rows:
+            y = g.head_width_y * row
+            step_range = list(range(g.num_step_x))
+            if is_reversed:
+                step_range = list(reversed(step_range))
+            for step in step_range:
+                x = g.head_width_x * step
+                for offs_x, offs_y in offset_range:
+                    current_x = x + offs_x
+                    current_y = y + offs_y
+                    if g.is_random_offsets:
+                        jitter_x, jitter_y = next(jitter)
+                        current_x += jitter_x
+                        current_y += jitter_y
+                    commands.append(g._move_cmd(x=r(current_x), y=r(current_y), f=g.speed_xy))
+                    commands.append(g._move_cmd(z=r(z_offset - needle_depth), f=g.speed_z_insert))
+                    commands.append(g._move_cmd(z=r(g.dist_to_material + z_offset),
+                                                f=g.speed_z_extract))
+
+        commands.append(g._move_cmd(z=r(z_layer_position), f=g.speed_z_extract))
+        commands.append(g._move_cmd(x=r(g.layer_laying_position_x),
+                                    y=r(g.layer_laying_position_y), f=g.speed_xy))
+
+        pause_sec = max(g.pause, g.sound_signal_duration)
+        if g.sound_signal_duration > 0:
+            commands.extend(g._generate_sound_signal(g.sound_signal_duration))
+            if pause_sec - g.sound_signal_duration > 0:
+                commands.append(PauseCommand(milliseconds=(pause_sec - g.sound_signal_duration) * 1000))
+        else:
+            commands.append(PauseCommand(milliseconds=pause_sec * 1000))
+
+        if layer_idx + 1 >= start_layer:
+            layers.append(Layer(layer_number=layer_idx + 1,
+                                is_virtual=layer_idx >= g.amount_layers, commands=commands))
+
+        if finish_hit < len(offset_list):
+            start_hit += g.num_pitch
+            finish_hit += g.num_pitch
+        else:
+            start_hit = 0
+            finish_hit = g.num_pitch
+    return layers
+
+
+def reference_engine(case: FuzzCase, tmp: str) -> List[Command]:
+    """Исходный способ: слои исходным циклом, запись через GCodeFormatter."""
+    generator = CommandGenerator(case.config)
+    path = os.path.join(tmp, 'reference.tap')
+    _write_with_formatter(path, generator, baseline_layers(generator, case.start_layer),
+                          case.start_layer)
+    return _file_commands(path)
+
+
+def _iter_layers_engine(reuse_hits: bool) -> Callable[[FuzzCase, str], List[Command]]:
+    def engine(case: FuzzCase, tmp: str) -> List[Command]:
+        generator = CommandGenerator(case.config)
+        path = os.path.join(tmp, 'iter.tap')
+        layers = generator.iter_layers(start_layer=case.start_layer, reuse_hits=reuse_hits)
+        _write_with_formatter(path, generator, layers, case.start_layer)
+        return _file_commands(path)
+    return engine
+
+
+def _single_pass_engine(case: FuzzCase, tmp: str) -> List[Command]:
+    path = os.path.join(tmp, 'single_pass.tap')
+    write_single_pass(path, CommandGenerator(case.config), start_layer=case.start_layer,
+                      reuse_hits=not case.config["Случайные смещения"], background_write=True)
+    return _file_commands(path)
+
+
+def _file_engine(case: FuzzCase, tmp: str) -> List[Command]:
+    path = os.path.join(tmp, 'file.tap')
+    generate_G_codes_file(case.config, lambda x: None, output_path=path,
+                          start_layer=case.start_layer, telemetry_path='')
+    return _file_commands(path)
+
+
+def _split_engine(case: FuzzCase, tmp: str) -> List[Command]:
+    result = generate_G_codes_file(case.config, lambda x: None,
+                                   output_path=os.path.join(tmp, 'split.tap'),
+                                   start_layer=case.start_layer, split_layers=2,
+                                   telemetry_path='')
+    return _file_commands(*result['parts'])
+
+
+def _sender_engine(case: FuzzCase, tmp: str) -> List[Command]:
+    generator = CommandGenerator(case.config)
+    return [decode_command(line) for _, line in program_lines(generator, start_layer=case.start_layer)]
+
+
+# Проверяемые способы: имя — функция (параметры, временная папка) -> команды
+ENGINES: Dict[str, Callable[[FuzzCase, str], List[Command]]] = {
+    'streaming': _iter_layers_engine(reuse_hits=False),
+    'template': _iter_layers_engine(reuse_hits=True),
+    'single_pass': _single_pass_engine,
+    'file': _file_engine,
+    'split': _split_engine,
+    'sender': _sender_engine,
+}
+
+
+def compare_engines(case: FuzzCase,
+                    engines: Optional[Dict[str, Callable]] = None) -> List[Mismatch]:
+    """
+    Сравнивает команды каждого способа с исходным.
+
+    Args:
+        case: Параметры задания
+        engines: Проверяемые способы (по умолчанию ENGINES)
+
+    Returns:
+        Список расхождений (пустой — способы совпадают). random_case даёт
+        только допустимые параметры, поэтому ошибка исходного способа —
+        тоже расхождение (способ 'reference')
+    """
+    if engines is None:
+        engines = ENGINES
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            expected = reference_engine(case, tmp)
+        except Exception as e:
+            return [Mismatch('reference', error=f'{type(e).__name__}: {e}')]
+
+        mismatches = []
+        for name, engine in engines.items():
+            try:
+                actual = engine(case, tmp)
+            except Exception as e:
+                mismatches.append(Mismatch(name, error=f'{type(e).__name__}: {e}'))
+                continue
+            if actual == expected:
+                continue
+            index = next((i for i, (a, b) in enumerate(zip(expected, actual)) if a != b),
+                         min(len(expected), len(actual)))
+            mismatches.append(Mismatch(
+                name, index,
+                expected[index] if index < len(expected) else None,
+                actual[index] if index < len(actual) else None,
+            ))
+        return mismatches
+
+
+# --- упрощение параметров ---
+
+# Целые параметры: путь в словаре и наименьшее значение
+_INT_KNOBS = [
+    (("Количество слоёв",), 1),
+    (("Количество пустых слоёв",), 0),
+    (("Количество шагов головы", "X"), 1),
+    (("Количество шагов головы", "Y"), 1),
+    (("Игольницы (ИП головы)", FUZZ_HEAD, "X"), 1),
+    (("Игольницы (ИП головы)", FUZZ_HEAD, "Y"), 1),
+    (("Параметры паттерна", "Кол-во ударов"), 1),
+    (("Параметры паттерна", "nx"), 1),
+    (("Параметры паттерна", "ny"), 1),
+]
+
+# Остальные параметры: путь и простейшее значение
+_SIMPLE_VALUES = [
+    (("Случайный порядок ударов",), False),
+    (("Случайные смещения",), False),
+    (("Чередование направлений прохода слоя",), False),
+    (("Смена осей X↔Y",), False),
+    (("Пробивка", "Пробивка с нарастанием глубины"), False),
+    (("Позиция при ручной укладки слоя", "Рост Z с каждым слоем"), False),
+    (("Параметры паттерна", "Автоматическое определение формы паттерна"), True),
+    (("Позиция при ручной укладки слоя", "Пауза в конце слоя (сек)"), 0),
+    (("Позиция при ручной укладки слоя", "Звуковой сигнал (сек)"), 0),
+    (("Позиция при ручной укладки слоя", "Режим звукового сигнала", "value"), SOUND_MODES[0]),
+    (("Порядок прохождения рядов", "value"), ORDERS[0]),
+    (("Задание размеров каркаса", "value"), FRAME_TYPES[0]),
+    (("Позиция при ручной укладки слоя", "X"), 0),
+    (("Позиция при ручной укладки слоя", "Y"), 0),
+    (("Толщина слоя (мм)",), 1.0),
+    (("Игольницы (ИП головы)", FUZZ_HEAD, "needle_spacing_x"), 8.0),
+    (("Игольницы (ИП головы)", FUZZ_HEAD, "needle_spacing_y"), 8.0),
+]
+
+
+def _get(config: Dict[str, Any], path: Tuple[str, ...]) -> Any:
+    for key in path:
+        config = config[key]
+    return config
+
+
+def _with(case: FuzzCase, path: Tuple[str, ...], value: Any) -> FuzzCase:
+    """Копия параметров с изменённым значением."""
+    config = copy.deepcopy(case.config)
+    target = config
+    for key in path[:-1]:
+        target = target[key]
+    target[path[-1]] = value
+    return FuzzCase(config, case.start_layer)
+
+
+def _simpler_cases(case: FuzzCase):
+    """Кандидаты на упрощение: от сильного к слабому."""
+    if case.start_layer > 1:
+        yield FuzzCase(case.config, 1)
+        yield FuzzCase(case.config, case.start_layer - 1)
+    for path, minimum in _INT_KNOBS:
+        value = _get(case.config, path)
+        for smaller in sorted({minimum, (value + minimum) // 2, value - 1}):
+            if minimum <= smaller < value:
+                yield _with(case, path, smaller)
+    for path, simple in _SIMPLE_VALUES:
+        if _get(case.config, path) != simple:
+            yield _with(case, path, simple)
+
+
+def shrink_case(case: FuzzCase, fails: Callable[[FuzzCase], bool],
+                max_attempts: int = 500) -> FuzzCase:
+    """
+    Упрощает параметры, пока расхождение сохраняется.
+
+    Жадно применяет упрощения (меньше слоёв, шагов, ударов; опции
+    выключены; перечисления — первое значение), пока ни одно не сохраняет
+    расхождение или не исчерпаны попытки.
+
+    Args:
+        case: Параметры с расхождением
+        fails: Проверка: True если на параметрах есть расхождение
+        max_attempts: Наибольшее количество проверок
+
+    Returns:
+        Упрощённые параметры
+    """
+    attempts = 0
+    improved = True
+    while improved and attempts < max_attempts:
+        improved = False
+        for candidate in _simpler_cases(case):
+            total_layers = (candidate.config["Количество слоёв"]
+                            + candidate.config["Количество пустых слоёв"])
+            if candidate.start_layer > total_layers:
+                continue
+            attempts += 1
+            if fails(candidate):
+                case = candidate
+                improved = True
+                break
+            if attempts >= max_attempts:
+                break
+    return case
+
+
+def fuzz(samples: int = 100, seed: int = 0, seconds: float = 0.0,
+         engines: Optional[Dict[str, Callable]] = None,
+         max_failures: int = 1) -> FuzzResult:
+    """
+    Проверяет способы генерации на серии случайных параметров.
+
+    Args:
+        samples: Наибольшее количество наборов параметров
+        seed: Зерно генератора параметров (одинаковое зерно — одинаковая серия)
+        seconds: Ограничение времени (0 — без ограничения); проверка
+            заканчивается после набора, на котором время истекло
+        engines: Проверяемые способы (по умолчанию ENGINES)
+        max_failures: После скольких расхождений остановиться
+
+    Returns:
+        FuzzResult с упрощёнными параметрами каждого расхождения
+    """
+    rng = random.Random(seed)
+    result = FuzzResult()
+    start = time.perf_counter()
+    for _ in range(samples):
+        if seconds and time.perf_counter() - start > seconds:
+            break
+        case = random_case(rng)
+        result.samples += 1
+        mismatches = compare_engines(case, engines)
+        if not mismatches:
+            continue
+
+        failing = {mismatch.engine for mismatch in mismatches}
+        only = {name: engine for name, engine in (engines or ENGINES).items() if name in failing}
+
+        def fails(candidate):
+            # Упрощение не должно менять расхождение на другое (например,
+            # на ошибку исходного способа при недопустимых параметрах)
+            return bool(failing & {mismatch.engine for mismatch in compare_engines(candidate, only)})
+
+        case = shrink_case(case, fails)
+        result.failures.append((case, compare_engines(case, only)))
+        if len(result.failures) >= max_failures:
+            break
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def main():
+    """Запуск проверки из командной строки."""
+    parser = argparse.ArgumentParser(description='Сравнение способов генерации на случайных параметрах')
+    parser.add_argument('--samples', type=int, default=200, help='количество наборов параметров')
+    parser.add_argument('--seed', type=int, default=0, help='зерно генератора параметров')
+    parser.add_argument('--seconds', type=float, default=0, help='ограничение времени (с)')
+    parser.add_argument('--max-failures', type=int, default=1,
+                        help='после скольких расхождений остановиться')
+    args = parser.parse_args()
+
+    # Предупреждения генератора о параметрах (сигнал длиннее паузы и т.п.) ожидаемы
+    logging.getLogger('core').setLevel(logging.ERROR)
+    result = fuzz(args.samples, args.seed, args.seconds, max_failures=args.max_failures)
+    print(f'Проверено наборов параметров: {result.samples} за {result.seconds:.1f} с')
+    for case, mismatches in result.failures:
+        print('\nРасхождение на параметрах:')
+        print(case.to_json())
+        for mismatch in mismatches:
+            print(f'  {mismatch.describe()}')
+    sys.exit(0 if result.ok else 1)
+
+
+if __name__ == '__main__':
+    main()
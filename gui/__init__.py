@@ -3,18 +3,16 @@ GUI модуль генератора G-кодов.
 
 Публичный API:
 - Приложение: GeneratorApp, AppState
-- Визуализация: show_visualization, VisualizationConfig
+
+Визуализация (gui.visualization) тянет plotly и pandas, поэтому
+импортируется при построении графика, а не при импорте gui.
 """
 
 from .app import GeneratorApp
 from .state import AppState
-from .visualization import show_visualization, VisualizationConfig
 
 __all__ = [
     # Приложение
     'GeneratorApp',
     'AppState',
-    # Визуализация
-    'show_visualization',
-    'VisualizationConfig',
 ]
@@ -9,7 +9,8 @@ from tkinter import Tk, Frame, BooleanVar, messagebox, N, S
 from gui.state import AppState
 from gui.data_manager import load_data_json, load_heads_json, migrate_heads_data
 from gui.widgets import (create_left_panel, create_right_panel_top,
-                         create_right_panel_bottom, create_order_combobox)
+                         create_right_panel_bottom, create_order_combobox,
+                         create_prediction_label)
 from gui.event_handlers import EventHandlers
 from gui.ui_helpers import centered_win, create_scrollable_frame
 
@@ -17,15 +18,16 @@ from gui.ui_helpers import centered_win, create_scrollable_frame
 class GeneratorApp:
     """Главный класс приложения генератора G-кодов."""
 
-    def __init__(self, master: Tk):
+    def __init__(self, master: Tk, job_server: str = ""):
         """
         Инициализирует приложение.
 
         Args:
             master: Главное окно Tkinter
+            job_server: Адрес сервиса генерации (пусто — генерация в этом процессе)
         """
         self.window = master
-        self.state = AppState()
+        self.state = AppState(job_server=job_server)
         self.handlers = None
 
         try:
@@ -135,6 +137,12 @@ class GeneratorApp:
         self.state.wd_left = {**self.state.wd_left, **wd_right_bottom}
         callbacks['filename_visibility']()
 
+        # Прогноз (время, размер, плотность, свесы) пересчитывается в фоне после изменений
+        self.state.wd_right["Лейбл прогноза"] = create_prediction_label(right_desk)
+        self.handlers.start_live_estimation(self.window)
+        for sequence in ('<KeyRelease>', '<ButtonRelease-1>', '<<ComboboxSelected>>'):
+            self.window.bind_all(sequence, callbacks['prediction'], add='+')
+
         # Настраиваем trace callbacks для автоматической смены видимости
         try:
             auto_var = self.state.wd_left["Параметры паттерна"]["Автоматическое определение формы паттерна"]
@@ -168,3 +176,5 @@ class GeneratorApp:
     def run(self):
         """Запускает главный цикл приложения."""
         self.window.mainloop()
+        if self.handlers is not None and self.handlers.live_estimator is not None:
+            self.handlers.live_estimator.close()
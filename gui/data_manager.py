@@ -29,12 +29,13 @@ def is_opened_file(filename):
     return False
 
 
-def recursion_saver(widget_dict):
+def recursion_saver(widget_dict, silent=False):
     """
     Рекурсивно извлекает данные из словаря виджетов.
 
     Args:
         widget_dict: Словарь с виджетами (может быть вложенным)
+        silent: Не показывать сообщение об ошибке (для фоновых расчётов)
 
     Returns:
         Словарь с данными из виджетов
@@ -45,7 +46,7 @@ def recursion_saver(widget_dict):
     data_dict = {}
     for section, item in widget_dict.items():
         if isinstance(item, dict):
-            data_dict[section] = recursion_saver(item)
+            data_dict[section] = recursion_saver(item, silent)
         elif isinstance(item, BooleanVar):
             data_dict[section] = bool(item.get())
         elif isinstance(item, Combobox):
@@ -65,6 +66,8 @@ def recursion_saver(widget_dict):
                     try:
                         data_dict[section] = float(item.get())
                     except ValueError:
+                        if silent:
+                            raise
                         print(section, item)
                         messagebox.showerror('Смотри, что пишешь!',  f'Значение {item.get()} параметра {section}  не является числом')
                         raise ValueError
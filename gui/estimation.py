@@ -0,0 +1,164 @@
+'''
+Фоновый пересчёт оценок в GUI.
+
+Содержит LiveEstimator — отложенный (debounce) расчёт в отдельном потоке:
+изменения полей копятся DEBOUNCE_MS, затем параметры считываются из виджетов
+в главном потоке, а расчёт выполняется в рабочем потоке, чтобы не
+подвешивать ввод. Устаревшие результаты отбрасываются, в главный поток
+через after() передаётся только результат для последних параметров.
+Тот же поток выполняет разовые расчёты (request) — например, проверки
+перед генерацией; они не отбрасываются.
+'''
+
+import queue
+import threading
+from collections import namedtuple
+from tkinter import TclError
+
+# Задержка после последнего изменения перед пересчётом (мс)
+DEBOUNCE_MS = 200
+
+# Разовый расчёт в рабочем потоке (см. LiveEstimator.request)
+_Task = namedtuple('_Task', 'compute params on_result on_error')
+
+
+class LiveEstimator:
+    """Отложенный фоновый расчёт с отбрасыванием устаревших результатов."""
+
+    def __init__(self, root, collect, compute, on_result, on_error=None,
+                 delay_ms=DEBOUNCE_MS):
+        """
+        Инициализирует расчёт и запускает рабочий поток.
+
+        Args:
+            root: Виджет Tk (для after/after_cancel)
+            collect: Функция без аргументов, считывающая параметры из виджетов
+                (вызывается в главном потоке)
+            compute: Функция расчёта compute(params) (вызывается в рабочем потоке)
+            on_result: Функция on_result(result) (вызывается в главном потоке)
+            on_error: Функция on_error(exception) при ошибке чтения или расчёта
+                (вызывается в главном потоке)
+            delay_ms: Задержка после последнего изменения в миллисекундах
+        """
+        self.root = root
+        self.collect = collect
+        self.compute = compute
+        self.on_result = on_result
+        self.on_error = on_error
+        self.delay_ms = delay_ms
+
+        self._after_id = None
+        self._generation = 0
+        self._requests = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def schedule(self, event=None):
+        """Откладывает пересчёт: каждый вызов переносит его на delay_ms."""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+        self._after_id = self.root.after(self.delay_ms, self._submit)
+
+    def request(self, compute, params, on_result, on_error=None):
+        """
+        Выполняет разовый расчёт в рабочем потоке (вызывается из главного потока).
+
+        В отличие от пересчёта по schedule, запрос не отбрасывается новыми
+        изменениями полей; результат передаётся в главный поток.
+
+        Args:
+            compute: Функция расчёта compute(params)
+            params: Параметры расчёта (не должны меняться после вызова)
+            on_result: Функция on_result(result) (вызывается в главном потоке)
+            on_error: Функция on_error(exception) при ошибке расчёта
+                (вызывается в главном потоке)
+        """
+        self._requests.put(_Task(compute, params, on_result, on_error))
+
+    def close(self):
+        """Останавливает рабочий поток."""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        self._generation += 1
+        self._requests.put(None)
+
+    def _submit(self):
+        """Считывает параметры и передаёт их рабочему потоку (главный поток)."""
+        self._after_id = None
+        self._generation += 1
+        try:
+            params = self.collect()
+        except Exception as e:
+            self._deliver(self._generation, None, e)
+            return
+        self._requests.put((self._generation, params))
+
+    def _run(self):
+        """Цикл рабочего потока."""
+        while True:
+            requests = [self._requests.get()]
+            while True:
+                try:
+                    requests.append(self._requests.get_nowait())
+                except queue.Empty:
+                    break
+            if None in requests:
+                return
+
+            # Разовые расчёты выполняются все, пересчёт — только самый свежий
+            latest = None
+            for request in requests:
+                if isinstance(request, _Task):
+                    if not self._run_task(request):
+                        return
+                else:
+                    latest = request
+            if latest is None:
+                continue
+
+            generation, params = latest
+            if generation != self._generation:
+                continue
+            result, error = None, None
+            try:
+                result = self.compute(params)
+            except Exception as e:
+                error = e
+            if generation == self._generation:
+                try:
+                    self.root.after(0, self._deliver, generation, result, error)
+                except (RuntimeError, TclError):
+                    # Окно уже закрыто
+                    return
+
+    def _run_task(self, task):
+        """Выполняет разовый расчёт; False если окно уже закрыто (рабочий поток)."""
+        result, error = None, None
+        try:
+            result = task.compute(task.params)
+        except Exception as e:
+            error = e
+        try:
+            self.root.after(0, self._deliver_task, task, result, error)
+        except (RuntimeError, TclError):
+            return False
+        return True
+
+    def _deliver_task(self, task, result, error):
+        """Передаёт результат разового расчёта в GUI (главный поток)."""
+        if error is not None:
+            if task.on_error is not None:
+                task.on_error(error)
+        else:
+            task.on_result(result)
+
+    def _deliver(self, generation, result, error):
+        """Передаёт результат в GUI, если он ещё актуален (главный поток)."""
+        if generation != self._generation:
+            return
+        if error is not None:
+            if self.on_error is not None:
+                self.on_error(error)
+        else:
+            self.on_result(result)
@@ -8,6 +8,8 @@ from tkinter import BooleanVar, messagebox
 from gui.state import AppState
 from gui.data_manager import recursion_saver, write_to_json_file
 from gui.ui_helpers import show_image
+from gui.estimation import LiveEstimator
+from core import JobSpec, predict_job
 from utils.crossplatform_utils import get_resource_path
 
 
@@ -22,6 +24,7 @@ class EventHandlers:
             state: Состояние приложения
         """
         self.state = state
+        self.live_estimator = None
 
     def get_callbacks(self):
         """
@@ -40,6 +43,7 @@ class EventHandlers:
             'setup': self.on_setup,
             'show_offsets': self.on_show_offsets,
             'generate': self.on_generate,
+            'prediction': self.on_prediction_update,
         }
 
     def on_pattern_parameters_change(self):
@@ -195,10 +199,39 @@ class EventHandlers:
         show_visualization(cell_size_x, cell_size_y, num_pitch, generate_nx_ny, nx, ny,
                            is_random_offsets, coefficient_random_offsets, is_random_order)
 
+    def start_live_estimation(self, root):
+        """
+        Запускает фоновый пересчёт прогноза (время, размер, плотность, свесы).
+
+        Args:
+            root: Главное окно (для after)
+        """
+        from gui.generation import collect_generation_data
+
+        label = self.state.wd_right["Лейбл прогноза"]
+
+        def collect():
+            # JobSpec неизменяем: рабочий поток не видит последующих правок словарей GUI,
+            # а одинаковые параметры дают прогноз из кэша predict_job
+            return JobSpec.from_dict(collect_generation_data(self.state, silent=True))
+
+        self.live_estimator = LiveEstimator(
+            root, collect, predict_job,
+            on_result=lambda prediction: label.config(text=prediction.describe()),
+            on_error=lambda e: label.config(text='Прогноз: введите корректные параметры'),
+        )
+        self.live_estimator.schedule()
+
+    def on_prediction_update(self, event=None):
+        """Откладывает пересчёт прогноза после изменения параметров."""
+        if self.live_estimator is not None:
+            self.live_estimator.schedule()
+
     def on_generate(self):
         """Запускает генерацию G-кодов."""
         # Импорт здесь для избежания циркулярных зависимостей
         from gui.generation import GenerationController
 
-        controller = GenerationController(None, self.state)  # window будет установлен позже
+        # window будет установлен позже; проверки выполняются в потоке прогноза
+        controller = GenerationController(None, self.state, self.live_estimator)
         controller.start_generation()
@@ -10,25 +10,58 @@ from tkinter import Toplevel, messagebox
 from tkinter.ttk import Progressbar
 from gui.state import AppState
 from gui.data_manager import recursion_saver
-from gui.validation import validate_generation_params
+from gui.validation import analyze_generation, check_generation_params, confirm_generation
 from gui.ui_helpers import centered_win
-from core import generate_G_codes_file, get_filename, get_message
+from core import (generate_G_codes_file, get_filename, get_message,
+                  get_filename_path_and_create_directory_if_need)
 from utils.crossplatform_utils import get_resource_path
 
+# Одновременно выполняется только одна генерация из GUI
+_generation_lock = threading.Lock()
+
+
+def collect_generation_data(state: AppState, silent=False):
+    """
+    Собирает параметры генерации из виджетов.
+
+    Args:
+        state: Состояние приложения
+        silent: Не показывать сообщение о нечисловом значении
+
+    Returns:
+        dict с параметрами генерации
+
+    Raises:
+        ValueError: Если значение не является числом там, где ожидается число
+    """
+    data = recursion_saver(state.wd_left, silent)
+
+    # Получаем текущие значения enum параметров
+    data["Порядок прохождения рядов"] = state.wd_right["Комбобокс порядок рядов"].get()
+    frame_size_index = data.pop("Номер радиокнопки типа задания размера каркаса")
+    data["Задание размеров каркаса"] = state.type_frame_size_list[frame_size_index]
+    combo = state.wd_right["Комбобокс выбор головы"]
+    head_name = combo.get()
+    state.heads['Выбранная игольница (ИП игольница)'] = head_name
+    return {**data, **state.heads}
+
 
 class GenerationController:
     """Контроллер для управления генерацией G-кодов."""
 
-    def __init__(self, parent, state: AppState):
+    def __init__(self, parent, state: AppState, live_estimator=None):
         """
         Инициализирует контроллер.
 
         Args:
             parent: Родительское окно (Tk)
             state: Состояние приложения
+            live_estimator: LiveEstimator, в рабочем потоке которого выполняются
+                расчётные проверки (None — проверки в главном потоке)
         """
         self.parent = parent
         self.state = state
+        self.live_estimator = live_estimator
 
     def _get_data_for_generating(self):
         """
@@ -37,16 +70,7 @@ class GenerationController:
         Returns:
             dict с параметрами генерации
         """
-        data = recursion_saver(self.state.wd_left)
-
-        # Получаем текущие значения enum параметров
-        data["Порядок прохождения рядов"] = self.state.wd_right["Комбобокс порядок рядов"].get()
-        frame_size_index = data.pop("Номер радиокнопки типа задания размера каркаса")
-        data["Задание размеров каркаса"] = self.state.type_frame_size_list[frame_size_index]
-        combo = self.state.wd_right["Комбобокс выбор головы"]
-        head_name = combo.get()
-        self.state.heads['Выбранная игольница (ИП игольница)'] = head_name
-        return {**data, **self.state.heads}
+        return collect_generation_data(self.state)
 
     def start_generation(self):
         """Начинает процесс генерации G-кодов."""
@@ -56,10 +80,54 @@ class GenerationController:
         except ValueError:
             return
 
-        # Проверяем входные данные
-        if not validate_generation_params(data_dict):
+        # Проверяем входные данные (параметры разбираются один раз для всей генерации)
+        spec = check_generation_params(data_dict)
+        if spec is None:
+            return
+
+        if not _generation_lock.acquire(blocking=False):
+            messagebox.showwarning('Генерация уже идёт', 'Дождитесь окончания текущей генерации.')
+            return
+
+        if self.live_estimator is None:
+            try:
+                checks = analyze_generation(spec)
+            except Exception as e:
+                self._on_check_error(e)
+                return
+            self._on_checked(data_dict, spec, *checks)
+            return
+
+        # Пределы осей и прогноз считаются в рабочем потоке прогноза,
+        # генерация продолжается в главном потоке по их результату
+        self.live_estimator.request(
+            analyze_generation, spec,
+            on_result=lambda checks: self._on_checked(data_dict, spec, *checks),
+            on_error=self._on_check_error,
+        )
+
+    def _on_checked(self, data_dict, spec, envelope, prediction):
+        """Продолжает генерацию после расчётных проверок (главный поток)."""
+        if not confirm_generation(envelope, prediction):
+            _generation_lock.release()
             return
+        self._open_progress(data_dict, spec)
 
+    def _on_check_error(self, error):
+        """Сообщает об ошибке расчётных проверок (главный поток)."""
+        _generation_lock.release()
+        messagebox.showerror('Не удалось проверить параметры', str(error))
+
+    def _open_progress(self, data_dict, spec):
+        """
+        Открывает окно прогресса и запускает генерацию в отдельном потоке.
+
+        Вызывается с захваченной _generation_lock; блокировку освобождает поток генерации.
+
+        Args:
+            data_dict: Параметры генерации
+            spec: Разобранные параметры генерации (JobSpec)
+        """
         # Окно с progress bar
         win = Toplevel(self.parent)
         try:
@@ -78,9 +146,33 @@ class GenerationController:
         centered_win(win)
 
         # Вычисляем g коды в отдельном потоке для отображения прогресса на progress bar
-        threading.Thread(target=lambda: self._run_generation_thread(win, bar, data_dict)).start()
+        threading.Thread(target=lambda: self._run_generation_thread(win, bar, data_dict, spec),
+                         daemon=True).start()
 
-    def _run_generation_thread(self, win_with_progress, bar, data_dict):
+    def _generate(self, data_dict, spec, display_progress):
+        """
+        Генерирует файл в этом процессе или через сервис генерации.
+
+        Args:
+            data_dict: Параметры генерации (передаются сервису)
+            spec: Разобранные параметры генерации (JobSpec)
+            display_progress: Функция отображения прогресса
+
+        Returns:
+            Результат generate_G_codes_file
+        """
+        if not self.state.job_server:
+            return generate_G_codes_file(spec, display_progress)
+
+        # Клиент нужен только в режиме --server, не замедляем им запуск
+        from core.job_service import JobServiceClient
+        client = JobServiceClient(self.state.job_server)
+        job_id = client.submit(data_dict)
+        final = client.wait(job_id, display_progress)
+        client.download(job_id, get_filename_path_and_create_directory_if_need(spec))
+        return final['result']
+
+    def _run_generation_thread(self, win_with_progress, bar, data_dict, spec):
         """
         Выполняет генерацию в отдельном потоке.
 
@@ -88,6 +180,7 @@ class GenerationController:
             win_with_progress: Окно с progress bar
             bar: Progressbar виджет
             data_dict: Параметры генерации
+            spec: Разобранные параметры генерации (JobSpec)
         """
         # Создаём функцию для отображения процесса на progressbar
         def display_progress(progress):
@@ -95,18 +188,22 @@ class GenerationController:
 
         # Генерируем
         try:
-            result = generate_G_codes_file(data_dict, display_progress)
+            result = self._generate(data_dict, spec, display_progress)
         except BaseException as e:
             win_with_progress.destroy()
             messagebox.showerror('Всё. Херня. Звони Артёму', e)
             return
+        finally:
+            _generation_lock.release()
 
         # Формируем сообщение с информацией
-        message = f"Сгенерирован файл\n{get_filename(data_dict)}\n\n"
+        message = f"Сгенерирован файл\n{get_filename(spec)}\n\n"
         message += f"Время одного слоя: {result['layer_time_str']}\n"
         message += f"Время всех слоёв: {result['work_time_str']}\n\n"
         message += f"Плотность пробивки: {result['density']:.2f} уд/кв.см\n\n"
-        message += get_message(data_dict)
+        if spec.is_random_order or spec.is_random_offsets:
+            message += f"Зерно случайности: {result['seed']}\n\n"
+        message += get_message(spec)
 
         # Закрываем окно
         win_with_progress.destroy()
@@ -27,6 +27,9 @@ class AppState:
     selected_order: str = ""
     selected_type_frame_size: str = ""
 
+    # Адрес сервиса генерации (пусто — генерация в этом процессе)
+    job_server: str = ""
+
     def __repr__(self):
         """Упрощённое представление для отладки."""
         return (f"AppState(wd_left_keys={list(self.wd_left.keys())}, "
@@ -28,6 +28,9 @@ TOOLTIPS = {
     "Извлечение игл по Z": "Скорость движения вверх (извлечение) по оси Z в мм/мин",
     "Ускорение осей станка": "Ускорение линейных осей станка в мм/с². Используется для расчёта времени выполнения (не записывается в G-код)",
     "Ускорение осей станка (мм/с²)": "Ускорение линейных осей станка в мм/с². Используется для расчёта времени выполнения (не записывается в G-код)",
+    "Ускорение по осям (мм/с²)": "Ускорение каждой оси станка отдельно в мм/с². Перемещение ограничивается самой медленной осью (обычно Z разгоняется медленнее X и Y). Используется только для расчёта времени",
+    "Максимальная скорость осей (мм/мин)": "Предельная скорость каждой оси станка в мм/мин. Если скорость F в команде больше, для расчёта времени берётся предел оси",
+    "Пределы осей станка (мм)": "Программные пределы перемещения осей станка. Перед записью файла проверяется, что все координаты программы в них укладываются; иначе файл не создаётся. Укажите пределы своего станка",
     "Смена осей X↔Y": "Меняет местами оси X и Y в генерируемых командах перемещения. Полезно при нестандартной ориентации станка",
 
     # Секция пробивки
@@ -75,6 +78,7 @@ TOOLTIPS = {
     "Случайный порядок ударов": "Случайная перестановка точек в паттерне пробивки для равномерного распределения нагрузки",
     "Случайные смещения": "Добавление случайного смещения к каждой точке пробивки для создания более естественного паттерна",
     "Коэффициент случайных смещений": "Максимальная величина случайного смещения в миллиметрах (обычно 0.1-0.25 мм)",
+    "Зерно случайности": "Число, из которого получаются случайный порядок и случайные смещения. 0 — новое зерно при каждой генерации. Зерно записывается в заголовок файла: с ним файл можно сгенерировать повторно точно таким же",
     "Чередование направлений прохода слоя": "Изменение направления движения головы на каждом четном слое. Устраняет эффект волны на каркасе",
     "Порядок прохождения рядов": "Последовательность обхода рядов по оси Y. Влияет на качество пробивки и предотвращает образование горбов",
 
@@ -82,6 +86,7 @@ TOOLTIPS = {
     "Создание файла на рабочем столе": "Сохранять файл на рабочий стол (~/Desktop/<имя_головы>/) или в директорию программы",
     "Автоматическая генерация имени файла": "Формировать имя файла автоматически на основе параметров (например, 250x250x8_10_ударов_лаб_Г1.tap)",
     "Имя файла": "Имя для сохранения .tap файла (доступно только при выключенной автогенерации)",
+    "Прогноз": "Количество команд, размер файла и время работы на станке, рассчитанные по параметрам без генерации. Знак ~ — размер приблизительный (случайные смещения)",
 
     # Настройки игольницы
     "ИП голова": "Тип игольной головы из предустановленных конфигураций. Определяет количество игл и изображение головы",
@@ -1,60 +1,95 @@
 '''
 Валидация параметров перед генерацией G-кодов.
 
-Содержит функции для проверки входных данных.
+Содержит функции для проверки входных данных: быстрые проверки
+(check_generation_params) и сообщения (confirm_generation) выполняются
+в главном потоке, расчётные (analyze_generation) — в рабочем.
 '''
 
 from tkinter import messagebox
-from core import check_dict_keys
+from core import CommandGenerator, JobSpec, check_dict_keys, check_envelope, predict_job
 from gui.data_manager import is_opened_file
 
 
-def is_big_size_future_file(data_dict):
+# Порог размера файла, после которого спрашиваем подтверждение (МБ).
+# Примерно соответствует прежнему порогу в 500 000 ударов.
+BIG_FILE_MEGABYTES = 40
+
+
+def is_big_size_future_file(prediction):
     """
     Проверяет, будет ли создан большой файл.
 
     Args:
-        data_dict: Словарь с параметрами генерации
+        prediction: Прогноз задания (JobPrediction)
 
     Returns:
-        True если файл будет содержать более 500,000 ударов
+        True если размер файла больше BIG_FILE_MEGABYTES
     """
-    l = data_dict['Количество слоёв']
-    e = data_dict['Количество пустых слоёв']
-    x = data_dict['Количество шагов головы']['X']
-    y = data_dict['Количество шагов головы']['Y']
-    n = data_dict['Параметры паттерна']['Кол-во ударов']
-    hits = (l + e) * x * y * n
-    if hits > 500_000:
-        return True
-    return False
+    return prediction.megabytes > BIG_FILE_MEGABYTES
 
 
-def validate_generation_params(data_dict):
+def check_generation_params(data_dict):
     """
-    Проверяет все условия перед генерацией.
+    Быстрые проверки перед генерацией (главный поток).
 
     Args:
         data_dict: Словарь с параметрами генерации
 
     Returns:
-        True если все проверки пройдены, False если есть ошибки
+        Разобранные параметры (JobSpec) если проверки пройдены,
+        None если есть ошибки
     """
     # Проверяем наличие всех ключей в json файле
     message = check_dict_keys(data_dict)
     if message != '':
         messagebox.showerror('Отсутствует параметр в json файле', message)
-        return False
+        return None
+    spec = JobSpec.from_dict(data_dict)
 
     # Проверяем файл
-    if is_opened_file(data_dict["Имя файла"]):
-        messagebox.showerror('Файл открыт в другой программе', f'Закройте файл {data_dict["Имя файла"]}.')
+    if is_opened_file(spec.file_name):
+        messagebox.showerror('Файл открыт в другой программе', f'Закройте файл {spec.file_name}.')
+        return None
+
+    return spec
+
+
+def analyze_generation(spec):
+    """
+    Расчётные проверки перед генерацией: пределы осей и прогноз размера.
+
+    Не обращается к виджетам, поэтому выполняется в рабочем потоке
+    (LiveEstimator.request), чтобы не подвешивать окно на больших заданиях.
+
+    Args:
+        spec: Разобранные параметры генерации (JobSpec)
+
+    Returns:
+        Кортеж (EnvelopeReport, JobPrediction)
+    """
+    return check_envelope(CommandGenerator(spec)), predict_job(spec)
+
+
+def confirm_generation(envelope, prediction):
+    """
+    Сообщает результат расчётных проверок (главный поток).
+
+    Args:
+        envelope: Отчёт check_envelope (EnvelopeReport)
+        prediction: Прогноз задания (JobPrediction)
+
+    Returns:
+        True если генерацию можно начинать
+    """
+    # Проверяем, что программа не выходит за пределы осей станка
+    if not envelope.ok:
+        messagebox.showerror('Выход за пределы осей станка', envelope.describe())
         return False
 
     # Проверяем размер будущего файла
-    if is_big_size_future_file(data_dict):
-        res = messagebox.askyesno('Создаётся большой файл',
-            'Файл с g кодами содержит больше 500 000 ударов. Вы уверены, что хотите его создать?')
-        return res
+    if is_big_size_future_file(prediction):
+        return messagebox.askyesno('Создаётся большой файл',
+            f'{prediction.describe()}\n\nВы уверены, что хотите создать файл?')
 
     return True
@@ -2,15 +2,21 @@
 Визуализация паттерна пробивки.
 
 Использует Plotly для построения интерактивного графика точек пробивки.
+Plotly (вместе с pandas) импортируется только при первом построении,
+чтобы не замедлять запуск приложения.
 '''
 
 from tkinter import messagebox
 from core import get_nx_ny, get_result_offset_list
 
-try:
-    import plotly.express as px
-except Exception:
-    px = None  # покажем понятную ошибку при попытке построения
+
+def _load_plotly():
+    """Импортирует plotly.express при первом вызове. Возвращает None, если plotly не установлен."""
+    try:
+        import plotly.express as px
+    except Exception:
+        return None  # покажем понятную ошибку при попытке построения
+    return px
 
 
 class VisualizationConfig:
@@ -40,6 +46,7 @@ def expand_with_neighbors(points, cell_size_x, cell_size_y):
 def _plot_offsets(points, num_pitch, cell_size_x, cell_size_y, title="Паттерн"):
     """Рисует точки, окрашивая точки пробитые на одном слое (каждые num_pitch последовательных точек) в один цвет."""
 
+    px = _load_plotly()
     if px is None:
         messagebox.showerror(
             "Plotly не установлен",
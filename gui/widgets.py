@@ -277,3 +277,19 @@ def create_right_panel_bottom(frame, second_dict, filename,
     bt_generate.grid(columnspan=2, row=22, padx=3, pady=3, sticky=W+E)
 
     return widget_dict
+
+
+def create_prediction_label(frame):
+    """
+    Создаёт лейбл с прогнозом размера файла и времени работы.
+
+    Args:
+        frame: Родительский фрейм
+
+    Returns:
+        Label виджет
+    """
+    lbl = Label(frame, text='', justify='left')
+    lbl.grid(columnspan=2, row=23, padx=3, pady=3, sticky=W)
+    add_tooltip_by_name(lbl, "Прогноз")
+    return lbl
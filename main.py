@@ -2,14 +2,20 @@
 '''
 Точка входа для генератора G-кодов.
 
-Запускает GUI приложение.
+Запускает GUI приложение, локальный сервис генерации (--serve)
+отправку задания на контроллер по мере генерации (--send)
+или печатает сводку журнала генераций (--telemetry-report).
+GUI импортируется внутри main(), чтобы режим --profile-startup
+замерял и его импорт.
 '''
 
 import sys
 import logging
-from tkinter import Tk, messagebox
-from gui import GeneratorApp
+import argparse
+import contextlib
+import multiprocessing
 from utils.crossplatform_utils import get_resource_path
+from utils.startup_profile import StartupProfiler
 
 
 def setup_logging():
@@ -30,13 +36,61 @@ def setup_logging():
     logger.addHandler(console_handler)
 
 
+def parse_args(argv=None):
+    """Разбирает аргументы командной строки."""
+    parser = argparse.ArgumentParser(description='Генератор G кодов для ИП станка')
+    parser.add_argument('--serve', action='store_true',
+                        help='запустить сервис генерации вместо GUI')
+    parser.add_argument('--host', default='127.0.0.1', help='адрес сервиса (для --serve)')
+    parser.add_argument('--port', type=int, default=8765, help='порт сервиса (для --serve)')
+    parser.add_argument('--workers', type=int, default=2,
+                        help='количество одновременных генераций (для --serve)')
+    parser.add_argument('--output-dir', default='jobs',
+                        help='папка для файлов заданий (для --serve)')
+    parser.add_argument('--server', default='',
+                        help='адрес сервиса генерации, например 127.0.0.1:8765; '
+                             'GUI будет отправлять задания на него')
+    parser.add_argument('--send', default='', metavar='HOST:PORT',
+                        help='сгенерировать задание из data/data.json и отправить его '
+                             'на контроллер по TCP, не записывая файл')
+    parser.add_argument('--start-layer', type=int, default=1,
+                        help='продолжить задание с этого слоя (для --send)')
+    parser.add_argument('--telemetry-report', nargs='?', const='', default=None, metavar='PATH',
+                        help='напечатать загрузку станков по головам и скорость генерации '
+                             'по журналу генераций (по умолчанию data/telemetry.jsonl)')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='напечатать в stderr время импорта модулей и этапов запуска '
+                             '(без консоли — в startup_profile.txt)')
+    return parser.parse_args(argv)
+
+
 def main():
     """Главная функция приложения."""
     # Настраиваем логирование
     setup_logging()
 
+    args = parse_args()
+    if args.serve:
+        from core.job_service import run_job_service
+        run_job_service(args.output_dir, args.host, args.port, args.workers)
+        return
+    if args.send:
+        _send(args.send, args.start_layer)
+        return
+    if args.telemetry_report is not None:
+        from core import build_report, read_records
+        print(build_report(read_records(args.telemetry_report or None)).describe())
+        return
+
+    profiler = StartupProfiler()
+    with profiler if args.profile_startup else contextlib.nullcontext():
+        from tkinter import Tk, messagebox
+        from gui import GeneratorApp
+        from core.version import VERSION
+    profiler.mark('Импорт GUI')
+
     window = Tk()
-    window.title("Генератор G кодов для ИП станка v.1.12.0")
+    window.title(f"Генератор G кодов для ИП станка v.{VERSION}")
 
     try:
         # На linux системах tkinter не отображает иконку в title bar окна
@@ -45,7 +99,10 @@ def main():
         print(f"Ошибка загрузки иконки: {e}")
 
     try:
-        app = GeneratorApp(window)
+        app = GeneratorApp(window, job_server=args.server)
+        profiler.mark('Создание окна')
+        if args.profile_startup:
+            window.after_idle(lambda: _report_startup(profiler))
         app.run()
     except Exception as e:
         messagebox.showerror("Критическая ошибка", str(e))
@@ -54,5 +111,35 @@ def main():
         sys.exit(1)
 
 
+def _send(address, start_layer):
+    """Отправляет задание с параметрами из data/data.json на контроллер address."""
+    import json
+    from core.sender import send_job
+
+    with open(get_resource_path('data/data.json'), encoding='utf-8-sig') as f:
+        config = json.load(f)
+    with open(get_resource_path('data/heads.json'), encoding='utf-8-sig') as f:
+        config.update(json.load(f))
+
+    host, _, port = address.rpartition(':')
+    result = send_job(config, host, int(port), start_layer=start_layer,
+                      display_percent_progress_func=lambda p: print(f'{p:.0f}%'))
+    print(f'Отправлено строк: {result.lines} за {result.seconds:.1f} с')
+
+
+def _report_startup(profiler):
+    """Печатает отчёт о запуске после первой отрисовки окна."""
+    profiler.mark('Первая отрисовка')
+    report = profiler.format_report(full=True)
+    if sys.stderr is not None:
+        print(report, file=sys.stderr)
+    else:
+        # В exe, собранном с --windowed, консоли нет — пишем отчёт в файл рядом с exe
+        with open(get_resource_path('startup_profile.txt'), 'w', encoding='utf-8') as f:
+            f.write(report + '\n')
+
+
 if __name__ == "__main__":
+    # Нужно для пула процессов сервиса в собранном exe
+    multiprocessing.freeze_support()
     main()
@@ -8,9 +8,28 @@
 
 import unittest
 import os
+import copy
 import json
+import dataclasses
 import warnings
-from typing import List, Tuple
+import asyncio
+import tempfile
+import threading
+import subprocess
+import sys
+import time
+import random
+import logging
+import socket
+import http.client
+from typing import Dict, List, Optional, Tuple
+
+# Тесты не пишут в журнал генераций программы (см. core.telemetry)
+os.environ['GCODE_TELEMETRY'] = ''
+
+from gui.estimation import LiveEstimator
+from utils.startup_profile import StartupProfiler
+import fuzz_engines
 from core import (
     generate_G_codes_file,
     generate_offset_list,
@@ -18,6 +37,41 @@ from core import (
     get_ordered_list_of_rows,
     check_nums_x_y_from_dict as check_nums_x_y,
     get_result_offset_list,
+    compare_gcode_files_streaming,
+    decode_command,
+    layer_digests,
+    generated_layer_digests,
+    CommandGenerator,
+    MoveCommand,
+    format_move,
+    PauseCommand,
+    TimeEstimator,
+    GCodeFormatter,
+    GenerationJobService,
+    JobServiceClient,
+    generate_batch,
+    AtomicOutputWriter,
+    predict_job,
+    estimate_engine_memory,
+    write_split_output,
+    make_time_estimator,
+    select_engine,
+    JobSpec,
+    get_filename,
+    get_message,
+    EnvelopeError,
+    check_envelope,
+    program_extents,
+    ControllerSimulator,
+    DWELL_MILLISECONDS,
+    DWELL_SECONDS,
+    GCodeSender,
+    SenderError,
+    program_lines,
+    send_job,
+    build_report,
+    parameter_hash,
+    read_records,
 )
 
 
@@ -171,6 +225,172 @@ def compare_gcode_files(file1: str, file2: str, show_warnings: bool = True) -> T
     return files_identical, warnings_list
 
 
+def _command_words(line):
+    """Разбирает команду на слова (буква, число) без комментария."""
+    from decimal import Decimal
+    code = line.split(';')[0].split()
+    return [code[0]] + [(w[0], Decimal(w[1:])) for w in code[1:]]
+
+
+def program_words(path):
+    """Команды файла (без комментариев), разобранные на слова."""
+    with open(path, encoding='utf-8') as f:
+        return [_command_words(line) for line in f if line.strip() and not line.startswith(';')]
+
+
+def expand_subprograms(path):
+    """
+    Разворачивает вызовы подпрограмм с учётом сдвига G52 Z.
+
+    Returns:
+        Кортеж (команды развёрнутой программы, как в program_words; количество подпрограмм)
+    """
+    from decimal import Decimal
+    with open(path, encoding='utf-8') as f:
+        lines = [line.rstrip('\n') for line in f if line.strip() and not line.startswith(';')]
+    end = lines.index('M30')
+    programs, number = {}, None
+    for line in lines[end + 1:]:
+        if line.startswith('O'):
+            number = line[1:]
+            programs[number] = []
+        elif line != 'M99':
+            programs[number].append(_command_words(line))
+
+    result, shift = [], Decimal(0)
+    for line in lines[:end]:
+        words = _command_words(line)
+        if words[0] == 'G52':
+            shift = words[1][1]
+        elif words[0] == 'M98':
+            for sub in programs[str(words[1][1])]:
+                result.append([w if w[0] != 'Z' else ('Z', w[1] + shift) for w in sub])
+        else:
+            result.append(words)
+    return result, len(programs)
+
+
+# Минимальная рабочая конфигурация (см. minimal_config)
+_MINIMAL_CONFIG = {
+    "Количество слоёв": 1,
+    "Количество пустых слоёв": 0,
+    "Толщина слоя (мм)": 0.82,
+    "Расстояние от каркаса до головы перед ударом (мм)": 30,
+    "Скорость (мм/мин)": {
+        "Движение осей X и Y": 3000,
+        "Внедрение игл по Z": 3000,
+        "Извлечение игл по Z": 3000
+    },
+    "Ускорение осей станка (мм/с²)": 300,
+    "Пробивка": {
+        "Пробивка с нарастанием глубины": False,
+        "Начальная глубина удара (мм)": 8,
+        "Глубина удара (мм)": 18
+    },
+    "Параметры паттерна": {
+        "Автоматическое определение формы паттерна": True,
+        "nx": 12,
+        "ny": 10,
+        "Кол-во ударов": 10
+    },
+    "Позиция при ручной укладки слоя": {
+        "X": 0,
+        "Y": -400,
+        "Z": 100,
+        "Пауза в конце слоя (сек)": 0,
+        "Звуковой сигнал (сек)": 0,
+        "Режим звукового сигнала": {
+            "value": "Непрерывный",
+            "options": ["Непрерывный", "Прерывистый", "Частый прерывистый"]
+        },
+        "Рост Z с каждым слоем": True
+    },
+    "Расстояние между иглами (мм)": {
+        "X": 8.0,
+        "Y": 8.0
+    },
+    "Количество шагов головы": {
+        "X": 2,
+        "Y": 2
+    },
+    "Габариты каркаса": {
+        "X": 100,
+        "Y": 100
+    },
+    "Случайный порядок ударов": False,
+    "Случайные смещения": False,
+    "Коэффициент случайных смещений": 0.15,
+    "Чередование направлений прохода слоя": False,
+    "Смена осей X↔Y": False,
+    "Создание файла на рабочем столе": False,
+    "Автоматическая генерация имени файла": False,
+    "Имя файла": "test_edge_case.tap",
+    "Порядок прохождения рядов": {
+        "value": "По очереди",
+        "options": ["По очереди", "Сначала чётные", "Сначала нечётные", "Из центра", "В центр"]
+    },
+    "Задание размеров каркаса": {
+        "value": "По шагам головы",
+        "options": ["По шагам головы", "По габаритам"]
+    },
+    "Игольницы (ИП головы)": {
+        "Тестовая_игольница": {
+            "X": 4,
+            "Y": 4,
+            "path": "test.png"
+        }
+    },
+    "Выбранная игольница (ИП игольница)": "Тестовая_игольница"
+}
+
+
+def minimal_config(*change_sets: Dict, **changes) -> Dict:
+    """
+    Возвращает минимальную рабочую конфигурацию с изменёнными параметрами.
+
+    Изменения применяются по порядку: наборы change_sets, затем changes.
+    Словарь для раздела-словаря дополняет раздел, остальные значения
+    заменяют параметр. Возвращается независимая копия.
+
+    Пример:
+        minimal_config(RESUME_CHANGES, **{"Количество слоёв": 3})
+    """
+    config = dict(_MINIMAL_CONFIG)
+    for change_set in change_sets + (changes,):
+        for key, value in change_set.items():
+            if isinstance(value, dict) and isinstance(config.get(key), dict):
+                config[key] = dict(config[key], **value)
+            else:
+                config[key] = value
+    return copy.deepcopy(config)
+
+
+# Задание со случайностью, пустыми слоями и реверсом (продолжение со слоя, отправка)
+RESUME_CHANGES = {
+    "Количество слоёв": 30,
+    "Количество пустых слоёв": 4,
+    "Случайный порядок ударов": True,
+    "Случайные смещения": True,
+    "Зерно случайности": 11,
+    "Чередование направлений прохода слоя": True,
+}
+
+# То же с нарастанием глубины (однопроходная и фоновая запись, журнал генераций)
+SINGLE_PASS_CHANGES = {**RESUME_CHANGES, "Пробивка": {"Пробивка с нарастанием глубины": True}}
+
+# Задание с нарастанием глубины и пустыми слоями для проверки пределов осей
+ENVELOPE_CHANGES = {
+    "Количество слоёв": 12,
+    "Количество пустых слоёв": 3,
+    "Пробивка": {"Пробивка с нарастанием глубины": True},
+    "Параметры паттерна": {"Кол-во ударов": 7},
+    "Позиция при ручной укладки слоя": {"Y": 40},
+}
+
+# Слой в 10^5 ударов (100 × 100 шагов головы, 10 ударов паттерна) — большие задания
+LARGE_LAYER_CHANGES = {"Количество шагов головы": {"X": 100, "Y": 100}}
+
+
 class TestGCodeComparison(unittest.TestCase):
     """Тесты для сравнения G-code файлов."""
 
@@ -256,6 +476,102 @@ class TestGCodeComparison(unittest.TestCase):
                 os.remove(test_file2)
 
 
+class TestStreamingDiff(unittest.TestCase):
+    """Тесты потокового сравнения G-code файлов."""
+
+    def setUp(self):
+        self.test_file = 'test_temp_stream.tap'
+
+    def tearDown(self):
+        if os.path.exists(self.test_file):
+            os.remove(self.test_file)
+
+    def _write_modified_reference(self, replace_line: int, new_command: Optional[str],
+                                  insert: bool = False):
+        """
+        Копирует reference.tap, заменяя команду в строке replace_line (с 1).
+
+        При insert=True команда вставляется перед строкой, при new_command=None
+        строка удаляется.
+        """
+        with open('reference.tap', 'r', encoding='utf-8') as src, \
+                open(self.test_file, 'w', encoding='utf-8') as dst:
+            for line_number, line in enumerate(src, start=1):
+                if line_number == replace_line:
+                    if new_command is None:
+                        continue
+                    changed = f'{new_command:16};changed\n'
+                    line = changed + line if insert else changed
+                dst.write(line)
+
+    def test_decode_command(self):
+        """Тест разбора команды на слова."""
+        self.assertEqual(decode_command('G1 X486.0 Y1.2 F3000'),
+                         {'G': 1, 'X': 486.0, 'Y': 1.2, 'F': 3000})
+        self.assertEqual(decode_command('G1 Z-18.0'), {'G': 1, 'Z': -18.0})
+
+    def test_identical_files(self):
+        """Тест: файл идентичен сам себе, в т.ч. при маленьких кусках и блоках."""
+        result = compare_gcode_files_streaming('reference.tap', 'reference.tap',
+                                               block_size=7, chunk_size=100)
+        self.assertTrue(result.identical)
+        self.assertEqual(result.commands_compared, len(extract_commands_from_file('reference.tap')))
+
+    def test_first_difference_with_layer(self):
+        """Тест: первое различие сообщается с номером строки, слоя и командой."""
+        # Строка 1500 находится внутри слоя 2 reference.tap
+        self._write_modified_reference(1500, 'G1 X1.0 Y2.0 F3000')
+        result = compare_gcode_files_streaming('reference.tap', self.test_file,
+                                               block_size=64, chunk_size=4096)
+        self.assertFalse(result.identical)
+        self.assertEqual(len(result.differences), 1)
+        diff = result.differences[0]
+        self.assertEqual(diff.reference_line, 1500)
+        self.assertEqual(diff.candidate_line, 1500)
+        self.assertEqual(diff.layer_number, 2)
+        self.assertEqual(diff.candidate, 'G1 X1.0 Y2.0 F3000')
+
+    def test_inserted_line_is_one_difference(self):
+        """Тест: вставленная строка — одно различие, дальше файлы снова выровнены."""
+        self._write_modified_reference(1500, 'G1 X1.0 Y2.0 F3000', insert=True)
+        result = compare_gcode_files_streaming('reference.tap', self.test_file,
+                                               block_size=64, chunk_size=4096)
+        self.assertFalse(result.identical)
+        self.assertEqual(len(result.differences), 1)
+        diff = result.differences[0]
+        self.assertIsNone(diff.reference)
+        self.assertEqual(diff.candidate, 'G1 X1.0 Y2.0 F3000')
+        self.assertEqual(diff.candidate_line, 1500)
+        self.assertEqual(diff.layer_number, 2)
+        self.assertEqual(result.commands_compared,
+                         len(extract_commands_from_file('reference.tap')) + 1)
+
+    def test_deleted_line_is_one_difference(self):
+        """Тест: удалённая строка — одно различие, в том числе в конце файла."""
+        commands = extract_commands_from_file('reference.tap')
+        with open('reference.tap', encoding='utf-8') as f:
+            last_line = sum(1 for _ in f)
+        for line in (1500, last_line):
+            with self.subTest(line=line):
+                self._write_modified_reference(line, None)
+                result = compare_gcode_files_streaming('reference.tap', self.test_file,
+                                                       block_size=64, chunk_size=4096)
+                self.assertEqual(len(result.differences), 1)
+                diff = result.differences[0]
+                self.assertEqual(diff.reference_line, line)
+                self.assertIsNone(diff.candidate)
+                self.assertEqual(result.commands_compared, len(commands))
+
+    def test_summary_mode(self):
+        """Тест: режим summary сравнивает только хэши слоёв."""
+        self._write_modified_reference(1500, 'G1 X1.0 Y2.0 F3000')
+        result = compare_gcode_files_streaming('reference.tap', self.test_file, summary=True)
+        self.assertFalse(result.identical)
+        self.assertEqual(result.differing_layers, [2])
+        self.assertEqual(result.layers_reference, 20)
+        self.assertEqual(len(layer_digests('reference.tap')), 20)
+
+
 class TestGeneratorAlgorithm(unittest.TestCase):
     """Unit-тесты для функций алгоритма генератора."""
 
@@ -346,86 +662,125 @@ class TestGeneratorAlgorithm(unittest.TestCase):
         self.assertEqual(len(offset_list3), nx * ny)
 
 
+class TestSeededRandomness(unittest.TestCase):
+    """Тесты воспроизводимости случайного порядка и смещений по зерну."""
+
+    CHANGES = {"Количество слоёв": 4, "Случайный порядок ударов": True, "Случайные смещения": True}
+
+    def _strings(self, seed, layers=4):
+        """Строки команд слоёв задания с зерном seed."""
+        config = minimal_config(self.CHANGES, **{"Зерно случайности": seed, "Количество слоёв": layers})
+        return [[cmd.to_string() for cmd in layer.commands]
+                for layer in CommandGenerator(config).generate_layers()]
+
+    def test_same_seed_reproduces_layers(self):
+        """Тест: одно и то же зерно даёт одинаковые слои, разные зёрна — разные."""
+        first = self._strings(12345)
+        second = self._strings(12345)
+        other = self._strings(54321)
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+
+    def test_layer_depends_only_on_seed_and_index(self):
+        """Тест: слой не зависит от того, сколько слоёв сгенерировано до и после."""
+        short = self._strings(777, layers=2)
+        long = self._strings(777, layers=6)
+        self.assertEqual(short, long[:2])
+
+    def test_jitter_bounds(self):
+        """Тест: смещения слоя вычисляются одним вызовом и не превышают коэффициент."""
+        generator = CommandGenerator(minimal_config(self.CHANGES, **{"Зерно случайности": 1}))
+        jitter = generator.layer_jitter(3, 1000)
+        self.assertEqual(len(jitter), 1000)
+        self.assertLessEqual(max(abs(v) for pair in jitter for v in pair),
+                             generator.coefficient_random_offsets)
+        self.assertEqual(jitter, generator.layer_jitter(3, 1000))
+
+    def test_seed_written_to_header(self):
+        """Тест: зерно записывается в заголовок файла и возвращается в результате."""
+        config = minimal_config(self.CHANGES, **{"Зерно случайности": 0})
+        head_name = config["Выбранная игольница (ИП игольница)"]
+        output_file = os.path.join(head_name, config["Имя файла"])
+
+        try:
+            result = generate_G_codes_file(config, lambda x: None)
+            self.assertGreater(result['seed'], 0)
+            with open(output_file, 'r', encoding='utf-8') as f:
+                self.assertIn(f": {result['seed']}\n", f.read())
+        finally:
+            if os.path.exists(output_file):
+                os.remove(output_file)
+            if os.path.exists(head_name) and not os.listdir(head_name):
+                os.rmdir(head_name)
+
+
+class TestPrecomputedCommandText(unittest.TestCase):
+    """Тесты готовых строк команд из таблиц координат."""
+
+    CASES = {
+        'base': {},
+        'swap': {"Смена осей X↔Y": True},
+        'random_offsets': {"Случайные смещения": True, "Зерно случайности": 7},
+        'no_rotation': {"Чередование направлений прохода слоя": False},
+    }
+
+    def test_text_matches_coordinates(self):
+        """Тест: готовая строка каждой команды совпадает с записью её координат."""
+        for name, overrides in self.CASES.items():
+            with self.subTest(case=name):
+                generator = CommandGenerator(minimal_config({"Количество слоёв": 4}, **overrides))
+                moves = [cmd for layer in generator.iter_layers(reuse_hits=True)
+                         for cmd in layer.commands if isinstance(cmd, MoveCommand)]
+                self.assertTrue(all(cmd.text is not None for cmd in moves))
+                for cmd in moves:
+                    self.assertEqual(cmd.to_string(), format_move(cmd.x, cmd.y, cmd.z, cmd.f))
+
+    def test_number_spelling_is_preserved(self):
+        """Тест: целые и дробные значения пишутся как раньше ('X0', 'X486.0', '-0.0')."""
+        self.assertEqual(format_move(x=0, y=486.0, f=3000), 'G1 X0 Y486.0 F3000')
+        self.assertEqual(format_move(z=-0.04), 'G1 Z-0.0')
+        self.assertEqual(MoveCommand(x=1.25, y=2).to_string(), 'G1 X1.2 Y2')
+        # Готовая строка не участвует в сравнении команд
+        self.assertEqual(MoveCommand(x=1.0, text='G1 X1.0'), MoveCommand(x=1.0))
+
+
+class TestSharedCommands(unittest.TestCase):
+    """Тесты переиспользования повторяющихся команд генератора."""
+
+    def test_repeated_commands_are_shared(self):
+        """Тест: Z удара и извлечения и позиция укладки — общие объекты."""
+        generator = CommandGenerator(minimal_config(**{"Количество слоёв": 3}))
+        layers = generator.generate_layers()
+
+        hits = 2 * 2 * 10
+        for layer in layers:
+            moves = layer.commands[2:2 + 3 * hits]
+            self.assertEqual(len({id(cmd) for cmd in moves[1::3]}), 1)
+            self.assertEqual(len({id(cmd) for cmd in moves[2::3]}), 1)
+            # Отдельные объекты только у XY ударов (и команд конца слоя)
+            self.assertEqual(len({id(cmd) for cmd in layer.commands}),
+                             hits + 4 + len(generator.layer_tail()))
+        self.assertIs(layers[0].commands[1], layers[2].commands[1])
+
+    def test_equal_but_differently_written_values_are_not_shared(self):
+        """Тест: 1 и 1.0, 0.0 и -0.0 пишутся по-разному и не объединяются."""
+        generator = CommandGenerator(minimal_config())
+        pairs = [((1, 3000), (1.0, 3000)), ((0.0, 3000), (-0.0, 3000)), ((5.0, 3000), (5.0, 3000.0))]
+        for (z_a, f_a), (z_b, f_b) in pairs:
+            with self.subTest(a=(z_a, f_a), b=(z_b, f_b)):
+                a = generator._move_cmd(z=z_a, f=f_a, shared=True)
+                b = generator._move_cmd(z=z_b, f=f_b, shared=True)
+                self.assertIsNot(a, b)
+                self.assertNotEqual(a.to_string(), b.to_string())
+                self.assertIs(generator._move_cmd(z=z_a, f=f_a, shared=True), a)
+
+
 class TestEdgeCases(unittest.TestCase):
     """Тесты граничных случаев и валидации."""
 
-    def get_minimal_config(self):
-        """Возвращает минимальную рабочую конфигурацию."""
-        return {
-            "Количество слоёв": 1,
-            "Количество пустых слоёв": 0,
-            "Толщина слоя (мм)": 0.82,
-            "Расстояние от каркаса до головы перед ударом (мм)": 30,
-            "Скорость (мм/мин)": {
-                "Движение осей X и Y": 3000,
-                "Внедрение игл по Z": 3000,
-                "Извлечение игл по Z": 3000
-            },
-            "Ускорение осей станка (мм/с²)": 300,
-            "Пробивка": {
-                "Пробивка с нарастанием глубины": False,
-                "Начальная глубина удара (мм)": 8,
-                "Глубина удара (мм)": 18
-            },
-            "Параметры паттерна": {
-                "Автоматическое определение формы паттерна": True,
-                "nx": 12,
-                "ny": 10,
-                "Кол-во ударов": 10
-            },
-            "Позиция при ручной укладки слоя": {
-                "X": 0,
-                "Y": -400,
-                "Z": 100,
-                "Пауза в конце слоя (сек)": 0,
-                "Звуковой сигнал (сек)": 0,
-                "Режим звукового сигнала": {
-                    "value": "Непрерывный",
-                    "options": ["Непрерывный", "Прерывистый", "Частый прерывистый"]
-                },
-                "Рост Z с каждым слоем": True
-            },
-            "Расстояние между иглами (мм)": {
-                "X": 8.0,
-                "Y": 8.0
-            },
-            "Количество шагов головы": {
-                "X": 2,
-                "Y": 2
-            },
-            "Габариты каркаса": {
-                "X": 100,
-                "Y": 100
-            },
-            "Случайный порядок ударов": False,
-            "Случайные смещения": False,
-            "Коэффициент случайных смещений": 0.15,
-            "Чередование направлений прохода слоя": False,
-            "Смена осей X↔Y": False,
-            "Создание файла на рабочем столе": False,
-            "Автоматическая генерация имени файла": False,
-            "Имя файла": "test_edge_case.tap",
-            "Порядок прохождения рядов": {
-                "value": "По очереди",
-                "options": ["По очереди", "Сначала чётные", "Сначала нечётные", "Из центра", "В центр"]
-            },
-            "Задание размеров каркаса": {
-                "value": "По шагам головы",
-                "options": ["По шагам головы", "По габаритам"]
-            },
-            "Игольницы (ИП головы)": {
-                "Тестовая_игольница": {
-                    "X": 4,
-                    "Y": 4,
-                    "path": "test.png"
-                }
-            },
-            "Выбранная игольница (ИП игольница)": "Тестовая_игольница"
-        }
-
     def test_single_layer_generation(self):
         """Тест: генерация файла с одним слоем."""
-        config = self.get_minimal_config()
+        config = minimal_config()
         config["Количество слоёв"] = 1
         head_name = config["Выбранная игольница (ИП игольница)"]
         output_file = os.path.join(head_name, config["Имя файла"])
@@ -454,7 +809,7 @@ class TestEdgeCases(unittest.TestCase):
 
     def test_multiple_virtual_layers(self):
         """Тест: генерация с пустыми слоями (holostoy)."""
-        config = self.get_minimal_config()
+        config = minimal_config()
         config["Количество слоёв"] = 2
         config["Количество пустых слоёв"] = 3
         head_name = config["Выбранная игольница (ИП игольница)"]
@@ -482,7 +837,7 @@ class TestEdgeCases(unittest.TestCase):
 
     def test_progressive_depth_punching(self):
         """Тест: пробивка с нарастанием глубины."""
-        config = self.get_minimal_config()
+        config = minimal_config()
         config["Количество слоёв"] = 5
         config["Пробивка"]["Пробивка с нарастанием глубины"] = True
         config["Пробивка"]["Начальная глубина удара (мм)"] = 5
@@ -518,7 +873,7 @@ class TestEdgeCases(unittest.TestCase):
 
     def test_different_row_orders(self):
         """Тест: разные порядки прохождения рядов."""
-        config = self.get_minimal_config()
+        config = minimal_config()
         config["Количество шагов головы"]["Y"] = 5
         head_name = config["Выбранная игольница (ИП игольница)"]
 
@@ -550,7 +905,7 @@ class TestEdgeCases(unittest.TestCase):
 
     def test_gcode_file_structure(self):
         """Тест: проверка структуры G-code файла."""
-        config = self.get_minimal_config()
+        config = minimal_config()
         head_name = config["Выбранная игольница (ИП игольница)"]
         output_file = os.path.join(head_name, config["Имя файла"])
 
@@ -583,6 +938,1524 @@ class TestEdgeCases(unittest.TestCase):
                 os.rmdir(head_name)
 
 
+class TestJobSpec(unittest.TestCase):
+    """Тесты разобранных параметров задания."""
+
+    CHANGES = {
+        "Автоматическая генерация имени файла": True,
+        "Количество слоёв": 7,
+        "Параметры паттерна": {"Кол-во ударов": 7},
+    }
+
+    def test_frozen_and_hashable(self):
+        """Тест: равные словари дают равные хешируемые JobSpec."""
+        spec = JobSpec.from_dict(minimal_config(self.CHANGES))
+        self.assertEqual(spec, JobSpec.from_dict(minimal_config(self.CHANGES)))
+        self.assertEqual(hash(spec), hash(JobSpec.from_dict(minimal_config(self.CHANGES))))
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            spec.amount_layers = 1
+
+        other = minimal_config(self.CHANGES)
+        other["Количество слоёв"] = 8
+        self.assertNotEqual(spec, JobSpec.from_dict(other))
+
+        # Производные величины вычисляются один раз и не влияют на равенство
+        self.assertEqual(spec.head_width_x, 32.0)
+        self.assertIn('head_width_x', vars(spec))
+        self.assertEqual(spec, JobSpec.from_dict(minimal_config(self.CHANGES)))
+
+    def test_legacy_formats(self):
+        """Тест: старые форматы значений дают тот же JobSpec."""
+        config = minimal_config(self.CHANGES)
+        head = config["Игольницы (ИП головы)"]["Тестовая_игольница"]
+        new = dict(config, **{
+            "Порядок прохождения рядов": "По очереди",
+            "Задание размеров каркаса": "По шагам головы",
+        })
+        new["Игольницы (ИП головы)"] = {"Тестовая_игольница": dict(
+            head, needle_spacing_x=8.0, needle_spacing_y=8.0)}
+        laying = dict(config["Позиция при ручной укладки слоя"])
+        laying["Режим звукового сигнала"] = ["Непрерывный", "Прерывистый"]
+        config["Позиция при ручной укладки слоя"] = laying
+        self.assertEqual(JobSpec.from_dict(config), JobSpec.from_dict(new))
+
+    def test_derived_values_match_generator(self):
+        """Тест: шаги, форма паттерна и удары совпадают с генерацией."""
+        for by_dimensions in (False, True):
+            for num_pitch in (7, 10, 120, 200):
+                with self.subTest(by_dimensions=by_dimensions, num_pitch=num_pitch):
+                    frame = "По габаритам" if by_dimensions else "По шагам головы"
+                    config = minimal_config(self.CHANGES, **{
+                        "Параметры паттерна": {"Кол-во ударов": num_pitch},
+                        "Задание размеров каркаса": {"value": frame}})
+                    spec = JobSpec.from_dict(config)
+                    generator = CommandGenerator(spec)
+                    self.assertEqual((generator.nx, generator.ny), spec.nx_ny)
+                    prediction = predict_job(spec)
+                    self.assertEqual(spec.total_hits, prediction.hits)
+                    self.assertEqual((spec.num_step_x, spec.num_row_y),
+                                     (prediction.num_step_x, prediction.num_row_y))
+
+    def test_hits_follow_row_order(self):
+        """Тест: удары считаются по рядам порядка прохождения, как в прогнозе."""
+        for order in TestGoldenDigests.ORDERS:
+            for rows in (1, 2, 3):
+                with self.subTest(order=order, rows=rows):
+                    spec = JobSpec.from_dict(minimal_config(self.CHANGES, **{
+                        "Порядок прохождения рядов": {"value": order},
+                        "Количество шагов головы": {"X": 2, "Y": rows}}))
+                    self.assertEqual(spec.total_hits, predict_job(spec).hits)
+                    if spec.passed_rows == 0:
+                        self.assertEqual(spec.hits_per_layer, 0)
+
+    def test_dict_and_spec_are_interchangeable(self):
+        """Тест: функции core принимают и словарь, и JobSpec."""
+        config = minimal_config(self.CHANGES)
+        spec = JobSpec.from_dict(config)
+        # Каркас задан шагами головы: размеры — шаги × ширина головы
+        self.assertEqual(get_filename(spec), get_filename(config))
+        self.assertEqual(get_filename(spec), '64.0x64.0x5_7_ударов_Тестовая_игольница.tap')
+        self.assertEqual(get_message(spec), '')
+
+        config["Задание размеров каркаса"]["value"] = "По габаритам"
+        spec = JobSpec.from_dict(config)
+        self.assertEqual(get_message(spec), get_message(config))
+        self.assertIn('Свесы по Х: 14.0', get_message(spec))
+
+        # Прогноз запоминается по JobSpec
+        self.assertIs(predict_job(config), predict_job(spec))
+
+    def test_file_name_params_required_only_for_name(self):
+        """Тест: параметры имени файла не нужны для генерации команд."""
+        config = minimal_config(self.CHANGES)
+        del config["Автоматическая генерация имени файла"]
+        spec = JobSpec.from_dict(config)
+        CommandGenerator(spec).generate_layers()
+        with self.assertRaises(KeyError):
+            get_filename(spec)
+
+
+class TestEnvelopePreflight(unittest.TestCase):
+    """Тесты проверки пределов осей станка."""
+
+    @staticmethod
+    def _actual_extents(layers):
+        """Крайние значения осей по сгенерированным командам."""
+        values = {'X': [], 'Y': [], 'Z': []}
+        for layer in layers:
+            for cmd in layer.commands:
+                if isinstance(cmd, MoveCommand):
+                    for axis in values:
+                        value = getattr(cmd, axis.lower())
+                        if value is not None:
+                            values[axis].append(value)
+        return {axis: (min(v), max(v)) for axis, v in values.items()}
+
+    def test_extents_match_generated_program(self):
+        """Тест: крайние значения совпадают с командами программы."""
+        variants = {
+            'default': {},
+            'swap': {"Смена осей X↔Y": True},
+            'random_order': {"Случайный порядок ударов": True, "Зерно случайности": 5},
+            'few_layers': {"Количество слоёв": 2, "Количество пустых слоёв": 0},
+            'fixed_z': {"Пробивка": {"Пробивка с нарастанием глубины": False,
+                                     "Начальная глубина удара (мм)": 8,
+                                     "Глубина удара (мм)": 18}},
+        }
+        for name, changes in variants.items():
+            for start_layer in (1, 2):
+                with self.subTest(variant=name, start_layer=start_layer):
+                    config = minimal_config(ENVELOPE_CHANGES, **changes)
+                    generator = CommandGenerator(config)
+                    extents, exact = program_extents(generator, start_layer=start_layer)
+                    actual = self._actual_extents(
+                        CommandGenerator(config).generate_layers(start_layer=start_layer))
+                    self.assertTrue(exact)
+                    for axis, (low, high) in actual.items():
+                        self.assertEqual((extents[axis].min, extents[axis].max), (low, high))
+
+    def test_random_offsets_are_bounded(self):
+        """Тест: при случайных смещениях диапазон XY — оценка сверху."""
+        config = minimal_config(ENVELOPE_CHANGES, **{"Случайные смещения": True, "Зерно случайности": 3})
+        extents, exact = program_extents(CommandGenerator(config))
+        actual = self._actual_extents(CommandGenerator(config).generate_layers())
+        self.assertFalse(exact)
+        for axis, (low, high) in actual.items():
+            self.assertLessEqual(extents[axis].min, low)
+            self.assertGreaterEqual(extents[axis].max, high)
+        self.assertEqual((extents['Z'].min, extents['Z'].max), actual['Z'])
+
+    def test_refuses_to_write_outside_limits(self):
+        """Тест: при выходе за пределы файл не создаётся, отчёт указывает команду."""
+        config = minimal_config(ENVELOPE_CHANGES, **{
+            "Количество шагов головы": {"X": 10},
+            "Пределы осей станка (мм)": {"X мин": -5, "X макс": 250, "Z мин": -30}})
+        generator = CommandGenerator(config)
+        report = check_envelope(generator)
+        self.assertEqual([(v.axis, v.bound) for v in report.violations], [('X', 'макс')])
+        self.assertIn('шаг головы 10 по X', report.describe())
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'out', 'job.tap')
+            with self.assertRaises(EnvelopeError) as ctx:
+                generate_G_codes_file(config, lambda x: None, output_path=path)
+            self.assertFalse(ctx.exception.report.ok)
+            self.assertFalse(os.path.exists(os.path.dirname(path)))
+
+            config["Пределы осей станка (мм)"]["X макс"] = 400
+            generate_G_codes_file(config, lambda x: None, output_path=path)
+            self.assertTrue(os.path.exists(path))
+
+    def test_large_job_is_fast(self):
+        """Тест: проверка задания на 10^7 ударов занимает миллисекунды."""
+        config = minimal_config(LARGE_LAYER_CHANGES, **{
+            "Количество слоёв": 100, "Пределы осей станка (мм)": {"X макс": 5000, "Y макс": 5000}})
+        generator = CommandGenerator(config)
+        self.assertGreaterEqual(generator.spec.total_hits, 10 ** 7)
+        start = time.perf_counter()
+        report = check_envelope(generator)
+        self.assertLess(time.perf_counter() - start, 0.1)
+        self.assertTrue(report.ok)
+
+
+class TestMotionPlanner(unittest.TestCase):
+    """Тесты режима планировщика в TimeEstimator."""
+
+    def test_reversals_match_stop_and_go_model(self):
+        """Тест: удары по Z (развороты) считаются так же, как без планировщика."""
+        commands = []
+        for _ in range(5):
+            commands.append(MoveCommand(z=-18.0, f=3000))
+            commands.append(MoveCommand(z=30.0, f=3000))
+        commands.append(PauseCommand(milliseconds=1000))
+
+        plain = TimeEstimator(3000, 300).estimate_layer(commands)
+        planned = TimeEstimator(3000, 300, planner=True).estimate_layer(commands)
+        self.assertAlmostEqual(plain.total_seconds, planned.total_seconds, places=6)
+        self.assertAlmostEqual(planned.pause_seconds, 1.0)
+
+    def test_collinear_chain_is_blended(self):
+        """Тест: цепочка коллинеарных перемещений идёт как одно перемещение."""
+        chain = [MoveCommand(x=10.0 * i, y=0.0, f=3000) for i in range(1, 51)]
+        single = [MoveCommand(x=500.0, y=0.0, f=3000)]
+
+        plain = TimeEstimator(3000, 300).estimate_layer(chain)
+        planned = TimeEstimator(3000, 300, planner=True, lookahead=0).estimate_layer(chain)
+        reference = TimeEstimator(3000, 300).estimate_layer(single)
+
+        self.assertLess(planned.total_seconds, plain.total_seconds)
+        self.assertAlmostEqual(planned.total_seconds, reference.total_seconds, places=6)
+        self.assertAlmostEqual(planned.total_distance_mm, 500.0)
+
+    def test_lookahead_limits_blending(self):
+        """Тест: маленький буфер планировщика не даёт разогнаться на коротких перемещениях."""
+        chain = [MoveCommand(x=1.0 * i, y=0.0, f=3000) for i in range(1, 201)]
+        short_buffer = TimeEstimator(3000, 300, planner=True, lookahead=2).estimate_layer(chain)
+        long_buffer = TimeEstimator(3000, 300, planner=True, lookahead=64).estimate_layer(chain)
+        self.assertGreater(short_buffer.total_seconds, long_buffer.total_seconds)
+
+    def test_planner_not_slower_on_real_layer(self):
+        """Тест: на реальном слое планировщик не даёт оценку больше, чем без него."""
+        layer = CommandGenerator(minimal_config()).generate_layers()[0]
+        plain = TimeEstimator(3000, 300).estimate_layer(layer.commands)
+        planned = TimeEstimator(3000, 300, planner=True).estimate_layer(layer.commands)
+        self.assertLessEqual(planned.total_seconds, plain.total_seconds + 1e-9)
+        self.assertAlmostEqual(planned.total_distance_mm, plain.total_distance_mm)
+
+
+class TestAxisLimits(unittest.TestCase):
+    """Тесты ограничений скорости и ускорения по осям в TimeEstimator."""
+
+    def test_z_strokes_use_z_acceleration(self):
+        """Тест: удары по Z считаются с ускорением оси Z, перемещения XY — нет."""
+        strokes = [MoveCommand(z=-18.0, f=3000), MoveCommand(z=30.0, f=3000)]
+        travel = [MoveCommand(x=100.0, y=0.0, f=3000)]
+        limits = {'X': 300, 'Y': 300, 'Z': 75}
+
+        common = TimeEstimator(3000, 300)
+        per_axis = TimeEstimator(3000, 300, axis_acceleration=limits)
+        z_only = TimeEstimator(3000, 75)
+
+        self.assertAlmostEqual(per_axis.estimate_layer(strokes).total_seconds,
+                               z_only.estimate_layer(strokes).total_seconds)
+        self.assertAlmostEqual(per_axis.estimate_layer(travel).total_seconds,
+                               common.estimate_layer(travel).total_seconds)
+
+    def test_slowest_axis_projection_limits_speed(self):
+        """Тест: диагональное перемещение ограничено скоростью оси X по проекции."""
+        diagonal = [MoveCommand(x=300.0, y=400.0, f=6000)]
+        # Проекция на X = 0.6, значит скорость перемещения = 1800 / 0.6 = 3000 мм/мин
+        limited = TimeEstimator(6000, 300, axis_max_speed={'X': 1800})
+        equivalent = TimeEstimator(3000, 300)
+        self.assertAlmostEqual(limited.estimate_layer(diagonal).total_seconds,
+                               equivalent.estimate_layer([MoveCommand(x=300.0, y=400.0, f=3000)]).total_seconds)
+
+    def test_planner_uses_axis_limits(self):
+        """Тест: планировщик учитывает ограничения по осям так же, как обычный расчёт."""
+        strokes = []
+        for _ in range(3):
+            strokes.append(MoveCommand(z=-18.0, f=3000))
+            strokes.append(MoveCommand(z=30.0, f=3000))
+        limits = {'Z': 50}
+        plain = TimeEstimator(3000, 300, axis_acceleration=limits).estimate_layer(strokes)
+        planned = TimeEstimator(3000, 300, planner=True, axis_acceleration=limits).estimate_layer(strokes)
+        self.assertAlmostEqual(plain.total_seconds, planned.total_seconds, places=6)
+
+    def test_limits_are_read_from_parameters(self):
+        """Тест: ограничения по осям передаются из словаря параметров."""
+        generator = CommandGenerator(minimal_config(**{
+            'Ускорение по осям (мм/с²)': {'X': 300, 'Y': 300, 'Z': 100},
+            'Максимальная скорость осей (мм/мин)': {'X': 6000, 'Y': 6000, 'Z': 2000},
+        }))
+        self.assertEqual(generator.axis_acceleration['Z'], 100)
+        self.assertEqual(generator.axis_max_speed['Z'], 2000)
+
+        # Старые конфигурации без этих ключей продолжают работать
+        self.assertEqual(CommandGenerator(minimal_config()).axis_acceleration, {})
+
+
+class TestLayerMemo(unittest.TestCase):
+    """Тесты мемоизации оценок времени по сигнатуре слоя."""
+
+    CHANGES = {"Количество слоёв": 60, "Количество пустых слоёв": 5,
+               "Чередование направлений прохода слоя": True}
+
+    def _layers(self, **changes):
+        return CommandGenerator(minimal_config(self.CHANGES, **changes)).generate_layers()
+
+    def test_memoized_estimate_is_exact(self):
+        """Тест: оценка с кэшем совпадает с оценкой каждого слоя по отдельности."""
+        layers = self._layers()
+        without_signatures = [dataclasses.replace(layer, signature=None) for layer in layers]
+
+        for planner in (False, True):
+            memoized = TimeEstimator(3000, 300, planner=planner)
+            estimate = memoized.estimate_from_layers(layers)
+            expected = TimeEstimator(3000, 300, planner=planner).estimate_from_layers(without_signatures)
+
+            self.assertAlmostEqual(estimate.total_seconds, expected.total_seconds, places=6)
+            self.assertAlmostEqual(estimate.total_distance_mm, expected.total_distance_mm, places=6)
+
+            # 12 окон паттерна × 2 направления; остальные слои берутся из кэша
+            info = memoized.memo_info()
+            self.assertLessEqual(info.misses, 2 * 12 + 2)
+            self.assertEqual(info.hits + info.misses, len(layers))
+
+    def test_progressive_depth_changes_signature(self):
+        """Тест: при нарастании глубины слои с разной глубиной не совпадают."""
+        config = minimal_config(**{"Количество слоёв": 3,
+                                   "Пробивка": {"Пробивка с нарастанием глубины": True}})
+        layers = CommandGenerator(config).generate_layers()
+        self.assertEqual(len({layer.signature for layer in layers}), 3)
+
+    def test_random_offsets_are_not_memoized(self):
+        """Тест: слои со случайными смещениями не имеют сигнатуры."""
+        layers = self._layers(**{"Случайные смещения": True})
+        self.assertTrue(all(layer.signature is None for layer in layers))
+
+        estimator = TimeEstimator(3000, 300)
+        estimator.estimate_from_layers(layers)
+        self.assertEqual(estimator.memo_info().currsize, 0)
+
+
+class TestJobPrediction(unittest.TestCase):
+    """Тесты прогноза размера файла, количества команд и времени."""
+
+    def _variants(self):
+        yield minimal_config()
+
+        # Нарастание глубины, пустые слои, смена осей
+        yield minimal_config(**{
+            "Пробивка": {"Пробивка с нарастанием глубины": True},
+            "Количество слоёв": 30,
+            "Количество пустых слоёв": 4,
+            "Смена осей X↔Y": True,
+        })
+
+        # Неполное окно паттерна, случайный порядок, сигнал короче паузы
+        yield minimal_config(**{
+            "Параметры паттерна": {
+                "Автоматическое определение формы паттерна": False, "nx": 7, "ny": 5, "Кол-во ударов": 4},
+            "Количество слоёв": 23,
+            "Случайный порядок ударов": True,
+            "Зерно случайности": 5,
+            "Позиция при ручной укладки слоя": {
+                "Звуковой сигнал (сек)": 3, "Пауза в конце слоя (сек)": 5,
+                "Режим звукового сигнала": {"value": "Прерывистый"}},
+        })
+
+        # Скорость из одной цифры — строки ударов короче ширины поля
+        yield minimal_config(**{
+            "Скорость (мм/мин)": {"Движение осей X и Y": 9},
+            "Позиция при ручной укладки слоя": {"Рост Z с каждым слоем": False},
+            "Количество слоёв": 12,
+        })
+
+        # Номера слоёв разной длины, меняющаяся длина Z команд, чередование направлений
+        yield minimal_config(**{
+            "Количество слоёв": 105,
+            "Количество пустых слоёв": 7,
+            "Толщина слоя (мм)": 0.1,
+            "Позиция при ручной укладки слоя": {"Z": 9.95},
+            "Чередование направлений прохода слоя": True,
+            "Порядок прохождения рядов": {"value": "Из центра"},
+            "Количество шагов головы": {"X": 3, "Y": 4},
+        })
+
+    def test_prediction_matches_generated_file(self):
+        """Тест: команды, байты и время совпадают с реально сгенерированным файлом."""
+        with tempfile.TemporaryDirectory() as tmp:
+            for i, config in enumerate(self._variants()):
+                with self.subTest(variant=i):
+                    prediction = predict_job(config)
+                    self.assertTrue(prediction.exact)
+
+                    path = os.path.join(tmp, f'{i}.tap')
+                    result = generate_G_codes_file(config, lambda x: None, output_path=path)
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                    commands = sum(1 for line in data.splitlines() if line and not line.startswith(b';'))
+
+                    self.assertEqual(prediction.bytes, len(data))
+                    self.assertEqual(prediction.commands, commands)
+                    self.assertEqual(prediction.work_time_str, result['work_time_str'])
+                    self.assertEqual(prediction.layer_time_str, result['layer_time_str'])
+
+    def test_large_job_is_predicted_without_layers(self):
+        """Тест: прогноз задания на миллион слоёв считается по окнам, а не по слоям."""
+        config = minimal_config(**{"Количество слоёв": 1_000_000,
+                                   "Количество шагов головы": {"X": 50, "Y": 50},
+                                   "Чередование направлений прохода слоя": True})
+        generator = CommandGenerator(config)
+        offsets = generator.pattern_offsets()
+        hits = sum(len(offsets[slice(*generator.hit_window(layer_idx, len(offsets)))])
+                   for layer_idx in range(len(offsets)))
+        self.assertEqual(len(offsets) % generator.num_pitch, 0)
+
+        prediction = predict_job(config)
+        self.assertEqual(prediction.hits, 1_000_000 * 50 * 50 * hits // len(offsets))
+        self.assertEqual(prediction.commands, 1_000_000 * (4 + len(generator.layer_tail()))
+                         + 3 * prediction.hits)
+        layer = generator.generate_layer(0, offsets)
+        layer_seconds = make_time_estimator(generator).estimate_layer(layer.commands).total_seconds
+        self.assertAlmostEqual(prediction.seconds / 1_000_000, layer_seconds, places=6)
+
+    def test_random_offsets_are_approximate(self):
+        """Тест: при случайных смещениях размер помечается как приблизительный."""
+        self.assertFalse(predict_job(minimal_config(**{"Случайные смещения": True})).exact)
+
+    def test_generate_layer_matches_full_generation(self):
+        """Тест: отдельно сгенерированный слой совпадает со слоем из generate_layers."""
+        generator = CommandGenerator(minimal_config(**{
+            "Параметры паттерна": {
+                "Автоматическое определение формы паттерна": False, "nx": 7, "ny": 5, "Кол-во ударов": 4},
+            "Количество слоёв": 20,
+        }))
+        layers = generator.generate_layers()
+        for layer_idx in (0, 8, 9, 19):
+            self.assertEqual(generator.generate_layer(layer_idx).commands, layers[layer_idx].commands)
+
+
+class TestAtomicOutputWriter(unittest.TestCase):
+    """Тесты атомарной записи выходного файла."""
+
+    def test_replaces_file_only_on_success(self):
+        """Тест: при ошибке остаётся прежний файл и не остаётся временных."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'out.tap')
+            with AtomicOutputWriter(path, newline='\n') as f:
+                f.write('G1 X0 Y0\n')
+                self.assertFalse(os.path.exists(path))
+
+            with self.assertRaises(RuntimeError):
+                with AtomicOutputWriter(path, newline='\n') as f:
+                    f.write('G1 X1 Y1\n')
+                    raise RuntimeError('генерация прервана')
+
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), b'G1 X0 Y0\n')
+            self.assertEqual(os.listdir(tmp), ['out.tap'])
+
+    def test_durability_policies(self):
+        """Тест: все политики пишут одинаковый файл, неизвестная отклоняется."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'out.tap')
+            for durability in ('none', 'file', 'file+dir'):
+                with AtomicOutputWriter(path, buffer_size=16, durability=durability,
+                                        newline='\r\n') as f:
+                    f.write('; Слой\nG1 X0\n')
+                self.assertEqual(f.bytes_written, len('; Слой\r\nG1 X0\r\n'.encode('utf-8')))
+                with open(path, 'rb') as result:
+                    self.assertEqual(result.read().decode('utf-8'), '; Слой\r\nG1 X0\r\n')
+        with self.assertRaises(ValueError):
+            AtomicOutputWriter('out.tap', durability='always')
+
+    @unittest.skipUnless(os.name == 'posix', 'права файлов POSIX')
+    def test_file_mode_follows_current_umask(self):
+        """Тест: права итогового файла — как у open() при текущем umask процесса."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'out.tap')
+            previous = os.umask(0o027)
+            try:
+                with AtomicOutputWriter(path) as f:
+                    f.write('G1 X0\n')
+            finally:
+                os.umask(previous)
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o640)
+
+
+class _BlockingFile:
+    """Файл, запись в который ждёт разрешения (или падает с ошибкой)."""
+
+    def __init__(self, file, error=None):
+        self.file = file
+        self.error = error
+        self.allowed = threading.Event()
+        self.chunks = 0
+
+    def write(self, data):
+        self.allowed.wait(5)
+        if self.error is not None:
+            raise self.error
+        self.chunks += 1
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+class TestBackgroundWriter(unittest.TestCase):
+    """Тесты записи на диск в отдельном потоке."""
+
+    def test_same_file_as_direct_write(self):
+        """Тест: файл с фоновой записью совпадает с обычным (и при однопроходной записи)."""
+        config = minimal_config(SINGLE_PASS_CHANGES)
+        with tempfile.TemporaryDirectory() as tmp:
+            for single_pass in (False, True):
+                contents = []
+                for background_write in (False, True):
+                    path = os.path.join(tmp, f'{single_pass}_{background_write}.tap')
+                    generate_G_codes_file(config, lambda x: None, output_path=path,
+                                          single_pass=single_pass,
+                                          background_write=background_write)
+                    with open(path, 'rb') as f:
+                        contents.append(f.read())
+                self.assertEqual(contents[0], contents[1])
+
+            # Мелкие блоки: много передач через очередь, затем исправление заголовка
+            path = os.path.join(tmp, 'small.tap')
+            with AtomicOutputWriter(path, buffer_size=8, newline='\n', background=True) as f:
+                f.write('; Удары: ')
+                offset = f.tell()
+                f.write('    \n' + 'G1 X0\n' * 50)
+                f.patch(offset, '1234')
+                f.write('M30\n')
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), ('; Удары: 1234\n' + 'G1 X0\n' * 50 + 'M30\n').encode())
+
+    def test_backpressure(self):
+        """Тест: генерация ждёт, пока очередь блоков заполнена."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'out.tap')
+            writer = AtomicOutputWriter(path, buffer_size=10, newline='\n',
+                                        background=True, queue_chunks=2)
+            done = threading.Event()
+
+            def produce():
+                with writer:
+                    blocking = _BlockingFile(writer._file)
+                    writer._file = blocking
+                    for i in range(10):
+                        writer.write(f'G1 X{i:05}\n')
+                    done.set()
+
+            producer = threading.Thread(target=produce)
+            producer.start()
+            time.sleep(0.1)
+            # Один блок пишется, два в очереди, генерация ждёт места для четвёртого
+            self.assertFalse(done.is_set())
+            self.assertEqual(writer._queue.qsize(), 2)
+            writer._file.allowed.set()
+            producer.join(5)
+            self.assertTrue(done.is_set())
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), b''.join(f'G1 X{i:05}\n'.encode() for i in range(10)))
+
+    def test_write_error_aborts_generation(self):
+        """Тест: ошибка потока записи прерывает генерацию, временный файл удаляется."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'out.tap')
+            with self.assertRaises(OSError):
+                with AtomicOutputWriter(path, buffer_size=10, background=True) as writer:
+                    writer._file = _BlockingFile(writer._file, OSError(28, 'No space left'))
+                    writer._file.allowed.set()
+                    for i in range(1000):
+                        writer.write(f'G1 X{i:05}\n')
+                        self.assertLess(i, 100)
+            self.assertEqual(os.listdir(tmp), [])
+            self.assertIsNone(writer._thread)
+
+    def test_generation_error_stops_writer(self):
+        """Тест: ошибка генерации останавливает поток записи, файл не создаётся."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'out.tap')
+            with self.assertRaises(RuntimeError):
+                with AtomicOutputWriter(path, buffer_size=10, background=True) as writer:
+                    writer.write('G1 X0\n' * 100)
+                    raise RuntimeError('генерация прервана')
+            self.assertEqual(os.listdir(tmp), [])
+            self.assertIsNone(writer._thread)
+
+
+class TestMemoryBudget(unittest.TestCase):
+    """Тесты выбора способа генерации по бюджету памяти."""
+
+    CHANGES = {"Количество шагов головы": {"X": 4, "Y": 4}, "Количество слоёв": 6}
+
+    @staticmethod
+    def _generate_traced(config, path, **kwargs):
+        """Генерирует файл под tracemalloc; возвращает (результат, пик памяти в байтах)."""
+        import tracemalloc
+        tracemalloc.start()
+        try:
+            result = generate_G_codes_file(config, lambda x: None, output_path=path, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return result, peak
+
+    def _generate_large_job(self, layers):
+        """Генерирует задание со слоями по 10^5 ударов в бюджете 200 МБ."""
+        config = minimal_config(LARGE_LAYER_CHANGES, **{"Количество слоёв": layers})
+        choice = select_engine(CommandGenerator(config), 200 * 2 ** 20)
+        with tempfile.TemporaryDirectory() as tmp:
+            result, peak = self._generate_traced(config, os.path.join(tmp, 'large.tap'),
+                                                 memory_budget=choice.memory_budget,
+                                                 background_write=False)
+        self.assertEqual(result['engine'], choice.engine)
+        self.assertEqual(result['hits'], 10 ** 5 * layers)
+        self.assertLessEqual(peak, choice.estimated_bytes)
+
+    def test_large_job_fits_budget(self):
+        """Тест: задание на 10^7 ударов укладывается в 200 МБ, слой такого задания — в оценку."""
+        generator = CommandGenerator(minimal_config(LARGE_LAYER_CHANGES, **{"Количество слоёв": 100}))
+        hits = (generator.num_row_y * generator.num_step_x * generator.num_pitch
+                * (generator.amount_layers + generator.amount_virtual_layers))
+        self.assertGreaterEqual(hits, 10 ** 7)
+
+        budget = 200 * 2 ** 20
+        choice = select_engine(generator, budget)
+        self.assertEqual(choice.engine, 'streaming')
+        self.assertLessEqual(choice.estimated_bytes, budget)
+        # Все слои в памяти не помещаются
+        self.assertGreater(choice.estimates['memory'], budget)
+        with self.assertRaises(ValueError):
+            select_engine(generator, budget, need_all_layers=True)
+
+        # Пик памяти определяется размером слоя, а не их количеством
+        self._generate_large_job(layers=1)
+
+    @unittest.skipUnless(os.environ.get('LARGE_TESTS'), 'долгий тест (минуты): LARGE_TESTS=1')
+    def test_large_job_generated_within_budget(self):
+        """Тест: задание на 10^7 ударов генерируется целиком в пределах оценки памяти."""
+        self._generate_large_job(layers=100)
+
+    def test_fastest_engine_that_fits(self):
+        """Тест: выбирается самый быстрый способ из укладывающихся в бюджет."""
+        generator = CommandGenerator(minimal_config(self.CHANGES))
+        estimates = estimate_engine_memory(generator)
+        self.assertEqual(select_engine(generator).engine, 'template')
+        self.assertEqual(select_engine(generator, estimates['streaming']).engine, 'streaming')
+        self.assertEqual(select_engine(generator, need_all_layers=True).engine, 'memory')
+        with self.assertRaises(ValueError):
+            select_engine(generator, estimates['streaming'] - 1)
+
+        config = minimal_config(self.CHANGES, **{"Случайные смещения": True})
+        self.assertEqual(select_engine(CommandGenerator(config)).engine, 'streaming')
+
+    def test_engines_write_same_file_within_budget(self):
+        """Тест: файл не зависит от способа, пик памяти не превышает оценку."""
+        estimates = estimate_engine_memory(CommandGenerator(minimal_config(self.CHANGES)))
+        config = minimal_config(self.CHANGES, **{"Чередование направлений прохода слоя": True,
+                                                 "Пробивка": {"Пробивка с нарастанием глубины": True}})
+        with tempfile.TemporaryDirectory() as tmp:
+            reference = os.path.join(tmp, 'reference.tap')
+            generate_G_codes_file(config, lambda x: None, output_path=reference)
+            # Все слои в памяти держит только запись подпрограммами — её файл
+            # сравнивается с обычным после развёртывания вызовов
+            for engine, budget, subprograms in (('template', 0, False),
+                                                ('streaming', estimates['streaming'], False),
+                                                ('memory', 0, True)):
+                with self.subTest(engine=engine):
+                    path = os.path.join(tmp, f'{engine}.tap')
+                    result, peak = self._generate_traced(config, path, memory_budget=budget,
+                                                         subprograms=subprograms)
+                    self.assertEqual(result['engine'], engine)
+                    if budget:
+                        self.assertLessEqual(peak, budget)
+                    if subprograms:
+                        self.assertLessEqual(peak, estimates['memory'])
+                        self.assertEqual(expand_subprograms(path)[0], program_words(reference))
+                    else:
+                        with open(path, 'rb') as f, open(reference, 'rb') as ref:
+                            self.assertEqual(f.read(), ref.read())
+
+    def test_template_reuses_hit_moves(self):
+        """Тест: при reuse_hits слои с тем же окном делят XY команды ударов."""
+        config = minimal_config(self.CHANGES, **{"Количество слоёв": 30})
+        generator = CommandGenerator(config)
+        layers = list(generator.iter_layers(reuse_hits=True))
+        self.assertEqual(layers, CommandGenerator(config).generate_layers())
+        same_window = [layer for layer in layers if layer.signature[:2] == layers[0].signature[:2]]
+        self.assertGreater(len(same_window), 1)
+        self.assertIs(same_window[0].commands[2], same_window[1].commands[2])
+
+
+class TestSubprograms(unittest.TestCase):
+    """Тесты записи слоёв подпрограммами."""
+
+    def test_expanded_program_matches_normal_output(self):
+        """Тест: развёрнутая программа совпадает с обычной по всем перемещениям."""
+        # Вариант: (параметры, во сколько раз файл должен стать меньше)
+        variants = {
+            'простой': ({}, 3),
+            # Пока глубина нарастает, слои уникальны и пишутся целиком
+            'реверс и глубина': ({"Чередование направлений прохода слоя": True,
+                                  "Пробивка": {"Пробивка с нарастанием глубины": True,
+                                               "Начальная глубина удара (мм)": 8,
+                                               "Глубина удара (мм)": 18}}, 1.5),
+            'без роста Z и случайный порядок': ({"Случайный порядок ударов": True,
+                                                 "Зерно случайности": 7}, 3),
+        }
+        for name, (overrides, shrink) in variants.items():
+            with self.subTest(variant=name), tempfile.TemporaryDirectory() as tmp:
+                config = minimal_config({"Количество слоёв": 40, "Количество пустых слоёв": 3},
+                                        overrides)
+                if name.startswith('без роста'):
+                    config["Позиция при ручной укладки слоя"]["Рост Z с каждым слоем"] = False
+
+                normal_path = os.path.join(tmp, 'normal.tap')
+                sub_path = os.path.join(tmp, 'sub.tap')
+                generate_G_codes_file(config, lambda x: None, output_path=normal_path)
+                generate_G_codes_file(config, lambda x: None, output_path=sub_path,
+                                      subprograms=True)
+
+                expanded, programs = expand_subprograms(sub_path)
+                self.assertEqual(expanded, program_words(normal_path))
+                self.assertLess(programs, 43)
+                self.assertLess(os.path.getsize(sub_path), os.path.getsize(normal_path) / shrink)
+
+    def test_random_offsets_are_rejected(self):
+        """Тест: при случайных смещениях режим подпрограмм недоступен."""
+        config = minimal_config(**{"Случайные смещения": True})
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.assertRaises(ValueError):
+                generate_G_codes_file(config, lambda x: None,
+                                      output_path=os.path.join(tmp, 'sub.tap'), subprograms=True)
+            self.assertEqual(os.listdir(tmp), [])
+
+
+class TestSplitOutput(unittest.TestCase):
+    """Тесты записи программы частями."""
+
+    CHANGES = {"Количество слоёв": 25, "Количество пустых слоёв": 2, "Зерно случайности": 3}
+
+    @staticmethod
+    def _body(path):
+        """Строки программы начиная с первого слоя (без заголовка)."""
+        with open(path, encoding='utf-8') as f:
+            lines = f.readlines()
+        first = next(i for i, line in enumerate(lines) if line.startswith('; <<<'))
+        return lines[first - 1:]
+
+    def test_split_by_layers(self):
+        """Тест: части по N слоёв вместе совпадают с обычным файлом."""
+        with tempfile.TemporaryDirectory() as tmp:
+            normal_path = os.path.join(tmp, 'normal.tap')
+            generate_G_codes_file(minimal_config(self.CHANGES), lambda x: None, output_path=normal_path)
+            path = os.path.join(tmp, 'split.tap')
+            result = generate_G_codes_file(minimal_config(self.CHANGES), lambda x: None,
+                                           output_path=path, split_layers=10)
+
+            self.assertFalse(os.path.exists(path))
+            self.assertEqual([os.path.basename(p) for p in result['parts']],
+                             ['split_part01.tap', 'split_part02.tap', 'split_part03.tap'])
+            joined = [line for part in result['parts'] for line in self._body(part)]
+            self.assertEqual(joined, self._body(normal_path))
+
+            with open(result['manifest_path'], encoding='utf-8') as f:
+                manifest = json.load(f)
+            self.assertEqual([(p['first_layer'], p['last_layer']) for p in manifest['parts']],
+                             [(1, 10), (11, 20), (21, 27)])
+            self.assertEqual([p['bytes'] for p in manifest['parts']],
+                             [os.path.getsize(p) for p in result['parts']])
+            with open(result['parts'][1], encoding='utf-8') as f:
+                text = f.read()
+            self.assertIn('; Часть               : 2 из 3', text)
+            self.assertIn(f"; Время всех слоёв    : {manifest['parts'][1]['work_time_str']}", text)
+
+    def test_split_by_bytes(self):
+        """Тест: каждая часть укладывается в ограничение размера."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'split.tap')
+            result = generate_G_codes_file(minimal_config(self.CHANGES), lambda x: None,
+                                           output_path=path, split_bytes=8000)
+            sizes = [os.path.getsize(p) for p in result['parts']]
+            self.assertGreater(len(sizes), 2)
+            self.assertTrue(all(size <= 8000 for size in sizes), sizes)
+            # Части заполняются жадно: следующий слой (~1.3 КБ) уже не поместился бы
+            self.assertTrue(all(size > 8000 - 1600 for size in sizes[:-1]), sizes)
+
+    def test_too_small_budget_is_rejected(self):
+        """Тест: слой, не помещающийся в ограничение, — ошибка без записи файлов."""
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.assertRaises(ValueError):
+                generate_G_codes_file(minimal_config(self.CHANGES), lambda x: None,
+                                      output_path=os.path.join(tmp, 'split.tap'),
+                                      split_bytes=1000)
+            self.assertEqual(os.listdir(tmp), [])
+
+    def test_resumed_split_has_resume_line(self):
+        """Тест: заголовок каждой части продолженного задания содержит слой продолжения."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'split.tap')
+            result = generate_G_codes_file(minimal_config(self.CHANGES), lambda x: None, output_path=path,
+                                           split_bytes=8000, start_layer=5)
+            self.assertGreater(len(result['parts']), 1)
+            for part in result['parts']:
+                self.assertLessEqual(os.path.getsize(part), 8000)
+                with open(part, encoding='utf-8') as f:
+                    self.assertIn('; Продолжение задания со слоя        : 5', f.read())
+
+    def test_split_streams_layers(self):
+        """Тест: части пишутся без списка всех слоёв и совпадают с записью из списка."""
+        config = minimal_config(self.CHANGES)
+        estimates = estimate_engine_memory(CommandGenerator(config))
+        budget = estimates['template']
+        self.assertGreater(estimates['memory'], budget)
+
+        for limits in ({'max_layers': 10}, {'max_bytes': 8000}):
+            with self.subTest(**limits), tempfile.TemporaryDirectory() as tmp:
+                result = generate_G_codes_file(
+                    config, lambda x: None, output_path=os.path.join(tmp, 'streamed.tap'),
+                    memory_budget=budget, split_layers=limits.get('max_layers', 0),
+                    split_bytes=limits.get('max_bytes', 0))
+                self.assertNotEqual(result['engine'], 'memory')
+
+                generator = CommandGenerator(config)
+                parts, _ = write_split_output(os.path.join(tmp, 'listed.tap'), generator,
+                                              generator.generate_layers(),
+                                              make_time_estimator(generator), **limits)
+                self.assertEqual(len(parts), len(result['parts']))
+                for part, streamed in zip(parts, result['parts']):
+                    with open(part.path, 'rb') as f1, open(streamed, 'rb') as f2:
+                        self.assertEqual(f1.read(), f2.read())
+
+
+class TestResumeFromLayer(unittest.TestCase):
+    """Тесты продолжения задания с заданного слоя."""
+
+    def test_layers_match_full_generation(self):
+        """Тест: слои с start_layer совпадают с хвостом полной генерации."""
+        full = CommandGenerator(minimal_config(RESUME_CHANGES)).generate_layers()
+        for start_layer in (1, 2, 12, 13, 25, 34):
+            with self.subTest(start_layer=start_layer):
+                layers = CommandGenerator(minimal_config(RESUME_CHANGES)).generate_layers(start_layer=start_layer)
+                self.assertEqual(layers, full[start_layer - 1:])
+
+    def test_invalid_start_layer(self):
+        """Тест: номер слоя вне задания — ошибка."""
+        generator = CommandGenerator(minimal_config(RESUME_CHANGES))
+        for start_layer in (0, 35):
+            with self.subTest(start_layer=start_layer), self.assertRaises(ValueError):
+                generator.generate_layers(start_layer=start_layer)
+
+    def test_resume_file(self):
+        """Тест: файл продолжения — блок входа и слои K..N как в полном файле."""
+        with tempfile.TemporaryDirectory() as tmp:
+            full_path = os.path.join(tmp, 'full.tap')
+            resume_path = os.path.join(tmp, 'resume.tap')
+            generate_G_codes_file(minimal_config(RESUME_CHANGES), lambda x: None, output_path=full_path)
+            generate_G_codes_file(minimal_config(RESUME_CHANGES), lambda x: None, output_path=resume_path,
+                                  start_layer=20)
+
+            with open(full_path, encoding='utf-8') as f:
+                full = f.read()
+            with open(resume_path, encoding='utf-8') as f:
+                resume = f.read()
+
+            marker = '; <<<<<<<<<< [20] layer >>>>>>>>>>'
+            self.assertTrue(full.endswith(full[full.index(marker):]))
+            self.assertEqual(resume[resume.index(marker):], full[full.index(marker):])
+            self.assertIn('; Продолжение задания со слоя        : 20', resume)
+
+            # Вход: подъём на Z укладки слоя 20, переезд к позиции укладки, остановка
+            layer_start = full[full.index(marker):].splitlines()[2:4]
+            reentry = resume[resume.index('re-entry [20]'):resume.index(marker)].splitlines()[2:]
+            self.assertEqual([line.split(';')[0].strip() for line in reentry if line != ';'],
+                             [line.split(';')[0].strip() for line in layer_start] + ['M0'])
+
+    def test_random_job_without_seed_is_rejected(self):
+        """Тест: без зерна исходного задания случайный паттерн не воспроизвести."""
+        config = minimal_config(RESUME_CHANGES)
+        del config["Зерно случайности"]
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.assertRaises(ValueError):
+                generate_G_codes_file(config, lambda x: None,
+                                      output_path=os.path.join(tmp, 'resume.tap'), start_layer=5)
+
+
+class TestSinglePass(unittest.TestCase):
+    """Тесты однопроходной записи с итогами в заголовке."""
+
+    def test_body_and_exact_totals(self):
+        """Тест: слои как при обычной записи, в заголовке — точные итоги."""
+        with tempfile.TemporaryDirectory() as tmp:
+            normal_path = os.path.join(tmp, 'normal.tap')
+            path = os.path.join(tmp, 'single.tap')
+            generate_G_codes_file(minimal_config(SINGLE_PASS_CHANGES), lambda x: None, output_path=normal_path)
+            result = generate_G_codes_file(minimal_config(SINGLE_PASS_CHANGES), lambda x: None,
+                                           output_path=path, single_pass=True)
+
+            body = TestSplitOutput._body
+            self.assertEqual(body(path), body(normal_path))
+
+            generator = CommandGenerator(minimal_config(SINGLE_PASS_CHANGES))
+            layers = generator.generate_layers()
+            estimate = TimeEstimator(3000, 300).estimate_from_layers(layers)
+            hits = sum(1 for layer in layers for cmd in layer.commands
+                       if isinstance(cmd, MoveCommand) and cmd.x is not None)
+            hits -= 2 * len(layers)  # позиция укладки в начале и в конце слоя
+
+            self.assertEqual(result['work_time_str'], estimate.to_dhms())
+            self.assertEqual(result['hits'], hits)
+            self.assertAlmostEqual(result['distance_mm'], estimate.total_distance_mm, places=6)
+            self.assertEqual(result['bytes'], os.path.getsize(path))
+
+            with open(path, encoding='utf-8') as f:
+                header = f.read(2000)
+            self.assertIn(f"; Время всех слоёв    : {estimate.to_dhms():16}\n", header)
+            self.assertIn(f"; Удары               : {hits:<12}\n", header)
+            self.assertIn(f"; Размер файла, байт  : {os.path.getsize(path):<14}\n", header)
+
+    def test_hits_count_only_emitted_rows(self):
+        """Тест: удары считаются по пройденным рядам ('В центр' при 1-2 рядах — без ударов)."""
+        with tempfile.TemporaryDirectory() as tmp:
+            for order in TestGoldenDigests.ORDERS:
+                for rows in (1, 2, 3):
+                    config = minimal_config(**{"Порядок прохождения рядов": {"value": order},
+                                               "Количество шагов головы": {"X": 2, "Y": rows},
+                                               "Количество слоёв": 3})
+                    layers = CommandGenerator(config).generate_layers()
+                    hits = sum(1 for layer in layers for cmd in layer.commands
+                               if isinstance(cmd, MoveCommand) and cmd.x is not None)
+                    hits -= 2 * len(layers)
+                    for single_pass in (False, True):
+                        with self.subTest(order=order, rows=rows, single_pass=single_pass):
+                            path = os.path.join(tmp, 'job.tap')
+                            result = generate_G_codes_file(config, lambda x: None, output_path=path,
+                                                           single_pass=single_pass)
+                            self.assertEqual(result['hits'], hits)
+                            if single_pass:
+                                with open(path, encoding='utf-8') as f:
+                                    self.assertIn(f"; Удары               : {hits:<12}\n", f.read(2000))
+
+    def test_layers_are_not_materialized(self):
+        """Тест: слои генерируются по одному."""
+        generator = CommandGenerator(minimal_config(SINGLE_PASS_CHANGES))
+        layers = generator.iter_layers()
+        self.assertNotIsInstance(layers, list)
+        self.assertEqual(next(layers).layer_number, 1)
+        with self.assertRaises(ValueError):
+            generator.iter_layers(start_layer=0)
+
+    def test_patch_must_fit_reserved_field(self):
+        """Тест: значение длиннее зарезервированного поля не записывается."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'patch.tap')
+            with self.assertRaises(ValueError):
+                with AtomicOutputWriter(path) as f:
+                    formatter = GCodeFormatter(f, 1)
+                    formatter.write_prehead(CommandGenerator(minimal_config(SINGLE_PASS_CHANGES)).get_prehead_params(),
+                                            reserve_stats=True)
+                    formatter.patch_prehead(hits='1' * 13)
+            self.assertEqual(os.listdir(tmp), [])
+
+
+class TestTelemetry(unittest.TestCase):
+    """Тесты журнала генераций и сводки загрузки."""
+
+    def test_records_every_generation(self):
+        """Тест: каждая генерация (и неудачная) дописывает строку журнала."""
+        config = minimal_config(SINGLE_PASS_CHANGES)
+        with tempfile.TemporaryDirectory() as tmp:
+            log = os.path.join(tmp, 'telemetry.jsonl')
+            paths = [os.path.join(tmp, 'job.tap'), os.path.join(tmp, 'single_pass.tap')]
+            results = [
+                generate_G_codes_file(config, lambda x: None, output_path=paths[0],
+                                      telemetry_path=log),
+                generate_G_codes_file(config, lambda x: None, output_path=paths[1],
+                                      single_pass=True, telemetry_path=log),
+            ]
+            config["Пределы осей станка (мм)"] = {"X макс": 1}
+            with self.assertRaises(EnvelopeError):
+                generate_G_codes_file(config, lambda x: None, output_path=paths[0],
+                                      telemetry_path=log)
+
+            records = list(read_records(log))
+            self.assertEqual([r['status'] for r in records], ['ok', 'ok', 'error'])
+            spec = JobSpec.from_dict(config)
+            for record, result, path in zip(records, results, paths):
+                self.assertEqual(record['hits'], spec.total_hits)
+                self.assertEqual(record['hits'], result['hits'])
+                self.assertEqual(record['bytes'], os.path.getsize(path))
+                self.assertEqual(record['layers'], spec.total_layers)
+                self.assertEqual(record['head'], spec.head_name)
+                self.assertEqual(record['engine'], result['engine'])
+                self.assertGreater(record['machine_seconds'], 0)
+                self.assertIn('write', record['stages'])
+                self.assertLessEqual(sum(record['stages'].values()), record['seconds'] + 1e-3)
+            # Пределы осей — параметр задания, хеш меняется
+            self.assertEqual(records[0]['params'], records[1]['params'])
+            self.assertNotEqual(records[2]['params'], records[0]['params'])
+            self.assertIn('EnvelopeError', records[2]['error'])
+
+    def test_parameter_hash_ignores_file_name(self):
+        """Тест: хеш параметров не зависит от имени файла и стабилен между процессами."""
+        config = minimal_config(SINGLE_PASS_CHANGES)
+        renamed = dict(config, **{"Имя файла": "другое_имя.tap"})
+        self.assertEqual(parameter_hash(JobSpec.from_dict(config)),
+                         parameter_hash(JobSpec.from_dict(renamed)))
+        code = ('import json, sys; from core import JobSpec, parameter_hash; '
+                'print(parameter_hash(JobSpec.from_dict(json.load(sys.stdin))))')
+        output = subprocess.run([sys.executable, '-c', code], input=json.dumps(config),
+                                capture_output=True, text=True, encoding='utf-8', check=True)
+        self.assertEqual(output.stdout.strip(), parameter_hash(JobSpec.from_dict(config)))
+
+    def test_disabled_and_unwritable_log(self):
+        """Тест: пустой путь отключает журнал, ошибка записи не прерывает генерацию."""
+        config = minimal_config(SINGLE_PASS_CHANGES)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'job.tap')
+            generate_G_codes_file(config, lambda x: None, output_path=path, telemetry_path='')
+            self.assertEqual(os.listdir(tmp), ['job.tap'])
+            # Путь журнала — папка: запись невозможна, файл программы создаётся
+            with self.assertLogs('core.telemetry', 'WARNING'):
+                generate_G_codes_file(config, lambda x: None, output_path=path,
+                                      telemetry_path=tmp)
+
+    def test_report(self):
+        """Тест: сводка по головам, дням, версиям; повреждённые строки пропускаются."""
+        records = [
+            {'time': '2026-03-01T10:00:00+00:00', 'version': '1.9.0', 'status': 'ok',
+             'head': 'A', 'hits': 1000, 'bytes': 1 << 20, 'machine_seconds': 3600,
+             'seconds': 2.0, 'engine': 'template'},
+            {'time': '2026-03-01T11:00:00+00:00', 'version': '1.10.0', 'status': 'ok',
+             'head': 'B', 'hits': 3000, 'bytes': 3 << 20, 'machine_seconds': 7200,
+             'seconds': 1.0, 'engine': 'template'},
+            {'time': '2026-03-02T09:00:00+00:00', 'version': '1.10.0', 'status': 'error',
+             'head': 'A', 'seconds': 0.1, 'error': 'EnvelopeError: ...'},
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            log = os.path.join(tmp, 'telemetry.jsonl')
+            with open(log, 'w', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record) + '\n')
+                f.write('{"time": "2026-03-0\n')
+            with self.assertLogs('core.telemetry', 'WARNING'):
+                report = build_report(read_records(log))
+
+        self.assertEqual([(row.key, row.runs, row.errors, row.machine_hours) for row in report.heads],
+                         [('B', 1, 0, 2.0), ('A', 1, 1, 1.0)])
+        self.assertEqual([(row.key, row.hits_per_second) for row in report.days],
+                         [('2026-03-01', 4000 / 3.0), ('2026-03-02', 0.0)])
+        self.assertEqual([row.key for row in report.versions], ['1.9.0', '1.10.0'])
+        self.assertEqual(report.engines[0].megabytes_per_second, 4 / 3.0)
+        self.assertIn('Станко-часов', report.describe())
+
+
+class TestJobService(unittest.TestCase):
+    """Тесты локального сервиса генерации (только localhost)."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.loop = asyncio.new_event_loop()
+        cls.service = GenerationJobService(os.path.join(cls.tmp.name, 'jobs'), max_workers=1, port=0)
+        host, port = cls.loop.run_until_complete(cls.service.start())
+        cls.thread = threading.Thread(target=cls.loop.run_forever, daemon=True)
+        cls.thread.start()
+        cls.client = JobServiceClient(f'{host}:{port}', timeout=60)
+
+    @classmethod
+    def tearDownClass(cls):
+        asyncio.run_coroutine_threadsafe(cls.service.close(), cls.loop).result()
+        cls.loop.call_soon_threadsafe(cls.loop.stop)
+        cls.thread.join()
+        cls.loop.close()
+        cls.tmp.cleanup()
+
+    def test_job_matches_in_process_generation(self):
+        """Тест: файл от сервиса совпадает с файлом, сгенерированным напрямую."""
+        config = minimal_config(**{"Зерно случайности": 42})
+
+        job_id = self.client.submit(config)
+        progress = []
+        final = self.client.wait(job_id, progress.append)
+        self.assertEqual(final['state'], 'done')
+        self.assertEqual(progress[-1], 100)
+        self.assertEqual(progress, sorted(progress))
+
+        remote = self.client.download(job_id, os.path.join(self.tmp.name, 'remote.tap'))
+        local = os.path.join(self.tmp.name, 'local', 'local.tap')
+        result = generate_G_codes_file(config, lambda x: None, output_path=local)
+        self.assertEqual(final['result'], result)
+        with open(remote, 'rb') as f1, open(local, 'rb') as f2:
+            self.assertEqual(f1.read(), f2.read())
+        self.assertIn(job_id, [job['id'] for job in self.client.jobs()])
+
+    def test_invalid_requests(self):
+        """Тест: неполные параметры и неизвестные задания отклоняются."""
+        config = minimal_config()
+        del config["Автоматическая генерация имени файла"]
+        with self.assertRaises(RuntimeError):
+            self.client.submit(config)
+        with self.assertRaises(RuntimeError):
+            self.client.status('unknown')
+
+        config = minimal_config()
+        del config["Пробивка"]
+        with self.assertRaises(RuntimeError):
+            self.client.submit(config)
+
+        # Ошибка генерации в процессе пула приходит в итоговом событии
+        config = minimal_config(**{"Параметры паттерна": {"Кол-во ударов": 0}})
+        job_id = self.client.submit(config)
+        with self.assertRaises(RuntimeError):
+            self.client.wait(job_id)
+        self.assertEqual(self.client.status(job_id)['state'], 'error')
+        with self.assertRaises(RuntimeError):
+            self.client.download('unknown', os.path.join(self.tmp.name, 'none.tap'))
+
+    def test_rejects_paths_outside_job_folder(self):
+        """Тест: имя файла с путём отклоняется ответом 400, файл не создаётся."""
+        crafted_head = minimal_config(**{
+            "Автоматическая генерация имени файла": True,
+            "Выбранная игольница (ИП игольница)": "../голова",
+            "Игольницы (ИП головы)": {
+                "../голова": {"X": 2, "Y": 2, "needle_spacing_x": 8.0, "needle_spacing_y": 8.0}},
+        })
+        outside = os.path.join(self.tmp.name, 'outside.tap')
+        configs = {name: minimal_config(**{"Имя файла": name})
+                   for name in (outside, '../../outside.tap', 'sub/outside.tap',
+                                'sub\\outside.tap', 'C:outside.tap', '..')}
+        configs['head'] = crafted_head
+
+        host, port = self.service.host, self.service.port
+        for name, config in configs.items():
+            with self.subTest(name=name):
+                connection = http.client.HTTPConnection(host, port, timeout=10)
+                try:
+                    connection.request('POST', '/jobs', json.dumps(config).encode('utf-8'),
+                                       {'Content-Type': 'application/json'})
+                    response = connection.getresponse()
+                    self.assertEqual(response.status, 400)
+                    self.assertIn('Недопустимое имя файла', json.loads(response.read())['error'])
+                finally:
+                    connection.close()
+        self.assertFalse(os.path.exists(outside))
+
+    def test_bad_content_length_is_rejected(self):
+        """Тест: нечисловой или отрицательный Content-Length — ответ 400, а не обрыв соединения."""
+        for value in ('abc', '-5', '²'):
+            with self.subTest(value=value):
+                with socket.create_connection((self.service.host, self.service.port), timeout=10) as sock:
+                    sock.sendall(f'POST /jobs HTTP/1.1\r\nContent-Length: {value}\r\n\r\n'.encode('latin-1'))
+                    response = sock.makefile('rb').readline()
+                self.assertTrue(response.startswith(b'HTTP/1.1 400'), response)
+
+    def test_truncated_download_keeps_previous_file(self):
+        """Тест: при обрыве скачивания остаётся прежний файл, обрезанный не сохраняется."""
+        server = socket.create_server(('127.0.0.1', 0))
+
+        def serve():
+            connection, _ = server.accept()
+            with connection:
+                connection.recv(65536)
+                connection.sendall(b'HTTP/1.1 200 OK\r\nContent-Type: application/octet-stream\r\n'
+                                   b'Content-Length: 1000\r\nConnection: close\r\n\r\nG1 X0 Y0\n')
+
+        thread = threading.Thread(target=serve, daemon=True)
+        thread.start()
+        folder = os.path.join(self.tmp.name, 'truncated')
+        os.makedirs(folder)
+        path = os.path.join(folder, 'job.tap')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('прежний файл')
+        try:
+            client = JobServiceClient('127.0.0.1:%d' % server.getsockname()[1], timeout=10)
+            with self.assertRaises(RuntimeError):
+                client.download('job', path)
+        finally:
+            thread.join()
+            server.close()
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'прежний файл')
+        self.assertEqual(os.listdir(folder), ['job.tap'])
+
+
+class TestBatchGeneration(unittest.TestCase):
+    """Тесты пакетной генерации для нескольких игольниц."""
+
+    def _config(self):
+        config = minimal_config(**{"Случайный порядок ударов": True})
+        # Набор игольниц заменяется целиком
+        config["Игольницы (ИП головы)"] = {
+            "Голова_А": {"X": 2, "Y": 3, "needle_spacing_x": 8.0, "needle_spacing_y": 8.0},
+            "Голова_Б": {"X": 4, "Y": 1, "needle_spacing_x": 8.0, "needle_spacing_y": 8.0},
+            "Голова_В": {"X": 3, "Y": 3, "needle_spacing_x": 6.0, "needle_spacing_y": 7.0},
+        }
+        return config
+
+    def _check_batch(self, max_workers):
+        config = self._config()
+        with tempfile.TemporaryDirectory() as tmp:
+            batch = generate_batch(config, output_dir=tmp, max_workers=max_workers)
+            self.assertEqual(batch.failed, [])
+            # Паттерн строится один раз на группу голов с одинаковым шагом игл
+            self.assertEqual(batch.pattern_groups, 2)
+
+            for item in batch.items:
+                single = {**config, "Выбранная игольница (ИП игольница)": item.head_name,
+                          "Зерно случайности": batch.seed}
+                path = os.path.join(tmp, 'single.tap')
+                result = generate_G_codes_file(single, lambda x: None, output_path=path)
+                self.assertEqual(item.result, result)
+                with open(item.path, 'rb') as f1, open(path, 'rb') as f2:
+                    self.assertEqual(f1.read(), f2.read(), item.head_name)
+
+            table = batch.format_summary_table()
+            for head_name in config["Игольницы (ИП головы)"]:
+                self.assertIn(head_name, table)
+
+    def test_batch_matches_single_generation(self):
+        """Тест: файлы пакета совпадают с файлами, сгенерированными по одному."""
+        self._check_batch(max_workers=1)
+
+    def test_batch_in_process_pool(self):
+        """Тест: параллельная генерация в пуле процессов даёт те же файлы."""
+        self._check_batch(max_workers=2)
+
+    def test_failed_head_does_not_stop_batch(self):
+        """Тест: ошибка одной головы попадает в таблицу, остальные генерируются."""
+        config = self._config()
+        del config["Игольницы (ИП головы)"]["Голова_Б"]["Y"]
+        with tempfile.TemporaryDirectory() as tmp:
+            batch = generate_batch(config, output_dir=tmp, max_workers=1)
+        self.assertEqual([item.head_name for item in batch.failed], ["Голова_Б"])
+        self.assertIn('ОШИБКА', batch.format_summary_table())
+
+
+class TestSender(unittest.TestCase):
+    """Тесты отправки программы на контроллер (на локальном имитаторе)."""
+
+    def _reference_config(self):
+        TestIntegrationWithReference.setUpClass()
+        return TestIntegrationWithReference.reference_data
+
+    def test_streams_reference_program(self):
+        """Тест: контроллер получает строки reference.tap без комментариев, буфер не переполняется."""
+        expected = []
+        with open('reference.tap', 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.split(';', 1)[0].strip()
+                if line:
+                    expected.append(line)
+
+        config = self._reference_config()
+        generator = CommandGenerator(config)
+        consumed = [0]
+        consumed_at_first_layer = []
+
+        def lines():
+            for item in program_lines(generator):
+                consumed[0] += 1
+                yield item
+
+        def progress(layer_number):
+            if not consumed_at_first_layer:
+                consumed_at_first_layer.append(consumed[0])
+
+        with ControllerSimulator(time_scale=0) as simulator:
+            with socket.create_connection(simulator.address) as connection:
+                result = GCodeSender(connection).stream(lines(), progress)
+            self.assertTrue(simulator.wait_idle())
+
+        self.assertEqual(simulator.received, expected)
+        self.assertEqual(simulator.executed, expected)
+        self.assertFalse(simulator.overflow)
+        self.assertLessEqual(result.max_buffered, 128)
+        self.assertEqual(result.lines, len(expected))
+        # Первый слой подтверждён, когда сгенерирована лишь часть программы
+        self.assertLess(consumed_at_first_layer[0], consumed[0] // 2)
+        self.assertLess(result.first_line_seconds, result.seconds)
+
+    def test_send_job_progress_and_resume(self):
+        """Тест: send_job с start_layer отправляет блок входа и доводит прогресс до 100%."""
+        config = minimal_config(RESUME_CHANGES)
+        generator = CommandGenerator(config)
+        expected = [line for _, line in program_lines(generator, start_layer=3,
+                                                      dwell_units=DWELL_SECONDS)]
+        progress = []
+        with ControllerSimulator(time_scale=0) as simulator:
+            send_job(config, *simulator.address, start_layer=3,
+                     display_percent_progress_func=progress.append)
+            simulator.wait_idle()
+        self.assertEqual(simulator.received, expected)
+        self.assertEqual(progress[-1], 100)
+        self.assertEqual(progress, sorted(progress))
+
+    def test_pause_units_follow_controller(self):
+        """Тест: send_job переводит паузы G4 P в секунды (Grbl), файл и Mach3 — миллисекунды."""
+        config = minimal_config(RESUME_CHANGES, **{
+            "Позиция при ручной укладки слоя": {"Пауза в конце слоя (сек)": 2}})
+        generator = CommandGenerator(config)
+        file_pauses = [line for _, line in program_lines(generator) if line.startswith('G4')]
+        self.assertTrue(file_pauses)
+        self.assertEqual(set(file_pauses), {'G4 P2000'})
+
+        with ControllerSimulator(time_scale=0) as simulator:
+            send_job(config, *simulator.address)
+            simulator.wait_idle()
+        sent_pauses = [line for line in simulator.received if line.startswith('G4')]
+        self.assertEqual(sent_pauses, ['G4 P2.0'] * len(file_pauses))
+
+        for units, seconds in ((DWELL_SECONDS, 1.5), (DWELL_MILLISECONDS, 0.0015)):
+            with ControllerSimulator(time_scale=0, dwell_units=units) as simulator:
+                with socket.create_connection(simulator.address) as connection:
+                    GCodeSender(connection, timeout=5).stream(['G4 P1.5'])
+                self.assertTrue(simulator.wait_idle())
+            self.assertAlmostEqual(simulator.machine_seconds, seconds)
+        with self.assertRaises(ValueError):
+            list(program_lines(generator, dwell_units='min'))
+
+    def test_feed_override_and_pause(self):
+        """Тест: коррекция подачи и пауза выполняются контроллером вне очереди строк."""
+        with ControllerSimulator(time_scale=1) as simulator:
+            with socket.create_connection(simulator.address) as connection:
+                sender = GCodeSender(connection, timeout=5)
+                self.assertEqual(sender.set_feed_override(137), 137)
+                self.assertEqual(sender.set_feed_override(500), 200)
+                sender.pause()
+                sender.stream(['G1 X10 F60000', 'G1 X20'])
+                time.sleep(0.05)
+                self.assertEqual(simulator.feed_override, 200)
+                self.assertTrue(simulator.paused)
+                # На паузе строки приняты, но не выполнены
+                self.assertEqual(len(simulator.received), 2)
+                self.assertLess(len(simulator.executed), 2)
+                sender.resume()
+                self.assertTrue(simulator.wait_idle(5))
+        self.assertFalse(simulator.paused)
+        self.assertEqual(simulator.executed, ['G1 X10 F60000', 'G1 X20'])
+        self.assertEqual(simulator.position['X'], 20)
+
+    def test_controller_error(self):
+        """Тест: ошибка контроллера прерывает отправку с номером строки."""
+        with ControllerSimulator(time_scale=0) as simulator:
+            with socket.create_connection(simulator.address) as connection:
+                with self.assertRaises(SenderError) as ctx:
+                    GCodeSender(connection, timeout=5).stream(['G1 X1', 'G1 X?', 'G1 X2'])
+        self.assertIn('строку 2', str(ctx.exception))
+        self.assertEqual(simulator.errors, [('G1 X?', 'error:1')])
+
+    def test_envelope_checked_before_connecting(self):
+        """Тест: программа за пределами осей не отправляется."""
+        config = minimal_config(ENVELOPE_CHANGES, **{"Пределы осей станка (мм)": {"X макс": 10}})
+        with ControllerSimulator(time_scale=0) as simulator:
+            with self.assertRaises(EnvelopeError):
+                send_job(config, *simulator.address)
+        self.assertEqual(simulator.received, [])
+
+
+class _ManualRoot:
+    """Планировщик after/after_cancel, выполняющий задачи по команде теста."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tasks = {}
+        self._next_id = 0
+
+    def after(self, ms, func, *args):
+        with self._lock:
+            self._next_id += 1
+            self._tasks[self._next_id] = (func, args)
+            return self._next_id
+
+    def after_cancel(self, after_id):
+        with self._lock:
+            self._tasks.pop(after_id, None)
+
+    def pending(self):
+        with self._lock:
+            return len(self._tasks)
+
+    def run_pending(self, timeout=5.0):
+        """Ждёт появления задач и выполняет их в текущем (главном) потоке."""
+        deadline = time.monotonic() + timeout
+        while not self.pending() and time.monotonic() < deadline:
+            time.sleep(0.005)
+        with self._lock:
+            tasks, self._tasks = list(self._tasks.values()), {}
+        for func, args in tasks:
+            func(*args)
+        return len(tasks)
+
+
+class TestLiveEstimator(unittest.TestCase):
+    """Тесты отложенного фонового пересчёта оценок в GUI."""
+
+    def test_debounce_computes_latest_params_once(self):
+        """Тест: серия изменений приводит к одному расчёту с последними параметрами."""
+        root = _ManualRoot()
+        values = iter(range(100))
+        computed, results = [], []
+
+        def compute(params):
+            computed.append(params)
+            return params * 10
+
+        estimator = LiveEstimator(root, lambda: next(values), compute, results.append)
+        for _ in range(5):
+            estimator.schedule()
+        self.assertEqual(root.pending(), 1)
+
+        root.run_pending()            # отложенный запуск расчёта
+        root.run_pending()            # результат из рабочего потока
+        self.assertEqual(computed, [0])
+        self.assertEqual(results, [0])
+        estimator.close()
+
+    def test_stale_results_are_dropped(self):
+        """Тест: результат для устаревших параметров не попадает в GUI."""
+        root = _ManualRoot()
+        values = iter(['старые', 'новые'])
+        started, release = threading.Event(), threading.Event()
+        results = []
+
+        def compute(params):
+            if params == 'старые':
+                started.set()
+                release.wait(5)
+            return params
+
+        estimator = LiveEstimator(root, lambda: next(values), compute, results.append)
+        estimator.schedule()
+        root.run_pending()
+        self.assertTrue(started.wait(5))
+
+        estimator.schedule()
+        root.run_pending()
+        release.set()
+
+        root.run_pending()
+        self.assertEqual(results, ['новые'])
+        estimator.close()
+
+    def test_requests_are_not_dropped(self):
+        """Тест: разовый расчёт выполняется, даже если за ним следует пересчёт."""
+        root = _ManualRoot()
+        results, computed = [], []
+
+        def compute(params):
+            computed.append(params)
+            return params
+
+        estimator = LiveEstimator(root, lambda: 'прогноз', compute, lambda r: None)
+        estimator.request(lambda params: params * 2, 21, results.append)
+        estimator.request(lambda params: 1 / params, 0, results.append, results.append)
+        estimator.schedule()
+        root.run_pending()
+        while len(results) < 2:
+            self.assertTrue(root.run_pending())
+        self.assertEqual(results[0], 42)
+        self.assertIsInstance(results[1], ZeroDivisionError)
+        estimator.close()
+
+    def test_errors_are_reported(self):
+        """Тест: ошибка чтения параметров передаётся в on_error."""
+        root = _ManualRoot()
+        errors = []
+
+        def collect():
+            raise ValueError('не число')
+
+        estimator = LiveEstimator(root, collect, lambda p: p, lambda r: None, errors.append)
+        estimator.schedule()
+        root.run_pending()
+        self.assertEqual(len(errors), 1)
+        estimator.close()
+
+
+class TestStartupImports(unittest.TestCase):
+    """Тесты отложенной загрузки тяжёлых зависимостей и замера запуска."""
+
+    def _loaded_modules(self, code):
+        """Выполняет code в чистом интерпретаторе и возвращает загруженные модули."""
+        script = code + '\nimport sys\nprint("\\n".join(sys.modules))'
+        output = subprocess.run([sys.executable, '-c', script], check=True,
+                                capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        return set(output.split())
+
+    def test_core_and_gui_import_without_heavy_dependencies(self):
+        """Импорт core и gui не загружает plotly, pandas и сервис."""
+        modules = self._loaded_modules('import core, gui')
+        for name in ('plotly', 'pandas', 'asyncio', 'gui.visualization', 'core.job_service'):
+            with self.subTest(module=name):
+                self.assertNotIn(name, modules)
+
+    def test_lazy_names_are_loaded_on_first_use(self):
+        """Отложенные имена доступны как обычные атрибуты пакетов."""
+        modules = self._loaded_modules(
+            'import core, gui\ncore.generate_batch'
+        )
+        self.assertIn('core.batch', modules)
+        # plotly импортируется только при построении графика
+        self.assertNotIn('plotly', modules)
+
+        import core
+        self.assertIs(core.JobServiceClient, JobServiceClient)
+        with self.assertRaises(AttributeError):
+            core.no_such_name
+
+    def test_build_finds_lazily_used_modules(self):
+        """Тест: сборщик exe находит модули режимов --serve, --server и --send по импортам main.py."""
+        import modulefinder
+        finder = modulefinder.ModuleFinder(
+            excludes=['numpy', 'plotly', 'pandas', 'tkinter', 'PIL', 'matplotlib'])
+        finder.run_script(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py'))
+        for name in ('core.job_service', 'core.sender', 'gui.visualization'):
+            with self.subTest(module=name):
+                self.assertTrue(name in finder.modules, f'{name} не найден от main.py')
+
+    def test_profiler_records_new_imports(self):
+        """StartupProfiler записывает загруженные модули и этапы."""
+        sys.modules.pop('colorsys', None)
+        profiler = StartupProfiler()
+        with profiler:
+            import colorsys  # noqa: F401
+            import json  # уже загружен — не записывается
+        profiler.mark('Импорт')
+
+        names = [rec.name for rec in profiler.records]
+        self.assertEqual(names, ['colorsys'])
+        self.assertGreaterEqual(profiler.records[0].cumulative_us, profiler.records[0].self_us)
+        report = profiler.format_report(full=True)
+        self.assertIn('Импорт', report)
+        self.assertIn('| colorsys', report)
+
+
 class TestIntegrationWithReference(unittest.TestCase):
     """Интеграционный тест сравнения с reference.tap."""
 
@@ -671,75 +2544,202 @@ class TestIntegrationWithReference(unittest.TestCase):
 
     def test_compare_with_reference(self):
         """
-        Интеграционный тест: сравнение сгенерированного файла с reference.tap.
+        Интеграционный тест: дайджесты слоёв файла, записанного
+        generate_G_codes_file, совпадают с дайджестами reference.tap.
 
         Внимание: Этот тест может не пройти, если reference.tap был создан
         с другими параметрами. В таком случае нужно обновить self.reference_data
         в setUpClass.
         """
-        # Файл создается в подкаталоге с именем головы
-        head_name = self.reference_data["Выбранная игольница (ИП игольница)"]
-        generated_file = os.path.join(head_name, 'test_generated.tap')
-
-        try:
-            # Генерируем файл
-            generate_G_codes_file(self.reference_data, lambda x: None)
+        expected = layer_digests(self.reference_file)
+        with tempfile.TemporaryDirectory() as tmp:
+            generated_file = os.path.join(tmp, 'test_generated.tap')
+            generate_G_codes_file(self.reference_data, lambda x: None, output_path=generated_file)
+            generated = layer_digests(generated_file)
+        self.assertEqual(len(generated), len(expected))
+        for (layer, digest), (expected_layer, expected_digest) in zip(generated, expected):
+            self.assertEqual(layer, expected_layer)
+            self.assertEqual(digest, expected_digest,
+                             f"Команды слоя {layer} отличаются от {self.reference_file}")
+
+
+GOLDEN_DIGESTS_FILE = 'golden_digests.json'
+
+# Общая часть конфигураций эталонной матрицы
+GOLDEN_CHANGES = {
+    "Количество слоёв": 4,
+    "Количество пустых слоёв": 1,
+    "Количество шагов головы": {"X": 3, "Y": 5},
+    "Параметры паттерна": {"Кол-во ударов": 7},
+    "Чередование направлений прохода слоя": True,
+    "Позиция при ручной укладки слоя": {"Пауза в конце слоя (сек)": 2},
+}
+
+
+class TestGoldenDigests(unittest.TestCase):
+    """
+    Эталонные программы по дайджестам слоёв.
 
-            # Проверяем, что файл создан
-            self.assertTrue(
-                os.path.exists(generated_file),
-                f"Файл {generated_file} не был создан"
-            )
-
-            # Сравниваем с reference
-            identical, warnings_list = compare_gcode_files(
-                self.reference_file,
-                generated_file,
-                show_warnings=True
-            )
-
-            # Выводим предупреждения о различиях в комментариях
-            if warnings_list:
-                print("\n" + "="*70)
-                print("ПРЕДУПРЕЖДЕНИЯ О РАЗЛИЧИЯХ:")
-                print("="*70)
-
-                # Группируем предупреждения
-                comment_warnings = [w for w in warnings_list if 'комментари' in w.lower()]
-                command_warnings = [w for w in warnings_list if 'команд' in w.lower()]
-
-                if comment_warnings:
-                    print(f"\nОбнаружено {len(comment_warnings)} различий в комментариях:")
-                    # Показываем первые 5 примеров
-                    for w in comment_warnings[:5]:
-                        print(f"\n{w}")
-                    if len(comment_warnings) > 5:
-                        print(f"\n... и ещё {len(comment_warnings) - 5} различий в комментариях")
-
-                if command_warnings:
-                    print(f"\nОБНАРУЖЕНО {len(command_warnings)} РАЗЛИЧИЙ В КОМАНДАХ:")
-                    for w in command_warnings:
-                        print(f"\n{w}")
-
-                print("\n" + "="*70)
-
-            # Проверяем идентичность команд
-            self.assertTrue(
-                identical,
-                "Файлы имеют различия в командах! См. предупреждения выше."
-            )
-
-            print(f"\n✓ Тест пройден: Сгенерированный файл идентичен {self.reference_file} (по командам)")
-            if warnings_list and not any('команд' in w.lower() for w in warnings_list):
-                print(f"  Найдено {len(warnings_list)} различий только в комментариях (это нормально)")
+    Каждая конфигурация матрицы записывается generate_G_codes_file (выбор
+    способа генерации, форматирование, запись файла), для файла вычисляются
+    SHA-256 команд каждого слоя и сравниваются с golden_digests.json.
+    После намеренного изменения программы эталон обновляется запуском
+    тестов с переменной окружения UPDATE_GOLDEN=1.
+    """
 
-        finally:
-            # Удаляем сгенерированный файл и папку
-            if os.path.exists(generated_file):
-                os.remove(generated_file)
-            # Удаляем папку, если она пустая
-            if os.path.exists(head_name) and not os.listdir(head_name):
-                os.rmdir(head_name)
+    SOUND_MODES = ("Непрерывный", "Прерывистый", "Частый прерывистый")
+    ORDERS = ("По очереди", "Сначала чётные", "Сначала нечётные", "Из центра", "В центр")
+
+    def _cases(self):
+        """Матрица конфигураций: имя — параметры."""
+        # base — первый порядок рядов и первый режим сигнала без сигнала
+        changes = {'base': {}}
+        for i, order in enumerate(self.ORDERS[1:], 1):
+            changes[f'order_{i}'] = {"Порядок прохождения рядов": {"value": order}}
+        for i, mode in enumerate(self.SOUND_MODES):
+            changes[f'sound_{i}'] = {"Позиция при ручной укладки слоя": {
+                "Звуковой сигнал (сек)": 3, "Режим звукового сигнала": {"value": mode}}}
+        changes.update({
+            'swap_xy': {"Смена осей X↔Y": True},
+            'virtual_layers': {"Количество пустых слоёв": 4},
+            'progressive_depth': {"Пробивка": {
+                "Пробивка с нарастанием глубины": True, "Начальная глубина удара (мм)": 4}},
+            'no_rotation': {"Чередование направлений прохода слоя": False},
+            'fixed_z': {"Позиция при ручной укладки слоя": {"Рост Z с каждым слоем": False}},
+            'manual_pattern': {"Параметры паттерна": {
+                "Автоматическое определение формы паттерна": False, "nx": 4, "ny": 3}},
+            'frame_by_dimensions': {"Задание размеров каркаса": {"value": "По габаритам"},
+                                    "Габариты каркаса": {"X": 90, "Y": 70}},
+            'random_order': {"Случайный порядок ударов": True, "Зерно случайности": 11},
+            'random_offsets': {"Случайные смещения": True, "Зерно случайности": 12},
+        })
+        return {name: minimal_config(GOLDEN_CHANGES, change) for name, change in changes.items()}
+
+    @staticmethod
+    def _digests(config, start_layer=1):
+        """Дайджесты слоёв файла, записанного generate_G_codes_file."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'job.tap')
+            generate_G_codes_file(config, lambda x: None, output_path=path,
+                                  start_layer=start_layer)
+            return [list(item) for item in layer_digests(path)]
+
+    @staticmethod
+    def _generated_digests(config, start_layer=1):
+        """Дайджесты слоёв по мере генерации, без записи файла."""
+        generator = CommandGenerator(config)
+        reentry = generator.reentry_commands(start_layer) if start_layer > 1 else ()
+        layers = generator.iter_layers(start_layer=start_layer)
+        return [[layer, digest] for layer, digest in generated_layer_digests(layers, reentry)]
+
+    def test_golden_matrix(self):
+        """Тест: дайджесты слоёв всех конфигураций совпадают с эталоном."""
+        actual = {name: self._digests(config) for name, config in self._cases().items()}
+        actual['resume_layer_3'] = self._digests(minimal_config(GOLDEN_CHANGES), start_layer=3)
+
+        if os.environ.get('UPDATE_GOLDEN'):
+            # Одна строка на слой — в истории видно, какие слои изменились
+            cases = [f' {json.dumps(name)}: [\n'
+                     + ',\n'.join(f'  {json.dumps(item)}' for item in digests) + '\n ]'
+                     for name, digests in actual.items()]
+            with open(GOLDEN_DIGESTS_FILE, 'w', encoding='utf-8', newline='\n') as f:
+                f.write('{\n' + ',\n'.join(cases) + '\n}\n')
+        with open(GOLDEN_DIGESTS_FILE, 'r', encoding='utf-8') as f:
+            golden = json.load(f)
+
+        self.assertEqual(sorted(golden), sorted(actual), 'Набор эталонов изменился: UPDATE_GOLDEN=1')
+        for name, digests in actual.items():
+            with self.subTest(case=name):
+                self.assertEqual(len(digests), len(golden[name]))
+                for (layer, digest), (_, expected) in zip(digests, golden[name]):
+                    self.assertEqual(digest, expected, f'{name}: отличаются команды слоя {layer}')
+
+    def test_matrix_is_distinct(self):
+        """Тест: каждая конфигурация матрицы даёт свою программу (эталоны что-то проверяют)."""
+        programs = {}
+        for name, config in self._cases().items():
+            key = tuple(digest for _, digest in self._digests(config))
+            self.assertNotIn(key, programs, f'{name} совпадает с {programs.get(key)}')
+            programs[key] = name
+
+    def test_digests_match_written_file(self):
+        """Тест: дайджесты при генерации совпадают с дайджестами записанного файла."""
+        config = minimal_config(GOLDEN_CHANGES, **{"Смена осей X↔Y": True})
+        for start_layer in (1, 3):
+            self.assertEqual(self._generated_digests(config, start_layer),
+                             self._digests(config, start_layer))
+
+
+class TestDifferentialFuzz(unittest.TestCase):
+    """Тесты сравнения способов генерации на случайных параметрах (fuzz_engines.py)."""
+
+    def setUp(self):
+        # Предупреждения генератора о случайных параметрах ожидаемы
+        logger = logging.getLogger('core')
+        self.addCleanup(logger.setLevel, logger.level)
+        logger.setLevel(logging.ERROR)
+
+    def test_engines_match_reference(self):
+        """Тест: все способы генерации совпадают с исходным на случайных параметрах."""
+        result = fuzz_engines.fuzz(samples=40, seed=2026, seconds=20)
+        self.assertGreater(result.samples, 0)
+        report = '\n'.join(case.to_json() + '\n' + '\n'.join(m.describe() for m in mismatches)
+                           for case, mismatches in result.failures)
+        self.assertTrue(result.ok, report)
+
+    def test_shrinks_to_minimal_reproducer(self):
+        """Тест: расхождение упрощается до минимальных параметров."""
+        streaming = fuzz_engines.ENGINES['streaming']
+
+        def buggy(case, tmp):
+            # Ошибка проявляется только при смене осей и хотя бы двух слоях
+            commands = streaming(case, tmp)
+            config = case.config
+            if config["Смена осей X↔Y"] and config["Количество слоёв"] >= 2:
+                commands = commands[:-1]
+            return commands
+
+        result = fuzz_engines.fuzz(samples=100, seed=5, engines={'buggy': buggy})
+        self.assertEqual(len(result.failures), 1)
+        case, mismatches = result.failures[0]
+        config = case.config
+        self.assertEqual([m.engine for m in mismatches], ['buggy'])
+        self.assertTrue(config["Смена осей X↔Y"])
+        self.assertEqual(config["Количество слоёв"], 2)
+        self.assertEqual(config["Количество пустых слоёв"], 0)
+        self.assertEqual(config["Количество шагов головы"], {"X": 1, "Y": 1})
+        self.assertEqual(config["Параметры паттерна"]["Кол-во ударов"], 1)
+        self.assertFalse(config["Случайный порядок ударов"] or config["Случайные смещения"])
+        self.assertEqual(case.start_layer, 1)
+
+    def test_crash_is_a_mismatch(self):
+        """Тест: исключение любого способа, в том числе исходного, — расхождение."""
+        case = fuzz_engines.random_case(random.Random(1))
+
+        def crash(case, tmp):
+            raise MemoryError('нет памяти')
+
+        mismatches = fuzz_engines.compare_engines(case, {'crash': crash})
+        self.assertEqual(mismatches[0].describe(), 'crash: ошибка MemoryError: нет памяти')
+        invalid = fuzz_engines.FuzzCase(dict(case.config, **{"Выбранная игольница (ИП игольница)": "нет"}))
+        mismatches = fuzz_engines.compare_engines(invalid, {'crash': crash})
+        self.assertEqual([m.engine for m in mismatches], ['reference'])
+        self.assertIsNotNone(mismatches[0].error)
+
+    def test_reference_matches_golden_digests(self):
+        """Тест: исходный цикл (эталон проверки) совпадает с эталонными дайджестами."""
+        with open(GOLDEN_DIGESTS_FILE, encoding='utf-8') as f:
+            golden = json.load(f)
+        golden_cases = TestGoldenDigests()
+        cases = dict(golden_cases._cases(), resume_layer_3=minimal_config(GOLDEN_CHANGES))
+        for name, config in cases.items():
+            with self.subTest(case=name):
+                start_layer = 3 if name == 'resume_layer_3' else 1
+                generator = CommandGenerator(config)
+                reentry = generator.reentry_commands(start_layer) if start_layer > 1 else ()
+                layers = fuzz_engines.baseline_layers(generator, start_layer)
+                digests = [list(item) for item in generated_layer_digests(layers, reentry)]
+                self.assertEqual(digests, golden[name])
 
 
 def run_tests(verbosity=2):
@@ -754,9 +2754,34 @@ def run_tests(verbosity=2):
 
     # Добавляем все тестовые классы
     suite.addTests(loader.loadTestsFromTestCase(TestGCodeComparison))
+    suite.addTests(loader.loadTestsFromTestCase(TestStreamingDiff))
     suite.addTests(loader.loadTestsFromTestCase(TestGeneratorAlgorithm))
+    suite.addTests(loader.loadTestsFromTestCase(TestSeededRandomness))
+    suite.addTests(loader.loadTestsFromTestCase(TestPrecomputedCommandText))
+    suite.addTests(loader.loadTestsFromTestCase(TestSharedCommands))
     suite.addTests(loader.loadTestsFromTestCase(TestEdgeCases))
+    suite.addTests(loader.loadTestsFromTestCase(TestJobSpec))
+    suite.addTests(loader.loadTestsFromTestCase(TestEnvelopePreflight))
+    suite.addTests(loader.loadTestsFromTestCase(TestMotionPlanner))
+    suite.addTests(loader.loadTestsFromTestCase(TestAxisLimits))
+    suite.addTests(loader.loadTestsFromTestCase(TestLayerMemo))
+    suite.addTests(loader.loadTestsFromTestCase(TestJobPrediction))
+    suite.addTests(loader.loadTestsFromTestCase(TestAtomicOutputWriter))
+    suite.addTests(loader.loadTestsFromTestCase(TestBackgroundWriter))
+    suite.addTests(loader.loadTestsFromTestCase(TestMemoryBudget))
+    suite.addTests(loader.loadTestsFromTestCase(TestSubprograms))
+    suite.addTests(loader.loadTestsFromTestCase(TestSplitOutput))
+    suite.addTests(loader.loadTestsFromTestCase(TestResumeFromLayer))
+    suite.addTests(loader.loadTestsFromTestCase(TestSinglePass))
+    suite.addTests(loader.loadTestsFromTestCase(TestTelemetry))
+    suite.addTests(loader.loadTestsFromTestCase(TestJobService))
+    suite.addTests(loader.loadTestsFromTestCase(TestBatchGeneration))
+    suite.addTests(loader.loadTestsFromTestCase(TestSender))
+    suite.addTests(loader.loadTestsFromTestCase(TestLiveEstimator))
+    suite.addTests(loader.loadTestsFromTestCase(TestStartupImports))
     suite.addTests(loader.loadTestsFromTestCase(TestIntegrationWithReference))
+    suite.addTests(loader.loadTestsFromTestCase(TestGoldenDigests))
+    suite.addTests(loader.loadTestsFromTestCase(TestDifferentialFuzz))
 
     # Запускаем тесты
     runner = unittest.TextTestRunner(verbosity=verbosity)
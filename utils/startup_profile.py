@@ -0,0 +1,155 @@
+"""
+Замер времени запуска приложения.
+
+Режим запуска main.py --profile-startup: записывает время импорта каждого
+загруженного модуля (как python -X importtime) и время этапов запуска
+(импорт, создание окна, первая отрисовка), затем печатает отчёт в stderr.
+В отличие от -X importtime работает и в собранном exe.
+
+Содержит:
+- ImportRecord — время импорта одного модуля
+- StartupProfiler — сбор замеров и отчёт
+"""
+
+import builtins
+import importlib.util
+import sys
+import time
+from dataclasses import dataclass
+from typing import List, Tuple
+
+# Сколько самых медленных модулей показывать в сводке
+TOP_MODULES_DEFAULT = 15
+
+
+@dataclass
+class ImportRecord:
+    """
+    Время импорта одного модуля.
+
+    Attributes:
+        name: Полное имя модуля
+        self_us: Время без вложенных импортов (мкс)
+        cumulative_us: Время вместе с вложенными импортами (мкс)
+        depth: Глубина вложенности импорта
+    """
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+class StartupProfiler:
+    """
+    Записывает время импортов и этапов запуска.
+
+    Импорты перехватываются через builtins.__import__ — учитываются только
+    вызовы, которые действительно загрузили новые модули.
+
+    Пример:
+        profiler = StartupProfiler()
+        with profiler:
+            from gui import GeneratorApp
+        profiler.mark('Импорт GUI')
+        print(profiler.format_report())
+    """
+
+    def __init__(self):
+        self.records: List[ImportRecord] = []
+        self.marks: List[Tuple[str, float]] = []
+        self._start = time.perf_counter()
+        self._original_import = None
+        self._stack: List[int] = []
+
+    def __enter__(self) -> 'StartupProfiler':
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        builtins.__import__ = self._original_import
+        self._original_import = None
+        return False
+
+    def mark(self, label: str) -> None:
+        """
+        Отмечает завершение этапа запуска.
+
+        Args:
+            label: Название этапа
+        """
+        self.marks.append((label, time.perf_counter() - self._start))
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        """Замена builtins.__import__, замеряющая загрузку новых модулей."""
+        modules_before = set(sys.modules)
+        self._stack.append(0)
+        start = time.perf_counter_ns()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            cumulative_us = (time.perf_counter_ns() - start) // 1000
+            children_us = self._stack.pop()
+            if len(sys.modules) > len(modules_before):
+                self.records.append(ImportRecord(
+                    name=_loaded_name(name, globals, fromlist, level, modules_before),
+                    self_us=max(cumulative_us - children_us, 0),
+                    cumulative_us=cumulative_us,
+                    depth=len(self._stack),
+                ))
+                if self._stack:
+                    self._stack[-1] += cumulative_us
+
+    def slowest(self, count: int = TOP_MODULES_DEFAULT) -> List[ImportRecord]:
+        """Возвращает самые медленные импорты (по суммарному времени)."""
+        return sorted(self.records, key=lambda rec: rec.cumulative_us, reverse=True)[:count]
+
+    def format_report(self, top: int = TOP_MODULES_DEFAULT, full: bool = False) -> str:
+        """
+        Формирует отчёт о запуске.
+
+        Args:
+            top: Сколько самых медленных импортов показать в сводке
+            full: Добавить полный список импортов в формате -X importtime
+
+        Returns:
+            Текст отчёта
+        """
+        lines = ['Этапы запуска:']
+        previous = 0.0
+        for label, seconds in self.marks:
+            lines.append(f'  {label:30} {seconds * 1000:8.1f} мс  (+{(seconds - previous) * 1000:.1f} мс)')
+            previous = seconds
+
+        lines.append(f'Самые медленные импорты (из {len(self.records)}):')
+        for rec in self.slowest(top):
+            lines.append(f'  {rec.cumulative_us / 1000:8.1f} мс  {rec.name}')
+
+        if full:
+            # Порядок как у -X importtime: вложенные модули перед родителем
+            lines.append('import time: self [us] | cumulative | imported package')
+            for rec in self.records:
+                lines.append(f'import time: {rec.self_us:>9} | {rec.cumulative_us:>10} | '
+                             f'{"  " * rec.depth}{rec.name}')
+        return '\n'.join(lines)
+
+
+def _loaded_name(name, globals, fromlist, level, modules_before) -> str:
+    """
+    Возвращает полное имя модуля, загруженного вызовом __import__.
+
+    Для относительных импортов имя разрешается от пакета вызывающего модуля,
+    для 'from pkg import mod' — берётся загруженный подмодуль из fromlist.
+    """
+    if level and globals:
+        package = globals.get('__package__') or ''
+        try:
+            name = importlib.util.resolve_name('.' * level + name, package)
+        except (ImportError, ValueError):
+            pass
+    if name in modules_before:
+        for item in fromlist or ():
+            submodule = f'{name}.{item}'
+            if submodule in sys.modules and submodule not in modules_before:
+                return submodule
+    return name